@@ -0,0 +1,34 @@
+#Benchmark for how long a save holds the GUI thread: the snapshot a background save takes against serializing in place
+#Run from the repository root: python -m Benchmarks.bench_background_save
+import time
+
+from PySide6.QtWidgets import QApplication
+
+from WhiteboardApplication.main import MainWindow
+from WhiteboardApplication.notebook_data import deserialize_item
+from WhiteboardApplication.style_table import deserialize_pen
+from WhiteboardApplication.save_worker import finish_notebook
+from Benchmarks.bench_notebook_format import synthetic_notebook, best_time
+
+FRAME = 1 / 60  # s
+
+
+if __name__ == '__main__':
+    app = QApplication([])
+    window = MainWindow()
+    scene = window.scene
+    notebook = synthetic_notebook()
+    styles = scene.styles
+    for pen in notebook['styles']:
+        styles.intern(deserialize_pen(pen))
+    for item_data in notebook['items']:
+        scene.addItem(deserialize_item(item_data, styles, styles))
+
+    snapshot_time = best_time(lambda: window.snapshot_notebook(scene=scene))
+    serialize_time = best_time(lambda: window.serialize_notebook(scene=scene))
+    finish_time = best_time(lambda: finish_notebook(window.snapshot_notebook(scene=scene))) - snapshot_time
+    print(f"{len(notebook['items'])} strokes")
+    print(f"GUI thread, serializing in place: {serialize_time * 1000:8.1f} ms ({serialize_time / FRAME:.1f} frames)")
+    print(f"GUI thread, snapshot only:        {snapshot_time * 1000:8.1f} ms ({snapshot_time / FRAME:.1f} frames)")
+    print(f"worker, finishing the snapshot:   {finish_time * 1000:8.1f} ms")
+    window.close()
@@ -0,0 +1,42 @@
+#Benchmark for exporting a 300-page notebook to PDF and PNG with one worker process against one per core
+#Run from the repository root: python -m Benchmarks.bench_export
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from PySide6.QtWidgets import QApplication
+
+from WhiteboardApplication.export import export_pages
+from WhiteboardApplication.notebook_format import dumps_notebook
+from Benchmarks.bench_notebook_format import synthetic_notebook
+
+PAGES = 300
+STROKES_PER_PAGE = 400
+
+
+def synthetic_pages():
+    random.seed(1)
+    notebook = synthetic_notebook()
+    items = notebook['items']
+    # Each page a different slice of the strokes, encoded the way export hands pages to its workers
+    return [dumps_notebook(dict(notebook, items=random.sample(items, STROKES_PER_PAGE))) for _page in range(PAGES)]
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    pages = synthetic_pages()
+    cores = os.cpu_count() or 1
+    print(f"{PAGES} pages of {STROKES_PER_PAGE} strokes, {cores} core(s)")
+    print(f"{'format':>6} {'workers':>8} {'seconds':>8} {'pages/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for format in ('pdf', 'png'):
+            for workers in sorted({1, cores}):
+                start = time.perf_counter()
+                export_pages(pages, os.path.join(directory, f"notebook.{format}"), format, workers=workers)
+                elapsed = time.perf_counter() - start
+                print(f"{format:>6} {workers:>8} {elapsed:>8.2f} {PAGES / elapsed:>8.1f}")
+    # The exporting process; the pages themselves are held in memory by the benchmark
+    print(f"peak memory of this process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
@@ -0,0 +1,69 @@
+#Benchmark for moving 1M points between Qt paths and Python a point at a time against the NumPy geometry bridge
+#Run from the repository root: python -m Benchmarks.bench_geometry
+import random
+import time
+from array import array
+
+from PySide6.QtGui import QPainterPath
+
+from WhiteboardApplication import geometry
+from WhiteboardApplication.notebook_data import PackedElements, path_from_elements, serialize_path
+
+POINTS = 1000000
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def points_by_point(path):
+    return [(point.x(), point.y()) for subpath in path.toSubpathPolygons() for point in subpath]
+
+
+def elements_by_point(path):
+    kinds, xs, ys = bytearray(), array('d'), array('d')
+    for i in range(path.elementCount()):
+        element = path.elementAt(i)
+        kinds.append(element.type.value)
+        xs.append(element.x)
+        ys.append(element.y)
+    return PackedElements(kinds, xs, ys)
+
+
+def path_by_point(points):
+    path = QPainterPath()
+    path.moveTo(*points[0])
+    for x, y in points[1:]:
+        path.lineTo(x, y)
+    return path
+
+
+def path_from_elements_by_point(elements):
+    path = QPainterPath()
+    for kind, x, y in zip(elements.kinds, elements.xs, elements.ys):
+        if kind == 0:
+            path.moveTo(x, y)
+        else:
+            path.lineTo(x, y)
+    return path
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    points = [(index * 0.001, random.uniform(0, 500)) for index in range(POINTS)]
+    path = geometry.polyline_path(points)
+    elements = serialize_path(path)
+    print(f"{POINTS} points")
+    print(f"{'conversion':<34} {'per point':>10} {'bridge':>10} {'speedup':>8}")
+    for name, slow, fast in (
+            ("path -> points (save, network)", lambda: points_by_point(path),
+             lambda: geometry.point_list(geometry.path_points(path))),
+            ("path -> saved elements", lambda: elements_by_point(path), lambda: serialize_path(path)),
+            ("points -> path (JSON loaders)", lambda: path_by_point(points), lambda: geometry.polyline_path(points)),
+            ("saved elements -> path", lambda: path_from_elements_by_point(elements),
+             lambda: path_from_elements(elements))):
+        slow_result, slow_time = timed(slow)
+        fast_result, fast_time = timed(fast)
+        print(f"{name:<34} {slow_time * 1000:>8.0f}ms {fast_time * 1000:>8.0f}ms {slow_time / fast_time:>7.1f}x")
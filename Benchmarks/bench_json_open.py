@@ -0,0 +1,70 @@
+#Benchmark for opening a big collaboration whiteboard JSON file whole against streaming it (time, peak memory)
+#Run from the repository root: python -m Benchmarks.bench_json_open
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from PySide6.QtGui import QPainterPath
+
+from WhiteboardApplication import geometry
+from WhiteboardApplication.whiteboard_json import WhiteboardReader
+
+STROKES = 20000
+POINTS_PER_STROKE = 100
+
+
+def write_board(path, seed=1):
+    random.seed(seed)
+    with open(path, 'w') as file:
+        file.write('{"items": [')
+        for stroke in range(STROKES):
+            x, y = random.uniform(0, 600), random.uniform(0, 500)
+            points = [[x + point * 0.5, y + random.uniform(-1, 1)] for point in range(POINTS_PER_STROKE)]
+            if stroke:
+                file.write(', ')
+            json.dump({'type': 'path', 'color': '#000000', 'width': 3.0, 'points': points}, file)
+        file.write('], "scene_rect": [600, 500], "color": "#000000", "size": 3}')
+
+
+def open_whole(path):
+    with open(path, 'r') as file:
+        data = json.load(file)
+    paths = []
+    for item_data in data['items']:
+        path = QPainterPath()
+        path.moveTo(item_data['points'][0][0], item_data['points'][0][1])
+        for point in item_data['points'][1:]:
+            path.lineTo(point[0], point[1])
+        paths.append(path)
+    return paths
+
+
+def open_streaming(path):
+    with open(path, 'rb') as file:
+        return [geometry.polyline_path(item_data['points']) for item_data in WhiteboardReader(file).items()]
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    # Traced separately, tracing slows the run down several times
+    tracemalloc.start()
+    function()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "board.json")
+        write_board(path)
+        print(f"{STROKES} strokes of {POINTS_PER_STROKE} points, {os.path.getsize(path) / 2 ** 20:.1f} MiB on disk")
+        print(f"{'open':>10} {'strokes':>8} {'seconds':>8} {'peak MiB':>9}")  # Python heap only, paths live in Qt
+        for name, function in (('whole', open_whole), ('streaming', open_streaming)):
+            paths, elapsed, peak = measure(lambda: function(path))
+            print(f"{name:>10} {len(paths):>8} {elapsed:>8.3f} {peak / 2 ** 20:>9.1f}")
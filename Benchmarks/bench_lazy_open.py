@@ -0,0 +1,77 @@
+#Benchmark for opening a big chunked notebook lazily against reading it whole (time to the first screen, memory)
+#Run from the repository root: python -m Benchmarks.bench_lazy_open
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from PySide6.QtCore import QRectF
+
+from WhiteboardApplication.lazy_notebook import LazyNotebook
+from WhiteboardApplication.notebook_data import PackedElements, path_from_elements
+from WhiteboardApplication.notebook_format import dumps_notebook, read_notebook
+
+STROKES = 100000
+POINTS_PER_STROKE = 60
+# What the canvas zoomed all the way in shows of the page, with the prefetch margin around it
+FIRST_SCREEN = QRectF(0, 0, 212, 275)
+
+
+def synthetic_notebook(seed=1):
+    random.seed(seed)
+    pen = {'width': 2.0, 'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255},
+           'style': 1, 'capstyle': 32, 'joinstyle': 64}
+    identity = {'m11': 1.0, 'm12': 0.0, 'm13': 0.0, 'm21': 0.0, 'm22': 1.0, 'm23': 0.0,
+                'm31': 0.0, 'm32': 0.0, 'm33': 1.0}
+    items = []
+    for _ in range(STROKES):
+        x, y = random.uniform(0, 600), random.uniform(0, 500)
+        xs = [x + random.uniform(-1, 1) + point * 0.5 for point in range(POINTS_PER_STROKE)]
+        ys = [y + random.uniform(-1, 1) for _ in range(POINTS_PER_STROKE)]
+        elements = PackedElements.from_dicts([{'type': 'moveTo' if point == 0 else 'lineTo', 'x': px, 'y': py}
+                                              for point, (px, py) in enumerate(zip(xs, ys))])
+        items.append({
+            'type': 'QGraphicsPathItem', 'style': 0,
+            'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': 0},
+            'rotation': 0.0, 'transform': identity, 'x': 0.0, 'y': 0.0, 'name': '', 'elements': elements,
+        })
+    return {'template': 'blank', 'styles': [pen], 'items': items}
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    # Traced separately, tracing slows the run down several times
+    tracemalloc.start()
+    function()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def open_whole(path):
+    notebook_data = read_notebook(path)
+    return [path_from_elements(data['elements']) for data in notebook_data['items']]
+
+
+def open_lazily(path):
+    notebook = LazyNotebook(path)
+    paths = []
+    for chunk in notebook.chunks_in(FIRST_SCREEN):
+        paths.extend(path_from_elements(data['elements']) for _number, data in notebook.load_chunk(chunk))
+    notebook.close()
+    return paths
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "big.bnb")
+        with open(path, 'wb') as file:
+            file.write(dumps_notebook(synthetic_notebook()))
+        print(f"{STROKES} strokes of {POINTS_PER_STROKE} points, {os.path.getsize(path) / 2 ** 20:.1f} MiB on disk")
+        print(f"{'open':>8} {'strokes':>8} {'seconds':>8} {'peak MiB':>9}")  # Python heap only, paths live in Qt
+        for name, function in (('whole', open_whole), ('lazy', open_lazily)):
+            paths, elapsed, peak = measure(lambda: function(path))
+            print(f"{name:>8} {len(paths):>8} {elapsed:>8.3f} {peak / 2 ** 20:>9.1f}")
@@ -0,0 +1,66 @@
+#Benchmark for the notebook library: scanning ten thousand notebooks by their headers, and opening the dialog over them
+#Run from the repository root: python -m Benchmarks.bench_library
+import os
+import tempfile
+import time
+
+from PySide6.QtWidgets import QApplication
+
+from WhiteboardApplication.library import LibraryService, LibraryDialog, ScanJob
+from WhiteboardApplication.notebook_data import PackedElements
+from WhiteboardApplication.notebook_format import dumps_notebook, read_notebook
+
+NOTEBOOKS = 10000
+STROKES = 500  # per notebook
+POINTS_PER_STROKE = 40
+
+
+def small_notebook():
+    pen = {'width': 2.0, 'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255},
+           'style': 1, 'capstyle': 32, 'joinstyle': 64}
+    identity = {'m11': 1.0, 'm12': 0.0, 'm13': 0.0, 'm21': 0.0, 'm22': 1.0, 'm23': 0.0,
+                'm31': 0.0, 'm32': 0.0, 'm33': 1.0}
+    items = []
+    for stroke in range(STROKES):
+        y = stroke * 2.0
+        elements = PackedElements.from_dicts([{'type': 'moveTo' if point == 0 else 'lineTo', 'x': point * 10.0,
+                                               'y': y + point % 3} for point in range(POINTS_PER_STROKE)])
+        items.append({
+            'type': 'QGraphicsPathItem', 'style': 0,
+            'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': 0},
+            'rotation': 0.0, 'transform': identity, 'x': 0.0, 'y': 0.0, 'name': '', 'elements': elements,
+        })
+    return {'template': 'blank', 'styles': [pen], 'items': items}
+
+
+if __name__ == '__main__':
+    app = QApplication.instance() or QApplication([])
+    with tempfile.TemporaryDirectory() as directory:
+        folder = os.path.join(directory, "notebooks")
+        data = dumps_notebook(small_notebook())
+        for number in range(NOTEBOOKS):
+            path = os.path.join(folder, f"{number // 1000:02d}", f"notebook{number:05d}.bnb")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(data)
+        print(f"{NOTEBOOKS} notebooks of {len(data) / 1024:.0f} KiB")
+
+        start = time.perf_counter()
+        for number in range(0, NOTEBOOKS, 100):
+            read_notebook(os.path.join(folder, f"{number // 1000:02d}", f"notebook{number:05d}.bnb"))
+        print(f"{'reading every file whole':>28} {(time.perf_counter() - start) * 100:>8.2f} s (estimated)")
+
+        service = LibraryService(os.path.join(directory, "library.sqlite"))
+        for name in ('first scan, headers only', 'scan again, nothing changed'):
+            start = time.perf_counter()
+            ScanJob(service.writer, folders=[folder]).run()
+            print(f"{name:>28} {time.perf_counter() - start:>8.2f} s")
+
+        start = time.perf_counter()
+        dialog = LibraryDialog(service)
+        dialog.show()
+        app.processEvents()
+        print(f"{'opening the dialog':>28} {(time.perf_counter() - start) * 1000:>8.1f} ms, "
+              f"{dialog.model.rowCount()} notebooks listed")
+        dialog.reject()
+        service.close()
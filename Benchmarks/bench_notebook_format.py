@@ -0,0 +1,74 @@
+#Benchmark for the binary notebook format against the pickle format it replaces (file size, save and load time)
+#Run from the repository root: python -m Benchmarks.bench_notebook_format
+import math
+import pickle
+import random
+import time
+
+from WhiteboardApplication.notebook_data import path_from_elements, serialize_times
+from WhiteboardApplication.notebook_format import dumps_notebook, loads_notebook
+
+STROKES = 2000
+POINTS_PER_STROKE = 150
+REPEATS = 3
+
+
+def synthetic_notebook(seed=1):
+    """A full page of wandering pen strokes, saved the way the pickle format held them: a dict per element."""
+    random.seed(seed)
+    pen = {'width': 3.0, 'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255},
+           'style': 1, 'capstyle': 32, 'joinstyle': 64}
+    identity = {'m11': 1.0, 'm12': 0.0, 'm13': 0.0, 'm21': 0.0, 'm22': 1.0, 'm23': 0.0,
+                'm31': 0.0, 'm32': 0.0, 'm33': 1.0}
+    items = []
+    for stroke in range(STROKES):
+        x, y = random.uniform(0, 600), random.uniform(0, 500)
+        heading = random.uniform(0, 2 * math.pi)
+        elements = []
+        for point in range(POINTS_PER_STROKE):
+            heading += random.uniform(-0.3, 0.3)
+            x += math.cos(heading) * 2
+            y += math.sin(heading) * 2
+            elements.append({'type': 'moveTo' if point == 0 else 'lineTo', 'x': float(round(x)), 'y': float(round(y))})
+        items.append({
+            'type': 'QGraphicsPathItem', 'style': 0,
+            'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': 0},
+            'rotation': 0.0, 'transform': identity, 'x': 0.0, 'y': 0.0, 'name': '', 'elements': elements,
+            'times': serialize_times(1.7e12 + stroke * 1000,
+                                     [random.randint(5, 20) for _ in range(POINTS_PER_STROKE)]),
+        })
+    return {'template': 'blank', 'styles': [pen], 'items': items}
+
+
+def best_time(function):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def build_paths(notebook_data):
+    for item_data in notebook_data['items']:
+        path_from_elements(item_data['elements'])
+
+
+if __name__ == '__main__':
+    notebook = synthetic_notebook()
+    pickled = pickle.dumps(notebook, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"{STROKES} strokes of {POINTS_PER_STROKE} points")
+    print(f"{'format':>8} {'bytes':>10} {'smaller':>8} {'save s':>8} {'parse s':>8} {'load s':>8}")
+    print(f"{'pickle':>8} {len(pickled):>10} {1:>8.1f} "
+          f"{best_time(lambda: pickle.dumps(notebook, protocol=pickle.HIGHEST_PROTOCOL)):>8.3f} "
+          f"{best_time(lambda: pickle.loads(pickled)):>8.3f} "
+          f"{best_time(lambda: build_paths(pickle.loads(pickled))):>8.3f}")
+
+    for compression in ('zlib', 'lzma'):
+        # Saved from the app the elements are already packed, so time the save from packed data
+        packed = loads_notebook(dumps_notebook(notebook, compression))
+        data = dumps_notebook(packed, compression)
+        print(f"{compression:>8} {len(data):>10} {len(pickled) / len(data):>8.1f} "
+              f"{best_time(lambda: dumps_notebook(packed, compression)):>8.3f} "
+              f"{best_time(lambda: loads_notebook(data)):>8.3f} "
+              f"{best_time(lambda: build_paths(loads_notebook(data))):>8.3f}")
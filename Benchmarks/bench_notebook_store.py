@@ -0,0 +1,94 @@
+#Benchmark for saving and opening notebooks as a SQLite store against pickles, at 10k, 100k and 1M strokes
+#Run from the repository root: python -m Benchmarks.bench_notebook_store [strokes ...]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PySide6.QtCore import QRectF
+
+from WhiteboardApplication.notebook_data import PackedElements
+from WhiteboardApplication.notebook_format import read_notebook, write_notebook
+from WhiteboardApplication.notebook_store import save_store, update_store, StoreNotebook
+
+SIZES = (10000, 100000, 1000000)
+POINTS_PER_STROKE = 20
+# What the canvas zoomed all the way in shows of the page, with the prefetch margin around it
+FIRST_SCREEN = QRectF(0, 0, 212, 275)
+
+
+def stroke(x, y):
+    xs = [x + point * 0.5 for point in range(POINTS_PER_STROKE)]
+    ys = [y + random.uniform(-1, 1) for _ in range(POINTS_PER_STROKE)]
+    return {
+        'type': 'QGraphicsPathItem', 'style': 0,
+        'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': 0},
+        'rotation': 0.0, 'x': 0.0, 'y': 0.0, 'name': '',
+        'transform': {'m11': 1.0, 'm12': 0.0, 'm13': 0.0, 'm21': 0.0, 'm22': 1.0, 'm23': 0.0,
+                      'm31': 0.0, 'm32': 0.0, 'm33': 1.0},
+        'elements': PackedElements.from_dicts([{'type': 'moveTo' if point == 0 else 'lineTo', 'x': px, 'y': py}
+                                               for point, (px, py) in enumerate(zip(xs, ys))]),
+    }
+
+
+def synthetic_notebook(strokes, seed=1):
+    random.seed(seed)
+    pen = {'width': 2.0, 'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255},
+           'style': 1, 'capstyle': 32, 'joinstyle': 64}
+    items = [stroke(random.uniform(0, 3000), random.uniform(0, 3000)) for _ in range(strokes)]
+    return {'template': 'blank', 'styles': [pen], 'items': items}
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def open_first_screen(path):
+    notebook = StoreNotebook(path)
+    strokes = [data for chunk in notebook.chunks_in(FIRST_SCREEN) for data in notebook.load_chunk(chunk)]
+    notebook.close()
+    return strokes
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    print(f"{'strokes':>8} {'pass':>30} {'seconds':>8} {'MiB':>7}")
+    for size in sizes:
+        notebook = synthetic_notebook(size)
+        with tempfile.TemporaryDirectory() as directory:
+            pickled, store = os.path.join(directory, "notes.pkl"), os.path.join(directory, "notes.bndb")
+
+            # Items are given ids from the bottom of the stack up, as a page saving to the store has them
+            ids = list(range(size, 0, -1))
+
+            def draw_and_save_whole():
+                # One stroke drawn on top, then the whole page saved again
+                notebook['items'].insert(0, stroke(100, 100))
+                ids.insert(0, ids[0] + 1)
+                save_store(store, notebook, ids=ids)
+
+            def draw_and_save_changes(count):
+                # Strokes drawn on top, then only they are saved
+                changes = []
+                for _ in range(count):
+                    notebook['items'].insert(0, stroke(100, 100))
+                    ids.insert(0, ids[0] + 1)
+                    changes.append((ids[0], notebook['items'][0]))
+                update_store(store, dict(notebook, items=changes))
+
+            passes = [
+                ('pickle: save', lambda: write_notebook(pickled, notebook), pickled),
+                ('pickle: open', lambda: read_notebook(pickled), pickled),
+                ('store: first save', lambda: save_store(store, notebook, ids=ids), store),
+                ('store: one stroke, whole save', draw_and_save_whole, store),
+                ('store: one stroke, changes', lambda: draw_and_save_changes(1), store),
+                ('store: 1000 strokes, changes', lambda: draw_and_save_changes(1000), store),
+                ('store: open first screen', lambda: open_first_screen(store), store),
+                ('store: open whole', lambda: read_notebook(store), store),
+            ]
+            for name, function, path in passes:
+                seconds, _result = timed(function)
+                print(f"{size:>8} {name:>30} {seconds:>8.3f} {os.path.getsize(path) / 2 ** 20:>7.1f}")
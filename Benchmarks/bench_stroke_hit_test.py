@@ -0,0 +1,56 @@
+#Benchmark for point-in-stroke checks on wide pens (StrokeItem vs QGraphicsPathItem)
+#Run from the repository root: python -m Benchmarks.bench_stroke_hit_test
+import random
+import time
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainterPath, QPen, QColor, Qt
+from PySide6.QtWidgets import QApplication, QGraphicsPathItem
+
+from WhiteboardApplication.stroke_item import StrokeItem
+
+STROKES = 200
+POINTS_PER_STROKE = 150
+QUERIES = 20000
+
+
+def build_strokes(item_class, width):
+    random.seed(1)
+    items = []
+    for _ in range(STROKES):
+        path = QPainterPath()
+        x, y = random.uniform(0, 800), random.uniform(0, 1000)
+        path.moveTo(x, y)
+        for _ in range(POINTS_PER_STROKE):
+            x += random.uniform(-6, 6)
+            y += random.uniform(-6, 6)
+            path.lineTo(x, y)
+        item = item_class(path)
+        pen = QPen(QColor("#000000"), width)
+        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        item.setPen(pen)
+        items.append(item)
+    return items
+
+
+def run(item_class, width):
+    items = build_strokes(item_class, width)
+    random.seed(2)
+    queries = [QPointF(random.uniform(0, 850), random.uniform(0, 1100)) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    hits = 0
+    for i, point in enumerate(queries):
+        if items[i % STROKES].contains(point):
+            hits += 1
+    return time.perf_counter() - start, hits
+
+
+if __name__ == '__main__':
+    app = QApplication([])
+    for width in [1, 10, 40]:
+        base, base_hits = run(QGraphicsPathItem, width)
+        cached, cached_hits = run(StrokeItem, width)
+        print(f"pen {width:>2}px: QGraphicsPathItem {base * 1000:8.1f} ms, "
+              f"StrokeItem {cached * 1000:8.1f} ms, speedup {base / cached:5.1f}x "
+              f"(hits {base_hits} / {cached_hits})")
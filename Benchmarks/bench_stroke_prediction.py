@@ -0,0 +1,45 @@
+#Benchmark for pen tip prediction on synthetic handwriting (latency hidden vs. overshoot)
+#Run from the repository root: python -m Benchmarks.bench_stroke_prediction
+import math
+import random
+
+from PySide6.QtCore import QPointF
+
+from WhiteboardApplication.stroke_prediction import StrokePredictor, PredictionStats
+
+STROKES = 200
+SAMPLE_INTERVAL = 8.0  # ms between pen samples, a 125 Hz digitizer
+SAMPLES_PER_STROKE = 120
+
+
+def handwriting(seed):
+    """Loopy cursive-like motion: a drifting baseline with overlapping circles of varying speed."""
+    random.seed(seed)
+    radius = random.uniform(8, 20)
+    drift = random.uniform(0.5, 2.0)
+    speed = random.uniform(0.015, 0.04)
+    for i in range(SAMPLES_PER_STROKE):
+        t = i * SAMPLE_INTERVAL
+        angle = t * speed
+        yield t, QPointF(t * drift * 0.1 + radius * math.cos(angle), radius * math.sin(angle) * 1.6)
+
+
+def run(horizon):
+    predictor = StrokePredictor(horizon=horizon, stats=PredictionStats())
+    for seed in range(STROKES):
+        samples = handwriting(seed)
+        t, point = next(samples)
+        predictor.begin_stroke(point, t)
+        for t, point in samples:
+            predictor.add_sample(point, t)
+            predictor.predict()
+        predictor.end_stroke()
+    return predictor.stats.report()
+
+
+if __name__ == '__main__':
+    for horizon in [8, 16, 24, 32]:
+        report = run(horizon)
+        print(f"horizon {horizon:>2} ms: latency hidden {report['latency_hidden_ms']:5.1f} ms, "
+              f"mean error {report['mean_error']:5.2f}, max error {report['max_error']:5.2f}, "
+              f"mean overshoot {report['mean_overshoot']:5.2f} ({report['predictions']} predictions)")
@@ -0,0 +1,37 @@
+#Benchmark for checking a big notebook's checksums against reading the file and decoding it whole
+#Run from the repository root: python -m Benchmarks.bench_verify
+import os
+import tempfile
+import time
+
+from Benchmarks.bench_lazy_open import synthetic_notebook
+from WhiteboardApplication.batch import verify_file
+from WhiteboardApplication.notebook_format import dumps_notebook, read_notebook
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        while file.read(1 << 20):
+            pass
+
+
+def timed(function, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "big.bnb")
+        with open(path, 'wb') as file:
+            file.write(dumps_notebook(synthetic_notebook()))
+        size = os.path.getsize(path) / 2 ** 20
+        print(f"{size:.1f} MiB on disk")
+        print(f"{'pass':>8} {'seconds':>8} {'MiB/s':>8}")
+        for name, function in (('read', read_bytes), ('verify', verify_file), ('decode', read_notebook)):
+            elapsed = timed(lambda: function(path))
+            print(f"{name:>8} {elapsed:>8.3f} {size / elapsed:>8.0f}")
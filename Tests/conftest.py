@@ -0,0 +1,94 @@
+#Shared fixtures for the tests in the Tests directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import random
+
+import pytest
+from PySide6.QtGui import QPainterPath, QPen, QColor, Qt
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication import autosave, thumbnails, search, library, garbage_collector
+from WhiteboardApplication.main import MainWindow
+from WhiteboardApplication.stroke_item import StrokeItem
+
+
+@pytest.fixture(autouse=True, scope='session')
+def collector(qapp):
+    # As in the app, the save and snapshot workers never free the Qt objects of windows closed by earlier tests
+    garbage_collector.install(qapp)
+
+
+@pytest.fixture(autouse=True)
+def autosave_directory(tmp_path, monkeypatch):
+    # Every window journals its notebooks, keep those out of the real autosave directory
+    directory = str(tmp_path / "autosave")
+    monkeypatch.setattr(autosave, 'journal_directory', lambda: directory)
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def thumbnail_cache(tmp_path, monkeypatch):
+    # Nor should their thumbnails end up in the real cache
+    path = str(tmp_path / "thumbnails.sqlite")
+    monkeypatch.setattr(thumbnails, 'cache_path', lambda: path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def search_index(tmp_path, monkeypatch):
+    # Nor their text boxes in the real search index
+    path = str(tmp_path / "search.sqlite")
+    monkeypatch.setattr(search, 'index_path', lambda: path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def library_database(tmp_path, monkeypatch):
+    # Nor should the notebooks they open end up in the real library
+    path = str(tmp_path / "library.sqlite")
+    monkeypatch.setattr(library, 'library_path', lambda: path)
+    return path
+
+
+@pytest.fixture
+def window(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    return window
+
+
+def current_scene(window):
+    """Scene of the page in the window's current tab."""
+    return window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+
+
+def add_stroke(scene, points, color="#000000", width=5, undo=True):
+    """Draws a stroke through points with a round pen, as the pen tool does; with undo it can be undone too."""
+    path = QPainterPath()
+    path.moveTo(*points[0])
+    for point in points[1:]:
+        path.lineTo(*point)
+    stroke = StrokeItem(path)
+    pen = QPen(QColor(color), width)
+    pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+    scene.styles.apply(stroke, pen)
+    scene.addItem(stroke)
+    if undo:
+        scene.add_item_to_undo(stroke)
+    return stroke
+
+
+def add_strokes(scene, count, seed=7):
+    """Draws count random scribbles over the first screen of a page, the same ones for the same seed."""
+    generator = random.Random(seed)
+    strokes = []
+    for _ in range(count):
+        x, y = generator.uniform(0, 600), generator.uniform(0, 500)
+        points = [(x, y)]
+        for _ in range(30):
+            x += generator.uniform(-8, 8)
+            y += generator.uniform(-8, 8)
+            points.append((x, y))
+        strokes.append(add_stroke(scene, points, generator.choice(["#000000", "#ff0000"]),
+                                  generator.choice([1, 5, 20]), undo=False))
+    return strokes
@@ -0,0 +1,153 @@
+#Tests file for asset_store.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pytest
+from PySide6.QtGui import QPixmap, QColor, QImage, QPainter
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import autosave
+from WhiteboardApplication.notebook_format import dumps_notebook, read_notebook
+from Tests.conftest import current_scene
+
+
+def screenshot(color="#3366cc"):
+    image = QImage(120, 80, QImage.Format.Format_ARGB32)
+    image.fill(QColor(color))
+    for x in range(120):
+        image.setPixelColor(x, x % 80, QColor("#ffffff"))
+    return QPixmap.fromImage(image)
+
+
+def paste(scene, pixmap, x, y):
+    item = ResizablePixmapItem(pixmap)
+    item.setPos(x, y)
+    scene.add_image(item)
+    return item
+
+
+def render(scene):
+    image = QImage(600, 500, QImage.Format.Format_ARGB32)
+    painter = QPainter(image)
+    scene.render(painter)
+    painter.end()
+    return image
+
+
+def test_SamePictureStoredOnce(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    paste(scene, screenshot(), 0, 0)
+    one = len(dumps_notebook(window.serialize_notebook()))
+    for page in range(29):
+        paste(scene, screenshot(), 10 * page, 5 * page)
+    paste(scene, screenshot("#cc3333"), 300, 300)
+
+    notebook = window.serialize_notebook()
+    keys = {data['asset'] for data in notebook['items'] if data['type'] == 'Image'}
+    assert len(notebook['items']) == 31 and len(keys) == 2 and notebook['assets'].keys() == keys
+    # Thirty copies cost their positions, not thirty pictures
+    assert len(dumps_notebook(notebook)) < 2 * one + 2048
+
+
+def test_ImagesDecodedWhenFirstShown(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    pasted = paste(scene, screenshot(), 20, 30)
+    pasted.resize(pasted.mapToScene(QPointF(60, 40)), 3)
+    paste(scene, screenshot(), 400, 300)
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook())
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.deserialize_notebook(read_notebook(path))
+    loaded = current_scene(window)
+    images = sorted((item for item in loaded.items() if isinstance(item, ResizablePixmapItem)), key=lambda item: item.x())
+    assert [item.pending_size is not None for item in images] == [True, True]
+    assert images[0].image_size() == pasted.image_size()
+    assert images[0].boundingRect() == pasted.boundingRect()
+
+    image = render(loaded)
+    assert [item.pending_size is None for item in images] == [True, True]
+    assert image == render(scene)
+    assert images[0].pixmap().size() == pasted.pixmap().size()
+    # Both show the one decoded picture
+    assert images[0].original_pixmap.cacheKey() == images[1].original_pixmap.cacheKey()
+
+
+def test_ImagesRecoveredFromJournal(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    paste(scene, screenshot(), 10, 10)
+    paste(scene, screenshot(), 200, 10)
+    saved = window.serialize_notebook()
+    journal = scene.history.journal
+    journal.flush()
+    base, records, _length = autosave.read_journal(journal.path)
+    assert [kind for kind, _command in records].count(autosave.ASSETS) == 1
+    assert autosave.journal_assets(base, records).keys() == list(saved['assets'])
+    journal.discard()
+
+
+def test_ImagesOfTheOpenedFileLeftOutOfTheJournal(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    paste(scene, screenshot(), 10, 10)
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook())
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.open_notebook(path)
+    scene = current_scene(window)
+    scene.load_all()
+    paste(scene, screenshot("#cc3333"), 200, 10)
+    saved = window.serialize_notebook()
+    journal = scene.history.journal
+    journal.flush()
+    base, records, _length = autosave.read_journal(journal.path)
+    # Only the picture pasted after opening is journaled, the file has the other
+    journaled = [command for kind, command in records if kind == autosave.ASSETS]
+    assert len(journaled) == 1 and len(journaled[0]) == 1
+    journal.file.close()
+    journal.lock.unlock()
+    scene.history.journal = None
+
+    recovered = MainWindow()
+    qtbot.addWidget(recovered)
+    recovered.tabWidget.setCurrentIndex(recovered.tabWidget.count() - 1)
+    assert recovered.serialize_notebook()['items'] == saved['items']
+    assert recovered.serialize_notebook()['assets'].keys() == saved['assets'].keys()
+
+
+@pytest.mark.parametrize('name', ["notebook.bnb", "notebook" + notebook_store.EXTENSION])
+def test_PicturesOfAnOpenedFileReadWhenFirstShown(qtbot, tmp_path, name):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    paste(scene, screenshot(), 20, 30)
+    paste(scene, screenshot("#cc3333"), 400, 300)
+    path = str(tmp_path / name)
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    assert window.open_notebook(path)
+    loaded = current_scene(window)
+    images = sorted((item for item in loaded.items() if isinstance(item, ResizablePixmapItem)), key=lambda item: item.x())
+    assert len(loaded.assets) == 2 and list(loaded.assets.blobs.values()) == [None, None]
+
+    # A picture deleted before it was ever shown is read before the save writes over the file, for undo
+    loaded.delete_items([images[1]])
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    loaded.undo()
+    restored = [item for item in loaded.items() if isinstance(item, ResizablePixmapItem) and item.x() == 400]
+    render(loaded)
+    assert restored[0].pixmap().toImage() == screenshot("#cc3333").toImage()
+    assert None not in loaded.assets.blobs.values()
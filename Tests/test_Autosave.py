@@ -0,0 +1,208 @@
+#Tests file for autosave.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import glob
+import os
+
+from PySide6.QtCore import QPointF
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import autosave, history
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import add_stroke, current_scene
+
+
+def crash(window):
+    """Leave the window's journals behind the way a crash would: on disk, with no one holding their locks."""
+    for index in range(window.tabWidget.count()):
+        history = window.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene().history
+        if history.journal.file is not None:
+            history.journal.flush()
+            history.journal.file.close()
+        history.journal.lock.unlock()
+        history.journal = None
+
+
+def recover(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    return window, current_scene(window)
+
+
+def test_EditsRecoveredAfterCrash(qtbot):
+    window, scene = recover(qtbot)
+    add_stroke(scene, [(10, 10), (50, 10)], color="#ff0000")
+    add_stroke(scene, [(10, 10), (50, 10)], color="#00ff00")
+    add_stroke(scene, [(200, 200), (250, 200)], color="#0000ff")
+    scene.erase(QPointF(30, 10))
+    scene.undo()
+    text_box = TextBox()
+    scene.add_text_box(text_box)
+    text_box.textCursor().insertText("Notes ")
+    window.clear_canvas()
+    window.undo()
+    saved = window.serialize_notebook()
+    crash(window)
+
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.tabWidget.count() == 2
+    assert recovered.serialize_notebook()['items'] == saved['items']
+    # The undo history comes back too, and redo brings back the cleared page
+    recovered_scene.undo()
+    assert [item.toPlainText() for item in recovered_scene.items() if isinstance(item, TextBox)] == ["Type Here"]
+    recovered_scene.redo()
+    recovered_scene.redo()
+    assert current_scene(recovered).items() == []
+
+
+def test_RecoversOnTopOfTheOpenedFile(qtbot, tmp_path, monkeypatch):
+    window, scene = recover(qtbot)
+    for x in range(0, 300, 30):
+        add_stroke(scene, [(x, 10), (x, 100)])
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook())
+
+    monkeypatch.setattr(library.LibraryDialog, 'get_notebook', lambda *args: path)
+    window.load()
+    scene.load_all()
+    scene.erase(QPointF(30, 50))
+    add_stroke(scene, [(400, 400), (450, 450)], color="#ff0000")
+    saved = window.serialize_notebook()
+    crash(window)
+
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.serialize_notebook()['items'] == saved['items']
+    assert len(saved['items']) == 10
+
+
+def test_JournalCompactsIntoSnapshot(qtbot, monkeypatch, autosave_directory):
+    monkeypatch.setattr(autosave, 'COMPACT_THRESHOLD', 4096)
+    window, scene = recover(qtbot)
+    journal = scene.history.journal
+    for i in range(100):
+        add_stroke(scene, [(i, 0), (i, 100), (i + 5, 200)])
+        qtbot.waitUntil(lambda: journal.compaction is None, timeout=5000)
+    assert journal.size < 3 * 4096
+    saved = window.serialize_notebook()
+    crash(window)
+
+    # A crash mid-write leaves a torn record at the end, which is ignored
+    with open(glob.glob(os.path.join(autosave_directory, '*.journal'))[0], 'ab') as file:
+        file.write(b'\x40\x00\x00\x00torn')
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.serialize_notebook()['items'] == saved['items']
+
+
+def test_ClosingLeavesNothingToRecover(qtbot, autosave_directory):
+    window, scene = recover(qtbot)
+    add_stroke(scene, [(10, 10), (50, 10)])
+    scene.history.journal.flush()
+    assert glob.glob(os.path.join(autosave_directory, '*.journal'))
+
+    window.close()
+    assert not glob.glob(os.path.join(autosave_directory, '*.journal'))
+    window, scene = recover(qtbot)
+    assert window.tabWidget.count() == 1
+
+
+def test_UnrecoverableJournalIsSetAside(qtbot, tmp_path, monkeypatch, autosave_directory):
+    window, scene = recover(qtbot)
+    add_stroke(scene, [(10, 10), (50, 10)])
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook())
+    monkeypatch.setattr(library.LibraryDialog, 'get_notebook', lambda *args: path)
+    window.load()
+    add_stroke(scene, [(400, 400), (450, 450)])
+
+    # A file that can't be opened leaves the page, and the file its journal is based on, as they were
+    broken = str(tmp_path / "broken.pkl")
+    with open(broken, 'wb') as file:
+        file.write(b'not a notebook')
+    assert not window.open_notebook(broken)
+    assert scene.history.journal.base['path'] == os.path.abspath(path)
+    crash(window)
+
+    # The file the journal was based on is gone, which mustn't keep the window from opening
+    os.remove(path)
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.tabWidget.count() == 1
+    assert "Couldn't recover 1 notebook(s)" in recovered.statusbar.currentMessage()
+    assert not glob.glob(os.path.join(autosave_directory, '*.journal'))
+    assert glob.glob(os.path.join(autosave_directory, '*' + autosave.UNRECOVERED_SUFFIX))
+
+
+def test_RecoveredUndoMatchesTheCrashedOne(qtbot, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(history.time, 'monotonic', lambda: clock[0])
+    window, scene = recover(qtbot)
+    stroke = add_stroke(scene, [(10, 10), (50, 10)])
+    item_id = scene.item_id(stroke)
+    # Two moves far apart are two entries, two close together one
+    for delay in (5, 5, 0.1):
+        clock[0] += delay
+        stroke.moveBy(10, 0)
+        scene.history.push(MoveItems({item_id: (10, 0)}))
+    assert len(scene.history) == 3
+    crash(window)
+
+    # Replayed in no time at all, the moves still come back as the entries they were
+    recovered, recovered_scene = recover(qtbot)
+    assert len(recovered_scene.history) == 3
+    recovered_scene.undo()
+    assert recovered.serialize_notebook()['items'][0]['x'] == 10
+
+
+def test_FileCloseLeavesNothingToRecover(qtbot, autosave_directory):
+    window, scene = recover(qtbot)
+    add_stroke(scene, [(10, 10), (50, 10)])
+    scene.history.journal.flush()
+
+    window.actionClose.trigger()
+    assert not glob.glob(os.path.join(autosave_directory, '*.journal'))
+
+
+def test_RecoversOnTopOfAStoreSavedWithOnlyItsChanges(qtbot, tmp_path):
+    window, scene = recover(qtbot)
+    for x in range(0, 300, 30):
+        add_stroke(scene, [(x, 10), (x, 100)])
+    path = str(tmp_path / "notebook.bndb")
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs and scene.history.journal.compaction is None, timeout=10000)
+
+    # Edits made while the changes are saved are carried over onto the store, and so are those after
+    add_stroke(scene, [(10, 200), (100, 200)], color="#ff0000")
+    job = window.save_notebook(path)
+    add_stroke(scene, [(10, 250), (100, 250)], color="#00ff00")
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    assert job.incremental and scene.history.journal.base['kind'] == 'file'
+    scene.delete_items([item for item in scene.items() if isinstance(item, StrokeItem)][-1:])
+    saved = window.serialize_notebook()
+    crash(window)
+
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.tabWidget.count() == 2
+    assert recovered.serialize_notebook()['items'] == saved['items']
+    # Saving the recovered page writes the edits made after the last save
+    assert recovered_scene.bound_to(path) and len(recovered_scene.changed_ids) == 2
+
+
+def test_SavesInARowShareOneSnapshot(qtbot, tmp_path):
+    window, scene = recover(qtbot)
+    journal = scene.history.journal
+    add_stroke(scene, [(10, 10), (50, 10)])
+    path = str(tmp_path / "notebook.bnb")
+    first = window.save_notebook(path)
+    running = journal.compaction
+    add_stroke(scene, [(10, 50), (50, 50)], color="#ff0000")
+    second = window.save_notebook(path)
+    # The second save leaves the snapshot of the first to finish, and its edit is carried over
+    assert journal.compaction is running
+    qtbot.waitUntil(lambda: not window.save_jobs and journal.compaction is None, timeout=10000)
+    assert first.incremental is False and second.incremental is False
+    assert not glob.glob(path + '*.snapshot') and not glob.glob(journal.path + '*.snapshot')
+    saved = window.serialize_notebook()
+    crash(window)
+
+    recovered, recovered_scene = recover(qtbot)
+    assert recovered.serialize_notebook()['items'] == saved['items']
@@ -0,0 +1,98 @@
+#Tests file for batch.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import json
+import os
+import pickle
+
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.batch import main as batch_main, run_batch, validate_notebook
+from WhiteboardApplication.notebook_format import read_notebook, dumps_notebook
+from WhiteboardApplication.notebook_store import save_store, read_store
+from WhiteboardApplication.stroke_item import StrokeItem
+
+BOARD = {'items': [{'type': 'path', 'color': '#ff0000', 'width': 3.0, 'points': [[10, 10], [200, 120]]}],
+         'scene_rect': [600, 500], 'color': '#000000', 'size': 3}
+
+
+def saved_notebook(qtbot, strokes):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    for start, end in strokes:
+        path = QPainterPath()
+        path.moveTo(*start)
+        path.lineTo(*end)
+        stroke = StrokeItem(path)
+        scene.styles.apply(stroke, QPen(QColor("#000000"), 4))
+        scene.addItem(stroke)
+    return window.serialize_notebook()
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def test_ConvertsFolders(qtbot, tmp_path, capsys):
+    notebook = saved_notebook(qtbot, [((50, 50), (300, 200)), ((60, 400), (500, 400))])
+    source, converted = tmp_path / "notebooks", tmp_path / "converted"
+    write(str(source / "class" / "lecture.pkl"), pickle.dumps(notebook))
+    write(str(source / "board.json"), json.dumps(BOARD).encode('utf-8'))
+    write(str(source / "broken.bnb"), dumps_notebook(notebook)[:40])
+
+    assert batch_main(['convert', str(source), '-o', str(converted), '-j', '2']) == 1
+    report = capsys.readouterr().out
+    assert "3 files, 1 failed" in report
+    assert "broken.bnb: FAILED: NotebookFormatError" in report
+    assert len(read_notebook(str(converted / "class" / "lecture.bnb"))['items']) == 2
+    assert len(read_notebook(str(converted / "board.bnb"))['items']) == 1
+    assert not os.path.exists(converted / "broken.bnb")
+
+
+def test_ValidatesCompactsAndUpgrades(qtbot, tmp_path):
+    notebook = saved_notebook(qtbot, [((50, 50), (300, 200)), ((9000, 9000), (9100, 9100))])
+    assert validate_notebook(notebook) == []
+    assert validate_notebook(dict(notebook, styles=[])) == ["stroke 0 has no pen", "stroke 1 has no pen"]
+    write(str(tmp_path / "old.pkl"), pickle.dumps(notebook))
+    write(str(tmp_path / "current.bnb"), dumps_notebook(notebook))
+    write(str(tmp_path / "damaged.pkl"), pickle.dumps(dict(notebook, styles=[])))
+    paths = [str(tmp_path / name) for name in ("old.pkl", "current.bnb", "damaged.pkl")]
+
+    validated = run_batch('validate', paths, workers=2)
+    assert [result.failed for result in validated] == [False, False, True]
+    assert validated[2].error == "ValueError: stroke 0 has no pen; stroke 1 has no pen"
+
+    corrupted = bytearray(dumps_notebook(notebook))
+    corrupted[-5] ^= 0xff
+    write(str(tmp_path / "corrupted.bnb"), bytes(corrupted))
+    verified = run_batch('verify', paths[:2] + [str(tmp_path / "corrupted.bnb")], workers=2)
+    assert [result.note for result in verified[:2]] == ["not checked, no checksums", ""]
+    assert verified[2].error.startswith("NotebookFormatError: 1 strokes around")
+
+    compacted = run_batch('compact', paths[:1], workers=1)[0]
+    assert compacted.output == paths[0] and compacted.bytes_saved > 0
+    assert len(pickle.loads(open(paths[0], 'rb').read())['items']) == 1
+
+    modified = os.path.getmtime(paths[1])
+    upgraded = run_batch('upgrade', paths[:2], workers=2)
+    assert [result.output for result in upgraded] == [str(tmp_path / "old.bnb"), None]
+    assert upgraded[1].note == "up to date" and os.path.getmtime(paths[1]) == modified
+    assert len(read_notebook(str(tmp_path / "old.bnb"))['items']) == 1
+
+
+def test_StoresAreFoundAndStayStores(qtbot, tmp_path):
+    notebook = saved_notebook(qtbot, [((50, 50), (300, 200)), ((9000, 9000), (9100, 9100))])
+    path = str(tmp_path / "notes" / "store.bndb")
+    os.makedirs(os.path.dirname(path))
+    save_store(path, notebook)
+
+    assert [result.path for result in run_batch('validate', [str(tmp_path / "notes")], workers=1)] == [path]
+    assert run_batch('upgrade', [path], workers=1)[0].note == "up to date"
+    compacted = run_batch('compact', [path], workers=1)[0]
+    assert compacted.output == path and not compacted.failed
+    assert len(read_store(path)['items']) == 1
@@ -0,0 +1,76 @@
+#Tests file for compaction.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pickle
+
+from PySide6.QtCore import QPointF
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.compaction import compact_notebook, main as compaction_main, DEGENERATE, OFF_PAGE, \
+    ERASED, UNUSED_ERASER
+from Tests.conftest import add_stroke
+
+
+def build_notebook(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+
+    strokes = {
+        'kept': add_stroke(scene, [(50, 50), (150, 80)]),
+        'erased': add_stroke(scene, [(300, 300), (340, 310)], width=3),
+        'click': add_stroke(scene, [(200, 200)]),
+        'off page': add_stroke(scene, [(9000, 9000), (9050, 9050)]),
+        'partly erased': add_stroke(scene, [(400, 100), (500, 100)]),
+    }
+    # Eraser strokes are added last, so they sit on top of the ink
+    strokes['eraser'] = add_stroke(scene, [(290, 305), (350, 305)], color="#F3F3F3", width=30)
+    strokes['partial eraser'] = add_stroke(scene, [(480, 100), (520, 100)], color="#F3F3F3", width=30)
+    strokes['unused eraser'] = add_stroke(scene, [(100, 400), (150, 450)], color="#F3F3F3", width=20)
+    return window, scene, strokes
+
+
+def test_InvisibleStrokesRemoved(qtbot):
+    window, scene, strokes = build_notebook(qtbot)
+    compacted, report = compact_notebook(window.serialize_notebook())
+
+    assert report.removed == {DEGENERATE: 1, OFF_PAGE: 1, ERASED: 1, UNUSED_ERASER: 2}
+    assert report.items_before == 8 and report.items_after == 3
+    assert report.bytes_saved > 0
+    # Only the ink and eraser pens are left in the style table
+    assert len(compacted['styles']) == 2
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.deserialize_notebook(compacted)
+    loaded = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    assert len(loaded.items()) == 3
+
+
+def test_CompactInAppRunsInBackground(qtbot):
+    window, scene, strokes = build_notebook(qtbot)
+    window.compact_notebook()
+    assert not window.action_compact.isEnabled()
+
+    qtbot.waitUntil(lambda: window.compaction_job is None, timeout=5000)
+    remaining = set(scene.items())
+    assert remaining == {strokes['kept'], strokes['partly erased'], strokes['partial eraser']}
+    assert "Removed 5 of 8 items" in window.statusbar.currentMessage()
+
+    # Compaction is a single undo step
+    scene.undo()
+    assert len(scene.items()) == 8
+
+
+def test_CommandLineCompactsFile(qtbot, tmp_path, capsys):
+    window, scene, strokes = build_notebook(qtbot)
+    notebook = tmp_path / "notebook.pkl"
+    notebook.write_bytes(pickle.dumps(window.serialize_notebook()))
+    output = tmp_path / "compacted.pkl"
+
+    assert compaction_main([str(notebook), '--dry-run']) == 0
+    assert not output.exists()
+    assert compaction_main([str(notebook), '-o', str(output)]) == 0
+    assert "Removed 5 of 8 items" in capsys.readouterr().out
+    assert len(pickle.loads(output.read_bytes())['items']) == 3
@@ -0,0 +1,83 @@
+#Tests file for export.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import os
+import re
+
+import pytest
+from PySide6.QtGui import QPainterPath, QPen, QColor, QImage
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.export import export_pages, page_paths, ExportCancelled
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import current_scene
+
+
+def draw_line(scene, y, color):
+    path = QPainterPath()
+    path.moveTo(50, y)
+    path.lineTo(550, y)
+    stroke = StrokeItem(path)
+    scene.styles.apply(stroke, QPen(QColor(color), 6))
+    scene.addItem(stroke)
+
+
+def two_pages(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    draw_line(current_scene(window), 100, "#ff0000")
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(1)
+    draw_line(current_scene(window), 300, "#0000ff")
+    return window, [window.snapshot_notebook(None, window.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas')
+                                             .scene()) for index in range(2)]
+
+
+def test_ExportToEachFormat(qtbot, tmp_path):
+    window, pages = two_pages(qtbot)
+
+    pdf = export_pages(pages, str(tmp_path / "notes.pdf"), 'pdf', workers=2)
+    assert pdf == [str(tmp_path / "notes.pdf")]
+    assert len(re.findall(rb'/Type\s*/Page\b', open(pdf[0], 'rb').read())) == 2
+
+    done = []
+    png = export_pages(pages, str(tmp_path / "notes.png"), 'png', lambda *progress: done.append(progress), workers=2)
+    assert png == page_paths(str(tmp_path / "notes.png"), 'png', 2) == [str(tmp_path / "notes-001.png"),
+                                                                         str(tmp_path / "notes-002.png")]
+    assert done[-1] == (2, 2)
+    first, second = QImage(png[0]), QImage(png[1])
+    assert first.pixelColor(600, 200) == QColor("#ff0000") and second.pixelColor(600, 200) == QColor("#ffffff")
+    assert second.pixelColor(600, 600) == QColor("#0000ff")
+
+    svg = export_pages(pages, str(tmp_path / "notes.svg"), 'svg', workers=2)
+    assert all(b'<svg' in open(path, 'rb').read() for path in svg)
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith('notes')) == \
+        ['notes-001.png', 'notes-001.svg', 'notes-002.png', 'notes-002.svg', 'notes.pdf']
+
+
+def test_CancelledExportLeavesNothingBehind(qtbot, tmp_path):
+    window, pages = two_pages(qtbot)
+    for format in ('pdf', 'png'):
+        with pytest.raises(ExportCancelled):
+            export_pages(pages * 3, str(tmp_path / f"notes.{format}"), format, cancelled=lambda: True, workers=2)
+    assert [name for name in os.listdir(tmp_path) if name.startswith('notes')] == []
+
+
+def test_FailedExportLeavesNothingBehind(qtbot, tmp_path):
+    window, pages = two_pages(qtbot)
+    # The pages rendering alongside the broken one finish, and are removed all the same
+    with pytest.raises(Exception):
+        export_pages(pages * 2 + [b'not a notebook'] + pages, str(tmp_path / "notes.png"), 'png', workers=2)
+    assert [name for name in os.listdir(tmp_path) if name.startswith('notes')] == []
+
+
+def test_ExportFromWindow(qtbot, tmp_path):
+    window, pages = two_pages(qtbot)
+    path = str(tmp_path / "notes.pdf")
+    window.export_notebooks(path, 'pdf', workers=1)
+    assert not window.actionExport.isEnabled()
+    qtbot.waitUntil(lambda: window.export_job is None, timeout=60000)
+    assert window.actionExport.isEnabled()
+    assert window.statusbar.currentMessage() == f"Exported {path}"
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,30 @@
+#Tests file for garbage_collector.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import gc
+import threading
+import weakref
+
+from WhiteboardApplication import garbage_collector
+
+
+class Node:
+    pass
+
+
+def test_WorkerCollectionsRunOnTheGuiThread(qtbot):
+    assert gc.isenabled()
+    freed = []
+    node = Node()
+    node.self = node
+    weakref.finalize(node, freed.append, threading.get_ident())
+    del node
+
+    # A collection started on a worker frees nothing there
+    worker = threading.Thread(target=gc.collect)
+    worker.start()
+    worker.join()
+    assert not freed
+
+    garbage_collector.collect_due()
+    assert freed == [threading.get_ident()]
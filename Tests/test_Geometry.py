@@ -0,0 +1,61 @@
+#Tests file for geometry.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import numpy
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainterPath, QPolygonF
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import geometry
+
+
+def built_point_by_point(points):
+    path = QPainterPath()
+    path.moveTo(*points[0])
+    for point in points[1:]:
+        path.lineTo(*point)
+    return path
+
+
+def test_PathRoundTrip():
+    path = QPainterPath()
+    path.moveTo(1, 2)
+    path.lineTo(3, 4)
+    path.cubicTo(5, 6, 7, 8, 9, 10)
+    path.moveTo(-1, -1)
+    path.lineTo(0.25, 0.5)
+    kinds, points = geometry.path_to_arrays(path)
+    assert kinds.tolist() == [0, 1, 2, 3, 3, 0, 1]
+    assert points.tolist() == [[1, 2], [3, 4], [5, 6], [7, 8], [9, 10], [-1, -1], [0.25, 0.5]]
+    assert geometry.path_from_arrays(kinds, points) == path
+    assert geometry.path_from_arrays(*geometry.path_to_arrays(QPainterPath())).isEmpty()
+
+
+def test_PolylineMatchesLineTo():
+    # Repeated points are dropped the way lineTo drops them
+    points = [(0, 0), (1, 1), (1, 1), (2, 0.5), (2, 0.5), (3, 3)]
+    path = geometry.polyline_path(points)
+    assert path == built_point_by_point(points)
+    assert path.elementCount() == 4
+
+
+def test_PathPointsMatchSubpathPolygons():
+    path = built_point_by_point([(0, 0), (10, 0), (10, 10)])
+    path.moveTo(50, 50)
+    path.moveTo(60, 60)
+    path.lineTo(70, 65)
+    path.moveTo(90, 90)
+    expected = [[point.x(), point.y()] for polygon in path.toSubpathPolygons() for point in polygon]
+    assert geometry.path_points(path).tolist() == expected
+
+    path.quadTo(100, 0, 120, 90)
+    expected = [[point.x(), point.y()] for polygon in path.toSubpathPolygons() for point in polygon]
+    assert geometry.path_points(path).tolist() == expected
+
+
+def test_PolygonRoundTrip():
+    polygon = QPolygonF([QPointF(1, 2), QPointF(3.5, -4), QPointF(0, 0)])
+    points = geometry.polygon_to_array(polygon)
+    assert points.tolist() == [[1, 2], [3.5, -4], [0, 0]]
+    assert list(geometry.polygon_from_array(points)) == list(polygon)
+    assert geometry.polygon_from_array(numpy.empty((0, 2))).isEmpty()
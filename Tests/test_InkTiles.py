@@ -0,0 +1,130 @@
+#Tests file for ink_tiles.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pytest
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.stroke_item import StrokeItem
+from WhiteboardApplication.text_box import TextBox
+from Tests.conftest import add_stroke, add_strokes
+
+
+def draw_page(scene, count):
+    add_strokes(scene, count)
+    highlight = StrokeItem()
+    path = QPainterPath()
+    path.moveTo(0, 250)
+    path.lineTo(600, 260)
+    highlight.setPath(path)
+    highlight.setPen(QPen(QColor(255, 255, 0, 30), 40))
+    scene.addItem(highlight)
+
+
+def max_channel_difference(first, second):
+    first_bytes = bytes(first.constBits())
+    second_bytes = bytes(second.constBits())
+    assert len(first_bytes) == len(second_bytes)
+    return max(abs(a - b) for a, b in zip(first_bytes, second_bytes))
+
+
+def open_canvas(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.resize(1000, 800)
+    window.show()
+    qtbot.waitExposed(window)
+    return window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def wait_for_tiles(qtbot, layer):
+    qtbot.waitUntil(lambda: not layer._pending and any(tile.image is not None for tile in layer._tiles.values()),
+                    timeout=5000)
+
+
+def test_TilesMatchItemPainting(qtbot):
+    view = open_canvas(qtbot)
+    scene = view.scene()
+    draw_page(scene, 150)
+    # A text box keeps its tiles on the normal paint path; strokes crossing into them are clipped
+    text_box = TextBox()
+    text_box.setPos(250, 200)
+    scene.add_text_box(text_box)
+
+    layer = view.ink_layer
+    wait_for_tiles(qtbot, layer)
+    assert any(tile.item_ids is None for tile in layer._tiles.values())
+    tiled = view.viewport().grab().toImage()
+
+    layer.enabled = False
+    untiled = view.viewport().grab().toImage()
+
+    # Compositing a tile first can round a channel by one where translucent ink overlaps
+    assert max_channel_difference(tiled, untiled) <= 2
+
+
+def test_EditInvalidatesOnlyTouchedTiles(qtbot):
+    view = open_canvas(qtbot)
+    scene = view.scene()
+    draw_page(scene, 50)
+    layer = view.ink_layer
+    wait_for_tiles(qtbot, layer)
+
+    keys = set(layer._tiles)
+    path = QPainterPath()
+    path.moveTo(10, 10)
+    path.lineTo(20, 20)
+    stroke = StrokeItem(path)
+    stroke.setPen(QPen(QColor("#000000"), 1))
+    scene.addItem(stroke)
+    qtbot.waitUntil(lambda: set(layer._tiles) != keys, timeout=2000)
+
+    dropped = keys - set(layer._tiles)
+    assert dropped
+    for key in dropped:
+        assert layer.tile_scene_rect(key).intersects(QRectF(9, 9, 12, 12))
+
+    # Once the edits settle the dropped tiles come back, now including the new stroke
+    qtbot.waitUntil(lambda: all(key in layer._tiles for key in dropped) and not layer._pending, timeout=5000)
+    assert any(id(stroke) in layer._tiles[key].item_ids for key in dropped)
+
+
+def test_StaleJobsCancelled(qtbot):
+    view = open_canvas(qtbot)
+    scene = view.scene()
+    draw_page(scene, 50)
+    layer = view.ink_layer
+    layer._request_timer.stop()
+
+    far_key = (layer.level(), 40, 40)
+    center = layer.tile_scene_rect(far_key).center()
+    path = QPainterPath()
+    path.moveTo(center)
+    path.lineTo(center.x() + 5, center.y() + 5)
+    stroke = StrokeItem(path)
+    stroke.setPen(QPen(QColor("#000000"), 3))
+    scene.addItem(stroke)
+    layer._start_job(far_key, 0)
+    job = layer._pending[far_key][0]
+
+    # The far tile is outside the viewport and its prefetch margin, so its job goes
+    layer.request_visible()
+    assert far_key not in layer._pending
+    assert job.cancelled
+
+
+def test_JobsReleasedOnceDoneOrCancelled(qtbot):
+    view = open_canvas(qtbot)
+    scene = view.scene()
+    draw_page(scene, 50)
+    layer = view.ink_layer
+    wait_for_tiles(qtbot, layer)
+    for x in range(0, 600, 100):
+        add_stroke(scene, [(x, 10), (x + 20, 20)], undo=False)
+        layer.clear()
+        layer.request_visible()
+
+    # Finished, cancelled while running, or taken off the pool before starting, every job is let go of
+    qtbot.waitUntil(lambda: not layer._pending and not layer._jobs, timeout=5000)
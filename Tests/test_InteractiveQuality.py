@@ -0,0 +1,69 @@
+#Tests file for the interactive quality mode of canvas_view.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.ink_tiles import PREVIEW_RESOLUTION, Tile
+
+
+def open_canvas(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.resize(1000, 800)
+    window.show()
+    qtbot.waitExposed(window)
+    return window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def test_SlowPageDropsQualityWhileMoving(qtbot):
+    view = open_canvas(qtbot)
+    view.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    view.quality_frame_budget = 0
+    view.quality_idle_delay = 50
+    view.frame_time = 0.001
+
+    view.begin_interaction()
+    assert view.interactive and view.ink_layer.interactive
+    assert not view.renderHints() & QPainter.RenderHint.Antialiasing
+
+    # Full quality comes back once the view has been idle for a moment
+    qtbot.waitUntil(lambda: not view.interactive, timeout=2000)
+    assert view.renderHints() & QPainter.RenderHint.Antialiasing
+    assert not view.ink_layer.interactive
+
+
+def test_FastPageKeepsFullQuality(qtbot):
+    view = open_canvas(qtbot)
+    view.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    view.frame_time = 0.001
+    view.ink_layer.last_frame_items = 10
+
+    view.begin_interaction()
+    assert not view.interactive
+    assert view.renderHints() & QPainter.RenderHint.Antialiasing
+
+
+def test_ZoomDrawsFromCachedLevel(qtbot):
+    view = open_canvas(qtbot)
+    layer = view.ink_layer
+    settled = layer.level()
+    # Pretend the page was fully tiled at the resting zoom
+    for key in layer.keys_for_rect(view.sceneRect(), settled):
+        layer._store(key, Tile(None, frozenset()))
+
+    view.quality_item_threshold = -1
+    view.begin_interaction()
+    view.scale(1.5, 1.5)
+    layer.begin_frame()
+    # Nothing exists at the new zoom yet, so the settled tiles are stretched instead
+    assert layer.draw_level == settled
+
+    layer._tiles.clear()
+    layer.begin_frame()
+    assert layer.draw_level == layer.level(PREVIEW_RESOLUTION)
+
+    view.end_interaction()
+    layer.begin_frame()
+    assert layer.draw_level == layer.level()
@@ -0,0 +1,133 @@
+#Tests file for lazy_notebook.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import json
+import struct
+
+import pytest
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.lazy_notebook import LazyNotebook
+from WhiteboardApplication.notebook_format import dumps_notebook, loads_notebook, pack_strokes, read_chunk_index, \
+    read_sections, verify_notebook, NotebookFormatError
+from WhiteboardApplication.stroke_item import StrokeItem
+
+
+def current_view(window):
+    return window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def spread_notebook(qtbot):
+    """A window whose page has a short stroke every 20 units, and a text box."""
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_view(window).scene()
+    for x in range(0, 600, 20):
+        for y in range(0, 500, 20):
+            path = QPainterPath()
+            path.moveTo(x, y)
+            path.lineTo(x + 5, y + 5)
+            stroke = StrokeItem(path)
+            scene.styles.apply(stroke, QPen(QColor("#000000"), 2))
+            scene.addItem(stroke)
+    text_box = TextBox()
+    text_box.setPlainText("Notes")
+    scene.addItem(text_box)
+    return window, scene
+
+
+def strokes_in(scene):
+    return [item for item in scene.items() if isinstance(item, StrokeItem)]
+
+
+def test_OnlyChunksNearTheViewAreDecoded(qtbot, tmp_path):
+    window, scene = spread_notebook(qtbot)
+    saved = window.serialize_notebook()
+    path = tmp_path / "spread.bnb"
+    path.write_bytes(dumps_notebook(saved))
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    view = current_view(window)
+    view.scale(8, 8)
+    view.centerOn(QPointF(40, 40))
+    notebook = LazyNotebook(str(path))
+    view.scene().attach_notebook(notebook)
+    assert len(view.scene().items()) > 0 and not strokes_in(view.scene())
+
+    window.load_visible(view)
+    qtbot.waitUntil(lambda: not view.scene().load_queue, timeout=5000)
+    loaded = len(strokes_in(view.scene()))
+    assert 0 < loaded < len(saved['items']) // 4
+    assert len(notebook.unloaded) < len(notebook.chunks)
+
+    # Saving decodes the rest, and the file's stacking order comes back
+    assert window.serialize_notebook()['items'] == saved['items']
+    assert notebook.closed
+
+
+def test_ChunkedFileRoundTrips(qtbot):
+    window, scene = spread_notebook(qtbot)
+    saved = window.serialize_notebook()
+    data = dumps_notebook(saved)
+    chunks = read_chunk_index(read_sections(data))
+    assert len(chunks) > 1
+    assert sum(count for _bounds, _offset, count in chunks) == len(saved['items']) - 1
+    assert loads_notebook(data)['items'] == saved['items']
+
+
+def test_ReadsVersionOneFiles(qtbot, tmp_path):
+    window, scene = spread_notebook(qtbot)
+    saved = window.serialize_notebook()
+    sections = [
+        (b'STYL', json.dumps(saved['styles']).encode('utf-8')),
+        (b'ORDR', bytes([1] + [0] * (len(saved['items']) - 1))),
+        (b'STRK', pack_strokes(saved['items'][1:])),
+        (b'TEXT', json.dumps(saved['items'][:1]).encode('utf-8')),
+    ]
+    data = struct.pack('<4sHH', b'BNNB', 1, len(sections))
+    for tag, raw in sections:
+        data += struct.pack('<4sBII', tag, 0, len(raw), len(raw)) + raw
+    assert loads_notebook(data)['items'] == saved['items']
+
+    # Without a chunk index the window reads the file whole
+    path = tmp_path / "old.bnb"
+    path.write_bytes(data)
+    assert notebook_format.read_notebook(str(path))['items'] == saved['items']
+
+
+def test_DamagedChunksLeftOut(qtbot, tmp_path, monkeypatch):
+    window, scene = spread_notebook(qtbot)
+    saved = window.serialize_notebook()
+    data = bytearray(dumps_notebook(saved))
+    assert verify_notebook(data) == []
+    bounds, offset, count = read_chunk_index(read_sections(data))[3]
+    # One byte in the middle of the fourth chunk
+    data[offset + 30] ^= 0xff
+    with pytest.raises(NotebookFormatError):
+        loads_notebook(data)
+
+    damaged = []
+    loaded = loads_notebook(data, damaged)
+    assert [(section.tag, section.offset, section.bounds, section.items) for section in damaged] == \
+        [(b'CHNK', offset, bounds, count)]
+    assert len(loaded['items']) == len(saved['items']) - count
+    assert all(item in saved['items'] for item in loaded['items'])
+    assert [(section.tag, section.offset, section.bounds) for section in verify_notebook(data)] == \
+        [(b'CHNK', offset, bounds)]
+
+    # Opened lazily, the rest of the page shows and the damage is reported once the chunk is reached
+    path = tmp_path / "damaged.bnb"
+    path.write_bytes(data)
+    monkeypatch.setattr(library.LibraryDialog, 'get_notebook', lambda *args: str(path))
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.load()
+    current_view(window).scene().load_all()
+    assert len(strokes_in(current_view(window).scene())) == len(saved['items']) - 1 - count
+    assert window.statusbar.currentMessage().startswith(f"Part of the notebook is damaged and was left out: "
+                                                        f"{count} strokes around")
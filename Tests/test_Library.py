@@ -0,0 +1,164 @@
+#Tests file for library.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import os
+import pickle
+
+import pytest
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QApplication
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import library
+from WhiteboardApplication.notebook_format import dumps_notebook
+from WhiteboardApplication.notebook_store import save_store
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import current_scene
+
+
+def draw_page(window, strokes, text):
+    scene = current_scene(window)
+    for number in range(strokes):
+        path = QPainterPath()
+        path.moveTo(50, 50 + number * 20)
+        path.lineTo(500, 50 + number * 20)
+        stroke = StrokeItem(path)
+        scene.styles.apply(stroke, QPen(QColor("#000000"), 4))
+        scene.addItem(stroke)
+    box = TextBox()
+    box.setPlainText(text)
+    scene.addItem(box)
+    return window.serialize_notebook()
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def test_ScanListsWhatNotebooksHoldFromTheirHeaders(qtbot, tmp_path, monkeypatch):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    notebook = dict(draw_page(window, 3, "Agenda"), template='lined')
+    folder = tmp_path / "notebooks"
+    write(str(folder / "class" / "lecture.bnb"), dumps_notebook(notebook))
+    write(str(folder / "old.pkl"), pickle.dumps(notebook))
+    store = library.Library(str(tmp_path / "library.sqlite"))
+
+    # Of a .bnb file only the header is read, and a pickle, which could run code, is never loaded
+    read = []
+    real_read = library.read_notebook
+    monkeypatch.setattr(library, 'read_notebook', lambda path: read.append(path) or real_read(path))
+    monkeypatch.setattr(pickle, 'loads', lambda data: read.append(data))
+    assert library.ScanJob(store, folders=[str(folder)]).scan(str(folder), [str(folder / "class" / "lecture.bnb"),
+                                                                          str(folder / "old.pkl")], True) == 2
+    assert read == []
+    infos = {info.title: info for info in store.notebooks()}
+    assert set(infos) == {"lecture", "old"}
+    lecture = infos["lecture"]
+    assert (lecture.template, lecture.strokes, lecture.texts, lecture.images) == ('lined', 3, 1, 0)
+    assert (infos["old"].strokes, infos["old"].texts, infos["old"].size) == \
+        (None, None, os.path.getsize(folder / "old.pkl"))
+    monkeypatch.undo()
+
+    # What a pickle holds is listed once the window has read it
+    job = library.ScanJob(store, files=[str(folder / "old.pkl")], opened={str(folder / "old.pkl"): notebook})
+    job.run()
+    assert {info.title: info.strokes for info in store.notebooks()} == {"lecture": 3, "old": 3}
+    assert lecture.size == os.path.getsize(folder / "class" / "lecture.bnb")
+    assert lecture.thumbnail == thumbnails.notebook_id(lecture.path)
+
+    # Scanning again reads only what changed, and drops what is gone
+    job = library.ScanJob(store, folders=[str(folder)])
+    job.run()
+    assert store.folders() == [str(folder)]
+    read.clear()
+    with qtbot.waitSignal(job.signals.finished) as blocker:
+        job.run()
+    assert blocker.args == [0] and read == []
+    items = notebook['items']
+    first_stroke = next(data for data in items if data['type'] == 'QGraphicsPathItem')
+    write(str(folder / "class" / "lecture.bnb"),
+          dumps_notebook(dict(notebook, items=[data for data in items if data is not first_stroke])))
+    os.remove(folder / "old.pkl")
+    job = library.ScanJob(store)
+    with qtbot.waitSignal(job.signals.finished) as blocker:
+        job.run()
+    assert blocker.args == [2]
+    assert [(info.title, info.strokes, info.texts) for info in store.notebooks()] == [("lecture", 2, 1)]
+    store.close()
+
+
+class CountingThumbnails:
+    def __init__(self):
+        self.read = []
+
+    def thumbnail(self, notebook_id):
+        self.read.append(notebook_id)
+        return None
+
+
+def test_LibraryOfTenThousandNotebooksReadsOnlyTheRowsShown(qtbot, tmp_path, monkeypatch):
+    service = library.LibraryService(str(tmp_path / "library.sqlite"))
+    service.writer.update([library.NotebookInfo(f"/notes/notebook{number}.bnb", "/notes", f"notebook{number}", 'blank',
+                                                number % 50, number % 7, number % 3, 1000 + number, 1.7e9 + number,
+                                                str(number), str(number)) for number in range(10000)])
+    rows = set()
+    data = library.LibraryModel.data
+    monkeypatch.setattr(library.LibraryModel, 'data',
+                        lambda model, index, role=Qt.ItemDataRole.DisplayRole: rows.add(index.row()) or
+                        data(model, index, role))
+
+    thumbnails = CountingThumbnails()
+    dialog = library.LibraryDialog(service, thumbnails)
+    dialog.show()
+    QApplication.processEvents()
+    assert dialog.model.rowCount() == 10000
+    # Only the rows on screen are formatted, and only their thumbnails read, however many there are
+    assert 0 < len(rows) < 100 and max(rows) < 100
+    assert 0 < len(thumbnails.read) < 100
+    assert dialog.model.info(dialog.model.index(0, 0)).title == "notebook9999"
+
+    dialog.search_box.setText("notebook123")
+    assert dialog.model.rowCount() == 11
+    dialog.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+    assert dialog.model.data(dialog.model.index(0, 0)) == "notebook123"
+    dialog.reject()
+    service.close()
+
+
+def test_LoadOpensTheNotebookPickedInTheLibrary(qtbot, tmp_path, monkeypatch):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    draw_page(window, 2, "Picked")
+    path = str(tmp_path / "picked.bnb")
+    with qtbot.waitSignal(window.library.changed, timeout=10000):
+        window.save_notebook(path)
+    assert [info.path for info in window.library.notebooks()] == [path]
+
+    monkeypatch.setattr(library.LibraryDialog, 'exec', lambda dialog: dialog.choose(dialog.model.index(0, 0)))
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(1)
+    window.load()
+    current_scene(window).load_all()
+    assert sorted(type(item).__name__ for item in current_scene(window).items()
+                  if item.parentItem() is None and isinstance(item, (StrokeItem, TextBox))) == \
+        ['StrokeItem', 'StrokeItem', 'TextBox']
+    window.close()
+
+
+def test_StoresAreCountedByTheirDatabase(qtbot, tmp_path, monkeypatch):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    path = str(tmp_path / "notebooks" / "store.bndb")
+    os.makedirs(os.path.dirname(path))
+    save_store(path, dict(draw_page(window, 4, "Store"), template='grid'))
+    store = library.Library(str(tmp_path / "library.sqlite"))
+
+    monkeypatch.setattr(library, 'read_notebook', lambda path: pytest.fail("the store was read whole"))
+    job = library.ScanJob(store, folders=[str(tmp_path / "notebooks")])
+    job.run()
+    info, = store.notebooks()
+    assert (info.path, info.template, info.strokes, info.texts, info.images) == (path, 'grid', 4, 1, 0)
+    store.close()
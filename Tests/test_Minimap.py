@@ -0,0 +1,59 @@
+#Tests file for minimap.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+from PySide6.QtCore import QPointF
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from Tests.conftest import add_stroke
+
+
+def open_window(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.resize(1200, 800)
+    window.show()
+    qtbot.waitExposed(window)
+    return window, window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def test_MinimapFollowsCurrentTab(qtbot):
+    window, view = open_window(qtbot)
+    assert window.minimap.view is view
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(1)
+    assert window.minimap.view is window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def test_OnlyDirtyChunksRerender(qtbot):
+    window, view = open_window(qtbot)
+    cache = view.minimap_cache
+    add_stroke(view.scene(), [(100, 100), (140, 130)], width=8, undo=False)
+    qtbot.waitUntil(lambda: not cache._pending and bool(cache._chunks), timeout=3000)
+
+    first = dict(cache._chunks)
+    # Far enough away to land in a new chunk, which grows the notebook extent
+    far = add_stroke(view.scene(), [(5000, 5000), (5040, 5030)], width=8, undo=False)
+    qtbot.waitUntil(lambda: not cache._pending and len(cache._chunks) == len(first) + 1, timeout=3000)
+
+    for key, image in first.items():
+        assert cache._chunks[key] is image
+    assert cache.extent.contains(far.sceneBoundingRect())
+
+    # Chunks re-rendered before their last render finished cancel it; no job is kept either way
+    for x in range(100, 400, 50):
+        add_stroke(view.scene(), [(x, 100), (x + 40, 130)], width=8, undo=False)
+        cache.refresh()
+    qtbot.waitUntil(lambda: not cache._pending and not cache._jobs, timeout=3000)
+
+
+def test_ClickJumpsToPoint(qtbot):
+    window, view = open_window(qtbot)
+    view.scene().setSceneRect(0, 0, 4000, 4000)
+    view.minimap_cache.set_scene(view.scene())
+
+    target = QPointF(3000, 3000)
+    position = window.minimap.scene_transform().map(target)
+    qtbot.mouseClick(window.minimap, Qt.MouseButton.LeftButton, pos=position.toPoint())
+    assert view.visible_scene_rect().contains(target)
@@ -0,0 +1,146 @@
+#Tests file for notebook_format.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import json
+import pickle
+import struct
+
+import pytest
+from PySide6.QtGui import QPainterPath, QPen, QColor, QPixmap, Qt
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.notebook_data import PackedElements, serialize_item
+from WhiteboardApplication.notebook_format import dumps_notebook, loads_notebook, read_notebook, \
+    main as convert_main, NotebookFormatError
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import current_scene
+
+
+def build_notebook(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    for i, color in enumerate(["#ff0000", "#00ff00", "#ff0000"]):
+        path = QPainterPath()
+        path.moveTo(10 + i, 20)
+        for point in range(1, 50):
+            path.lineTo(10 + i + point * 0.5, 20 + point * 0.25)
+        stroke = StrokeItem(path)
+        stroke.set_times(1.7e12 + i, [point for point in range(50)])
+        scene.styles.apply(stroke, QPen(QColor(color), 3))
+        scene.addItem(stroke)
+    scene.items()[0].setRotation(30)
+    text_box = TextBox()
+    text_box.setPlainText("Notes")
+    text_box.setPos(40, 60)
+    scene.addItem(text_box)
+    return window, scene
+
+
+def test_RoundTripKeepsEveryItem(qtbot):
+    window, scene = build_notebook(qtbot)
+    notebook = window.serialize_notebook()
+    loaded = loads_notebook(dumps_notebook(notebook))
+
+    assert loaded['styles'] == notebook['styles']
+    assert [item['type'] for item in loaded['items']] == [item['type'] for item in notebook['items']]
+    for saved, original in zip(loaded['items'], notebook['items']):
+        assert saved.keys() == original.keys()
+        for key in original:
+            assert saved[key] == original[key], key
+
+    # Images have their own section, and an image carrying its own bytes is moved into the asset section
+    image = ResizablePixmapItem(QPixmap(8, 8))
+    image.setPos(5, 5)
+    notebook['items'].append(serialize_item(image, scene.styles))
+    loaded = loads_notebook(dumps_notebook(notebook, 'lzma'))
+    assert loaded['assets'][loaded['items'][-1]['asset']] == notebook['items'][-1]['image']
+    assert loaded['items'][-1]['x'] == 5
+
+
+def test_SaveAndLoadThroughWindow(qtbot, tmp_path):
+    window, scene = build_notebook(qtbot)
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook())
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.deserialize_notebook(read_notebook(path))
+    loaded = current_scene(window)
+    strokes = [item for item in loaded.items() if isinstance(item, StrokeItem)]
+    assert len(strokes) == 3 and len(loaded.styles) == 2
+    assert strokes[0].path().elementCount() == 50
+    assert any(isinstance(item, TextBox) and item.toPlainText() == "Notes" for item in loaded.items())
+
+
+def identity_transform():
+    return {'m11': 1.0, 'm12': 0.0, 'm13': 0.0, 'm21': 0.0, 'm22': 1.0, 'm23': 0.0, 'm31': 0.0, 'm32': 0.0, 'm33': 1.0}
+
+
+def test_ConvertsLegacyPickle(qtbot, tmp_path):
+    elements = [{'type': 'moveTo', 'x': 0, 'y': 0}] + [{'type': 'lineTo', 'x': i, 'y': i} for i in range(1, 400)]
+    pen = {'width': 2.0, 'color': {'red': 0, 'green': 0, 'blue': 255, 'alpha': 255},
+           'style': Qt.PenStyle.SolidLine, 'capstyle': Qt.PenCapStyle.RoundCap, 'joinstyle': Qt.PenJoinStyle.BevelJoin}
+    item = {'type': 'QGraphicsPathItem', 'pen': pen,
+            'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': Qt.BrushStyle.NoBrush},
+            'rotation': 0, 'transform': identity_transform(), 'x': 0, 'y': 0, 'name': '', 'elements': elements}
+    # Before notebooks had settings, they were a bare list of items
+    legacy = tmp_path / "legacy.pkl"
+    legacy.write_bytes(pickle.dumps([dict(item, elements=[dict(element) for element in elements]) for _ in range(20)]))
+
+    assert convert_main([str(legacy)]) == 0
+    converted = read_notebook(str(tmp_path / "legacy.bnb"))
+    assert len(converted['styles']) == 1
+    assert all(item['style'] == 0 for item in converted['items'])
+    assert converted['items'][0]['elements'] == PackedElements.from_dicts(elements)
+    assert (tmp_path / "legacy.bnb").stat().st_size * 10 < legacy.stat().st_size
+
+
+def test_ConvertsCollaborationJson(qtbot, tmp_path):
+    client = {'items': [
+        {'type': 'path', 'color': '#000000', 'width': 3, 'points': [(0, 0), (10, 10), (20, 5)]},
+        {'type': 'rectangle', 'color': '#ff0000', 'width': 1, 'rect': [0, 0, 50, 20]},
+        {'type': 'ellipse', 'color': '#ff0000', 'width': 1, 'rect': [0, 0, 50, 20]},
+    ], 'scene_rect': [600, 500], 'color': '#000000', 'size': 1}
+    path = tmp_path / "board.json"
+    path.write_text(json.dumps(client))
+    notebook = read_notebook(str(path))
+    # JSON lists items bottom first, notebooks topmost first
+    assert [len(item['elements']) for item in notebook['items']] == [65, 5, 3]
+    assert len(notebook['styles']) == 2
+
+    server = {'lines': [{'color': '#000000', 'width': 3, 'points': [(0, 0), (10, 10)]}], 'scene_rect': [600, 500]}
+    path.write_text(json.dumps(server))
+    assert len(read_notebook(str(path))['items']) == 1
+
+
+def test_DamagedFileRejected(qtbot):
+    window, scene = build_notebook(qtbot)
+    data = dumps_notebook(window.serialize_notebook())
+    with pytest.raises(NotebookFormatError):
+        loads_notebook(data[:len(data) // 2])
+    with pytest.raises(NotebookFormatError):
+        loads_notebook(b'PK\x03\x04' + data[4:])
+
+
+def test_UndamagedSectionsRecovered(qtbot):
+    window, scene = build_notebook(qtbot)
+    notebook = window.serialize_notebook()
+    data = dumps_notebook(notebook)
+    sections = {}
+    offset = 8
+    while data[offset:offset + 4] != b'CIDX':
+        tag, _codec, length = struct.unpack_from('<4sBI', data, offset)
+        sections[tag] = offset
+        offset += 17 + length
+
+    # Damaged pens: strokes come back drawn with a plain pen. Damaged text: the text box is left out
+    broken = bytearray(data)
+    broken[sections[b'STYL'] + 17] ^= 0x01
+    broken[sections[b'TEXT'] + 17] ^= 0x01
+    damaged = []
+    loaded = loads_notebook(broken, damaged)
+    assert [section.tag for section in damaged] == [b'STYL', b'TEXT']
+    assert [item['elements'] for item in loaded['items']] == \
+        [item['elements'] for item in notebook['items'] if item['type'] == 'QGraphicsPathItem']
+    assert loaded['styles'][0]['width'] == QPen().widthF()
@@ -0,0 +1,151 @@
+#Tests file for notebook_store.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import os
+import sqlite3
+
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import save_worker, search
+from WhiteboardApplication.notebook_format import dumps_notebook, read_notebook
+from WhiteboardApplication.notebook_store import save_store, read_store, StoreNotebook
+from Tests.conftest import add_stroke
+
+
+def current_view(window):
+    return window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+
+
+def grid_page(qtbot):
+    """A window whose page has a short stroke every 50 units, and a text box."""
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_view(window).scene()
+    strokes = [add_stroke(scene, [(x, y), (x + 5, y + 5)], width=2, undo=False)
+               for x in range(0, 600, 50) for y in range(0, 500, 50)]
+    text_box = TextBox()
+    text_box.setPlainText("Notes")
+    scene.addItem(text_box)
+    return window, scene, strokes
+
+
+def rows(path):
+    connection = sqlite3.connect(path)
+    try:
+        return dict(connection.execute("SELECT key, id FROM items"))
+    finally:
+        connection.close()
+
+
+def test_SavingChangesOnlyTheRowsThatChanged(qtbot, tmp_path):
+    window, scene, strokes = grid_page(qtbot)
+    path = str(tmp_path / "grid.bndb")
+    saved = window.serialize_notebook()
+    assert save_store(path, saved) == (len(saved['items']), 0, 0)
+    assert dumps_notebook(read_store(path)) == dumps_notebook(saved)
+    assert read_notebook(path)['items'][0]['type'] == 'TextBox'
+    before = rows(path)
+
+    # Saved again unchanged, nothing is written; a stroke on top is one new row
+    assert save_store(path, saved) == (0, 0, 0)
+    add_stroke(scene, [(300, 300), (305, 305)], width=2, undo=False).setZValue(1)
+    saved = window.serialize_notebook()
+    assert save_store(path, saved) == (1, 0, 0)
+    after = rows(path)
+    assert all(after[key] == row_id for key, row_id in before.items())
+    assert dumps_notebook(read_store(path)) == dumps_notebook(saved)
+
+    # An erased stroke is one deleted row, and those above it move down
+    scene.removeItem(strokes[0])
+    saved = window.serialize_notebook()
+    assert save_store(path, saved) == (0, 1, len(saved['items']))
+    assert dumps_notebook(read_store(path)) == dumps_notebook(saved)
+
+
+def test_ViewportFetchesStrokesByOneQuery(qtbot, tmp_path):
+    window, scene, strokes = grid_page(qtbot)
+    path = str(tmp_path / "grid.bndb")
+    saved = window.serialize_notebook()
+    save_store(path, saved)
+
+    notebook = StoreNotebook(path)
+    assert [data['text'] for _number, data in notebook.eager_items] == ["Notes"]
+    chunks = notebook.chunks_in(QRectF(90, 90, 70, 70))
+    strokes = [stroke for chunk in chunks for stroke in notebook.load_chunk(chunk)]
+    assert sorted((data['elements'].xs[0], data['elements'].ys[0]) for _number, data in strokes) == \
+        [(100.0, 100.0), (100.0, 150.0), (150.0, 100.0), (150.0, 150.0)]
+    # Numbers are places in the saved order, as in a .bnb file
+    for number, data in strokes:
+        assert saved['items'][number]['elements'][0]['x'] == data['elements'].xs[0]
+    assert notebook.chunks_in(QRectF(90, 90, 70, 70)) == []
+    rest = notebook.load_chunk(None)
+    assert len(rest) == len(saved['items']) - 1 - 4 and notebook.unloaded == []
+    notebook.close()
+
+
+def test_WindowSavesAndOpensNotebookStores(qtbot, tmp_path):
+    window, scene, strokes = grid_page(qtbot)
+    path = str(tmp_path / "grid.bndb")
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    assert window.statusbar.currentMessage() == f"Saved {path}"
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(1)
+    window.open_notebook(path)
+    opened = current_view(window).scene()
+    assert isinstance(opened.lazy_notebook, StoreNotebook) or opened.lazy_notebook is None
+    opened.load_all()
+    assert dumps_notebook(window.serialize_notebook(scene=opened)) == \
+        dumps_notebook(window.serialize_notebook(scene=scene))
+    # Saved again as it was opened, no row changes
+    assert save_store(path, window.serialize_notebook(scene=opened)) == (0, 0, 0)
+    window.close()
+
+
+def test_SavingAgainWritesOnlyTheItemsChanged(qtbot, tmp_path, monkeypatch):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_view(window).scene()
+    strokes = []
+    for x in range(0, 600, 50):
+        strokes.append(add_stroke(scene, [(x, 0), (x + 5, 5)], width=2, undo=False))
+        scene.add_item_to_undo(strokes[-1])
+    scene.add_text_box(TextBox())
+    path = str(tmp_path / "grid.bndb")
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    assert not job.incremental and scene.bound_to(path)
+
+    # A stroke drawn, one moved and one erased are three rows; nothing else is finished or written
+    add_stroke(scene, [(300, 300), (305, 305)], width=2)
+    strokes[3].moveBy(0, 40)
+    scene.history.push(MoveItems({strokes[3].item_id: (0, 40)}))
+    scene.delete_items([strokes[5]])
+    finished = []
+    real_finish = save_worker.finish_item
+    monkeypatch.setattr(save_worker, 'finish_item', lambda data: finished.append(data) or real_finish(data))
+    job = window.save_notebook(path)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    assert job.incremental and len(job.snapshot['items']) == 3 and len(finished) == 2
+    assert window.statusbar.currentMessage() == f"Saved {path}"
+    assert dumps_notebook(read_store(path)) == dumps_notebook(window.serialize_notebook())
+    assert search.file_text_boxes(path) == search.text_boxes(window.serialize_notebook()) != []
+
+    # Opened again, items have the ids they were saved with, so the next save finds their rows
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(1)
+    window.open_notebook(path)
+    opened = current_view(window).scene()
+    opened.load_all()
+    assert sorted(opened.items_by_id) == sorted(scene.items_by_id)
+    moved = opened.items_by_id[strokes[3].item_id]
+    assert moved.pos().y() == 40
+    opened.delete_items([moved])
+    job = window.save_notebook(path, opened)
+    qtbot.waitUntil(lambda: job not in window.save_jobs, timeout=10000)
+    assert job.incremental
+    assert len(read_store(path)['items']) == len(window.serialize_notebook(scene=opened)['items']) == 12
+    window.close()
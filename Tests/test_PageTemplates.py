@@ -0,0 +1,61 @@
+#Tests file for page_templates.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pytest
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QImage, QPainter, QColor, Qt
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.page_templates import PageTemplate, LINE_SPACING
+
+
+def test_TileCachedPerZoomLevel(qtbot):
+    template = PageTemplate('grid')
+
+    tile = template.tile(1.0)
+    assert template.tile(1.0) is tile
+    assert template.tile(2.0) is not tile
+    assert template.tile(2.0).width() == 2 * tile.width()
+
+    # Switching template keeps the other template's tiles around
+    template.set_template('ruled')
+    assert template.tile(1.0) is not tile
+    template.set_template('grid')
+    assert template.tile(1.0) is tile
+
+    with pytest.raises(ValueError):
+        template.set_template('music')
+
+
+def test_RuledTemplateDrawn(qtbot):
+    scene = BoardScene()
+    scene.set_page_template('ruled')
+
+    image = QImage(200, 200, QImage.Format.Format_ARGB32)
+    image.fill(Qt.GlobalColor.white)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, 200, 200), QRectF(0, 0, 200, 200))
+    painter.end()
+
+    assert image.pixelColor(100, LINE_SPACING - 1) != QColor(Qt.GlobalColor.white)
+    assert image.pixelColor(100, LINE_SPACING + 5) == QColor(Qt.GlobalColor.white)
+
+
+def test_TemplateSavedWithNotebook(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+
+    window.set_page_template('dotted')
+    notebook_data = window.serialize_notebook()
+    assert notebook_data['template'] == 'dotted'
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.deserialize_notebook(notebook_data)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    assert scene.page_template.template == 'dotted'
+
+    # Notebooks saved before templates existed are a plain list of items
+    window.deserialize_notebook([])
+    assert scene.page_template.template == 'blank'
@@ -0,0 +1,93 @@
+#Tests file for playback.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import random
+import time
+
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.notebook_data import serialize_times
+from WhiteboardApplication.playback import PlaybackTimeline, MAX_GAP
+from WhiteboardApplication.stroke_item import StrokeItem
+
+
+def timed_notebook(strokes, points, gap=500):
+    """Strokes written one after another, 10 ms per point, gap ms apart."""
+    items = []
+    start = 1.7e12
+    for i in range(strokes):
+        items.append({
+            'type': 'QGraphicsPathItem',
+            'elements': [{'type': 'moveTo' if p == 0 else 'lineTo', 'x': p, 'y': i} for p in range(points)],
+            'times': serialize_times(start, [0] + [10] * (points - 1)),
+        })
+        start += 10 * (points - 1) + gap
+    return {'items': items}
+
+
+def replay(timeline, t):
+    state = [0] * len(timeline.entries)
+    for op in range(len(timeline.op_times)):
+        if timeline.op_times[op] <= t:
+            state[timeline.op_entries[op]] = timeline.op_counts[op]
+    return state
+
+
+def test_SeekMatchesReplayFromStart(qtbot):
+    timeline = PlaybackTimeline(timed_notebook(60, 50, gap=60000))
+    assert len(timeline.keyframes) > 1
+    # Minute-long pauses are shortened
+    assert timeline.duration == 60 * 490 + 59 * MAX_GAP
+
+    random.seed(3)
+    for t in [0, timeline.duration] + [random.uniform(0, timeline.duration) for _ in range(20)]:
+        assert list(timeline.state_at(t)) == replay(timeline, t)
+
+
+def test_SeekOnLongNotebookIsFast(qtbot):
+    # 2000 strokes of 200 points is 400k ops, a couple of hours of writing
+    timeline = PlaybackTimeline(timed_notebook(2000, 200, gap=3000))
+    random.seed(4)
+    start = time.perf_counter()
+    for _ in range(10):
+        timeline.state_at(random.uniform(0, timeline.duration))
+    assert (time.perf_counter() - start) / 10 < 0.1
+
+
+def test_DrawnStrokesPlayBack(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+
+    stroke = StrokeItem()
+    scene.styles.apply(stroke, QPen(QColor("#000000"), 3))
+    scene.addItem(stroke)
+    path = QPainterPath()
+    path.moveTo(10, 10)
+    stroke.setPath(path)
+    stroke.record_time(1000)
+    for i in range(1, 5):
+        path.lineTo(10 + i * 10, 10)
+        stroke.setPath(path)
+        stroke.record_time(1000 + i * 20)
+    assert list(stroke.timestamps) == [0, 20, 20, 20, 20]
+    untimed = StrokeItem(path)
+    scene.addItem(untimed)
+
+    window.open_playback()
+    playback = window.playback
+    qtbot.addWidget(playback)
+    assert playback.timeline.duration == 80
+
+    timed_item = next(item for item in playback.items if item.start_time is not None)
+    untimed_item = next(item for item in playback.items if item.start_time is None)
+    playback.seek(0)
+    assert untimed_item.isVisible()
+    assert timed_item.path().elementCount() == 1
+    playback.seek(45)
+    assert timed_item.path().elementCount() == 3
+    playback.seek(80)
+    assert timed_item.path().elementCount() == 5
@@ -0,0 +1,77 @@
+#Tests file for save_worker.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import gc
+import os
+import weakref
+
+from PySide6.QtCore import QCoreApplication, QEvent
+from PySide6.QtGui import QPainterPath
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.save_worker import SaveJob, encode_whiteboard_snapshot
+from Tests.conftest import add_stroke, current_scene
+
+
+def test_SavesInTheBackground(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    strokes = [add_stroke(scene, [(i, 0), (i, 50), (i + 10, 100)], width=3, undo=False) for i in range(200)]
+    expected = window.serialize_notebook()
+
+    os.mkdir(tmp_path / "saves")
+    path = str(tmp_path / "saves" / "notebook.bnb")
+    window.save_notebook(path)
+    # The snapshot was taken when the save started, so what happens meanwhile isn't saved
+    moved = QPainterPath(strokes[0].path())
+    moved.lineTo(500, 500)
+    strokes[0].setPath(moved)
+    add_stroke(scene, [(0, 0), (1, 1)], width=3, undo=False)
+    qtbot.waitUntil(lambda: not window.save_jobs, timeout=5000)
+
+    assert notebook_format.read_notebook(path)['items'] == expected['items']
+    assert os.listdir(tmp_path / "saves") == ["notebook.bnb"]
+    assert window.statusbar.currentMessage() == f"Saved {path}"
+
+
+def test_FinishedSaveLetGo(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    add_stroke(current_scene(window), [(0, 0), (10, 10)], width=3, undo=False)
+    freed = []
+    job = window.save_notebook(str(tmp_path / "notebook.bnb"))
+    weakref.finalize(job, freed.append, True)
+    del job
+    # Neither the pool nor a cycle through its signals keeps the job, or the snapshot it holds, alive
+    gc.disable()
+    try:
+        qtbot.waitUntil(lambda: not window.save_jobs, timeout=5000)
+        QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        assert freed
+    finally:
+        gc.enable()
+
+
+def test_FailedSaveReported(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    add_stroke(current_scene(window), [(0, 0), (10, 10)], width=3, undo=False)
+    path = str(tmp_path / "missing" / "notebook.bnb")
+    window.save_notebook(path)
+    qtbot.waitUntil(lambda: not window.save_jobs, timeout=5000)
+    assert not os.path.exists(path)
+    assert window.statusbar.currentMessage().startswith("Couldn't save")
+
+
+def test_WhiteboardJsonEncoder(qtbot, tmp_path):
+    path = QPainterPath()
+    path.moveTo(0, 0)
+    path.lineTo(10, 10)
+    snapshot = {'items': [{'type': 'path', 'color': '#000000', 'width': 3, 'path': path},
+                          {'type': 'rectangle', 'color': '#ff0000', 'width': 1, 'rect': [0, 0, 5, 5]}],
+                'scene_rect': [600, 500], 'color': '#000000', 'size': 1}
+    job = SaveJob(str(tmp_path / "board.json"), snapshot, encode_whiteboard_snapshot)
+    job.run()
+    saved = notebook_format.read_notebook(str(tmp_path / "board.json"))
+    assert [len(item['elements']) for item in saved['items']] == [5, 2]
@@ -0,0 +1,99 @@
+#Tests file for search.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import time
+
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import search
+from Tests.conftest import current_scene
+
+
+def add_text(scene, text, x, y):
+    box = TextBox()
+    box.setPlainText(text)
+    box.setPos(x, y)
+    scene.addItem(box)
+    return box
+
+
+def test_IndexRanksAndUpdatesNotebooks(tmp_path):
+    index = search.SearchIndex(str(tmp_path / "search.sqlite"))
+    index.update("lecture.bnb", "1", [(0, 10, 20, "Lecture notes on thermodynamics"),
+                                      (0, 10, 300, "Homework due Friday")])
+    index.update("other.bnb", "1", [(0, 5, 5, "Lecture lecture lecture")])
+
+    hits = index.search("lectu")
+    assert [os.path.basename(hit.path) for hit in hits] == ["other.bnb", "lecture.bnb"]
+    assert (hits[1].page, hits[1].x, hits[1].y) == (0, 10, 20)
+    assert "[Lecture]" in hits[1].snippet
+    assert [hit.y for hit in index.search("thermodynámics notes")] == [20]
+    assert index.search("  ") == []
+
+    # Saving again replaces the notebook's boxes
+    index.update("lecture.bnb", "2", [(0, 40, 50, "Friday quiz")])
+    assert index.version("lecture.bnb") == "2"
+    assert index.search("thermodynamics") == []
+    assert [(hit.x, hit.y) for hit in index.search("friday")] == [(40, 50)]
+    index.forget("lecture.bnb")
+    assert index.search("friday") == [] and index.version("lecture.bnb") is None
+    index.close()
+
+
+def test_SearchThousandsOfNotebooksInMilliseconds(tmp_path):
+    index = search.SearchIndex(str(tmp_path / "search.sqlite"))
+    for number in range(2000):
+        index.update(f"notebook{number}.bnb", "1", [(0, box * 10, box * 40, f"meeting {number} item {box} agenda")
+                                                    for box in range(10)])
+    index.update("needle.bnb", "1", [(0, 0, 0, "quarterly budget review")])
+
+    start = time.perf_counter()
+    hits = index.search("budget")
+    assert time.perf_counter() - start < 0.05
+    assert [os.path.basename(hit.path) for hit in hits] == ["needle.bnb"]
+    assert len(index.search("agenda")) == search.SEARCH_LIMIT
+    index.close()
+
+
+def test_SavedNotebookFoundAndOpenedAtTheBox(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    add_text(current_scene(window), "Quarterly budget review", 400, 900)
+    path = str(tmp_path / "budget.bnb")
+    with qtbot.waitSignal(window.search.indexed, timeout=10000):
+        window.save_notebook(path)
+
+    window.search_box.setText("budg")
+    assert window.search_results.count() == 1
+    assert "[budget]" in window.search_results.item(0).text()
+
+    # Activating the hit opens the notebook in a new tab and selects the box
+    window.open_search_hit(window.search_results.item(0))
+    assert window.tabWidget.count() == 2 and window.tabWidget.currentIndex() == 1
+    selected = current_scene(window).selectedItems()
+    assert len(selected) == 1 and selected[0].toPlainText() == "Quarterly budget review"
+    assert selected[0].pos() == QPointF(400, 900)
+
+    # It is open now, so its tab is gone back to
+    window.tabWidget.setCurrentIndex(0)
+    window.open_search_hit(window.search_results.item(0))
+    assert window.tabWidget.count() == 2 and window.tabWidget.currentIndex() == 1
+    window.close()
+
+
+def test_HitOfDeletedNotebookForgotten(qtbot, tmp_path):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    add_text(current_scene(window), "Quarterly budget review", 400, 900)
+    path = str(tmp_path / "budget.bnb")
+    with qtbot.waitSignal(window.search.indexed, timeout=10000):
+        window.save_notebook(path)
+    os.remove(path)
+
+    window.search_box.setText("budget")
+    with qtbot.waitSignal(window.search.indexed, timeout=10000):
+        window.open_search_hit(window.search_results.item(0))
+    assert window.tabWidget.count() == 1 and window.search_results.count() == 0
+    assert "taken out of the search index" in window.statusbar.currentMessage()
+    assert window.search.search("budget") == []
+    window.close()
@@ -0,0 +1,83 @@
+#Tests file for stroke_item.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QPainterPath, QPen, QColor, Qt
+from PySide6.QtWidgets import QGraphicsScene, QGraphicsPathItem
+
+from WhiteboardApplication.stroke_item import StrokeItem
+
+
+def make_path(points):
+    path = QPainterPath()
+    path.moveTo(*points[0])
+    for point in points[1:]:
+        path.lineTo(*point)
+    return path
+
+
+def make_pen(width):
+    pen = QPen(QColor("#000000"), width)
+    pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+    return pen
+
+
+def test_StrokeItemMatchesPathItemShape(qtbot):
+    path = make_path([(0, 0), (100, 0), (100, 100)])
+
+    stroke = StrokeItem(path)
+    stroke.setPen(make_pen(40))
+    reference = QGraphicsPathItem(path)
+    reference.setPen(make_pen(40))
+
+    # Inside the wide pen, but away from the centre line
+    for point in [QPointF(50, 15), QPointF(115, 50), QPointF(-15, 0)]:
+        assert stroke.contains(point) == reference.contains(point) == True
+
+    assert not stroke.contains(QPointF(50, 50))
+    assert reference.boundingRect().contains(stroke.boundingRect())
+
+
+def test_StrokeItemCachesOutline(qtbot):
+    stroke = StrokeItem(make_path([(0, 0), (10, 10)]))
+    stroke.setPen(make_pen(20))
+
+    outline = stroke.shape()
+    assert stroke.shape() is outline
+
+    # Any geometry change rebuilds the cache
+    stroke.setPath(make_path([(0, 0), (200, 0)]))
+    assert stroke.shape() is not outline
+    assert stroke.contains(QPointF(190, 5))
+
+    stroke.setPen(make_pen(1))
+    assert not stroke.contains(QPointF(190, 5))
+
+
+def test_StrokeItemOutlineFollowsBrush(qtbot):
+    stroke = StrokeItem(make_path([(0, 0), (100, 0), (100, 100)]))
+    stroke.setPen(make_pen(2))
+    assert not stroke.contains(QPointF(70, 30))
+
+    # Filled, the interior is part of the outline; unfilled again, it isn't
+    stroke.setBrush(QColor("#ff0000"))
+    assert stroke.contains(QPointF(70, 30))
+    stroke.setBrush(Qt.BrushStyle.NoBrush)
+    assert not stroke.contains(QPointF(70, 30))
+
+
+def test_StrokeItemHitTestInScene(qtbot):
+    scene = QGraphicsScene()
+    stroke = StrokeItem()
+    stroke.setPen(make_pen(40))
+    scene.addItem(stroke)
+
+    # Grow the stroke the way BoardScene does while drawing
+    path = make_path([(0, 0)])
+    for x in range(10, 310, 10):
+        path.lineTo(x, 0)
+        stroke.setPath(path)
+
+    assert stroke in scene.items(QRectF(290, 10, 5, 5))
+    assert stroke not in scene.items(QRectF(150, 30, 5, 5))
@@ -0,0 +1,70 @@
+#Tests file for stroke_prediction.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import pytest
+from PySide6.QtCore import QPointF, QRectF
+from PySide6.QtGui import QPen, QColor, QImage, QPainter
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.stroke_prediction import StrokePredictor, PredictionStats, PredictionOverlay, MAX_PREDICTION
+
+
+def test_ConstantVelocityPredictedExactly(qtbot):
+    predictor = StrokePredictor(horizon=16, stats=PredictionStats())
+    predictor.begin_stroke(QPointF(0, 0), 0)
+    for t in range(8, 80, 8):
+        predictor.add_sample(QPointF(t * 0.5, 0), t)
+        points = predictor.predict()
+
+    # Last sample at t=72 (x=36), moving at 0.5 units per ms
+    assert points[-1].x() == pytest.approx(36 + 16 * 0.5)
+    assert points[-1].y() == pytest.approx(0)
+
+    # Every prediction landed where the pen went, so the whole horizon counts as hidden latency
+    report = predictor.stats.report()
+    assert report['predictions'] > 0
+    assert report['mean_error'] == pytest.approx(0, abs=1e-6)
+    assert report['latency_hidden_ms'] == pytest.approx(16)
+
+
+def test_PredictionClampedAndConfigurable(qtbot):
+    predictor = StrokePredictor(horizon=50)
+    predictor.begin_stroke(QPointF(0, 0), 0)
+    predictor.add_sample(QPointF(100, 0), 8)
+    assert predictor.predict()[-1].x() == pytest.approx(100 + MAX_PREDICTION)
+
+    predictor.enabled = False
+    assert predictor.predict() == []
+
+
+def test_OverlayFollowsStrokeAndIsRemoved(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+
+    scene.begin_prediction(QPen(QColor("#000000"), 5), QPointF(100, 100))
+    overlay = scene.prediction_overlay
+    qtbot.wait(5)
+    scene.update_prediction(QPointF(110, 100))
+    assert not overlay.path.isEmpty()
+    assert overlay.path.currentPosition().x() > 110
+
+    # The tip is painted over the page, but it isn't one of its items, so it is neither saved nor journaled
+    image = QImage(200, 200, QImage.Format.Format_ARGB32)
+    image.fill(QColor("#ffffff"))
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, 200, 200), QRectF(0, 0, 200, 200))
+    painter.end()
+    assert image.pixelColor(int(overlay.path.currentPosition().x()) - 1, 100) == QColor("#000000")
+    assert scene.items() == []
+    assert window.serialize_notebook()['items'] == []
+    assert len(scene.history) == 0 and scene.history.journal.file is None
+
+    scene.end_prediction()
+    assert scene.prediction_overlay is None
+
+    # Turning prediction off in the menu skips the overlay entirely
+    window.action_stroke_prediction.setChecked(False)
+    scene.begin_prediction(QPen(QColor("#000000"), 5), QPointF(0, 0))
+    assert scene.prediction_overlay is None
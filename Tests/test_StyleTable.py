@@ -0,0 +1,78 @@
+#Tests file for style_table.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import json
+import pickle
+
+from PySide6.QtGui import QPen, QColor, QPainterPath, Qt
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.stroke_item import StrokeItem
+from WhiteboardApplication.style_table import StyleTable
+
+
+def draw_strokes(scene, colors):
+    for i, color in enumerate(colors):
+        path = QPainterPath()
+        path.moveTo(i * 10, 10)
+        path.lineTo(i * 10 + 5, 40)
+        stroke = StrokeItem(path)
+        pen = QPen(QColor(color), 5)
+        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        scene.styles.apply(stroke, pen)
+        scene.addItem(stroke)
+
+
+def test_EqualPensInterned(qtbot):
+    table = StyleTable()
+    first = table.intern(QPen(QColor("#ff0000"), 5))
+    assert table.intern(QPen(QColor("#ff0000"), 5)) == first
+    assert table.intern(QPen(QColor("#ff0000"), 10)) != first
+    assert len(table) == 2
+
+    # The serialized table is plain data, so it can go over the network as JSON
+    copy = StyleTable.deserialize(json.loads(json.dumps(table.serialize())))
+    assert copy.pen(first) == table.pen(first)
+
+
+def test_NotebookStoresEachPenOnce(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    draw_strokes(scene, ["#000000"] * 20 + ["#ff0000"] * 5)
+
+    notebook_data = pickle.loads(pickle.dumps(window.serialize_notebook()))
+    assert len(notebook_data['styles']) == 2
+    assert all('pen' not in item for item in notebook_data['items'])
+
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(window.tabWidget.count() - 1)
+    window.deserialize_notebook(notebook_data)
+    loaded = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    strokes = [item for item in loaded.items() if isinstance(item, StrokeItem)]
+    assert len(strokes) == 25
+    assert len(loaded.styles) == 2
+    assert sorted(stroke.pen().color().name() for stroke in strokes).count("#ff0000") == 5
+    assert all(stroke.pen().capStyle() == Qt.PenCapStyle.RoundCap for stroke in strokes)
+
+
+def test_LegacyPenPerStrokeLoads(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    legacy_item = {
+        'type': 'QGraphicsPathItem',
+        'pen': {'width': 5, 'color': {'red': 255, 'green': 0, 'blue': 0, 'alpha': 255},
+                'style': Qt.PenStyle.SolidLine, 'capstyle': Qt.PenCapStyle.RoundCap,
+                'joinstyle': Qt.PenJoinStyle.BevelJoin},
+        'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': Qt.BrushStyle.NoBrush},
+        'rotation': 0, 'transform': window.serialize_transform(QTransform()), 'x': 0, 'y': 0, 'name': '',
+        'elements': [{'type': 'moveTo', 'x': 0, 'y': 0}, {'type': 'lineTo', 'x': 10, 'y': 10}],
+    }
+    window.deserialize_notebook([legacy_item, dict(legacy_item)])
+
+    scene = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    strokes = [item for item in scene.items() if isinstance(item, StrokeItem)]
+    assert len(strokes) == 2
+    assert all(stroke.style == 0 for stroke in strokes)
+    assert strokes[0].pen().color() == QColor("#ff0000")
@@ -0,0 +1,103 @@
+#Tests file for thumbnails.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import time
+
+from PySide6.QtGui import QPainterPath, QPen, QColor
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import thumbnails
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import current_scene
+
+
+def draw_line(scene, y, color="#ff0000"):
+    path = QPainterPath()
+    path.moveTo(0, y)
+    path.lineTo(600, y)
+    stroke = StrokeItem(path)
+    scene.styles.apply(stroke, QPen(QColor(color), 10))
+    scene.addItem(stroke)
+    scene.add_item_to_undo(stroke)
+
+
+def test_ThumbnailDrawnFromSavedPage(qtbot):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    draw_line(scene, 250)
+    image = thumbnails.render_thumbnail(window.serialize_notebook())
+    assert (image.width(), image.height()) == (192, 160)
+    assert image.pixelColor(96, 80) == QColor("#ff0000")
+    assert image.pixelColor(96, 20) == QColor("#ffffff")
+
+
+def test_OnlyChangedPagesDrawnAgain(qtbot, thumbnail_cache):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    service = thumbnails.ThumbnailService(thumbnail_cache)
+    snapshot = lambda: window.snapshot_notebook(None, scene)
+
+    draw_line(scene, 100)
+    with qtbot.waitSignal(service.updated, timeout=10000):
+        assert service.request(scene.notebook_id, 0, scene.content_version, snapshot)
+    assert not service.request(scene.notebook_id, 0, scene.content_version, snapshot)
+    first = service.thumbnail(scene.notebook_id)
+    assert first.pixelColor(96, 32) == QColor("#ff0000")
+
+    scene.undo()
+    with qtbot.waitSignal(service.updated, timeout=10000):
+        assert service.request(scene.notebook_id, 0, scene.content_version, snapshot)
+    assert service.thumbnail(scene.notebook_id).pixelColor(96, 32) == QColor("#ffffff")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        service.thumbnail(scene.notebook_id)
+    assert (time.perf_counter() - start) / 100 < 0.001
+    service.close()
+
+
+def test_FailedThumbnailLetGo(qtbot, tmp_path, thumbnail_cache):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    scene = current_scene(window)
+    service = thumbnails.ThumbnailService(thumbnail_cache)
+    missing = str(tmp_path / "missing.bnb")
+    assert service.request('notebook', 0, 'gone', lambda: missing)
+    qtbot.waitUntil(lambda: not service.running, timeout=10000)
+    # That version isn't tried again, the next one is drawn as usual
+    assert not service.jobs
+    assert not service.request('notebook', 0, 'gone', lambda: missing)
+    draw_line(scene, 100)
+    with qtbot.waitSignal(service.updated, timeout=10000):
+        assert service.request('notebook', 0, 'drawn', lambda: window.snapshot_notebook(None, scene))
+    service.close()
+
+
+def test_TabsShowThumbnailsKeptForFiles(qtbot, tmp_path, monkeypatch):
+    window = MainWindow()
+    qtbot.addWidget(window)
+    draw_line(current_scene(window), 100)
+    window.new_tab()
+    with qtbot.waitSignal(window.thumbnails.updated, timeout=10000):
+        window.tabWidget.setCurrentIndex(1)
+    assert not window.tabWidget.tabIcon(0).isNull()
+
+    path = str(tmp_path / "notebook.bnb")
+    notebook_format.write_notebook(path, window.serialize_notebook(scene=window.tabWidget.widget(0)
+                                                                   .findChild(QGraphicsView, 'gv_Canvas').scene()))
+    monkeypatch.setattr(library.LibraryDialog, 'get_notebook', lambda *args: path)
+    window.load()
+    scene = current_scene(window)
+    assert scene.notebook_id == thumbnails.notebook_id(path)
+    with qtbot.waitSignal(window.thumbnails.updated, timeout=10000):
+        window.refresh_thumbnails()
+
+    # Opened again unchanged, the file's thumbnail is still good
+    window.new_tab()
+    window.tabWidget.setCurrentIndex(2)
+    window.load()
+    assert current_scene(window).content_version == scene.content_version
+    assert not window.thumbnails.request(scene.notebook_id, 0, scene.content_version, None)
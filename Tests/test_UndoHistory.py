@@ -0,0 +1,145 @@
+#Tests file for history.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+from PySide6.QtCore import QPointF
+from PySide6.QtGui import Qt
+from PySide6.QtWidgets import QGraphicsView
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication.history import History, MoveItems, diff_text
+from WhiteboardApplication.stroke_item import StrokeItem
+from Tests.conftest import add_stroke, current_scene
+
+
+def stroke_colors(scene):
+    return [item.pen().color().name() for item in scene.items() if isinstance(item, StrokeItem)]
+
+
+def test_HistoryHoldsNoSceneItems(window):
+    scene = current_scene(window)
+    stroke = add_stroke(scene, [(10, 10), (50, 50)])
+    scene.undo()
+    assert stroke.scene() is None
+    assert stroke not in scene.items_by_id.values()
+
+    # Redo rebuilds the stroke from its saved form
+    scene.redo()
+    restored = [item for item in scene.items() if isinstance(item, StrokeItem)]
+    assert len(restored) == 1 and restored[0] is not stroke
+    assert restored[0].path().elementCount() == 2
+    assert restored[0].pen() == stroke.pen()
+
+
+def test_RightClickStrokePushedOnce(qtbot, window):
+    scene = current_scene(window)
+    view = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+    scene.set_active_tool("pen")
+    start = view.mapFromScene(QPointF(100, 100))
+    qtbot.mousePress(view.viewport(), Qt.MouseButton.RightButton, pos=start)
+    qtbot.mouseRelease(view.viewport(), Qt.MouseButton.RightButton, pos=start)
+    assert len(scene.history) == 1
+
+
+def test_EraseAndClearUndoable(window):
+    scene = current_scene(window)
+    add_stroke(scene, [(10, 10), (50, 10)], color="#ff0000")
+    add_stroke(scene, [(10, 10), (50, 10)], color="#00ff00")
+    add_stroke(scene, [(200, 200), (250, 200)], color="#0000ff")
+
+    scene.erase(QPointF(30, 10))
+    assert stroke_colors(scene) == ["#0000ff"]
+    # Erased strokes come back in their old place in the stacking order
+    scene.undo()
+    assert stroke_colors(scene) == ["#0000ff", "#00ff00", "#ff0000"]
+
+    # Clearing swaps in an empty page, and undo swaps the old one back
+    view = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+    window.clear_canvas()
+    assert view.scene() is not scene and view.scene().items() == []
+    assert stroke_colors(scene) == ["#0000ff", "#00ff00", "#ff0000"]
+    window.undo()
+    assert view.scene() is scene
+    window.redo()
+    assert view.scene().items() == []
+    # Earlier history applies to the old page once it is back
+    window.undo()
+    window.undo()
+    assert stroke_colors(scene) == ["#00ff00", "#ff0000"]
+
+
+def test_ClearedPageDisposedOnceForgotten(qtbot, window):
+    scene = current_scene(window)
+    for i in range(1200):
+        add_stroke(scene, [(i % 500, 10), (i % 500, 50)])
+    window.clear_canvas()
+    page = window.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+    assert len(scene.items()) == 1200
+
+    # Drawing after undoing the clear drops its redo entry, which held the empty page
+    page.undo()
+    add_stroke(scene, [(0, 0), (10, 10)])
+    assert page in BoardScene.disposing
+
+    # Clearing the history lets go of the cleared content, which is torn down in batches
+    window.clear_canvas()
+    scene.history.clear()
+    assert scene in BoardScene.disposing
+    qtbot.waitUntil(lambda: scene not in BoardScene.disposing, timeout=5000)
+
+
+def test_MovesCoalesce(window):
+    scene = current_scene(window)
+    text_box = TextBox()
+    scene.add_text_box(text_box)
+    item_id = scene.item_id(text_box)
+    for _ in range(3):
+        text_box.moveBy(10, 0)
+        scene.history.push(MoveItems({item_id: (10, 0)}))
+    assert len(scene.history) == 2
+
+    scene.undo()
+    assert text_box.pos() == QPointF(0, 0)
+    scene.redo()
+    assert text_box.pos() == QPointF(30, 0)
+
+
+def test_TextEditsUndoable(window):
+    scene = current_scene(window)
+    text_box = TextBox()
+    scene.add_text_box(text_box)
+    assert diff_text("Type Here", "Type There") == (5, "H", "Th")
+
+    cursor = text_box.textCursor()
+    cursor.movePosition(cursor.MoveOperation.End)
+    for character in "!!!":
+        cursor.insertText(character)
+    assert len(scene.history) == 2
+
+    scene.undo()
+    assert text_box.toPlainText() == "Type Here"
+    scene.redo()
+    assert text_box.toPlainText() == "Type Here!!!"
+
+
+def test_OldHistorySpillsToDisk(window):
+    scene = current_scene(window)
+    scene.history = History(scene, memory_budget=4096, coalesce_interval=0)
+    strokes = [add_stroke(scene, [(i, 0), (i, 100), (i + 5, 200)]) for i in range(100)]
+    assert scene.history.memory_used <= 4096
+    assert scene.history.disk_used > 0
+    assert len(scene.history) == 100
+
+    # Undoing all the way back reads the spilled entries from the journal
+    while scene.history.undo():
+        pass
+    assert scene.items() == []
+    assert scene.history.disk_used == 0
+    scene.redo()
+    assert len(scene.items()) == 1
+
+    # Past the disk budget the oldest entries are dropped
+    scene.history = History(scene, memory_budget=1024, disk_budget=2048, coalesce_interval=0)
+    for i in range(100):
+        add_stroke(scene, [(i, 0), (i, 100)])
+    assert scene.history.disk_used <= 2048
+    assert len(scene.history) < 100
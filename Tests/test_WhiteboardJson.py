@@ -0,0 +1,64 @@
+#Tests file for whiteboard_json.py in WhiteboardApplication directory
+#Created 10/19/2026
+#Last edit: 10/19/2026
+import io
+import json
+
+from PySide6.QtWidgets import QGraphicsScene, QGraphicsPathItem
+
+from WhiteboardApplication.main import *
+from WhiteboardApplication import geometry
+from WhiteboardApplication.whiteboard_json import WhiteboardReader, WhiteboardLoader
+
+BOARD = {
+    'items': [
+        {'type': 'path', 'color': '#ff0000', 'width': 3.0, 'points': [[0.5, 1.25], [10, 20], [1e-3, -4.5e2]]},
+        {'type': 'rectangle', 'color': '#000000', 'width': 1.0, 'rect': [5, 5, 40, 30]},
+        {'type': 'path', 'color': '#0000ff', 'width': 2.0, 'points': [[x, x * 0.5] for x in range(300)]},
+    ],
+    'scene_rect': [600, 500], 'color': '#123456', 'size': 4,
+}
+
+
+def test_ReadsItemsAcrossBlocks():
+    text = json.dumps(BOARD, indent=1).encode('utf-8')
+    # Blocks far smaller than an item, so every value gets cut off somewhere
+    reader = WhiteboardReader(io.BytesIO(text), block_size=7)
+    items = list(reader.items())
+    assert reader.properties == {'scene_rect': [600, 500], 'color': '#123456', 'size': 4}
+    assert [item['type'] for item in items] == ['path', 'rectangle', 'path']
+    assert items[0]['points'].tolist() == [[0.5, 1.25], [10.0, 20.0], [1e-3, -4.5e2]]
+    assert items[1]['rect'] == [5, 5, 40, 30]
+    assert items[2]['points'].shape == (300, 2)
+
+
+def test_ReadsServerLines():
+    board = {'lines': [{'color': '#000000', 'width': 1, 'points': [[0, 0], [3, 4]]}],
+             'scene_rect': [600, 500], 'color': '#000000', 'size': 1}
+    reader = WhiteboardReader(io.BytesIO(json.dumps(board).encode('utf-8')), block_size=5)
+    items = list(reader.items())
+    assert items[0]['type'] == 'path'
+    assert items[0]['points'].tolist() == [[0, 0], [3, 4]]
+
+
+def test_LoaderFillsScene(qtbot, tmp_path):
+    path = tmp_path / "board.json"
+    path.write_text(json.dumps(BOARD))
+    scene = QGraphicsScene()
+    built = lambda number, item_data: QGraphicsPathItem(geometry.polyline_path(item_data['points'])) \
+        if item_data['type'] == 'path' else None
+    loader = WhiteboardLoader(scene, str(path), built)
+    with qtbot.waitSignal(loader.finished, timeout=5000) as finished:
+        loader.start()
+    assert finished.args[0]['color'] == '#123456'
+    assert len(scene.items()) == 2
+    assert loader.file.closed
+
+
+def test_LoaderReportsBrokenFile(qtbot, tmp_path):
+    path = tmp_path / "board.json"
+    path.write_text(json.dumps(BOARD)[:-40])
+    loader = WhiteboardLoader(QGraphicsScene(), str(path), lambda number, item_data: None)
+    with qtbot.waitSignal(loader.failed, timeout=5000):
+        loader.start()
+    assert loader.file.closed
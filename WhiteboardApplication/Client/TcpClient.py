@@ -29,11 +29,16 @@ from PySide6.QtGui import (
 from PySide6.QtCore import (
     Qt,
     QTimer,
-    QRectF
+    QRectF,
+    QThreadPool
 )
-import json
 from TcpClientNet import start_client, MyClient, signal_manager
 from WhiteboardApplication.UI.board import Ui_MainWindow
+from WhiteboardApplication.style_table import StyleTable
+from WhiteboardApplication.save_worker import SaveJob, encode_whiteboard_snapshot
+from WhiteboardApplication.whiteboard_json import WhiteboardLoader
+from WhiteboardApplication import geometry
+from WhiteboardApplication import garbage_collector
 from collections import deque
 
 itemTypes = set()
@@ -62,6 +67,8 @@ class BoardScene(QGraphicsScene):
         self.pathItem = None
         self.drawn_paths = []
         self.my_pen = None
+        # Pens received from other clients, shared by every item drawn with them
+        self.styles = StyleTable()
         self.recv_timer = QTimer()
         self.recv_timer.setInterval(100)
         self.recv_timer.timeout.connect(self.build_scene_file)
@@ -182,11 +189,13 @@ class BoardScene(QGraphicsScene):
     def scene_file(self, flag):
         global circular_send_buffer
         self.undo_flag = flag
+        styles = StyleTable()
         data = {
             'items': [],  # stores info of each line drawn
             'scene_rect': [self.width(), self.height()],  # stores dimension of scene
             'color': self.color.name(),  # store the color used
             'size': self.size,  # store the size of the pen
+            'styles': [],  # each pen used by the items, sent once
         }
 
         global g_length
@@ -200,15 +209,17 @@ class BoardScene(QGraphicsScene):
             if isinstance(item, QGraphicsPathItem):
                 line_data = {
                     'type': 'path',
+                    'style': styles.intern(item.pen()),  # index into data['styles']
+                    # Still sent for clients from before the style table, which read only these
                     'color': item.pen().color().name(),
                     'width': item.pen().widthF(),
-                    'points': [(point.x(), point.y()) for subpath in item.path().toSubpathPolygons() for point in
-                               subpath]  # stores the (X,Y) coordinate of the line
+                    'points': geometry.point_list(geometry.path_points(item.path()))  # stores the (X,Y) coordinate of the line
                 }
                 data['items'].append(line_data)
             elif isinstance(item, QGraphicsRectItem):
                 rect_data = {
                     'type': 'rectangle',
+                    'style': styles.intern(item.pen()),
                     'color': item.pen().color().name(),
                     'width': item.pen().widthF(),
                     'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
@@ -217,6 +228,7 @@ class BoardScene(QGraphicsScene):
             elif isinstance(item, QGraphicsEllipseItem):
                 ellipse_data = {
                     'type': 'ellipse',
+                    'style': styles.intern(item.pen()),
                     'color': item.pen().color().name(),
                     'width': item.pen().widthF(),
                     'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
@@ -230,6 +242,7 @@ class BoardScene(QGraphicsScene):
             #    # the complex line into sub parts and store it
             #   line_data['points'].extend([(point.x(), point.y()) for point in subpath])
 
+        data['styles'] = styles.serialize()
         circular_send_buffer.appendleft(data)
         # signal_manager.data_sig.emit(data, self.undo_flag)
 
@@ -265,19 +278,22 @@ class BoardScene(QGraphicsScene):
                         prev = scene_file
                     else:
                         pass
+                    # Older clients send colour and width with every item instead of a style table
+                    styles = StyleTable.deserialize(scene_file['styles']) if 'styles' in scene_file else None
+
+                    def item_pen(item_data):
+                        if styles is not None:
+                            return self.styles.pen(self.styles.intern(styles.pen(item_data['style'])))
+                        return QPen(QColor(item_data['color']), item_data['width'])
+
                     # Add lines to the scene
                     if 'items' in scene_file:
                         if scene_file['items'][0]['type'] == 'path':
                             for line_data in scene_file['items']:
-                                path = QPainterPath()
-                                path.moveTo(line_data['points'][0][0], line_data['points'][0][1])
-
-                                for subpath in line_data['points'][1:]:
-                                    path.lineTo(subpath[0], subpath[1])
-
-                                pathItem = QGraphicsPathItem(path)
-                                my_pen = QPen(QColor(line_data['color']), line_data['width'])
-                                my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+                                pathItem = QGraphicsPathItem(geometry.polyline_path(line_data['points']))
+                                my_pen = item_pen(line_data)
+                                if 'style' not in line_data:
+                                    my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
                                 pathItem.setPen(my_pen)
                                 self.addItem(pathItem)
 
@@ -285,7 +301,7 @@ class BoardScene(QGraphicsScene):
                             rect_data = scene_file['items'][0]['rect']
                             rect = QRectF(rect_data[0], rect_data[1], rect_data[2], rect_data[3])
                             rectItem = QGraphicsRectItem(rect)
-                            my_pen = QPen(QColor(scene_file['items'][0]['color']), scene_file['items'][0]['width'])
+                            my_pen = item_pen(scene_file['items'][0])
                             rectItem.setPen(my_pen)
                             self.addItem(rectItem)
 
@@ -293,7 +309,7 @@ class BoardScene(QGraphicsScene):
                             ellipse_data = scene_file['items'][0]['rect']
                             rect = QRectF(ellipse_data[0], ellipse_data[1], ellipse_data[2], ellipse_data[3])
                             ellipseItem = QGraphicsEllipseItem(rect)
-                            my_pen = QPen(QColor(scene_file['items'][0]['color']), scene_file['items'][0]['width'])
+                            my_pen = item_pen(scene_file['items'][0])
                             ellipseItem.setPen(my_pen)
                             self.addItem(ellipseItem)
             except IndexError as e:
@@ -369,122 +385,112 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.redo_list = []
         self.current_file = None
 
+        # Saves run one at a time, in order, so the last one started is the one left on disk
+        self.save_pool = QThreadPool(self)
+        self.save_pool.setMaxThreadCount(1)
+        self.save_jobs = set()
+        self.loader = None
+
     def save_file(self):
         filename, _ = QFileDialog.getSaveFileName(self, "Save File", "", "Whiteboard Files (*.json)")
         if filename:
-            data = {
-                'items': [],
-                'scene_rect': [self.scene.width(), self.scene.height()],
-                'color': self.scene.color.name(),
-                'size': self.scene.size
-            }
-            for item in reversed(self.scene.items()):
-                if isinstance(item, QGraphicsPathItem):
-                    line_data = {
-                        'type': 'path',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'points': [(point.x(), point.y()) for subpath in item.path().toSubpathPolygons() for point in
-                                   subpath]
-                    }
-                    data['items'].append(line_data)
-                elif isinstance(item, QGraphicsRectItem):
-                    rect_data = {
-                        'type': 'rectangle',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
-                    }
-                    data['items'].append(rect_data)
-                elif isinstance(item, QGraphicsEllipseItem):
-                    ellipse_data = {
-                        'type': 'ellipse',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
-                    }
-                    data['items'].append(ellipse_data)
+            self.current_file = filename
+            self.write_file(filename)
 
-            with open(filename, 'w') as file:
-                json.dump(data, file)
+    # Snapshot of the board taken here; paths are shared with their items, not copied, until either changes
+    def snapshot(self):
+        data = {
+            'items': [],
+            'scene_rect': [self.scene.width(), self.scene.height()],
+            'color': self.scene.color.name(),
+            'size': self.scene.size
+        }
+        for item in reversed(self.scene.items()):
+            if isinstance(item, QGraphicsPathItem):
+                data['items'].append({
+                    'type': 'path',
+                    'color': item.pen().color().name(),
+                    'width': item.pen().widthF(),
+                    'path': QPainterPath(item.path())
+                })
+            elif isinstance(item, QGraphicsRectItem):
+                data['items'].append({
+                    'type': 'rectangle',
+                    'color': item.pen().color().name(),
+                    'width': item.pen().widthF(),
+                    'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
+                })
+            elif isinstance(item, QGraphicsEllipseItem):
+                data['items'].append({
+                    'type': 'ellipse',
+                    'color': item.pen().color().name(),
+                    'width': item.pen().widthF(),
+                    'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
+                })
+        return data
+
+    # Points are worked out and the file written on the save thread, so drawing carries on meanwhile
+    def write_file(self, filename):
+        job = SaveJob(filename, self.snapshot(), encode_whiteboard_snapshot)
+        job.signals.progress.connect(
+            lambda done, total: self.statusbar.showMessage(f"Saving... {done * 100 // max(total, 1)}%"))
+        job.signals.finished.connect(lambda path: self.save_finished(job, f"Saved {path}"))
+        job.signals.failed.connect(lambda path, error: self.save_finished(job, f"Couldn't save {path}: {error}"))
+        self.save_jobs.add(job)
+        self.save_pool.start(job)
+
+    def save_finished(self, job, message):
+        self.save_jobs.discard(job)
+        garbage_collector.release_job(job)
+        self.statusbar.showMessage(message, 5000)
 
     def load_file(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Whiteboard Files (*.json)")
         if filename:
             self.current_file = filename
-            with open(filename, 'r') as file:
-                data = json.load(file)
-
+            if self.loader is not None:
+                self.loader.cancel()
             self.scene.clear()
-            self.scene.setSceneRect(0, 0, data['scene_rect'][0], data['scene_rect'][1])
-            self.scene.change_color(QColor(data['color']))
-            self.scene.change_size(data['size'])
-
-            for item_data in data['items']:
-                if item_data['type'] == 'path':
-                    path = QPainterPath()
-                    path.moveTo(item_data['points'][0][0], item_data['points'][0][1])
-                    for point in item_data['points'][1:]:
-                        path.lineTo(point[0], point[1])
-
-                    pathItem = QGraphicsPathItem(path)
-                    my_pen = QPen(QColor(item_data['color']), item_data['width'])
-                    my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                    pathItem.setPen(my_pen)
-                    self.scene.addItem(pathItem)
-                elif item_data['type'] == 'rectangle':
-                    rect_data = item_data['rect']
-                    rect = QRectF(rect_data[0], rect_data[1], rect_data[2], rect_data[3])
-                    rectItem = QGraphicsRectItem(rect)
-                    my_pen = QPen(QColor(item_data['color']), item_data['width'])
-                    rectItem.setPen(my_pen)
-                    self.scene.addItem(rectItem)
-                elif item_data['type'] == 'ellipse':
-                    ellipse_data = item_data['rect']
-                    rect = QRectF(ellipse_data[0], ellipse_data[1], ellipse_data[2], ellipse_data[3])
-                    ellipseItem = QGraphicsEllipseItem(rect)
-                    my_pen = QPen(QColor(item_data['color']), item_data['width'])
-                    ellipseItem.setPen(my_pen)
-                    self.scene.addItem(ellipseItem)
-            data.clear()
+
+            # Items are read and added a slice at a time, so big boards show up as they load
+            self.loader = WhiteboardLoader(self.scene, filename, self.build_item, self)
+            self.loader.progress.connect(
+                lambda done, total: self.statusbar.showMessage(f"Opening... {done * 100 // max(total, 1)}%"))
+            self.loader.finished.connect(self.load_finished)
+            self.loader.failed.connect(
+                lambda error: self.statusbar.showMessage(f"Couldn't open {filename}: {error}", 5000))
+            self.loader.start()
+
+    def build_item(self, number, item_data):
+        my_pen = QPen(QColor(item_data['color']), item_data['width'])
+        if item_data['type'] == 'path':
+            pathItem = QGraphicsPathItem(geometry.polyline_path(item_data['points']))
+            my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+            pathItem.setPen(my_pen)
+            return pathItem
+        elif item_data['type'] == 'rectangle':
+            rect_data = item_data['rect']
+            rectItem = QGraphicsRectItem(QRectF(rect_data[0], rect_data[1], rect_data[2], rect_data[3]))
+            rectItem.setPen(my_pen)
+            return rectItem
+        elif item_data['type'] == 'ellipse':
+            ellipse_data = item_data['rect']
+            ellipseItem = QGraphicsEllipseItem(QRectF(ellipse_data[0], ellipse_data[1], ellipse_data[2], ellipse_data[3]))
+            ellipseItem.setPen(my_pen)
+            return ellipseItem
+        return None
+
+    # The board's own settings come after its items in the file
+    def load_finished(self, properties):
+        self.loader = None
+        self.scene.setSceneRect(0, 0, properties['scene_rect'][0], properties['scene_rect'][1])
+        self.scene.change_color(QColor(properties['color']))
+        self.scene.change_size(properties['size'])
+        self.statusbar.showMessage(f"Opened {self.current_file}", 5000)
 
     def save(self):
         if self.current_file:
-            data = {
-                'items': [],
-                'scene_rect': [self.scene.width(), self.scene.height()],
-                'color': self.scene.color.name(),
-                'size': self.scene.size
-            }
-            for item in reversed(self.scene.items()):
-                if isinstance(item, QGraphicsPathItem):
-                    line_data = {
-                        'type': 'path',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'points': [(point.x(), point.y()) for subpath in item.path().toSubpathPolygons() for point in
-                                   subpath]
-                    }
-                    data['items'].append(line_data)
-                elif isinstance(item, QGraphicsRectItem):
-                    rect_data = {
-                        'type': 'rectangle',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
-                    }
-                    data['items'].append(rect_data)
-                elif isinstance(item, QGraphicsEllipseItem):
-                    ellipse_data = {
-                        'type': 'ellipse',
-                        'color': item.pen().color().name(),
-                        'width': item.pen().widthF(),
-                        'rect': [item.rect().x(), item.rect().y(), item.rect().width(), item.rect().height()]
-                    }
-                    data['items'].append(ellipse_data)
-
-            with open(self.current_file, 'w') as file:
-                json.dump(data, file)
+            self.write_file(self.current_file)
         else:
             self.save_file()
 
@@ -655,6 +661,8 @@ def validate_credentials(username: str, pwd: str):
 
 def init_gui():
     app = QApplication()
+    # Saves run on a worker thread, which must never be the one freeing Qt objects (see garbage_collector)
+    garbage_collector.install(app)
     window = MainWindow()
 
     # Start the ping_server thread
@@ -21,6 +21,8 @@ from PySide6.QtCore import (
 )
 import json
 from WhiteboardApplication.UI.board import Ui_MainWindow
+from WhiteboardApplication.whiteboard_json import WhiteboardLoader
+from WhiteboardApplication import geometry
 from tcpServerNet import start_server, MyServer, signal_manager
 
 itemTypes = set()
@@ -290,6 +292,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.gv_Canvas.setRenderHint(QPainter.RenderHint.Antialiasing, True)
 
         self.redo_list = []
+        self.loader = None
 
     def save_file(self):
         filename, _ = QFileDialog.getSaveFileName(self, "Save File", "", "Whiteboard Files (*.json)")  # open dialog
@@ -307,16 +310,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                     line_data = {
                         'color': item.pen().color().name(),
                         'width': item.pen().widthF(),
-                        'points': [],  # stores the (X,Y) coordinate of the line
+                        # stores the (X,Y) coordinate of the line; toSubpathPolygons breaks the complex line
+                        # down into sub parts
+                        'points': geometry.point_list(geometry.path_points(item.path())),
                         # 'z_value': item.zValue()  # Store the z-value
                     }
                     # print(f"Item value : {item.zValue()}")
 
-                    # Extract points from the path
-                    for subpath in item.path().toSubpathPolygons():  # to SubpathPolygons method is used to break down
-                        # the complex line into sub parts and store it
-                        line_data['points'].extend([(point.x(), point.y()) for point in subpath])
-
                     data['lines'].append(line_data)
 
             with open(filename, 'w') as file:
@@ -326,42 +326,34 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.scene.z_index_counter = 0
         filename, _ = QFileDialog.getOpenFileName(self, "Open File", "", "Whiteboard Files (*.json)")  # open dialog
         # window to Open the file
-        if filename:  # reading the file
-            with open(filename, 'r') as file:
-                data = json.load(file)
-
+        if filename:  # reading the file, a slice of lines at a time
+            if self.loader is not None:
+                self.loader.cancel()
             self.scene.clear()
 
-            # Set scene properties
-            self.scene.setSceneRect(0, 0, data['scene_rect'][0], data['scene_rect'][1])
-            self.scene.change_color(QColor(data['color']))
-            self.scene.change_size(data['size'])
-
-            z_index_counter = 0
-
-            items = []  # List to hold items before sorting
-            # Add lines to the scene
-            for line_data in data['lines']:
-                path = QPainterPath()
-                path.moveTo(line_data['points'][0][0], line_data['points'][0][1])
-
-                for subpath in line_data['points'][1:]:
-                    path.lineTo(subpath[0], subpath[1])
-
-                pathItem = QGraphicsPathItem(path)
-                pathItem.setZValue(z_index_counter)  # Assign unique z-index
-                z_index_counter += 1  # Increment counter
-                my_pen = QPen(QColor(line_data['color']), line_data['width'])
-                my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                pathItem.setPen(my_pen)
-
-                # items.append(pathItem)
-
-                self.scene.addItem(pathItem)
-            #
-            # items.sort(key=lambda x: x.zValue())
-            # for item in items:
-                # self.scene.addItem(pathItem)
+            self.loader = WhiteboardLoader(self.scene, filename, self.build_line, self)
+            self.loader.progress.connect(
+                lambda done, total: self.statusbar.showMessage(f"Opening... {done * 100 // max(total, 1)}%"))
+            self.loader.finished.connect(self.load_finished)
+            self.loader.failed.connect(
+                lambda error: self.statusbar.showMessage(f"Couldn't open {filename}: {error}", 5000))
+            self.loader.start()
+
+    def build_line(self, number, line_data):
+        pathItem = QGraphicsPathItem(geometry.polyline_path(line_data['points']))
+        pathItem.setZValue(number)  # Assign unique z-index
+        my_pen = QPen(QColor(line_data['color']), line_data['width'])
+        my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        pathItem.setPen(my_pen)
+        return pathItem
+
+    # Set scene properties, which come after the lines in the file
+    def load_finished(self, properties):
+        self.loader = None
+        self.scene.setSceneRect(0, 0, properties['scene_rect'][0], properties['scene_rect'][1])
+        self.scene.change_color(QColor(properties['color']))
+        self.scene.change_size(properties['size'])
+        self.statusbar.clearMessage()
 
     def Close_window(self):
         self.close()
@@ -443,14 +435,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 # Add lines to the scene
                 if 'lines' in scene_file:
                     for line_data in scene_file['lines']:
-                        path = QPainterPath()
-                        path.moveTo(line_data['points'][0][0], line_data['points'][0][1])
+                        path = geometry.polyline_path(line_data['points'])
                         print("line_data is cool")
 
-                        for subpath in line_data['points'][1:]:
-                            path.lineTo(subpath[0], subpath[1])
-                        print("Whatever tf subpath is, it's cool")
-
                         self.scene.temppath.clear()
 
                         if path not in self.scene.temppath:
@@ -0,0 +1,106 @@
+"""Images of a notebook, each kept once and found by a hash of its content.
+
+An image item refers to its picture by key, the SHA-256 of its PNG bytes, so the same screenshot
+pasted on thirty pages is stored, saved and journaled once. Decoding waits too: pictures stay PNG
+bytes until an item showing them is first painted (see ResizablePixmapItem.from_asset), and items
+showing the same picture share one decoded QPixmap. The pictures of a notebook opened lazily aren't
+even read until then, or until they are saved; the store only knows where they are (see add_source).
+"""
+import hashlib
+import os
+
+from WhiteboardApplication.notebook_data import serialize_pixmap, deserialize_pixmap
+
+
+def asset_key(data):
+    """Key of an image from its PNG bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class AssetStore:
+    """PNG bytes of every image in a notebook by key, in the order they were added."""
+
+    def __init__(self):
+        self.blobs = {}  # key -> PNG bytes, None for pictures not read yet from the file they are in
+        self._sources = {}  # key -> where the bytes of a picture not read yet are, see add_source
+        self._pixmaps = {}  # key -> QPixmap, for images decoded already
+
+    def __len__(self):
+        return len(self.blobs)
+
+    def __contains__(self, key):
+        return key in self.blobs
+
+    def keys(self):
+        return list(self.blobs)
+
+    def add(self, data):
+        """Key of the PNG bytes, adding them if no image with that content is here yet."""
+        data = bytes(data)
+        key = asset_key(data)
+        self._set(key, data)
+        return key
+
+    def add_pixmap(self, pixmap):
+        key = self.add(serialize_pixmap(pixmap))
+        self._pixmaps.setdefault(key, pixmap)
+        return key
+
+    def update(self, blobs):
+        """Adds the {key: PNG bytes} of a saved notebook or journal."""
+        for key, data in blobs.items():
+            self._set(key, bytes(data))
+
+    def add_source(self, source):
+        """Adds the pictures of a notebook opened lazily, leaving their bytes in its file.
+
+        source.keys() are the pictures, source.read(key) the PNG bytes of one, asked for once, the first
+        time they are needed, and source.path the file they are read from (see lazy_notebook.FileAssets).
+        """
+        for key in source.keys():
+            if key not in self.blobs:
+                self.blobs[key] = None
+                self._sources[key] = source
+
+    def read_from(self, path):
+        """Reads the pictures still left in the file at path, which is about to be written over."""
+        path = os.path.abspath(path)
+        for key in [key for key, source in self._sources.items() if source.path == path]:
+            self.data(key)
+
+    def _set(self, key, data):
+        # Bytes at hand save reading the picture from its file later
+        if self.blobs.get(key) is None:
+            self.blobs[key] = data
+            self._sources.pop(key, None)
+
+    def data(self, key):
+        data = self.blobs[key]
+        if data is None:
+            data = self.blobs[key] = self._sources[key].read(key)
+            del self._sources[key]
+        return data
+
+    def pixmap(self, key):
+        """The decoded image, reading and decoding it the first time it is asked for."""
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._pixmaps[key] = deserialize_pixmap(self.data(key))
+        return pixmap
+
+    def key_of(self, item):
+        """Key of a ResizablePixmapItem's image, adding the image if the item didn't come from this store."""
+        if item.asset is None or item.asset not in self.blobs:
+            item.decode()
+            item.asset = self.add_pixmap(item.original_pixmap)
+        return item.asset
+
+    def serialize(self, keys=None):
+        """{key: PNG bytes} of the given keys, or of every image."""
+        return {key: self.data(key) for key in (list(self.blobs) if keys is None else keys)}
+
+    @classmethod
+    def deserialize(cls, blobs):
+        store = cls()
+        store.update(blobs)
+        return store
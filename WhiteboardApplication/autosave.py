@@ -0,0 +1,331 @@
+"""Autosave: an append-only journal of every edit made to a notebook, replayed after a crash.
+
+Each notebook tab journals its undo history as it goes: every edit pushed, undone and redone, a
+few bytes each, synced to disk in small batches. An edit the history merged into the one before
+it is journaled as such, so replaying builds the same undo entries however fast it runs. A
+journal starts from a base, which is an empty page, a notebook file, or a snapshot of the page
+with its item ids. Once it grows past COMPACT_THRESHOLD a fresh snapshot is written on a worker
+thread and replaces it. A journal is locked while its tab is open and deleted when the tab
+closes, so an unlocked journal found at startup was left behind by a crash, and MainWindow
+replays it into a new tab. A journal that can't be replayed, e.g. because the notebook file it
+was based on is gone, is renamed out of the way (see quarantine) so it is kept for a look by
+hand but isn't tried again at every start. A save that writes only the items changed to a
+notebook store takes a checkpoint instead, and once it is done the journal starts over from the
+store, carrying over the edits made while it ran (see saved).
+
+History records name pens by their index in the page's style table, so pens added to the table
+are journaled too, before the first record that may use them, and every base carries the table
+as it was. Images are kept the same way: each picture the page's asset store gains is journaled
+once, before any record referring to it by key.
+
+Records, little-endian: uint32 length, uint32 crc32 of the payload, payload (a zlib-compressed
+pickle). A torn record at the end, from a crash mid-write, is ignored.
+"""
+import glob
+import os
+import pickle
+import struct
+import uuid
+import zlib
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QStandardPaths, QLockFile, QTimer, QThreadPool, Signal
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.asset_store import AssetStore
+from WhiteboardApplication.save_worker import finish_notebook
+from WhiteboardApplication.style_table import StyleTable, serialize_pen, deserialize_pen
+
+JOURNAL_SUFFIX = '.journal'
+UNRECOVERED_SUFFIX = '.unrecovered'  # Added to journals that couldn't be replayed
+FLUSH_INTERVAL = 1000  # ms an appended edit may wait before it is synced to disk
+FLUSH_BATCH = 64  # Edits appended before a sync regardless of the timer
+COMPACT_THRESHOLD = 4 * 1024 * 1024  # Journal bytes past which it is folded into a fresh snapshot
+
+# Record kinds; MERGE is an edit the undo history merged into the one before it
+BASE, DO, MERGE, UNDO, REDO, STYLES, ASSETS = 'base', 'do', 'merge', 'undo', 'redo', 'styles', 'assets'
+
+_RECORD = struct.Struct('<II')
+
+# Snapshot jobs still running, kept alive even if the tab whose journal started them closes meanwhile
+_running_jobs = set()
+
+
+def journal_directory():
+    """Where the journals of open notebooks are kept."""
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    return os.path.join(location or os.path.expanduser('~'), 'autosave')
+
+
+def encode_record(record):
+    payload = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    return _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_journal(path):
+    """(base, [(kind, command)], length) of a journal, up to its last whole record, which ends at length."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    records = []
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        length, checksum = _RECORD.unpack_from(data, offset)
+        payload = data[offset + _RECORD.size:offset + _RECORD.size + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            break
+        records.append(pickle.loads(zlib.decompress(payload)))
+        offset += _RECORD.size + length
+    if not records or records[0][0] != BASE:
+        raise ValueError(f"{path} doesn't start with a base")
+    return records[0][1], records[1:], offset
+
+
+def journal_styles(base, records):
+    """The style table as it was when the journal's last record was written."""
+    styles = StyleTable.deserialize(base.get('styles', []))
+    for kind, payload in records:
+        if kind == STYLES:
+            start, pens = payload
+            for pen in pens[len(styles) - start:]:
+                styles.intern(deserialize_pen(pen))
+    return styles
+
+
+def journal_assets(base, records):
+    """The asset store as it was when the journal's last record was written."""
+    assets = AssetStore.deserialize(base.get('assets', {}))
+    for kind, payload in records:
+        if kind == ASSETS:
+            assets.update(payload)
+    return assets
+
+
+def orphaned_journals(directory):
+    """[(path, lock)] of the journals in directory no running BestNotes holds; the locks are taken."""
+    orphans = []
+    for path in sorted(glob.glob(os.path.join(directory, '*' + JOURNAL_SUFFIX))):
+        lock = QLockFile(path + '.lock')
+        # A lock whose process is gone counts as stale and is taken over
+        if lock.tryLock(0):
+            orphans.append((path, lock))
+    return orphans
+
+
+def quarantine(path, lock):
+    """Sets aside an orphaned journal that couldn't be replayed and lets go of its lock; returns where it went."""
+    kept = path + UNRECOVERED_SUFFIX
+    try:
+        os.replace(path, kept)
+    except OSError:
+        kept = path
+    lock.unlock()
+    return kept
+
+
+class _SnapshotSignals(QObject):
+    finished = Signal(int, str)  # generation, path of the written snapshot
+
+
+class SnapshotJob(QRunnable):
+    """Writes a snapshot base record to a new file on a pool thread, finishing its notebook's items there."""
+
+    def __init__(self, generation, path, snapshot):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.path = path
+        self.snapshot = snapshot
+        self.signals = _SnapshotSignals()
+
+    def run(self):
+        snapshot = dict(self.snapshot, notebook=finish_notebook(self.snapshot['notebook']))
+        with open(self.path, 'wb') as file:
+            file.write(encode_record((BASE, snapshot)))
+            file.flush()
+            os.fsync(file.fileno())
+        self.signals.finished.emit(self.generation, self.path)
+
+
+class Journal(QObject):
+    """The autosave journal of one notebook tab."""
+    # The journal has grown past COMPACT_THRESHOLD and wants a snapshot (see start_compaction)
+    compaction_due = Signal()
+
+    def __init__(self, directory, path=None, lock=None, length=0):
+        super().__init__()
+        self.base = {'kind': 'empty', 'styles': [], 'assets': {}}
+        self.styles_written = 0  # pens of the style table the journal holds
+        self.assets_written = 0  # images of the asset store the journal holds
+        self.file = None  # opened with the first edit, an untouched notebook has nothing to recover
+        self.size = 0
+        if path is None:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, uuid.uuid4().hex + JOURNAL_SUFFIX)
+            self.lock = QLockFile(self.path + '.lock')
+            self.lock.tryLock(0)
+        else:
+            # Carrying on a recovered journal, after its last whole record
+            self.path = path
+            self.lock = lock
+            self.file = open(path, 'r+b')
+            self.file.truncate(length)
+            self.file.seek(length)
+            self.size = length
+        self.unflushed = 0
+        # Bumped whenever the journal starts over, so a snapshot taken before that is dropped
+        self.generation = 0
+        self.compaction = None
+        self.compaction_offset = 0
+        self.checkpoints = []  # [generation, size] of the journal when saves still running took their snapshot
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append(self, kind, command=None, styles=None, assets=None):
+        if self.file is None:
+            self._start(encode_record((BASE, self.base)))
+        if styles is not None and len(styles) > self.styles_written:
+            pens = [serialize_pen(pen) for pen in styles.pens[self.styles_written:]]
+            self._write(encode_record((STYLES, (self.styles_written, pens))))
+            self.styles_written = len(styles)
+        if assets is not None and len(assets) > self.assets_written:
+            self._write(encode_record((ASSETS, assets.serialize(assets.keys()[self.assets_written:]))))
+            self.assets_written = len(assets)
+        self._write(encode_record((kind, command)))
+        if self.unflushed >= FLUSH_BATCH:
+            self.flush()
+        elif not self.flush_timer.isActive():
+            self.flush_timer.start()
+        if self.size > COMPACT_THRESHOLD and self.compaction is None:
+            self.compaction_due.emit()
+
+    def _write(self, record):
+        self.file.write(record)
+        self.size += len(record)
+        self.unflushed += 1
+
+    def flush(self):
+        self.flush_timer.stop()
+        if self.file is not None and self.unflushed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unflushed = 0
+
+    #Starts over from a base that holds no edits yet, e.g. a notebook file that was just opened
+    def rebase(self, base):
+        self.generation += 1
+        self.base = base
+        self.styles_written = len(base['styles'])
+        self.assets_written = len(base.get('assets', ()))
+        if self.file is not None:
+            self._start(encode_record((BASE, base)))
+
+    #Folds everything so far into a snapshot; the edits made while it's written are carried over. While one
+    #is being written no other starts, that one already folds in what it can and the rest is carried over
+    def start_compaction(self, snapshot):
+        if self.compaction is not None:
+            return
+        if self.file is None:
+            self._start(encode_record((BASE, self.base)))
+        self.flush()
+        self.generation += 1
+        self.compaction_offset = self.size
+        # Named after its generation, so it never shares a file with a snapshot of a journal that started over
+        job = SnapshotJob(self.generation, f'{self.path}.{self.generation}.snapshot', snapshot)
+        job.signals.finished.connect(partial(self.compaction_finished, job))
+        self.compaction = job
+        _running_jobs.add(job)
+        QThreadPool.globalInstance().start(job)
+
+    def compaction_finished(self, job, generation, path):
+        _running_jobs.discard(job)
+        garbage_collector.release_job(job)
+        if self.compaction is job:
+            self.compaction = None
+        # The journal started over or was discarded while the snapshot was written
+        if generation != self.generation or self.lock is None:
+            os.remove(path)
+            return
+        self.file.flush()
+        with open(path, 'ab') as file:
+            # Checkpoints taken since the snapshot started move with the edits carried over
+            for checkpoint in self.checkpoints:
+                if checkpoint[0] == generation:
+                    checkpoint[1] += file.tell() - self.compaction_offset
+            with open(self.path, 'rb') as journal:
+                journal.seek(self.compaction_offset)
+                file.write(journal.read())
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        os.replace(path, self.path)
+        self.file = open(self.path, 'ab')
+        self.size = self.file.tell()
+
+    #Where the journal is now, for saved once the page as it is now has been written to a notebook file
+    def checkpoint(self):
+        if self.file is None:
+            self._start(encode_record((BASE, self.base)))
+        self.flush()
+        checkpoint = [self.generation, self.size]
+        self.checkpoints.append(checkpoint)
+        return checkpoint
+
+    #The page as it was at checkpoint is now in the file base names, so the journal starts over from that
+    #base, carrying over the edits made since
+    def saved(self, checkpoint, base):
+        self.forget(checkpoint)
+        if checkpoint[0] != self.generation or self.lock is None:
+            return
+        self.flush()
+        record = encode_record((BASE, base))
+        with open(self.path, 'rb') as journal:
+            journal.seek(checkpoint[1])
+            edits = journal.read()
+        self.file.close()
+        with open(self.path + '.tmp', 'wb') as file:
+            file.write(record + edits)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self.file = open(self.path, 'ab')
+        self.size = len(record) + len(edits)
+        self.base = base
+        # A snapshot still being written is of the old journal; later checkpoints move with their edits
+        self.generation += 1
+        for other in self.checkpoints:
+            if other[0] == checkpoint[0] and other[1] >= checkpoint[1]:
+                other[:] = [self.generation, other[1] - checkpoint[1] + len(record)]
+
+    #A checkpoint whose save failed
+    def forget(self, checkpoint):
+        if checkpoint in self.checkpoints:
+            self.checkpoints.remove(checkpoint)
+
+    #The tab closed normally, so there is nothing to recover
+    def discard(self):
+        self.flush_timer.stop()
+        self.generation += 1
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.lock is not None:
+            self.lock.unlock()
+            self.lock = None
+
+    def _start(self, base_record):
+        if self.file is not None:
+            self.file.close()
+        # Written beside the journal first, so a crash now leaves the old journal whole
+        with open(self.path + '.tmp', 'wb') as file:
+            file.write(base_record)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self.file = open(self.path, 'ab')
+        self.size = len(base_record)
+        self.unflushed = 0
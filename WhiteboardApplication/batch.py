@@ -0,0 +1,252 @@
+"""Converting, validating, verifying, compacting and upgrading many notebooks at once, with no window.
+
+Files are handed a few at a time to a pool of worker processes, and a line is printed per file,
+in order, with its size before and after, then a summary of the throughput and failures. Nothing
+here needs a display, so it runs as well on a headless server:
+    python -m WhiteboardApplication.batch convert notebooks/ [-o converted/] [--lzma] [-j 8]
+    python -m WhiteboardApplication.batch validate notebooks/
+    python -m WhiteboardApplication.batch verify notebooks/
+    python -m WhiteboardApplication.batch compact notebooks/ [--dry-run]
+    python -m WhiteboardApplication.batch upgrade notebooks/
+
+convert writes every notebook in the binary format. verify checks the checksums of .bnb files
+without decoding them, so it goes as fast as the files can be read; pickles and JSON boards have
+none to check. upgrade does so only for notebooks that aren't
+in the current version of it yet, replacing older .bnb files in place. compact removes what can
+never be seen (see compaction), keeping pickles as pickles and notebook stores as stores, whose
+rows it deletes in place. Folders are searched for notebooks (.pkl, .json, .bnb and .bndb)
+recursively. The exit status is 1 if any file failed.
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from WhiteboardApplication.compaction import compact_notebook
+from WhiteboardApplication.notebook_data import path_from_elements, normalize_notebook
+from WhiteboardApplication.notebook_format import MAGIC, VERSION, EXTENSION, NotebookFormatError, read_notebook, \
+    encode_notebook, write_atomically, verify_notebook
+from WhiteboardApplication.notebook_store import EXTENSION as STORE_EXTENSION, is_store, save_store
+
+OPERATIONS = ('convert', 'validate', 'verify', 'compact', 'upgrade')
+NOTEBOOK_EXTENSIONS = ('.pkl', '.json', EXTENSION, STORE_EXTENSION)
+FILES_PER_TASK = 8  # Most files a worker is handed at once; fewer when there are few files per worker
+
+
+class BatchResult:
+    """What happened to one file."""
+
+    def __init__(self, path, output=None, bytes_before=0, bytes_after=0, seconds=0.0, error=None, note=''):
+        self.path = path
+        self.output = output
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+        self.seconds = seconds
+        self.error = error
+        self.note = note
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        if self.failed:
+            return f"{self.path}: FAILED: {self.error}"
+        delta = self.bytes_after - self.bytes_before
+        target = f" -> {self.output}" if self.output not in (None, self.path) else ""
+        note = f", {self.note}" if self.note else ""
+        return (f"{self.path}{target}: {self.bytes_before} -> {self.bytes_after} bytes ({delta:+d}){note}, "
+                f"{self.seconds * 1000:.0f} ms")
+
+
+def find_notebooks(paths):
+    """(file, folder it was found under or None) of every notebook among paths, searching folders."""
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append((path, None))
+            continue
+        for folder, directories, files in os.walk(path):
+            directories.sort()
+            for name in sorted(files):
+                if name.endswith(NOTEBOOK_EXTENSIONS):
+                    found.append((os.path.join(folder, name), path))
+    return found
+
+
+def format_version(path):
+    """Version of a .bnb file's format, or None for the older pickle and JSON files."""
+    with open(path, 'rb') as file:
+        header = file.read(6)
+    if len(header) < 6 or not header.startswith(MAGIC):
+        return None
+    return struct.unpack_from('<H', header, 4)[0]
+
+
+def validate_notebook(notebook_data):
+    """Problems found in notebook data that would keep it from opening as saved; empty if there are none."""
+    notebook_data = normalize_notebook(notebook_data)
+    problems = []
+    styles = notebook_data.get('styles', [])
+    assets = notebook_data.get('assets', {})
+    for number, data in enumerate(notebook_data['items']):
+        kind = data.get('type')
+        if kind == 'QGraphicsPathItem':
+            if 'style' in data and not 0 <= data['style'] < len(styles):
+                problems.append(f"stroke {number} has no pen")
+            try:
+                path_from_elements(data['elements'])
+            except (KeyError, IndexError, TypeError, ValueError):
+                problems.append(f"stroke {number} has a damaged path")
+        elif kind == 'Image':
+            if 'asset' in data and data['asset'] not in assets:
+                problems.append(f"image {number} has no picture")
+            elif 'asset' not in data and not data.get('image'):
+                problems.append(f"image {number} has no picture")
+        elif kind != 'TextBox':
+            problems.append(f"item {number} is of unknown type {kind!r}")
+    return problems
+
+
+def verify_file(path):
+    """Checks a .bnb file's checksums, raising NotebookFormatError that names each damaged part."""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise NotebookFormatError("Empty file")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            damaged = verify_notebook(data)
+    if damaged:
+        raise NotebookFormatError("; ".join(str(section) for section in damaged))
+
+
+def output_path(path, root, output_dir, extension):
+    """Where a file found under root is written: beside it, or at the same place under output_dir."""
+    stem = os.path.splitext(path)[0] + extension
+    if output_dir is None:
+        return stem
+    relative = os.path.relpath(stem, root) if root is not None else os.path.basename(stem)
+    return os.path.join(output_dir, relative)
+
+
+def process_file(task):
+    """Runs an operation on one file in a worker; errors are returned in the BatchResult, not raised."""
+    operation, path, root, options = task
+    started = time.perf_counter()
+    result = BatchResult(path)
+    try:
+        result.bytes_before = result.bytes_after = os.path.getsize(path)
+        if operation == 'upgrade' and (format_version(path) == VERSION or is_store(path)):
+            # A store is brought up to date at every save
+            result.note = "up to date"
+        elif operation == 'verify':
+            if format_version(path) is None:
+                result.note = "not checked, no checksums"
+            else:
+                verify_file(path)
+        else:
+            notebook_data = read_notebook(path)
+            if operation == 'validate':
+                problems = validate_notebook(notebook_data)
+                if problems:
+                    raise ValueError("; ".join(problems))
+                result.note = f"{len(notebook_data['items'])} items"
+            else:
+                if operation == 'compact':
+                    notebook_data, report = compact_notebook(notebook_data)
+                    result.note = f"removed {report.items_saved} of {report.items_before} items"
+                # Compacted pickles stay pickles and stores stay stores; everything else is written in the binary format
+                if operation == 'compact' and is_store(path):
+                    result.output = output_path(path, root, options['output_dir'], STORE_EXTENSION)
+                    if not options['dry_run']:
+                        os.makedirs(os.path.dirname(result.output) or '.', exist_ok=True)
+                        # Only the rows of the items removed are deleted
+                        save_store(result.output, notebook_data)
+                        result.bytes_after = os.path.getsize(result.output)
+                else:
+                    if operation == 'compact' and path.endswith('.pkl'):
+                        result.output = output_path(path, root, options['output_dir'], '.pkl')
+                    else:
+                        result.output = output_path(path, root, options['output_dir'], EXTENSION)
+                    data = encode_notebook(result.output, notebook_data, options['compression'])
+                    if not options['dry_run']:
+                        os.makedirs(os.path.dirname(result.output) or '.', exist_ok=True)
+                        write_atomically(result.output, data)
+                    result.bytes_after = len(data)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _start_worker():
+    # Qt never looks for a display, whatever the server has
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+
+def run_batch(operation, paths, output_dir=None, compression='zlib', dry_run=False, workers=None, report=None):
+    """Runs operation on every notebook among paths over a process pool; returns a BatchResult per file, in order.
+
+    report(result) is told of each file as it finishes.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation {operation!r}")
+    options = {'output_dir': output_dir, 'compression': compression, 'dry_run': dry_run}
+    tasks = [(operation, path, root, options) for path, root in find_notebooks(paths)]
+    if not tasks:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    # Few enough files per hand-out that the workers finish together
+    chunksize = max(1, min(FILES_PER_TASK, len(tasks) // (workers * 4)))
+    results = []
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_start_worker) as pool:
+        for result in pool.map(process_file, tasks, chunksize=chunksize):
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+def summary(results, seconds):
+    """The closing lines of a batch: files, failures, throughput and the size change overall."""
+    failed = sum(result.failed for result in results)
+    done = [result for result in results if not result.failed]
+    before = sum(result.bytes_before for result in done)
+    after = sum(result.bytes_after for result in done)
+    seconds = max(seconds, 1e-9)
+    return (f"{len(results)} files, {failed} failed, in {seconds:.1f} s "
+            f"({len(results) / seconds:.1f} files/s, {before / seconds / 1e6:.1f} MB/s)\n"
+            f"{before} -> {after} bytes ({after - before:+d})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m WhiteboardApplication.batch",
+                                     description="Convert, validate, verify, compact or upgrade many notebooks, "
+                                                 "on every core and without a display.")
+    parser.add_argument('operation', choices=OPERATIONS)
+    parser.add_argument('paths', nargs='+', help="notebook files, or folders to search for them")
+    parser.add_argument('-o', '--output-dir', help="where to write the notebooks, keeping their place under the "
+                                                   "folders given (default: beside each one)")
+    parser.add_argument('--lzma', action='store_true', help="compress with lzma: smaller, slower to save")
+    parser.add_argument('--dry-run', action='store_true', help="only report the sizes, writing nothing")
+    parser.add_argument('-j', '--jobs', type=int, help="worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    started = time.perf_counter()
+    results = run_batch(args.operation, args.paths, args.output_dir, 'lzma' if args.lzma else 'zlib',
+                        args.dry_run, args.jobs, lambda result: print(result, flush=True))
+    print(summary(results, time.perf_counter() - started))
+    return 1 if any(result.failed for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
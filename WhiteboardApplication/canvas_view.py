@@ -0,0 +1,154 @@
+import time
+
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QGraphicsView, QScrollArea
+
+from WhiteboardApplication.ink_tiles import InkTileLayer
+from WhiteboardApplication.minimap import MinimapCache
+
+QUALITY_FRAME_BUDGET = 0.012  # Seconds a full quality frame may take before moving the view drops quality
+QUALITY_ITEM_THRESHOLD = 800  # Strokes painted per frame before moving the view drops quality
+QUALITY_IDLE_DELAY = 200  # ms without movement before full quality comes back
+ZOOM_STEP = 1.15
+MIN_ZOOM = 0.25
+MAX_ZOOM = 8.0
+
+
+class CanvasView(QGraphicsView):
+    """Notebook canvas that draws settled ink from tiles rendered on worker threads.
+
+    While the view is panned, zoomed or something is dragged, a page that is slow to paint
+    is drawn without antialiasing and from low-resolution tiles until it has been idle for
+    a moment. Pages that paint fast enough always stay at full quality.
+    """
+
+    # Emitted whenever the visible part of the scene may have changed (scroll, zoom, resize)
+    view_moved = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ink_layer = InkTileLayer(self)
+        self.minimap_cache = MinimapCache(self)
+
+        self.quality_frame_budget = QUALITY_FRAME_BUDGET
+        self.quality_item_threshold = QUALITY_ITEM_THRESHOLD
+        self.quality_idle_delay = QUALITY_IDLE_DELAY
+
+        self.interactive = False
+        # Smoothed duration of full quality frames, in seconds
+        self.frame_time = 0.0
+        self._antialiasing = False
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self.end_interaction)
+
+    def setScene(self, scene):
+        super().setScene(scene)
+        self.ink_layer.set_scene(scene)
+        self.minimap_cache.set_scene(scene)
+
+    def drawBackground(self, painter, rect):
+        # Page template first (BoardScene.drawBackground), then the baked ink on top of it
+        super().drawBackground(painter, rect)
+        self.ink_layer.draw(painter, rect)
+
+    def paintEvent(self, event):
+        self.ink_layer.begin_frame()
+        start = time.perf_counter()
+        super().paintEvent(event)
+        if not self.interactive:
+            elapsed = time.perf_counter() - start
+            self.frame_time = elapsed if not self.frame_time else 0.7 * self.frame_time + 0.3 * elapsed
+
+    # Navigation
+    ###########################################################################################################
+
+    def visible_scene_rect(self):
+        """Part of the scene actually on screen, taking the surrounding scroll area into account."""
+        return self.ink_layer.visible_scene_rect()
+
+    def center_on(self, point):
+        """Scroll both the view and the scroll area holding it so the scene point is centred."""
+        self.centerOn(point)
+        area = self._scroll_area()
+        if area is not None and area.widget() is not None:
+            position = self.viewport().mapTo(area.widget(), self.mapFromScene(point))
+            area.ensureVisible(position.x(), position.y(), area.viewport().width() // 2,
+                               area.viewport().height() // 2)
+        self.view_moved.emit()
+
+    def _scroll_area(self):
+        parent = self.parentWidget()
+        while parent is not None and not isinstance(parent, QScrollArea):
+            parent = parent.parentWidget()
+        return parent
+
+    # Quality
+    ###########################################################################################################
+
+    def needs_interactive_quality(self):
+        """Whether full quality frames are too slow for the view to keep up while moving."""
+        return (self.frame_time > self.quality_frame_budget
+                or self.ink_layer.last_frame_items > self.quality_item_threshold)
+
+    def begin_interaction(self, *args):
+        """Called for every pan, zoom or drag step; drops quality if needed until the view is idle."""
+        if not self.interactive:
+            if not self.needs_interactive_quality():
+                return
+            self.interactive = True
+            self._antialiasing = bool(self.renderHints() & QPainter.RenderHint.Antialiasing)
+            self.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+            self.ink_layer.set_interactive(True)
+        self._idle_timer.start(self.quality_idle_delay)
+
+    def end_interaction(self):
+        if not self.interactive:
+            return
+        self._idle_timer.stop()
+        self.interactive = False
+        self.setRenderHint(QPainter.RenderHint.Antialiasing, self._antialiasing)
+        self.ink_layer.set_interactive(False)
+        self.viewport().update()
+
+    # Events
+    ###########################################################################################################
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            self.begin_interaction()
+            factor = ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP
+            scale = abs(self.transform().m11()) or 1.0
+            factor = min(max(scale * factor, MIN_ZOOM), MAX_ZOOM) / scale
+            anchor = self.transformationAnchor()
+            self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+            self.scale(factor, factor)
+            self.setTransformationAnchor(anchor)
+            self.view_moved.emit()
+            event.accept()
+        else:
+            super().wheelEvent(event)
+
+    def mouseMoveEvent(self, event):
+        # Dragging a selection or a text box repaints everything under it on every move
+        scene = self.scene()
+        if event.buttons() != Qt.MouseButton.NoButton and scene is not None and scene.mouseGrabberItem() is not None:
+            self.begin_interaction()
+        super().mouseMoveEvent(event)
+
+    def scrollContentsBy(self, dx, dy):
+        self.begin_interaction()
+        super().scrollContentsBy(dx, dy)
+        self.ink_layer.schedule_request(0)
+        self.view_moved.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.ink_layer.schedule_request(0)
+        self.view_moved.emit()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.ink_layer.schedule_request(0)
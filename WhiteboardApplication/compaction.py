@@ -0,0 +1,204 @@
+"""Removes content that can never be seen from a notebook.
+
+Run headless on a saved notebook with:
+    python -m WhiteboardApplication.compaction notebook.bnb [-o compacted.bnb] [--dry-run]
+"""
+import argparse
+import pickle
+import sys
+from collections import Counter
+
+from PySide6.QtCore import QObject, QRunnable, QRectF, Qt, Signal
+from PySide6.QtGui import QColor
+
+from WhiteboardApplication.canvas_view import MIN_ZOOM
+from WhiteboardApplication.notebook_data import SCENE_RECT, CANVAS_SIZE, path_from_elements, item_scene_transform, \
+    item_pen, deserialize_brush, normalize_notebook
+from WhiteboardApplication.notebook_format import read_notebook, write_notebook
+from WhiteboardApplication.save_worker import finish_notebook
+from WhiteboardApplication.stroke_item import stroke_outline
+
+# The pen eraser paints strokes in the window colour (MainWindow.eraser_color)
+ERASER_COLOR = QColor("#F3F3F3")
+
+# Why an item was dropped, as counted in CompactionReport.removed
+DEGENERATE = 'degenerate'
+OFF_PAGE = 'off page'
+ERASED = 'erased'
+UNUSED_ERASER = 'unused eraser'
+
+
+def reachable_rect(scene_rect=SCENE_RECT):
+    """Widest part of the scene a canvas can show: the scene rect centred in the canvas, fully zoomed out."""
+    width, height = CANVAS_SIZE[0] / MIN_ZOOM, CANVAS_SIZE[1] / MIN_ZOOM
+    center = scene_rect.center()
+    return QRectF(center.x() - width / 2, center.y() - height / 2, width, height)
+
+
+def notebook_size(notebook_data):
+    return len(pickle.dumps(notebook_data, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class CompactionReport:
+    def __init__(self, items_before, bytes_before):
+        self.items_before = items_before
+        self.items_after = items_before
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_before
+        self.removed = Counter()  # reason -> number of items
+        self.dead = {}  # index in the notebook's items -> reason
+
+    @property
+    def items_saved(self):
+        return self.items_before - self.items_after
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(self.removed.items()))
+        return (f"Removed {self.items_saved} of {self.items_before} items ({reasons or 'nothing to remove'}), "
+                f"saved {self.bytes_saved} of {self.bytes_before} bytes")
+
+
+class _Stroke:
+    """Scene-space outline of one saved stroke."""
+
+    def __init__(self, index, outline, eraser):
+        self.index = index
+        self.outline = outline
+        self.bounds = outline.boundingRect()
+        self.eraser = eraser
+
+
+def dead_items(notebook_data, scene_rect=SCENE_RECT):
+    """Map the index of every invisible item in the notebook to the reason it can go.
+
+    Items are taken in saved order, topmost first, the way MainWindow.serialize_items writes them.
+    """
+    items = notebook_data['items']
+    reachable = reachable_rect(scene_rect)
+    dead = {}
+    strokes = []
+    # Text boxes have no known extent without a font engine, so they count as being everywhere
+    # and every eraser stroke above one is kept
+    lowest_other = -1
+
+    for index, item_data in enumerate(items):
+        if item_data['type'] != 'QGraphicsPathItem':
+            lowest_other = index
+            continue
+        pen = item_pen(notebook_data, item_data)
+        brush = deserialize_brush(item_data['brush'])
+        path = path_from_elements(item_data['elements'])
+        outline = item_scene_transform(item_data).map(stroke_outline(path, pen, brush))
+
+        if outline.isEmpty():
+            # A click without a drag leaves a path with nothing to paint
+            dead[index] = DEGENERATE
+        elif not outline.boundingRect().intersects(reachable):
+            dead[index] = OFF_PAGE
+        else:
+            eraser = pen.color() == ERASER_COLOR and brush.style() == Qt.BrushStyle.NoBrush
+            strokes.append(_Stroke(index, outline, eraser))
+
+    # Ink entirely painted over by eraser strokes above it
+    erasers = [stroke for stroke in strokes if stroke.eraser]
+    for stroke in strokes:
+        if stroke.eraser:
+            continue
+        remaining = stroke.outline
+        for eraser in erasers:
+            if eraser.index < stroke.index and eraser.bounds.intersects(stroke.bounds):
+                remaining = remaining.subtracted(eraser.outline)
+                if remaining.isEmpty():
+                    dead[stroke.index] = ERASED
+                    break
+
+    # Eraser strokes left painting over nothing. On ruled, grid and dotted pages they also hide
+    # the template lines, so they only go from blank pages
+    if notebook_data.get('template', 'blank') == 'blank':
+        ink = [stroke for stroke in strokes if not stroke.eraser and stroke.index not in dead]
+        for eraser in erasers:
+            if eraser.index < lowest_other:
+                continue
+            if not any(stroke.index > eraser.index and stroke.bounds.intersects(eraser.bounds)
+                       and stroke.outline.intersects(eraser.outline) for stroke in ink):
+                dead[eraser.index] = UNUSED_ERASER
+
+    return dead
+
+
+def compact_notebook(notebook_data, scene_rect=SCENE_RECT):
+    """Return a copy of the notebook without its invisible items, and a report of what was saved."""
+    notebook_data = normalize_notebook(notebook_data)
+    report = CompactionReport(len(notebook_data['items']), notebook_size(notebook_data))
+    report.dead = dead_items(notebook_data, scene_rect)
+    report.removed.update(report.dead.values())
+
+    items = [item_data for index, item_data in enumerate(notebook_data['items']) if index not in report.dead]
+    compacted = dict(notebook_data, items=items)
+
+    if 'styles' in notebook_data:
+        # Pens only the removed strokes used are dropped from the style table too
+        remap = {}
+        styles = []
+        items = []
+        for item_data in compacted['items']:
+            if 'style' in item_data:
+                if item_data['style'] not in remap:
+                    remap[item_data['style']] = len(styles)
+                    styles.append(notebook_data['styles'][item_data['style']])
+                item_data = dict(item_data, style=remap[item_data['style']])
+            items.append(item_data)
+        compacted['styles'] = styles
+        compacted['items'] = items
+
+    report.items_after = len(compacted['items'])
+    report.bytes_after = notebook_size(compacted)
+    return compacted, report
+
+
+class _CompactionSignals(QObject):
+    # compacted notebook data, CompactionReport; queued to the GUI thread
+    finished = Signal(object, object)
+
+
+class CompactionJob(QRunnable):
+    """Runs compact_notebook on a pool thread so the analysis doesn't block the UI.
+
+    It is given a snapshot of the notebook (see MainWindow.snapshot_notebook), whose items are put in
+    their saved form there too.
+    """
+
+    def __init__(self, snapshot):
+        super().__init__()
+        # Kept alive by whoever started it until finished is delivered
+        self.setAutoDelete(False)
+        self.snapshot = snapshot
+        self.signals = _CompactionSignals()
+
+    def run(self):
+        compacted, report = compact_notebook(finish_notebook(self.snapshot))
+        self.signals.finished.emit(compacted, report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m WhiteboardApplication.compaction",
+                                     description="Remove erased, degenerate and off-page strokes from a notebook.")
+    parser.add_argument('notebook', help="notebook file saved by BestNotes (.bnb or .pkl)")
+    parser.add_argument('-o', '--output', help="where to write the compacted notebook (default: in place)")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would be removed")
+    args = parser.parse_args(argv)
+
+    compacted, report = compact_notebook(read_notebook(args.notebook))
+    print(report)
+
+    if not args.dry_run:
+        write_notebook(args.output or args.notebook, compacted)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Exporting whole notebooks to PDF, PNG and SVG on every core.
+
+Each page, a notebook tab, is rendered from its saved form (.bnb bytes) in a worker process running
+Qt offscreen, never from the items on screen. PNG and SVG pages are written by the workers, a file
+per page. PDF pages come back recorded as QPictures and are played into a single QPdfWriter in page
+order, so the PDF goes to disk a page at a time. Only a few pages per worker are out at once,
+rendering or waiting for their turn, so memory stays flat however many pages there are.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PySide6.QtCore import QObject, QRunnable, QRectF, QSize, QSizeF, QMarginsF, QBuffer, QByteArray, QIODevice, \
+    Qt, Signal
+from PySide6.QtGui import QImage, QPainter, QPicture, QPdfWriter, QPageSize, QPageLayout, QColor
+from PySide6.QtWidgets import QApplication, QGraphicsScene
+
+from WhiteboardApplication.asset_store import AssetStore
+from WhiteboardApplication.notebook_data import SCENE_RECT, deserialize_item
+from WhiteboardApplication.notebook_format import dumps_notebook, loads_notebook, write_atomically
+from WhiteboardApplication.page_templates import PageTemplate
+from WhiteboardApplication.save_worker import finish_notebook
+from WhiteboardApplication.style_table import StyleTable
+
+FORMATS = ('pdf', 'png', 'svg')
+PNG_SCALE = 2.0  # Pixels per scene unit in PNG pages
+PAGES_PER_WORKER = 2  # Pages handed out per worker process at once, including those waiting to go into the PDF
+CANCEL_POLL = 0.1  # Seconds between checks for cancellation while pages render
+
+_worker_app = None
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class PageScene(QGraphicsScene):
+    """A saved page on white paper with its template, as it is exported."""
+
+    def __init__(self, template='blank'):
+        super().__init__()
+        self.page_template = PageTemplate(template)
+
+    def drawBackground(self, painter, rect):
+        painter.fillRect(rect, Qt.GlobalColor.white)
+        self.page_template.draw(painter, rect)
+
+
+def page_paths(path, format, count):
+    """Files the pages are written to: path itself for a PDF or a single page, numbered files beside it otherwise."""
+    if format == 'pdf' or count == 1:
+        return [path]
+    stem, extension = os.path.splitext(path)
+    digits = max(3, len(str(count)))
+    return [f"{stem}-{number:0{digits}d}{extension}" for number in range(1, count + 1)]
+
+
+def build_page(data):
+    """(scene, scene rect to export) of a page from its .bnb bytes."""
+    notebook_data = loads_notebook(data)
+    scene = PageScene(notebook_data['template'])
+    styles = StyleTable.deserialize(notebook_data['styles'])
+    assets = AssetStore.deserialize(notebook_data['assets'])
+    # Saved items are topmost first
+    for item_data in reversed(notebook_data['items']):
+        item = deserialize_item(item_data, styles, styles, assets)
+        scene.addItem(item)
+    rect = SCENE_RECT.united(scene.itemsBoundingRect())
+    return scene, rect
+
+
+def _start_worker():
+    global _worker_app
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    _worker_app = QApplication.instance() or QApplication([])
+
+
+def _encoded(paint, size, format):
+    """Bytes of a page painted by paint(painter, target rect) as a PNG or an SVG of size."""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    if format == 'svg':
+        from PySide6.QtSvg import QSvgGenerator
+        generator = QSvgGenerator()
+        generator.setOutputDevice(buffer)
+        generator.setSize(size)
+        generator.setViewBox(QRectF(0, 0, size.width(), size.height()))
+        painter = QPainter(generator)
+        paint(painter, QRectF(0, 0, size.width(), size.height()))
+        painter.end()
+    else:
+        image = QImage(math.ceil(size.width() * PNG_SCALE), math.ceil(size.height() * PNG_SCALE),
+                       QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(QColor(Qt.GlobalColor.white))
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        paint(painter, QRectF(image.rect()))
+        painter.end()
+        image.save(buffer, "PNG")
+    return bytes(data)
+
+
+def render_page(task):
+    """Renders one page in a worker: writes a PNG or SVG page and returns None, or returns a PDF page's
+    (width, height, QPicture bytes)."""
+    data, format, path = task
+    scene, rect = build_page(data)
+
+    def paint(painter, target):
+        scene.render(painter, target, rect)
+
+    if format == 'pdf':
+        picture = QPicture()
+        painter = QPainter(picture)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        paint(painter, QRectF(0, 0, rect.width(), rect.height()))
+        painter.end()
+        return rect.width(), rect.height(), bytes(picture.data())
+    write_atomically(path, _encoded(paint, QSize(math.ceil(rect.width()), math.ceil(rect.height())), format))
+    return None
+
+
+class _PdfPages:
+    """A PDF written a page at a time from QPictures, to a temporary file renamed over path when complete."""
+
+    def __init__(self, path):
+        self.path = path
+        self.temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self.writer = None
+        self.painter = None
+
+    def add(self, width, height, data):
+        picture = QPicture()
+        picture.setData(data)
+        # A scene unit is a pixel on screen, which the picture was recorded at and plays back at, unscaled
+        dpi = picture.logicalDpiX()
+        layout = QPageLayout(QPageSize(QSizeF(width, height) * 72 / dpi, QPageSize.Unit.Point, "",
+                                       QPageSize.SizeMatchPolicy.ExactMatch),
+                             QPageLayout.Orientation.Portrait, QMarginsF())
+        if self.writer is None:
+            self.writer = QPdfWriter(self.temporary)
+            self.writer.setResolution(dpi)
+            self.writer.setPageLayout(layout)
+            self.painter = QPainter(self.writer)
+        else:
+            self.writer.setPageLayout(layout)
+            self.writer.newPage()
+        self.painter.drawPicture(0, 0, picture)
+
+    def close(self, keep):
+        if self.painter is not None:
+            self.painter.end()
+        self.writer = self.painter = None
+        if keep:
+            os.replace(self.temporary, self.path)
+        elif os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+
+def export_pages(pages, path, format, progress=None, cancelled=None, workers=None):
+    """Export pages, each .bnb bytes or a notebook snapshot, to path in format; returns the files written.
+
+    progress(done, total) is told as pages finish. Once cancelled() is true the export stops,
+    removes what it wrote and raises ExportCancelled.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}")
+    workers = workers or os.cpu_count() or 1
+    paths = page_paths(path, format, len(pages))
+    pdf = _PdfPages(path) if format == 'pdf' else None
+    written = []
+    complete = False
+    try:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_start_worker) as pool:
+            running = {}  # future -> page number
+            waiting = {}  # page number -> rendered PDF page, until the pages before it are in
+            submitted = done = 0
+            try:
+                while done < len(pages):
+                    if cancelled is not None and cancelled():
+                        raise ExportCancelled(path)
+                    while submitted < len(pages) and len(running) + len(waiting) < workers * PAGES_PER_WORKER:
+                        page = pages[submitted]
+                        if not isinstance(page, (bytes, bytearray)):
+                            page = dumps_notebook(finish_notebook(page))
+                        task = (page, format, paths[submitted] if pdf is None else None)
+                        running[pool.submit(render_page, task)] = submitted
+                        submitted += 1
+                    finished, _ = wait(running, timeout=CANCEL_POLL, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        number = running.pop(future)
+                        result = future.result()
+                        if pdf is not None:
+                            waiting[number] = result
+                        else:
+                            written.append(paths[number])
+                            done += 1
+                    while done in waiting:
+                        pdf.add(*waiting.pop(done))
+                        done += 1
+                    if finished and progress is not None:
+                        progress(done, len(pages))
+            except BaseException:
+                # Cancelled or a page failed: pages already rendering are let finish, so what they wrote can be removed
+                pool.shutdown(cancel_futures=True)
+                written.extend(paths[number] for future, number in running.items()
+                               if pdf is None and not future.cancelled() and future.exception() is None)
+                raise
+        complete = True
+    finally:
+        if pdf is not None:
+            pdf.close(complete)
+        if not complete:
+            for page_path in written:
+                os.remove(page_path)
+    return paths
+
+
+class _ExportSignals(QObject):
+    progress = Signal(int, int)  # pages done, pages in all
+    finished = Signal(str)  # path
+    failed = Signal(str, str)  # path, what went wrong
+    cancelled = Signal(str)  # path
+
+
+class ExportJob(QRunnable):
+    """Runs export_pages on a pool thread, leaving the rendering to worker processes."""
+
+    def __init__(self, path, format, pages, workers=None):
+        super().__init__()
+        # Kept alive by whoever started it until a signal says it is over
+        self.setAutoDelete(False)
+        self.path = path
+        self.format = format
+        self.pages = pages
+        self.workers = workers
+        self.signals = _ExportSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            export_pages(self.pages, self.path, self.format, self.signals.progress.emit, lambda: self._cancelled,
+                         self.workers)
+        except ExportCancelled:
+            self.signals.cancelled.emit(self.path)
+            return
+        except Exception as error:
+            self.signals.failed.emit(self.path, str(error))
+            return
+        self.signals.finished.emit(self.path)
@@ -0,0 +1,77 @@
+"""Python's cyclic garbage collection, kept off the worker threads.
+
+Left to itself the collector runs on whichever thread happens to allocate past its threshold,
+the save, snapshot and compaction workers included. A cycle it frees there can hold Qt objects,
+a closed window's timers say, which must be destroyed on the thread they live on, so doing it
+anywhere else crashes later. Automatic collection stays on; a GarbageCollector only puts off one
+that starts on another thread than the GUI thread, by setting every object tracked so far aside
+(gc.freeze) before it looks at them, and runs it from a timer on the GUI thread instead.
+
+It is installed once by the applications' entry points (main.py and the collaboration client),
+never by a window. Work that keeps the GUI thread busy for long without the event loop ticking,
+opening a big notebook whole say, calls collect_due now and then so a collection put off doesn't
+wait for it.
+
+Pool jobs are let go of by whoever receives their last signal, with release_job, so they are
+freed by reference counting on the GUI thread and never left to the collector.
+"""
+import gc
+import threading
+
+import shiboken6
+from PySide6.QtCore import QObject, QTimer, QThread
+
+CHECK_INTERVAL = 500  # ms between checks for a collection put off by a worker thread
+
+_collector = None
+
+
+class GarbageCollector(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.gui_thread = threading.get_ident()
+        self.deferred = False  # a collection started on a worker thread was put off
+        gc.callbacks.append(self.collecting)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(CHECK_INTERVAL)
+
+    #Called by gc on the thread about to collect, holding the GIL; a worker's collection then finds nothing
+    def collecting(self, phase, info):
+        if phase == 'start' and threading.get_ident() != self.gui_thread:
+            gc.freeze()
+            self.deferred = True
+
+    #Runs the collection a worker thread put off, over everything set aside since
+    def check(self):
+        if self.deferred:
+            self.deferred = False
+            gc.unfreeze()
+            gc.collect()
+
+
+def install(app):
+    """Keeps collection in the whole process on the GUI thread with a GarbageCollector owned by app, once."""
+    global _collector
+    if _collector is None:
+        _collector = GarbageCollector(app)
+
+
+def collect_due():
+    """Runs a collection a worker thread put off, if one was and this is the GUI thread."""
+    if _collector is not None and QThread.currentThread() == _collector.thread():
+        _collector.check()
+
+
+def release_job(job, keep_signals=False):
+    """Lets go of a pool job whose last signal was just delivered, and of everything it holds.
+
+    Started on a QThreadPool, a job is made the pool's child, which keeps it alive as long as the
+    pool, and its signals object keeps the slots connected to it, which often name the job. Both
+    are undone here: the signals object is deleted once this slot returns and the job's C++ side
+    at once. The job's run() has at most to return, and the pool doesn't touch a job it isn't to
+    delete itself. Jobs that share their signals object with others, as tile jobs do, keep_signals.
+    """
+    if not keep_signals:
+        job.signals.deleteLater()
+    shiboken6.delete(job)
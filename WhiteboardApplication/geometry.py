@@ -0,0 +1,140 @@
+"""Bulk conversion between Qt paths and polygons and NumPy arrays.
+
+Going through PySide6 point by point (path.elementAt(i), path.lineTo(x, y), a QPointF per
+polygon point) costs a wrapper call each. Here a whole path or polygon crosses in one C++ call
+instead: Qt writes it to a QByteArray with QDataStream, a fixed-size record per point, which NumPy
+views in place through the buffer protocol, and a path is built back by reading such records
+from a buffer NumPy filled.
+
+Points are (N, 2) float64 arrays of x, y. Path element kinds are uint8 arrays of Qt's
+QPainterPath.ElementType values, MOVE_TO to CURVE_TO_DATA below.
+"""
+from itertools import chain
+
+import numpy
+from PySide6.QtCore import QByteArray, QDataStream, QIODevice
+from PySide6.QtGui import QPainterPath, QPolygonF
+
+MOVE_TO, LINE_TO, CURVE_TO, CURVE_TO_DATA = range(4)
+
+# QDataStream's form of a path: int32 element count; kind, x, y per element; then int32 index of
+# the last subpath's start and int32 fill rule. A polygon's: uint32 point count, then x, y per point.
+_COUNT = numpy.dtype('<i4')
+_PATH_ELEMENT = numpy.dtype([('kind', '<i4'), ('x', '<f8'), ('y', '<f8')])
+_POINTS = numpy.dtype('<f8')
+
+
+def _writer():
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream.setByteOrder(QDataStream.ByteOrder.LittleEndian)
+    return data, stream
+
+
+def _reader(buffer):
+    stream = QDataStream(QByteArray(buffer))
+    stream.setByteOrder(QDataStream.ByteOrder.LittleEndian)
+    return stream
+
+
+def as_points(points):
+    """points, a list of x, y pairs or an array NumPy reads as x, y, as an (N, 2) array."""
+    if isinstance(points, (list, tuple)):
+        # Much quicker than numpy.asarray for a list of small lists, as JSON decodes
+        return numpy.fromiter(chain.from_iterable(points), numpy.float64, 2 * len(points)).reshape(-1, 2)
+    return numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+
+
+def point_list(points):
+    """An (N, 2) array as a list of x, y tuples, for JSON."""
+    return list(zip(points[:, 0].tolist(), points[:, 1].tolist()))
+
+
+def path_to_arrays(path):
+    """(kinds, points) of every element of path, the control points of curves included."""
+    data, stream = _writer()
+    stream << path
+    count = int(numpy.frombuffer(data, _COUNT, 1)[0])
+    elements = numpy.frombuffer(data, _PATH_ELEMENT, count, offset=_COUNT.itemsize)
+    points = numpy.empty((count, 2))
+    points[:, 0] = elements['x']
+    points[:, 1] = elements['y']
+    return elements['kind'].astype(numpy.uint8), points
+
+
+def path_from_arrays(kinds, points):
+    """The QPainterPath with exactly these elements, as path_to_arrays gives them."""
+    count = len(kinds)
+    if count == 0:
+        return QPainterPath()
+    end = _COUNT.itemsize + _PATH_ELEMENT.itemsize * count
+    buffer = bytearray(end + 2 * _COUNT.itemsize)
+    numpy.frombuffer(buffer, _COUNT, 1)[0] = count
+    elements = numpy.frombuffer(buffer, _PATH_ELEMENT, count, offset=_COUNT.itemsize)
+    elements['kind'] = kinds
+    elements['x'] = points[:, 0]
+    elements['y'] = points[:, 1]
+    # The last subpath starts at the last moveTo; the fill rule stays OddEvenFill, 0
+    moves = numpy.flatnonzero(numpy.asarray(kinds) == MOVE_TO)
+    numpy.frombuffer(buffer, _COUNT, 1, offset=end)[0] = moves[-1] if len(moves) else 0
+    path = QPainterPath()
+    _reader(buffer) >> path
+    return path
+
+
+def drop_repeats(kinds, points):
+    """(kinds, points) without the elements moveTo and lineTo leave out when building a path.
+
+    A point repeating the one before is dropped unless it starts a subpath, and a moveTo followed
+    by another moveTo gives way to it, so paths built from the arrays match those built a point at
+    a time.
+    """
+    kinds = numpy.asarray(kinds)
+    if len(kinds) == 0:
+        return kinds, points
+    repeats = numpy.zeros(len(kinds), dtype=bool)
+    repeats[1:] = (points[1:] == points[:-1]).all(axis=1) & (kinds[1:] != MOVE_TO)
+    kinds, points = kinds[~repeats], points[~repeats]
+    superseded = numpy.zeros(len(kinds), dtype=bool)
+    superseded[:-1] = (kinds[:-1] == MOVE_TO) & (kinds[1:] == MOVE_TO)
+    return kinds[~superseded], points[~superseded]
+
+
+def polyline_path(points):
+    """The path a moveTo to the first point and a lineTo to each of the rest would build."""
+    points = as_points(points)
+    kinds = numpy.full(len(points), LINE_TO, dtype=numpy.uint8)
+    kinds[:1] = MOVE_TO
+    return path_from_arrays(*drop_repeats(kinds, points))
+
+
+def path_points(path):
+    """The points of path.toSubpathPolygons(), one subpath after another, as one (N, 2) array."""
+    kinds, points = path_to_arrays(path)
+    if (kinds >= CURVE_TO).any():
+        # Curves are flattened into lines by Qt
+        polygons = [polygon_to_array(polygon) for polygon in path.toSubpathPolygons()]
+        return numpy.concatenate(polygons) if polygons else numpy.empty((0, 2))
+    # toSubpathPolygons leaves out subpaths that are a moveTo alone
+    alone = kinds == MOVE_TO
+    alone[:-1] &= kinds[1:] == MOVE_TO
+    return points[~alone]
+
+
+def polygon_to_array(polygon):
+    """The points of a QPolygonF as an (N, 2) array, a view of Qt's serialized copy."""
+    data, stream = _writer()
+    stream << polygon
+    count = int(numpy.frombuffer(data, '<u4', 1)[0])
+    return numpy.frombuffer(data, _POINTS, 2 * count, offset=4).reshape(count, 2)
+
+
+def polygon_from_array(points):
+    """A QPolygonF through points."""
+    points = as_points(points)
+    buffer = bytearray(4 + points.nbytes)
+    numpy.frombuffer(buffer, '<u4', 1)[0] = len(points)
+    numpy.frombuffer(buffer, _POINTS, points.size, offset=4)[:] = points.ravel()
+    polygon = QPolygonF()
+    _reader(buffer) >> polygon
+    return polygon
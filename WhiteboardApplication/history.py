@@ -0,0 +1,374 @@
+"""Undo history made of small inverse operations rather than live scene items.
+
+Every entry is plain data: the saved form of added or removed items, a move delta or a text diff,
+keyed by the stable ids BoardScene gives its items. Entries are undone and redone by applying them
+to the scene. Recent entries stay in memory up to a byte budget; older ones are compressed into
+an on-disk journal, and past its own budget the oldest are dropped, so an all-day session holds a
+bounded amount of history. A History can also write what it does to an autosave journal, and
+tells the scene which items each edit, undo and redo changed, so a save can write only those.
+"""
+import pickle
+import tempfile
+import time
+import zlib
+from collections import deque
+
+MEMORY_BUDGET = 8 * 1024 * 1024  # Pickled bytes of history kept in memory before the oldest entries spill to disk
+DISK_BUDGET = 256 * 1024 * 1024  # Compressed bytes kept in the journal before the oldest entries are dropped
+COALESCE_INTERVAL = 0.75  # s; edits closer together than this that can merge are undone as one
+DETACHED_PAGE_SIZE = 1024 * 1024  # Bytes a cleared page held for undo counts as against the memory budget
+
+
+def command_size(command):
+    return len(pickle.dumps(command, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def diff_text(old, new):
+    """(position, removed, inserted) turning old into new, from their common prefix and suffix."""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return prefix, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+
+
+class Command:
+    """One undoable edit. undo and redo apply it to a BoardScene."""
+    # Whether the command is plain data that can be pickled into the journal
+    spillable = True
+
+    def size(self):
+        return command_size(self)
+
+    def item_ids(self):
+        """Ids of the items the command changes, or None if it changes the whole page."""
+        return None
+
+    def discard(self):
+        """Called once the command has left the history for good."""
+
+    def undo(self, scene):
+        raise NotImplementedError
+
+    def redo(self, scene):
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Fold a command that directly followed this one into it; False if they stay separate entries."""
+        return False
+
+
+class AddItems(Command):
+    def __init__(self, records):
+        self.records = records  # [(item id, serialize_item data)], topmost first
+        self.above = {}  # item id -> id of the item stacked directly above it, taken when undone
+
+    def item_ids(self):
+        return [item_id for item_id, _ in self.records]
+
+    def undo(self, scene):
+        self.above = scene.remove_items([item_id for item_id, _ in self.records])
+
+    def redo(self, scene):
+        scene.restore_items(self.records, self.above)
+
+
+class RemoveItems(Command):
+    def __init__(self, records, above):
+        self.records = records  # [(item id, serialize_item data)], topmost first
+        self.above = above  # item id -> id of the item stacked directly above it when removed
+
+    def item_ids(self):
+        return [item_id for item_id, _ in self.records]
+
+    def undo(self, scene):
+        scene.restore_items(self.records, self.above)
+
+    def redo(self, scene):
+        self.above = scene.remove_items([item_id for item_id, _ in self.records])
+
+
+class MoveItems(Command):
+    def __init__(self, moves):
+        self.moves = moves  # item id -> (dx, dy)
+
+    def item_ids(self):
+        return list(self.moves)
+
+    def undo(self, scene):
+        scene.move_items({item_id: (-dx, -dy) for item_id, (dx, dy) in self.moves.items()})
+
+    def redo(self, scene):
+        scene.move_items(self.moves)
+
+    def merge(self, other):
+        # Nudging the same selection again and again is one move
+        if not isinstance(other, MoveItems) or other.moves.keys() != self.moves.keys():
+            return False
+        for item_id, (dx, dy) in other.moves.items():
+            x, y = self.moves[item_id]
+            self.moves[item_id] = (x + dx, y + dy)
+        return True
+
+
+class EditText(Command):
+    def __init__(self, item_id, position, removed, inserted):
+        self.item_id = item_id
+        self.position = position
+        self.removed = removed
+        self.inserted = inserted
+
+    def item_ids(self):
+        return [self.item_id]
+
+    def undo(self, scene):
+        scene.edit_text(self.item_id, self.position, len(self.inserted), self.removed)
+
+    def redo(self, scene):
+        scene.edit_text(self.item_id, self.position, len(self.removed), self.inserted)
+
+    def merge(self, other):
+        if not isinstance(other, EditText) or other.item_id != self.item_id:
+            return False
+        # Typing on from where the last edit ended
+        if not other.removed and other.position == self.position + len(self.inserted):
+            self.inserted += other.inserted
+            return True
+        # Backspacing over what came before
+        if not self.inserted and not other.inserted and other.position + len(other.removed) == self.position:
+            self.position = other.position
+            self.removed = other.removed + self.removed
+            return True
+        return False
+
+
+class SwapPage(Command):
+    """Clearing the page by swapping the scene for an empty one; the old scene is kept whole, not copied.
+
+    The command always holds whichever of the two scenes isn't showing, so undo and redo are the same swap.
+    """
+    spillable = False
+
+    def __init__(self, page):
+        self.page = page
+
+    def size(self):
+        return DETACHED_PAGE_SIZE
+
+    def undo(self, scene):
+        self.page = scene.swap_page(self.page)
+
+    def redo(self, scene):
+        self.page = scene.swap_page(self.page)
+
+    def discard(self):
+        self.page.dispose()
+        self.page = None
+
+
+class _Spilled:
+    """Where an entry moved to the journal lives: a byte range of one zlib-compressed pickle."""
+    __slots__ = ('offset', 'length')
+
+    def __init__(self, offset, length):
+        self.offset = offset
+        self.length = length
+
+
+class History:
+    """Undo and redo stacks of Commands for one scene, within a memory and a disk budget."""
+
+    def __init__(self, scene, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET,
+                 coalesce_interval=COALESCE_INTERVAL):
+        self.scene = scene
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.coalesce_interval = coalesce_interval
+
+        self._undo = deque()  # [Command or _Spilled, size]; spilled entries are the oldest
+        self._redo = []  # [Command, size]
+        self._spilled = 0  # entries at the bottom of the undo stack that live in the journal
+        self.memory_used = 0  # pickled bytes of the entries in memory
+        self._last_push = None  # when the top entry was last pushed or merged into
+
+        self._journal = None
+        self._journal_start = 0  # bytes before this belong to entries that were dropped
+        self._journal_end = 0
+        self._applying = False
+        # autosave.Journal the history writes its pushes, undos and redos to, if any
+        self.journal = None
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def redo_count(self):
+        return len(self._redo)
+
+    @property
+    def disk_used(self):
+        return self._journal_end - self._journal_start
+
+    def push(self, command):
+        """Record an edit that has just been made to the scene."""
+        # Edits made by undo and redo themselves are not new history
+        if self._applying:
+            return
+        now = time.monotonic()
+        self._record(command, self._last_push is not None and now - self._last_push < self.coalesce_interval)
+        self._last_push = now
+
+    def _record(self, command, coalesce):
+        """Adds command to the undo stack, merged into the top entry if coalesce and the two can merge."""
+        self.scene.edits += 1
+        self.scene.items_changed(command.item_ids())
+        for entry in self._redo:
+            self.memory_used -= entry[1]
+            entry[0].discard()
+        self._redo.clear()
+
+        # Only an entry still in memory can merge
+        top = self._undo[-1] if coalesce and len(self._undo) > self._spilled else None
+        merged = top is not None and top[0].merge(command)
+        if merged:
+            size = top[0].size()
+            self.memory_used += size - top[1]
+            top[1] = size
+        else:
+            size = command.size()
+            self._undo.append([command, size])
+            self.memory_used += size
+        if self.journal is not None:
+            # Whether it merged is written down, so replaying the journal builds the same undo stack.
+            # A cleared page can't be written down, replaying it clears the page again
+            self.journal.append('merge' if merged else 'do', command if command.spillable else None,
+                                self.scene.styles, self.scene.assets)
+        self._enforce_budget()
+
+    def undo(self):
+        if not self._undo:
+            print("Undo list is empty")
+            return False
+        command, size = self._pop_undo()
+        self._apply(command.undo)
+        self.scene.edits += 1
+        self.scene.items_changed(command.item_ids())
+        if self.journal is not None:
+            self.journal.append('undo', styles=self.scene.styles, assets=self.scene.assets)
+        self._redo.append([command, size])
+        self._last_push = None
+        return True
+
+    def redo(self):
+        if not self._redo:
+            print("Redo list is empty")
+            return False
+        entry = self._redo.pop()
+        self._apply(entry[0].redo)
+        self.scene.edits += 1
+        self.scene.items_changed(entry[0].item_ids())
+        if self.journal is not None:
+            self.journal.append('redo', styles=self.scene.styles, assets=self.scene.assets)
+        self._undo.append(entry)
+        self._last_push = None
+        self._enforce_budget()
+        return True
+
+    def replay(self, command, merged=False):
+        """Make an edit read back from an autosave journal again; merged is whether it was merged into the
+        entry before it when it was first made, rather than when it is replayed."""
+        self._apply(command.redo)
+        self._record(command, merged)
+        # Nothing made after recovery merges into what was made before it
+        self._last_push = None
+
+    def clear(self):
+        for entry in list(self._undo)[self._spilled:] + self._redo:
+            entry[0].discard()
+        self._undo.clear()
+        self._redo.clear()
+        self._spilled = 0
+        self.memory_used = 0
+        self._last_push = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._journal_start = self._journal_end = 0
+
+    def _apply(self, method):
+        self._applying = True
+        try:
+            method(self.scene)
+        finally:
+            self._applying = False
+
+    def _pop_undo(self):
+        entry = self._undo.pop()
+        if len(self._undo) >= self._spilled:
+            self.memory_used -= entry[1]
+            return entry
+        # The newest spilled entry is always the last one written, so the journal shrinks like a stack
+        self._spilled -= 1
+        spilled = entry[0]
+        self._journal.seek(spilled.offset)
+        data = self._journal.read(spilled.length)
+        self._journal.truncate(spilled.offset)
+        self._journal_end = spilled.offset
+        if self._spilled == 0:
+            self._reset_journal()
+        return pickle.loads(zlib.decompress(data)), entry[1]
+
+    def _enforce_budget(self):
+        # Never spill the top entry, the next edit may still merge into it
+        while self.memory_used > self.memory_budget and self._spilled < len(self._undo) - 1:
+            entry = self._undo[self._spilled]
+            if entry[0].spillable:
+                self._spill(entry)
+            else:
+                # Everything older can only be undone after this entry, so it all goes together
+                self._forget_oldest(self._spilled + 1)
+        while self.disk_used > self.disk_budget and self._spilled:
+            self._forget_oldest(1)
+
+    def _spill(self, entry):
+        if self._journal is None:
+            self._journal = tempfile.TemporaryFile(prefix="bestnotes-undo-")
+        data = zlib.compress(pickle.dumps(entry[0], protocol=pickle.HIGHEST_PROTOCOL))
+        self._journal.seek(self._journal_end)
+        self._journal.write(data)
+        entry[0] = _Spilled(self._journal_end, len(data))
+        self._journal_end += len(data)
+        self._spilled += 1
+        self.memory_used -= entry[1]
+
+    def _forget_oldest(self, count):
+        for _ in range(count):
+            command, size = self._undo.popleft()
+            if isinstance(command, _Spilled):
+                self._spilled -= 1
+                self._journal_start = command.offset + command.length
+            else:
+                self.memory_used -= size
+                command.discard()
+
+        if self._spilled == 0:
+            self._reset_journal()
+        elif self._journal_start > self.disk_used:
+            # Once most of the file is forgotten entries, copy what is left to the front
+            self._journal.seek(self._journal_start)
+            live = self._journal.read(self.disk_used)
+            self._journal.seek(0)
+            self._journal.write(live)
+            self._journal.truncate(len(live))
+            for index in range(self._spilled):
+                self._undo[index][0].offset -= self._journal_start
+            self._journal_end = len(live)
+            self._journal_start = 0
+
+    def _reset_journal(self):
+        self._journal_start = self._journal_end = 0
+        if self._journal is not None:
+            self._journal.truncate(0)
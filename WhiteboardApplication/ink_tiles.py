@@ -0,0 +1,397 @@
+import itertools
+import math
+from collections import namedtuple, OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QThread, QTimer, Signal, Qt, QRectF, QRect, QPoint
+from PySide6.QtGui import QImage, QPainter, QTransform, QRegion
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.stroke_item import StrokeItem, stroke_outline, fills_outline
+
+TILE_SIZE = 256  # Tile side in view pixels
+PREFETCH_MARGIN = 1  # Rings of tiles rendered around the visible area
+MAX_TILES = 160  # About 40 MB of ARGB32 tiles per view
+REQUEST_DELAY = 120  # ms to wait after the last edit before re-rendering tiles
+PREVIEW_RESOLUTION = 0.5  # Tile resolution used while the view is moving
+
+# Immutable copy of what a worker needs to paint one stroke. QPainterPath/QPen/QBrush
+# are implicitly shared, so taking the snapshot only bumps reference counts, and later
+# edits on the GUI thread detach instead of changing what the worker sees.
+StrokeSnapshot = namedtuple('StrokeSnapshot', ['path', 'pen', 'brush', 'transform', 'opacity', 'outline'])
+
+# A rendered tile. image is None for empty tiles; item_ids is None for tiles that hold
+# items the worker can't draw (text boxes, images, selections), which paint themselves
+Tile = namedtuple('Tile', ['image', 'item_ids'])
+
+_tile_pool = None
+
+
+def tile_pool():
+    """Thread pool shared by every canvas, one worker per core."""
+    global _tile_pool
+    if _tile_pool is None:
+        _tile_pool = QThreadPool()
+        _tile_pool.setMaxThreadCount(max(1, QThread.idealThreadCount()))
+    return _tile_pool
+
+
+def snapshot_stroke(item):
+    # Outlines the item hasn't built yet are stroked by the worker instead of here
+    return StrokeSnapshot(item.path(), item.pen(), item.brush(), item.sceneTransform(), item.effectiveOpacity(),
+                          item.cached_outline())
+
+
+def paint_snapshots(painter, snapshots, transform, cancelled=None):
+    """Paint stroke snapshots with a scene-to-device transform; returns False if cancelled."""
+    for snapshot in snapshots:
+        if cancelled is not None and cancelled():
+            return False
+        painter.setTransform(snapshot.transform * transform)
+        painter.setOpacity(snapshot.opacity)
+        # Same painting as StrokeItem.paint, so tiles match what the items draw themselves
+        if fills_outline(snapshot.pen):
+            outline = snapshot.outline
+            if outline is None:
+                outline = stroke_outline(snapshot.path, snapshot.pen, snapshot.brush)
+            painter.fillPath(outline, snapshot.pen.brush())
+        else:
+            painter.setPen(snapshot.pen)
+            painter.setBrush(snapshot.brush)
+            painter.drawPath(snapshot.path)
+    return True
+
+
+class _TileSignals(QObject):
+    # key, job generation, finished image or a null one if cancelled; queued to the GUI thread
+    finished = Signal(object, int, QImage)
+
+
+class TileJob(QRunnable):
+    """Rasterizes the stroke snapshots of one tile into a QImage on a pool thread."""
+
+    def __init__(self, key, generation, snapshots, transform, size, dpr, signals):
+        super().__init__()
+        # The layer keeps the job alive until it reports back, which it does even when cancelled, or is taken
+        # off the pool before it starts
+        self.setAutoDelete(False)
+
+        self.key = key
+        self.generation = generation
+        self.snapshots = snapshots
+        self.transform = transform
+        self.size = size
+        self.dpr = dpr
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            self.signals.finished.emit(self.key, self.generation, QImage())
+            return
+
+        image = QImage(round(self.size * self.dpr), round(self.size * self.dpr),
+                       QImage.Format.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(self.dpr)
+        image.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        finished = paint_snapshots(painter, self.snapshots, self.transform, lambda: self.cancelled)
+        painter.end()
+
+        self.signals.finished.emit(self.key, self.generation, image if finished else QImage())
+
+
+class InkTileLayer(QObject):
+    """Caches the settled strokes of a view as tiles rendered off the GUI thread.
+
+    Tiles are keyed by (level, column, row), where level is the scale the tile was rendered
+    at and the device pixel ratio. A finished tile is blitted by the view's drawBackground,
+    and strokes baked into it skip painting themselves there, so each part of the page is
+    drawn either from a tile or by its items, never both.
+
+    While the view is in interactive mode (panning, zooming, dragging) frames are drawn from
+    whichever cached level covers the view best, usually low-resolution preview tiles, and
+    scaled to fit.
+    """
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.scene = None
+        self.enabled = True
+        self.interactive = False
+
+        # Level every tile lookup uses for the frame being painted, see begin_frame()
+        self.draw_level = None
+        self._settled_level = None
+        # Strokes painted in the last frame, used by the view's quality thresholds
+        self.frame_items = 0
+        self.last_frame_items = 0
+
+        self._tiles = OrderedDict()  # key -> Tile, least recently drawn first
+        self._pending = {}  # key -> (TileJob, ids of the strokes in its snapshot)
+        self._jobs = {}  # generation -> TileJob started and not released yet, pending or cancelled
+        self._settling = set()  # keys dropped by an edit, left alone until the edits pause
+        self._generations = itertools.count(1)
+
+        self._signals = _TileSignals()
+        self._signals.finished.connect(self._tile_finished)
+
+        self._request_timer = QTimer(self)
+        self._request_timer.setSingleShot(True)
+        self._request_timer.timeout.connect(self.request_visible)
+
+    def set_scene(self, scene):
+        if self.scene is not None:
+            self.scene.changed.disconnect(self.invalidate)
+        self.clear()
+        self.scene = scene
+        if scene is not None:
+            scene.changed.connect(self.invalidate)
+            self.schedule_request(0)
+
+    def clear(self):
+        for key in list(self._pending):
+            self._cancel(key)
+        self._tiles.clear()
+        self._settling.clear()
+
+    def level(self, resolution=1.0):
+        """Tile level for the view's current zoom, optionally at reduced resolution."""
+        scale = abs(self.view.transform().m11()) or 1.0
+        return round(scale * resolution, 4), self.view.devicePixelRatioF()
+
+    def set_interactive(self, interactive):
+        if interactive and not self.interactive:
+            # Tiles at the zoom the view was resting at stay usable while a zoom is in progress
+            self._settled_level = self.level()
+        self.interactive = interactive
+        self.schedule_request(0)
+
+    def begin_frame(self):
+        """Pick the tile level for the next paint, so the background and every item agree."""
+        self.last_frame_items = self.frame_items
+        self.frame_items = 0
+
+        if not self.interactive:
+            self.draw_level = self.level()
+            return
+
+        visible = self.visible_scene_rect()
+        best_level, best_count = self.level(PREVIEW_RESOLUTION), -1
+        for level in [self.level(PREVIEW_RESOLUTION), self.level(), self._settled_level]:
+            if level is None:
+                continue
+            count = sum(1 for key in self.keys_for_rect(visible, level) if key in self._tiles)
+            if count > best_count:
+                best_level, best_count = level, count
+        self.draw_level = best_level
+
+    # Tile geometry
+    ###########################################################################################################
+
+    @staticmethod
+    def tile_scene_rect(key):
+        (scale, _dpr), column, row = key
+        size = TILE_SIZE / scale
+        return QRectF(column * size, row * size, size, size)
+
+    @staticmethod
+    def keys_for_rect(rect, level):
+        scale = level[0]
+        left = math.floor(rect.left() * scale / TILE_SIZE)
+        top = math.floor(rect.top() * scale / TILE_SIZE)
+        right = math.ceil(rect.right() * scale / TILE_SIZE)
+        bottom = math.ceil(rect.bottom() * scale / TILE_SIZE)
+        return [(level, column, row) for row in range(top, max(bottom, top + 1))
+                for column in range(left, max(right, left + 1))]
+
+    def _device_rect(self, key, viewport_transform):
+        # Both corners are rounded so neighbouring tiles meet exactly, even when scaled
+        rect = viewport_transform.mapRect(self.tile_scene_rect(key))
+        return QRect(QPoint(round(rect.left()), round(rect.top())),
+                     QPoint(round(rect.right()) - 1, round(rect.bottom()) - 1))
+
+    def visible_scene_rect(self):
+        viewport = self.view.viewport()
+        # The canvas sits inside a scroll area, so only part of the viewport may be on screen
+        visible = viewport.visibleRegion().boundingRect()
+        if visible.isEmpty():
+            visible = viewport.rect()
+        return self.view.mapToScene(visible).boundingRect()
+
+    # Drawing
+    ###########################################################################################################
+
+    def draw(self, painter, rect):
+        """Blit the finished tiles that intersect the exposed scene rect."""
+        if not self.enabled or self.scene is None:
+            return
+
+        level = self.draw_level or self.level()
+        viewport_transform = self.view.viewportTransform()
+        painter.save()
+        painter.resetTransform()
+        missing = False
+        for key in self.keys_for_rect(rect, level):
+            tile = self._tiles.get(key)
+            if tile is None:
+                missing = missing or (key not in self._pending and key not in self._settling)
+                continue
+            self._tiles.move_to_end(key)
+            if tile.image is not None:
+                painter.drawImage(self._device_rect(key, viewport_transform), tile.image)
+        painter.restore()
+
+        # Newly exposed area (scrolling, zoom, tab switch) gets its tiles queued right away
+        if missing:
+            self.schedule_request(0)
+
+    def baked_clip(self, item, widget):
+        """How a stroke should paint itself on this view.
+
+        Returns None to paint normally, False when every tile it touches already holds it,
+        or a device QRegion to clip its painting to when only some of them do.
+        """
+        self.frame_items += 1
+        if not self.enabled or not self._tiles:
+            return None
+
+        item_id = id(item)
+        keys = self.keys_for_rect(item.sceneBoundingRect(), self.draw_level or self.level())
+        baked = []
+        for key in keys:
+            tile = self._tiles.get(key)
+            if tile is not None and tile.item_ids is not None and item_id in tile.item_ids:
+                baked.append(key)
+
+        if not baked:
+            return None
+        if len(baked) == len(keys):
+            return False
+
+        region = QRegion(widget.rect())
+        viewport_transform = self.view.viewportTransform()
+        for key in baked:
+            region = region.subtracted(QRegion(self._device_rect(key, viewport_transform)))
+        return region
+
+    # Rendering
+    ###########################################################################################################
+
+    def schedule_request(self, delay=REQUEST_DELAY):
+        if not self._request_timer.isActive() or self._request_timer.remainingTime() > delay:
+            self._request_timer.start(delay)
+
+    def request_visible(self):
+        """Queue jobs for missing tiles, visible ones first, and cancel jobs that scrolled away."""
+        if not self.enabled or self.scene is None or not self.view.isVisible():
+            return
+
+        self._settling.clear()
+        visible = self.visible_scene_rect()
+        if self.interactive:
+            # Only cheap preview tiles for what is on screen; full quality comes back once idle
+            level = self.level(PREVIEW_RESOLUTION)
+            wanted = self.keys_for_rect(visible, level)
+        else:
+            level = self.level()
+            margin = PREFETCH_MARGIN * TILE_SIZE / level[0]
+            wanted = self.keys_for_rect(visible.adjusted(-margin, -margin, margin, margin), level)
+        visible_keys = set(self.keys_for_rect(visible, level))
+
+        wanted_set = set(wanted)
+        for key in list(self._pending):
+            if key not in wanted_set:
+                self._cancel(key)
+
+        # Visible tiles nearest the centre of the view render first, then the prefetch ring
+        center = visible.center()
+
+        def order(key):
+            tile_center = self.tile_scene_rect(key).center()
+            return key not in visible_keys, (tile_center - center).manhattanLength()
+
+        wanted.sort(key=order)
+        for rank, key in enumerate(wanted):
+            if key not in self._tiles and key not in self._pending:
+                self._start_job(key, len(wanted) - rank)
+
+    def _start_job(self, key, priority):
+        rect = self.tile_scene_rect(key)
+        snapshots = []
+        item_ids = set()
+        for item in self.scene.items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect,
+                                     Qt.SortOrder.AscendingOrder):
+            if not item.isVisible():
+                continue
+            # Anything but plain settled strokes keeps the whole tile on the normal paint path,
+            # otherwise it would end up underneath ink that was drawn after it
+            if not isinstance(item, StrokeItem) or item.topLevelItem() is not item or item.isSelected():
+                self._store(key, Tile(None, None))
+                return
+            snapshots.append(snapshot_stroke(item))
+            item_ids.add(id(item))
+
+        if not snapshots:
+            self._store(key, Tile(None, frozenset()))
+            return
+
+        (scale, dpr), column, row = key
+        transform = QTransform.fromScale(scale, scale) * QTransform.fromTranslate(-column * TILE_SIZE,
+                                                                                  -row * TILE_SIZE)
+        job = TileJob(key, next(self._generations), snapshots, transform, TILE_SIZE, dpr, self._signals)
+        self._pending[key] = (job, frozenset(item_ids))
+        self._jobs[job.generation] = job
+        tile_pool().start(job, priority)
+
+    def _cancel(self, key):
+        job, _item_ids = self._pending.pop(key)
+        job.cancelled = True
+        # One that has started reports back and is released then
+        if tile_pool().tryTake(job):
+            del self._jobs[job.generation]
+            garbage_collector.release_job(job, keep_signals=True)
+
+    def _tile_finished(self, key, generation, image):
+        job = self._jobs.pop(generation, None)
+        if job is not None:
+            garbage_collector.release_job(job, keep_signals=True)
+        pending = self._pending.get(key)
+        # Dropped or re-queued since the job started; the image is out of date
+        if image.isNull() or pending is None or pending[0].generation != generation:
+            return
+        del self._pending[key]
+        self._store(key, Tile(image, pending[1]))
+
+        if key[0] == (self.draw_level or self.level()):
+            self.view.viewport().update(self._device_rect(key, self.view.viewportTransform()).adjusted(-1, -1, 1, 1))
+
+    def _store(self, key, tile):
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > MAX_TILES:
+            self._tiles.popitem(last=False)
+
+    # Invalidation
+    ###########################################################################################################
+
+    def invalidate(self, rects):
+        """Drop tiles under changed scene regions; they are re-rendered once edits settle."""
+        scene_rect = self.scene.sceneRect()
+        if any(rect == scene_rect for rect in rects):
+            # The scene reports its whole rect when everything was updated at once
+            self.clear()
+        else:
+            rects = [rect.adjusted(-1, -1, 1, 1) for rect in rects]
+            for key in list(self._tiles) + list(self._pending):
+                tile_rect = self.tile_scene_rect(key)
+                if any(tile_rect.intersects(rect) for rect in rects):
+                    self._settling.add(key)
+                    self._tiles.pop(key, None)
+                    if key in self._pending:
+                        self._cancel(key)
+
+        # Restarted on every edit, so nothing is re-rendered in the middle of a stroke
+        self._request_timer.start(REQUEST_DELAY)
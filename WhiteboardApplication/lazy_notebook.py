@@ -0,0 +1,158 @@
+"""Opening a .bnb notebook without reading all of it.
+
+The file is memory-mapped and only its small sections and chunk index are read when it is opened.
+Strokes are decoded a chunk at a time as the view comes near them, so a huge notebook shows its
+first screen quickly and memory grows with what has been looked at, not with the file. Pictures
+are left in the file too until an image showing them is first painted (see FileAssets).
+
+Each chunk's checksum is checked as it is decoded. A damaged chunk is left out and added to
+damaged, and the rest of the notebook opens as usual; damage anywhere else fails the opening, and
+the whole file is read instead (see notebook_format.loads_notebook).
+"""
+import json
+import math
+import mmap
+import os
+
+from WhiteboardApplication.notebook_format import CHUNK_SIZE, TEXT, IMAGE, NotebookFormatError, DamagedSection, \
+    read_sections, read_chunk_index, read_chunk, unpack_images, asset_offsets
+
+MAX_INDEXED_CELLS = 4096  # Chunks spread over more grid cells than this are checked against every query instead
+
+
+def _numbers_of(order, kind):
+    """Item numbers of the items of one kind, found in the ORDR bytes without a Python loop per item."""
+    numbers = []
+    marker = bytes([kind])
+    number = order.find(marker)
+    while number != -1:
+        numbers.append(number)
+        number = order.find(marker, number + 1)
+    return numbers
+
+
+class FileAssets:
+    """The pictures of a .bnb file, each read from the file the first time it is asked for.
+
+    The file is kept open on its own until they all have been, so closing the notebook, or saving
+    another file in its place, leaves them readable.
+    """
+
+    def __init__(self, path, offsets):
+        self.path = os.path.abspath(path)
+        self.offsets = offsets  # key -> (offset, size), of those not read yet
+        self.file = open(path, 'rb') if offsets else None
+
+    def keys(self):
+        return list(self.offsets)
+
+    def read(self, key):
+        offset, size = self.offsets[key]
+        self.file.seek(offset)
+        data = self.file.read(size)
+        if len(data) != size:
+            raise NotebookFormatError("Truncated notebook")
+        del self.offsets[key]
+        if not self.offsets:
+            self.file.close()
+            self.file = None
+        return data
+
+
+class LazyNotebook:
+    """A chunked .bnb notebook, mapped into memory, whose strokes are decoded on request."""
+    # Its items get ids from -1 down, so every id from here up is free for the items drawn on it
+    next_item_id = 0
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            sections = read_sections(self.map, spans=(b'ASST',))
+            if b'CIDX' not in sections:
+                raise NotebookFormatError("Notebook has no chunk index")
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+        self.template = json.loads(sections.get(b'META', b'{}')).get('template', 'blank')
+        self.styles = json.loads(sections.get(b'STYL', b'[]'))
+        self.count = len(sections.get(b'ORDR', b''))
+        self.chunks = read_chunk_index(sections)
+        self.unloaded = set(range(len(self.chunks)))
+        self.damaged = []  # DamagedSection of each chunk found damaged so far
+
+        # Text boxes and images are few and small, so they are read straight away; pictures are read and
+        # decoded once shown
+        order = sections.get(b'ORDR', b'')
+        texts = json.loads(sections.get(b'TEXT', b'[]'))
+        images = unpack_images(sections[b'IMAG']) if b'IMAG' in sections else []
+        self.assets = FileAssets(path, asset_offsets(self.map, *sections[b'ASST']) if b'ASST' in sections else {})
+        self.eager_items = list(zip(_numbers_of(order, TEXT), texts)) + list(zip(_numbers_of(order, IMAGE), images))
+
+        # Grid of CHUNK_SIZE cells -> chunks overlapping it
+        self.cells = {}
+        self.spread = []
+        for chunk, (bounds, _offset, _count) in enumerate(self.chunks):
+            left, top, right, bottom = self._cell_range(*bounds)
+            if (right - left + 1) * (bottom - top + 1) > MAX_INDEXED_CELLS:
+                self.spread.append(chunk)
+                continue
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    self.cells.setdefault((row, column), []).append(chunk)
+
+    @staticmethod
+    def _cell_range(left, top, right, bottom):
+        return (math.floor(left / CHUNK_SIZE), math.floor(top / CHUNK_SIZE),
+                math.floor(right / CHUNK_SIZE), math.floor(bottom / CHUNK_SIZE))
+
+    @property
+    def closed(self):
+        return self.file is None
+
+    def chunks_in(self, rect):
+        """Chunks not decoded yet whose strokes may show inside the scene rect."""
+        if not self.unloaded:
+            return []
+        x0, y0, x1, y1 = rect.left(), rect.top(), rect.right(), rect.bottom()
+        left, top, right, bottom = self._cell_range(x0, y0, x1, y1)
+        candidates = set(self.spread)
+        if (right - left + 1) * (bottom - top + 1) > len(self.cells):
+            candidates.update(self.unloaded)
+        else:
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    candidates.update(self.cells.get((row, column), ()))
+        found = []
+        for chunk in candidates & self.unloaded:
+            b_left, b_top, b_right, b_bottom = self.chunks[chunk][0]
+            if b_left <= x1 and b_right >= x0 and b_top <= y1 and b_bottom >= y0:
+                found.append(chunk)
+        return found
+
+    def chunk_center(self, chunk):
+        left, top, right, bottom = self.chunks[chunk][0]
+        return (left + right) / 2, (top + bottom) / 2
+
+    def load_chunk(self, chunk):
+        """[(item number, stroke data)] of a chunk, or [] if it was decoded already or is damaged."""
+        if chunk not in self.unloaded:
+            return []
+        self.unloaded.discard(chunk)
+        bounds, offset, count = self.chunks[chunk]
+        try:
+            numbers, strokes = read_chunk(self.map, offset)
+        except NotebookFormatError as error:
+            self.damaged.append(DamagedSection(b'CHNK', offset, str(error), bounds, count))
+            return []
+        return list(zip(numbers, strokes))
+
+    def close(self):
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,462 @@
+"""The notebook library: every notebook in the folders added to it, with what each holds, ready to pick from.
+
+What a notebook holds, its title, paper, strokes, text boxes and images, its size and when it was
+changed, is kept in a SQLite database with the id its thumbnails are cached under, so the open
+dialog lists thousands of notebooks from one query without touching a single file. A scanner on
+a background thread keeps the database up to date: it compares each file's version (modification
+time and size) with the one listed and reads again only the files that changed, and of a .bnb
+file only its first sections (see notebook_format.read_summary); a notebook store's rows are
+counted by SQLite. JSON boards have no such header and are read whole, once per version. Pickles can run code while loading, so the scanner never
+loads one: a pickle is listed with its size and date, and what it holds is filled in once the
+user opens it (see LibraryService.scan). The dialog reads the database alongside the scanner, in
+WAL mode, and lists what the scan finds as it is written.
+
+A notebook file is one page, so there is no page count to keep.
+"""
+import mmap
+import os
+import sqlite3
+import time
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QStandardPaths, QThreadPool, QAbstractTableModel, QModelIndex, Qt, \
+    Signal
+from PySide6.QtGui import QIcon, QPixmap
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QFileDialog, QHBoxLayout, QLineEdit, QPushButton, \
+    QTableView, QVBoxLayout, QAbstractItemView, QHeaderView
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.batch import find_notebooks
+from WhiteboardApplication.notebook_format import MAGIC, STROKE, TEXT, IMAGE, KINDS, read_notebook, read_summary
+from WhiteboardApplication.notebook_store import SQLITE_MAGIC, store_summary
+from WhiteboardApplication.thumbnails import file_version, notebook_id
+
+LOOSE = ''  # Folder of notebooks opened by themselves rather than found in a library folder
+# Bumped when the notebooks table changes; it is only a cache of the files, so an older one is dropped and rescanned
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS notebooks (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    title TEXT NOT NULL,
+    template TEXT,
+    strokes INTEGER,
+    texts INTEGER,
+    images INTEGER,
+    size INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    version TEXT NOT NULL,
+    thumbnail TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS notebooks_by_folder ON notebooks (folder);
+"""
+
+_COLUMNS = "path, folder, title, template, strokes, texts, images, size, modified, version, thumbnail"
+
+
+def library_path():
+    """Where the library database is kept."""
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+    return os.path.join(location or os.path.expanduser('~'), 'library.sqlite')
+
+
+class NotebookInfo:
+    """What the library knows of one notebook file."""
+
+    def __init__(self, path, folder, title, template, strokes, texts, images, size, modified, version, thumbnail):
+        self.path = path
+        self.folder = folder  # library folder it was found in, or LOOSE
+        self.title = title
+        self.template = template
+        # Counts of what it holds, None for a pickle never opened (see notebook_info)
+        self.strokes = strokes
+        self.texts = texts
+        self.images = images
+        self.size = size  # bytes
+        self.modified = modified  # seconds since the epoch
+        self.version = version  # as thumbnails.file_version gives it
+        self.thumbnail = thumbnail  # notebook id of its thumbnails in the thumbnail cache
+
+    def row(self):
+        return (self.path, self.folder, self.title, self.template, self.strokes, self.texts, self.images, self.size,
+                self.modified, self.version, self.thumbnail)
+
+
+def _counts(notebook_data):
+    """(template, strokes, text boxes, images) of notebook data."""
+    kinds = [KINDS.get(data['type']) for data in notebook_data['items']]
+    return notebook_data.get('template', 'blank'), kinds.count(STROKE), kinds.count(TEXT), kinds.count(IMAGE)
+
+
+def notebook_info(path, folder=LOOSE, notebook_data=None):
+    """NotebookInfo of the notebook file at path, from the header of a .bnb file, a query of a store or the whole
+    of a JSON board.
+
+    A pickle is never loaded here, so what it holds is None unless notebook_data, the notebook as
+    read when the user opened or saved it, is given.
+    """
+    path = os.path.abspath(path)
+    status = os.stat(path)
+    with open(path, 'rb') as file:
+        start = file.read(len(SQLITE_MAGIC))
+        if notebook_data is not None:
+            template, strokes, texts, images = _counts(notebook_data)
+        elif start.startswith(MAGIC):
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                meta, order = read_summary(data)
+            template = meta.get('template', 'blank')
+            strokes, texts, images = order.count(STROKE), order.count(TEXT), order.count(IMAGE)
+        elif start == SQLITE_MAGIC:
+            template, strokes, texts, images = store_summary(path)
+        elif start.lstrip()[:1] == b'{':
+            template, strokes, texts, images = _counts(read_notebook(path))
+        else:
+            template = strokes = texts = images = None
+    return NotebookInfo(path, folder, os.path.splitext(os.path.basename(path))[0], template, strokes, texts, images,
+                        status.st_size, status.st_mtime, file_version(path), notebook_id(path))
+
+
+def folder_of(path, folders):
+    """The library folder among folders the file at path is in, or LOOSE."""
+    path = os.path.abspath(path)
+    inside = [folder for folder in folders if path.startswith(os.path.join(folder, ''))]
+    return max(inside, key=len) if inside else LOOSE
+
+
+class Library:
+    """The SQLite database of notebooks, used from one thread at a time."""
+
+    def __init__(self, path, check_same_thread=True):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        # The dialog reads while the scanner writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS notebooks")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(_SCHEMA)
+        self.connection.commit()
+
+    def folders(self):
+        return [row[0] for row in self.connection.execute("SELECT path FROM folders ORDER BY path")]
+
+    def add_folder(self, folder):
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO folders VALUES (?)", (os.path.abspath(folder),))
+
+    def notebooks(self):
+        """[NotebookInfo] of every notebook, the most recently changed first."""
+        return [NotebookInfo(*row) for row in
+                self.connection.execute(f"SELECT {_COLUMNS} FROM notebooks ORDER BY modified DESC")]
+
+    def versions(self, folder):
+        """{path: version} of the notebooks listed as found in folder."""
+        return dict(self.connection.execute("SELECT path, version FROM notebooks WHERE folder = ?", (folder,)))
+
+    def update(self, infos, gone=()):
+        """Lists infos, replacing what was listed for their paths, and removes the paths in gone, in one transaction."""
+        with self.connection:
+            self.connection.executemany(f"INSERT OR REPLACE INTO notebooks ({_COLUMNS}) VALUES "
+                                        f"({', '.join('?' * 11)})", [info.row() for info in infos])
+            self.connection.executemany("DELETE FROM notebooks WHERE path = ?", [(path,) for path in gone])
+
+    def close(self):
+        self.connection.close()
+
+
+class _ScanSignals(QObject):
+    finished = Signal(int)  # notebooks listed, changed or removed
+
+
+class ScanJob(QRunnable):
+    """Brings the library up to date with its folders and loose notebooks on a pool thread.
+
+    Given folders or files, those are added to the library and only they are scanned. opened maps
+    paths to the notebook data the window read from them, which is listed instead of reading them.
+    """
+
+    def __init__(self, library, folders=None, files=None, opened=None):
+        super().__init__()
+        # Kept alive by whoever started it until finished is delivered
+        self.setAutoDelete(False)
+        self.library = library
+        self.folders = folders
+        self.files = files
+        self.opened = opened or {}
+        self.signals = _ScanSignals()
+
+    def run(self):
+        changes = 0
+        try:
+            for folder in self.folders or []:
+                self.library.add_folder(folder)
+            library_folders = self.library.folders()
+            if self.folders is None and self.files is None:
+                folders = library_folders
+                loose = {LOOSE: list(self.library.versions(LOOSE))}
+            else:
+                folders = [os.path.abspath(folder) for folder in self.folders or []]
+                loose = {}
+                for path in self.files or []:
+                    loose.setdefault(folder_of(path, library_folders), []).append(path)
+            for folder in folders:
+                changes += self.scan(folder, [path for path, _root in find_notebooks([folder])], True)
+            for folder, paths in loose.items():
+                changes += self.scan(folder, paths, folder == LOOSE and self.files is None)
+        except sqlite3.Error as error:
+            print(f"Couldn't update the notebook library: {error}")
+        self.signals.finished.emit(changes)
+
+    def scan(self, folder, paths, complete):
+        """Lists the notebooks at paths under folder, reading only those changed since; if paths are all of
+        folder's, those listed but gone are removed. Returns how many changed."""
+        known = self.library.versions(folder)
+        paths = [os.path.abspath(path) for path in paths]
+        scanned = set(paths)
+        found, changed = set(), []
+        for path in paths:
+            try:
+                if known.get(path) != file_version(path) or path in self.opened:
+                    changed.append(notebook_info(path, folder, self.opened.get(path)))
+                found.add(path)
+            except FileNotFoundError:
+                pass
+            except Exception as error:
+                # Whatever is wrong with the file, it is listed as it was, or not at all, until it can be read
+                print(f"Couldn't read {path} for the library: {error}")
+                found.add(path)
+        gone = [path for path in known if path not in found and (complete or path in scanned)]
+        self.library.update(changed, gone)
+        return len(changed) + len(gone)
+
+
+class LibraryService(QObject):
+    """Scans on a background thread and reads the library on the GUI thread."""
+    # Notebooks were listed, changed or removed
+    changed = Signal()
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        path = path or library_path()
+        # Only jobs use the writer, and the pool's one thread runs them one after another
+        self.writer = Library(path, check_same_thread=False)
+        self.reader = Library(path)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.running = set()  # jobs not finished yet, kept alive while the pool runs them
+
+    def notebooks(self):
+        return self.reader.notebooks() if self.reader is not None else []
+
+    def scan(self, folders=None, files=None, opened=None):
+        """Scans the given folders and notebook files, adding them to the library, or everything in it.
+
+        opened is {path: notebook data} of files the window has just read or written, so a pickle,
+        which the scanner never loads, is listed with what it holds.
+        """
+        if self.writer is None:
+            return
+        opened = {os.path.abspath(path): notebook_data for path, notebook_data in (opened or {}).items()}
+        job = ScanJob(self.writer, folders, files, opened)
+        job.signals.finished.connect(partial(self.job_finished, job))
+        self.running.add(job)
+        self.pool.start(job)
+
+    def job_finished(self, job, changes):
+        self.running.discard(job)
+        garbage_collector.release_job(job)
+        if changes:
+            self.changed.emit()
+
+    def close(self):
+        self.pool.waitForDone()
+        if self.writer is not None:
+            self.writer.close()
+            self.reader.close()
+            self.writer = self.reader = None
+
+
+def _size_text(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class LibraryModel(QAbstractTableModel):
+    """The notebooks of the library as table rows, sorted and filtered in Python rather than through a proxy,
+    so even tens of thousands of rows sort at once."""
+    COLUMNS = ("Title", "Strokes", "Text boxes", "Images", "Size", "Modified", "Folder")
+    _KEYS = ('title', 'strokes', 'texts', 'images', 'size', 'modified', 'path')
+
+    def __init__(self, service, thumbnails=None, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.thumbnails = thumbnails
+        self.icons = {}  # thumbnail id -> QIcon, of the rows shown so far
+        self.everything = []
+        self.shown = []
+        self.filter = ''
+        self.sorting = (5, Qt.SortOrder.DescendingOrder)
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self.everything = self.service.notebooks()
+        self._arrange()
+        self.endResetModel()
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self.filter = text.casefold()
+        self._arrange()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.sorting = (column, order)
+        self._arrange()
+        self.layoutChanged.emit()
+
+    def _arrange(self):
+        shown = [info for info in self.everything if self.filter in info.title.casefold()] if self.filter \
+            else list(self.everything)
+        column, order = self.sorting
+        key = self._KEYS[column]
+        if key == 'title':
+            sort_key = lambda info: info.title.casefold()
+        else:
+            # Counts not known yet sort below every known one
+            sort_key = lambda info: (getattr(info, key) is not None, getattr(info, key) or 0)
+        shown.sort(key=sort_key, reverse=order == Qt.SortOrder.DescendingOrder)
+        self.shown = shown
+
+    def info(self, index):
+        return self.shown[index.row()] if index.isValid() else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.shown)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        info = self.shown[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return info.title
+            if column in (1, 2, 3):
+                count = getattr(info, self._KEYS[column])
+                # A pickle's counts are only known once it has been opened
+                return str(count) if count is not None else ''
+            if column == 4:
+                return _size_text(info.size)
+            if column == 5:
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(info.modified))
+            return os.path.dirname(info.path)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return info.path
+        if role == Qt.ItemDataRole.DecorationRole and column == 0 and self.thumbnails is not None:
+            # Thumbnails are read from their cache only for the rows drawn
+            if info.thumbnail not in self.icons:
+                image = self.thumbnails.thumbnail(info.thumbnail)
+                self.icons[info.thumbnail] = QIcon(QPixmap.fromImage(image)) if image is not None else None
+            return self.icons[info.thumbnail]
+        if role == Qt.ItemDataRole.TextAlignmentRole and 1 <= column <= 4:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+
+class LibraryDialog(QDialog):
+    """Picks a notebook from the library, or from anywhere through a file dialog."""
+
+    def __init__(self, service, thumbnails=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Open Notebook")
+        self.resize(760, 480)
+        self.service = service
+        self.path = ""
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Filter by title")
+        self.search_box.setClearButtonEnabled(True)
+        self.model = LibraryModel(service, thumbnails, self)
+        self.search_box.textChanged.connect(self.model.set_filter)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(*self.model.sorting)
+        self.table.verticalHeader().hide()
+        # Fixed row heights and column widths, so no row is measured however many there are
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 220)
+        self.table.doubleClicked.connect(self.choose)
+
+        add_folder = QPushButton("Add Folder...")
+        add_folder.clicked.connect(self.add_folder)
+        browse = QPushButton("Browse...")
+        browse.clicked.connect(self.browse)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Open | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(lambda: self.choose(self.table.currentIndex()))
+        buttons.rejected.connect(self.reject)
+        bottom = QHBoxLayout()
+        bottom.addWidget(add_folder)
+        bottom.addWidget(browse)
+        bottom.addStretch()
+        bottom.addWidget(buttons)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search_box)
+        layout.addWidget(self.table)
+        layout.addLayout(bottom)
+
+        # Listed from the database as it is, then again as the scan finds changes
+        service.changed.connect(self.model.reload)
+        service.scan()
+
+    def choose(self, index):
+        info = self.model.info(index)
+        if info is None:
+            return
+        self.path = info.path
+        self.accept()
+
+    def browse(self):
+        path, _filter = QFileDialog.getOpenFileName(self, "Open Notebook", '',
+                                                    "Notebooks (*.bnb *.bndb *.pkl *.json);;All Files (*)")
+        if path != "":
+            self.path = path
+            self.accept()
+
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Folder to Library")
+        if folder != "":
+            self.service.scan(folders=[folder])
+
+    def done(self, result):
+        self.service.changed.disconnect(self.model.reload)
+        super().done(result)
+
+    @staticmethod
+    def get_notebook(parent, service, thumbnails=None):
+        """Path of the notebook picked, or "" if none was."""
+        dialog = LibraryDialog(service, thumbnails, parent)
+        dialog.exec()
+        dialog.deleteLater()
+        return dialog.path
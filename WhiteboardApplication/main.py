@@ -1,6 +1,11 @@
+import math
 import os
 import pickle
 import sys
+import time
+import uuid
+import zlib
+from functools import partial
 from os.path import expanduser
 
 from PySide6.QtWidgets import (
@@ -19,7 +24,8 @@ from PySide6.QtWidgets import (
     QLabel,
     QFileDialog,
     QGraphicsPixmapItem, QWidget, QTabWidget, QAbstractScrollArea, QSizePolicy, QGraphicsView, QHBoxLayout, QGridLayout,
-    QScrollArea, QMenu
+    QScrollArea, QMenu, QDockWidget, QGraphicsItem, QProgressDialog, QLineEdit, QListWidget, QListWidgetItem,
+    QVBoxLayout
 )
 
 from PySide6.QtGui import (
@@ -30,25 +36,66 @@ from PySide6.QtGui import (
     QColor,
     QBrush,
     QAction,
-    QTransform, QBrush, QFont, QPixmap, QImageReader, QCursor, QDesktopServices
+    QTransform, QBrush, QFont, QPixmap, QImageReader, QCursor, QDesktopServices, QActionGroup, QTextCursor, QIcon
 )
 
 from PySide6.QtCore import (
-    Qt, QRectF, QSizeF, QPointF, QSize, QRect, QDir, QUrl
+    Qt, QRectF, QSizeF, QPointF, QSize, QRect, QDir, QUrl, QThreadPool, QTimer, Signal
 )
 
 from WhiteboardApplication.UI.board import Ui_MainWindow
 from WhiteboardApplication.text_box import TextBox
+from WhiteboardApplication.stroke_item import StrokeItem
+from WhiteboardApplication.style_table import StyleTable
+from WhiteboardApplication.asset_store import AssetStore
+from WhiteboardApplication.stroke_prediction import StrokePredictor, PredictionOverlay
+from WhiteboardApplication import style_table
+from WhiteboardApplication.compaction import CompactionJob
+from WhiteboardApplication import notebook_data as codec
+from WhiteboardApplication import notebook_format
+from WhiteboardApplication import autosave
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication import thumbnails
+from WhiteboardApplication import search
+from WhiteboardApplication import library
+from WhiteboardApplication.lazy_notebook import LazyNotebook
+from WhiteboardApplication import notebook_store
+from WhiteboardApplication.notebook_store import StoreNotebook
+from WhiteboardApplication.notebook_data import SCENE_RECT, normalize_notebook, serialize_item, deserialize_item, \
+    snapshot_item, finish_item
+from WhiteboardApplication.save_worker import SaveJob, finish_notebook, encode_store_changes
+from WhiteboardApplication.export import ExportJob, FORMATS as EXPORT_FORMATS
+from WhiteboardApplication.history import History, AddItems, RemoveItems, MoveItems, EditText, SwapPage, diff_text
+from WhiteboardApplication.playback import PlaybackWindow
+from WhiteboardApplication.page_templates import PageTemplate, TEMPLATES
+from WhiteboardApplication.minimap import MinimapWidget
 from WhiteboardApplication.new_notebook import NewNotebook
 from WhiteboardApplication.resize_handle_image import ResizablePixmapItem
 from WhiteboardApplication.video_player import MediaPlayer
 from WhiteboardApplication.Collab_Functionality.client import Client
 
+DISPOSE_BATCH = 500  # Items a cleared page destroys per idle tick once its undo entry is gone
+LOAD_BATCH = 1  # Chunks of a lazily opened notebook decoded per idle tick
+TAB_ICON_SIZE = QSize(48, 40)  # Page thumbnails shown on the notebook tabs
+PREFETCH_MARGIN = 0.5  # Fraction of the visible rect loaded beyond each of its edges, so scrolling finds strokes ready
+
+
 class BoardScene(QGraphicsScene):
+    # Page state that stays with the notebook tab when its content is swapped out by clear_page
+    HANDED_OVER = ('styles', 'assets', 'history', 'predictor', 'page_template', 'active_tool', 'color', 'size',
+                   'color_highlighter', 'size_highlighter', 'i', 'j', 'next_item_id', 'notebook_id', 'content_base',
+                   'edits', 'store_path', 'store_version', 'changed_ids')
+
+    # Cleared pages being torn down, kept referenced until they are empty
+    disposing = set()
+
+    # A damaged chunk of the notebook being opened was left out (a notebook_format.DamagedSection)
+    damage_found = Signal(object)
+
     def __init__(self):
         super().__init__()
 
-        self.setSceneRect(0, 0, 600, 500)
+        self.setSceneRect(SCENE_RECT)
 
         self.path = None
         self.previous_position = None
@@ -73,60 +120,331 @@ class BoardScene(QGraphicsScene):
         self.erasing_enabled = False
         self.active_tool = None
 
-        self.undo_list = []
-        self.redo_list = []
+        # Undo history of small inverse edits, which refer to items by the ids handed out here
+        self.history = History(self)
+        self.items_by_id = {}
+        self.next_item_id = 1
+        self.move_origins = {}
         self.highlight_items = []
         self.i = 1
         self.j = 1
         self.highlight_radius_options = [10, 20, 30, 40]
         self.pen_radius_options = [1,5,10,20]
 
-    #Adds an action to the undo list (or a list of items in the case of textbox), by treating every action as a list
-    def add_item_to_undo(self, item):
-        """Add a single item or group of items to the undo list and clear redo list"""
-        # Clear redo list to ensure correct redo functionality
-        self.redo_list.clear()
+        # Paper template (ruled, grid, dotted) drawn behind the ink
+        self.page_template = PageTemplate()
+
+        # Every distinct pen used in the notebook, shared by all strokes drawn with it
+        self.styles = StyleTable()
+
+        # Every distinct image in the notebook, which image items refer to by content hash
+        self.assets = AssetStore()
+
+        # What the page's thumbnail is cached under (see content_version); opening a file sets them from the file
+        self.notebook_id = 'untitled-' + uuid.uuid4().hex
+        self.content_base = uuid.uuid4().hex
+        self.edits = 0  # counted by the undo history
+
+        # Notebook store the page was last saved to or opened from, as it was then (see bind_store), and the ids
+        # of the items changed since, which are all a save to it has to write; None once the whole page changed
+        self.store_path = None
+        self.store_version = None
+        self.changed_ids = set()
+
+        # Predicted pen tip drawn ahead of the stroke in progress to hide input latency
+        self.predictor = StrokePredictor()
+        self.prediction_overlay = None
+
+        # Notebook opened lazily, while some of its chunks are still undecoded
+        self.lazy_notebook = None
+        self.lazy_styles = None
+        self.lazy_depth = 0
+        self.load_queue = []
+        self.load_timer = QTimer(self)
+        self.load_timer.timeout.connect(self.load_step)
+
+    #Items get a stable id the first time the history refers to them
+    def item_id(self, item):
+        item_id = getattr(item, 'item_id', None)
+        if item_id is None:
+            item_id = self.next_item_id
+            self.next_item_id += 1
+            item.item_id = item_id
+            self.items_by_id[item_id] = item
+        return item_id
+
+    #Told by the undo history which items each edit, undo and redo changed; None is the whole page
+    def items_changed(self, item_ids):
+        if item_ids is None or self.changed_ids is None:
+            self.changed_ids = None
+        else:
+            self.changed_ids.update(item_ids)
 
-        # Add item (or list of items if it's a group) to the undo list
-        self.undo_list.append([item])
-        print("Added to undo:", item)
+    #The page is now as the notebook store at path holds it, so saving there again writes only what changes
+    def bind_store(self, path):
+        self.store_path = os.path.abspath(path)
+        self.store_version = thumbnails.file_version(path)
+        self.changed_ids = set()
 
-    #Pops action of undo stack to undo, and adds it to redo in case user wants to redo the action
-    def undo(self):
-        if not self.undo_list:
-            print("Undo list is empty")
-            return
+    #Whether saving to path can write just the items changed since, rather than the whole page
+    def bound_to(self, path):
+        return (self.changed_ids is not None and self.store_path == os.path.abspath(path) and
+                os.path.exists(path) and self.store_version == thumbnails.file_version(path))
 
-        # Pop the last group of items from the undo stack
-        item_group = self.undo_list.pop()
-        for item in item_group:
-            self.removeItem(item)
-            print("Removed from scene (undo):", item)
+    #Records that an item was just added, so undo can take it away again
+    def add_item_to_undo(self, item):
+        """Add a single item to the undo history and clear the redo list"""
+        data = self.record(item)
+        if data is None:
+            return
+        self.history.push(AddItems([(self.item_id(item), data)]))
+
+    #Saved form of an item for the history, which also keeps where a loaded item sits in the stacking order
+    def record(self, item):
+        data = serialize_item(item, self.styles, self.assets)
+        if data is not None and item.zValue():
+            data['z'] = item.zValue()
+        return data
+
+    #Removes items so that undo can put them back, e.g. for the eraser and clearing the page
+    def delete_items(self, items):
+        deleting = {item for item in items if item.scene() is self}
+        records = []
+        # Records are kept topmost first, the order restore_items puts them back in
+        for item in self.items():
+            if item not in deleting:
+                continue
+            data = self.record(item)
+            if data is not None:
+                records.append((self.item_id(item), data))
+            else:
+                self.removeItem(item)
+        if records:
+            above = self.remove_items([item_id for item_id, _ in records])
+            self.history.push(RemoveItems(records, above))
 
-        # Push the removed items to the redo stack
-        self.redo_list.append(item_group)
-        print("Added to redo stack:", item_group)
+    def undo(self):
+        self.history.undo()
 
-    #Pops an action off the redo stack and adds it back to undo to redo and action
     def redo(self):
-        if not self.redo_list:
-            print("Redo list is empty")
+        self.history.redo()
+
+    #Clears the page in constant time: the views switch to an empty scene and this one is kept whole for undo
+    def clear_page(self):
+        page = BoardScene()
+        self.swap_page(page)
+        page.history.push(SwapPage(self))
+
+    #Shows page in this scene's views instead, handing it the notebook's state, and returns this scene
+    def swap_page(self, page):
+        for name in self.HANDED_OVER:
+            setattr(page, name, getattr(self, name))
+        page.history.scene = page
+        for view in self.views():
+            view.setScene(page)
+        return self
+
+    #Destroying a big page at once is what used to freeze Clear, so a detached page goes a batch per idle tick
+    def dispose(self):
+        self.detach_notebook()
+        self.items_by_id.clear()
+        self.doomed = None
+        BoardScene.disposing.add(self)
+        self.dispose_timer = QTimer(self)
+        self.dispose_timer.timeout.connect(self.dispose_step)
+        self.dispose_timer.start(0)
+
+    def dispose_step(self):
+        if self.doomed is None:
+            # Without the index, removing an item is constant time
+            self.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+            self.doomed = [item for item in self.items() if item.parentItem() is None]
+        batch = self.doomed[-DISPOSE_BATCH:]
+        del self.doomed[-DISPOSE_BATCH:]
+        # The scene gives removed items back to Python, which deletes them with the last reference
+        for item in batch:
+            self.removeItem(item)
+        if not self.doomed:
+            self.dispose_timer.stop()
+            # Let go of the scene itself only once its own timer is done delivering
+            QTimer.singleShot(0, partial(BoardScene.disposing.discard, self))
+
+    @property
+    def content_version(self):
+        return f"{self.content_base}/{self.edits}"
+
+    #Drops everything, history included, e.g. before a notebook is loaded into the scene
+    def clear(self):
+        self.detach_notebook()
+        super().clear()
+        self.items_by_id.clear()
+        self.move_origins.clear()
+        self.prediction_overlay = None
+        self.history.clear()
+
+    #Shows a lazily opened notebook: text and images now, strokes as the view comes near them (see load_region)
+    def attach_notebook(self, notebook):
+        self.detach_notebook()
+        self.lazy_notebook = notebook
+        self.lazy_styles = StyleTable.deserialize(notebook.styles)
+        # A store's items may have ids from 1 up, which the items drawn from now on mustn't take, nor stack under
+        self.next_item_id = max(self.next_item_id, notebook.next_item_id)
+        self.lazy_depth = notebook.next_item_id
+        self.assets.add_source(notebook.assets)
+        self.set_page_template(notebook.template)
+        for number, data in notebook.eager_items:
+            self.add_saved_item(number, data, self.lazy_styles, -1 - number, -1 - number - self.lazy_depth)
+        if not notebook.unloaded:
+            self.detach_notebook()
+
+    def detach_notebook(self):
+        self.load_timer.stop()
+        self.load_queue = []
+        if self.lazy_notebook is not None:
+            self.lazy_notebook.close()
+            self.lazy_notebook = None
+
+    #Items of a notebook are stacked by their place in the file, under anything drawn since it was opened.
+    #Their ids come from that place too, so an autosave journal made on top of the file finds them again
+    def add_saved_item(self, number, data, styles, item_id, z):
+        item = deserialize_item(data, styles, self.styles, self.assets)
+        item.setZValue(z)
+        if item_id is not None:
+            item.item_id = item_id
+            self.items_by_id[item_id] = item
+        self.addItem(item)
+        if isinstance(item, TextBox):
+            self.track_text(item)
+
+    #Queues the undecoded chunks in a scene rect, nearest its middle first, to be decoded while idle
+    def load_region(self, rect):
+        if self.lazy_notebook is None:
             return
-
-        # Pop the last group of items from the redo stack
-        item_group = self.redo_list.pop()
-        for item in item_group:
+        center = rect.center()
+        chunks = self.lazy_notebook.chunks_in(rect)
+        chunks.sort(key=lambda chunk: math.dist(self.lazy_notebook.chunk_center(chunk), (center.x(), center.y())))
+        self.load_queue = chunks
+        if chunks:
+            self.load_timer.start(0)
+
+    def load_step(self):
+        batch = self.load_queue[:LOAD_BATCH]
+        del self.load_queue[:LOAD_BATCH]
+        for chunk in batch:
+            self.load_chunk(chunk)
+        if not self.load_queue:
+            self.load_timer.stop()
+
+    def load_chunk(self, chunk):
+        notebook = self.lazy_notebook
+        damaged = len(notebook.damaged)
+        for number, data in notebook.load_chunk(chunk):
+            self.add_saved_item(number, data, self.lazy_styles, -1 - number, -1 - number - self.lazy_depth)
+        for section in notebook.damaged[damaged:]:
+            self.damage_found.emit(section)
+        if not notebook.unloaded:
+            self.detach_notebook()
+
+    #Decodes whatever is left, e.g. before the whole notebook is saved
+    def load_all(self):
+        while self.lazy_notebook is not None:
+            self.load_chunk(next(iter(self.lazy_notebook.unloaded)))
+            garbage_collector.collect_due()
+
+    #Takes items out of the scene by id, returning the id of the item that was stacked above each one
+    def remove_items(self, item_ids):
+        removing = {self.items_by_id[item_id] for item_id in item_ids if item_id in self.items_by_id}
+        above = {}
+        upper = None
+        # Items are topmost first, so the last item seen is the one above. That may be going too,
+        # restore_items puts items back topmost first so it is in place again by then
+        for item in self.items():
+            if item.parentItem() is not None:
+                continue
+            if item in removing:
+                above[item.item_id] = self.item_id(upper) if upper is not None else None
+            upper = item
+        for item in removing:
+            del self.items_by_id[item.item_id]
+            self.removeItem(item)
+        return above
+
+    #Rebuilds items from their saved records and stacks each one back under the item it was below
+    def restore_items(self, records, above):
+        for item_id, data in records:
+            item = deserialize_item(data, self.styles, self.styles, self.assets)
+            item.setZValue(data.get('z', 0))
+            item.item_id = item_id
+            self.items_by_id[item_id] = item
             self.addItem(item)
-            print("Added back to scene (redo):", item)
-
-        # Push the redone items back to the undo stack
-        self.undo_list.append(item_group)
-        print("Restored to undo stack:", item_group)
+            if isinstance(item, TextBox):
+                self.track_text(item)
+            upper = self.items_by_id.get(above.get(item_id))
+            if upper is not None and upper.scene() is self:
+                item.stackBefore(upper)
+
+    def move_items(self, moves):
+        for item_id, (dx, dy) in moves.items():
+            item = self.items_by_id.get(item_id)
+            if item is not None:
+                item.moveBy(dx, dy)
+
+    #Replaces removed characters at position in a text box with the inserted text
+    def edit_text(self, item_id, position, removed, inserted):
+        item = self.items_by_id.get(item_id)
+        if item is None:
+            return
+        cursor = QTextCursor(item.document())
+        cursor.setPosition(position)
+        cursor.setPosition(position + removed, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(inserted)
+        item.history_text = item.toPlainText()
+
+    #Text boxes report each change as a diff against the text they had before it
+    def track_text(self, text_box):
+        text_box.history_text = text_box.toPlainText()
+        text_box.document().contentsChanged.connect(self.text_changed)
+
+    def text_changed(self):
+        # The document belongs to the box's text control, which belongs to the box
+        text_box = self.sender()
+        while text_box is not None and not isinstance(text_box, TextBox):
+            text_box = text_box.parent()
+        if text_box is None or text_box.scene() is not self:
+            return
+        text = text_box.toPlainText()
+        if text == text_box.history_text:
+            return
+        position, removed, inserted = diff_text(text_box.history_text, text)
+        text_box.history_text = text
+        self.history.push(EditText(self.item_id(text_box), position, removed, inserted))
+
+    #Positions of the items a press may start dragging, so the release can record how far they went
+    def begin_move(self):
+        movable = QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+        items = self.selectedItems()
+        if self.mouseGrabberItem() is not None:
+            items.append(self.mouseGrabberItem())
+        self.move_origins = {item: item.pos() for item in items
+                             if item.parentItem() is None and item.flags() & movable}
+
+    def end_move(self):
+        moves = {}
+        for item, origin in self.move_origins.items():
+            delta = item.pos() - origin
+            if item.scene() is self and not delta.isNull():
+                moves[self.item_id(item)] = (delta.x(), delta.y())
+        self.move_origins = {}
+        if moves:
+            self.history.push(MoveItems(moves))
 
     #Adds text box and resizing handles as a group so they are undone at once
     def add_text_box(self, text_box_item):
+        if text_box_item.start_time is None:
+            text_box_item.start_time = time.time() * 1000
         self.addItem(text_box_item)
-        self.add_item_to_undo(text_box_item)  # For complex items, group with handles if needed
+        self.track_text(text_box_item)
+        self.add_item_to_undo(text_box_item)
         print("TextBox added to scene:", text_box_item)
 
     # def add_shape(self, shape_item):
@@ -174,13 +492,15 @@ class BoardScene(QGraphicsScene):
         #Creates a 20 x 20 rectangle, using the current position and moving further left and up to set the left corner of the rectangle
         erase_item = self.items(QRectF(position - QPointF(eraser_radius, eraser_radius), QSizeF(eraser_radius * 2, eraser_radius * 2)))
 
-        #Removes all items within the rectangle
+        #Removes all items within the rectangle, as one step of the undo history
+        erased = []
         for item in erase_item:
             if item in self.highlight_items:
-                self.removeItem(item)
+                erased.append(item)
                 self.highlight_items.remove(item)
             elif isinstance(item, QGraphicsPathItem):
-                self.removeItem(item)
+                erased.append(item)
+        self.delete_items(erased)
 
     # def highlight(self, position):
     #     highlight_color = QColor(255, 255, 0, 10)
@@ -228,22 +548,26 @@ class BoardScene(QGraphicsScene):
                     self.path = QPainterPath()
                     self.previous_position = event.scenePos()
                     self.path.moveTo(self.previous_position)
-                    self.pathItem = QGraphicsPathItem()
+                    self.pathItem = StrokeItem()
                     my_pen = QPen(self.color, self.size)
                     my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                    self.pathItem.setPen(my_pen)
+                    self.styles.apply(self.pathItem, my_pen)
                     self.addItem(self.pathItem)
+                    self.begin_prediction(self.pathItem.pen(), self.previous_position)
+                    self.pathItem.record_time(time.time() * 1000)
                 elif self.active_tool == "highlighter":
                     print("Highlighter tool active")
                     self.highlighting = True
                     self.path_highlighter = QPainterPath()
                     self.previous_position_highlighter = event.scenePos()
                     self.path_highlighter.moveTo(self.previous_position_highlighter)
-                    self.pathItem_highlighter = QGraphicsPathItem()
+                    self.pathItem_highlighter = StrokeItem()
                     my_pen = QPen(self.color_highlighter, self.size_highlighter)
                     my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                    self.pathItem_highlighter.setPen(my_pen)
+                    self.styles.apply(self.pathItem_highlighter, my_pen)
                     self.addItem(self.pathItem_highlighter)
+                    self.begin_prediction(self.pathItem_highlighter.pen(), self.previous_position_highlighter)
+                    self.pathItem_highlighter.record_time(time.time() * 1000)
                 elif self.active_tool == "eraser":
                     print("Eraser tool active")
                     self.drawing = False
@@ -257,13 +581,14 @@ class BoardScene(QGraphicsScene):
                 self.path_highlighter = QPainterPath()
                 self.previous_position_highlighter = event.scenePos()
                 self.path_highlighter.moveTo(self.previous_position_highlighter)
-                self.pathItem_highlighter = QGraphicsPathItem()
+                self.pathItem_highlighter = StrokeItem()
                 self.size_highlighter = self.highlight_radius_options[self.i]
                 my_pen = QPen(self.color_highlighter, self.size_highlighter)
                 my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                self.pathItem_highlighter.setPen(my_pen)
+                self.styles.apply(self.pathItem_highlighter, my_pen)
                 self.addItem(self.pathItem_highlighter)
-                self.add_item_to_undo(self.pathItem_highlighter)
+                self.begin_prediction(self.pathItem_highlighter.pen(), self.previous_position_highlighter)
+                self.pathItem_highlighter.record_time(time.time() * 1000)
                 self.i += 1
                 if self.i >= len(self.highlight_radius_options):
                     self.i = 0
@@ -272,18 +597,20 @@ class BoardScene(QGraphicsScene):
                 self.path = QPainterPath()
                 self.previous_position = event.scenePos()
                 self.path.moveTo(self.previous_position)
-                self.pathItem = QGraphicsPathItem()
+                self.pathItem = StrokeItem()
                 self.size = self.pen_radius_options[self.j]
                 my_pen = QPen(self.color, self.size)
                 my_pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-                self.pathItem.setPen(my_pen)
+                self.styles.apply(self.pathItem, my_pen)
                 self.addItem(self.pathItem)
-                self.add_item_to_undo(self.pathItem)
+                self.begin_prediction(self.pathItem.pen(), self.previous_position)
+                self.pathItem.record_time(time.time() * 1000)
                 self.j += 1
                 if self.j >= len(self.pen_radius_options):
                     self.j = 0
 
         super().mousePressEvent(event)
+        self.begin_move()
 
     def mouseMoveEvent(self, event):
         if self.dragging_text_box and self.selected_text_box:
@@ -299,12 +626,16 @@ class BoardScene(QGraphicsScene):
             curr_position = event.scenePos()
             self.path.lineTo(curr_position)
             self.pathItem.setPath(self.path)
+            self.pathItem.record_time(time.time() * 1000)
+            self.update_prediction(curr_position)
             self.previous_position = curr_position
         elif self.highlighting:
             print("highlighting")
             curr_position = event.scenePos()
             self.path_highlighter.lineTo(curr_position)
             self.pathItem_highlighter.setPath(self.path_highlighter)
+            self.pathItem_highlighter.record_time(time.time() * 1000)
+            self.update_prediction(curr_position)
             self.previous_position_highlighter = curr_position
 
         super().mouseMoveEvent(event)
@@ -318,19 +649,64 @@ class BoardScene(QGraphicsScene):
                 # Add the completed path to the undo stack when drawing is finished so it can be deleted or added back with undo
                 self.add_item_to_undo(self.pathItem)
                 print("Path item added to undo stack:", self.pathItem)
-            elif self.active_tool == "highlighter":
+            elif self.highlighting:
                 self.add_item_to_undo(self.pathItem_highlighter)
                 print("Path item added to undo stack:", self.pathItem_highlighter)
+            self.end_prediction()
             self.drawing = False
             self.highlighting = False
             self.highlighting_enabled = False
             self.is_text_box_selected = False
 
         super().mouseReleaseEvent(event)
+        self.end_move()
+
+    #Starts predicting the pen tip for a new stroke drawn with this pen
+    def begin_prediction(self, pen, position):
+        self.end_prediction()
+        self.predictor.begin_stroke(position, time.perf_counter() * 1000)
+        if self.predictor.enabled:
+            self.prediction_overlay = PredictionOverlay(pen)
+
+    #Real samples replace the previous prediction, and a new one is drawn ahead of them
+    def update_prediction(self, position):
+        self.predictor.add_sample(position, time.perf_counter() * 1000)
+        if self.prediction_overlay is not None:
+            self.update(self.prediction_overlay.show_prediction(position, self.predictor.predict()))
+
+    def end_prediction(self):
+        self.predictor.end_stroke()
+        if self.prediction_overlay is not None:
+            self.update(self.prediction_overlay.bounding_rect())
+            self.prediction_overlay = None
+
     #Marks which tool (pen, eraser, highlighter) is being used so multiple don't run at once
     def set_active_tool(self, tool):
         self.active_tool = tool
 
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        self.page_template.draw(painter, rect)
+
+    #The predicted tip goes over everything on the page, and isn't one of its items
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        if self.prediction_overlay is not None:
+            painter.save()
+            self.prediction_overlay.paint(painter)
+            painter.restore()
+
+    def set_page_template(self, template):
+        self.page_template.set_template(template)
+        self.edits += 1
+
+        # Repaint only the background layer of each view; going through scene.update()
+        # would report the whole page as changed and throw away cached ink as well
+        for view in self.views():
+            visible = view.mapToScene(view.viewport().rect()).boundingRect()
+            view.invalidateScene(visible, QGraphicsScene.SceneLayer.BackgroundLayer)
+            view.viewport().update()
+
     # def shapes_menu(self):
     #     shapes_menu = QMenu()
     #     ellipse_action = shapes_menu.addAction("Ellipse")
@@ -367,7 +743,75 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.actionLoad.triggered.connect(self.load)
         self.actionNew.triggered.connect(self.new_tab)
         self.actionDocument.triggered.connect(self.display_help_doc)
-        self.actionClose.triggered.connect(sys.exit)
+        # Through closeEvent, which waits for saves and discards the journals of notebooks closed on purpose
+        self.actionClose.triggered.connect(self.close)
+
+        # Menus Bar: Files > Compact Notebook
+        self.action_compact = QAction("Compact Notebook", self)
+        self.menuFile.insertAction(self.actionClose, self.action_compact)
+        self.action_compact.triggered.connect(self.compact_notebook)
+        self.compaction_job = None
+
+        # Menus Bar: Files > Export
+        self.actionExport.triggered.connect(self.export)
+        self.export_job = None
+        self.export_progress = None
+
+        # Saves run one at a time, in order, so the last one started is the one left on disk
+        self.save_pool = QThreadPool(self)
+        self.save_pool.setMaxThreadCount(1)
+        self.save_jobs = set()
+
+        # Menus Bar: Options > Templates
+        templates_menu = QMenu(self)
+        self.template_actions = QActionGroup(self)
+        for template, name in TEMPLATES.items():
+            action = templates_menu.addAction(name)
+            action.setCheckable(True)
+            action.setData(template)
+            self.template_actions.addAction(action)
+        self.template_actions.triggered.connect(lambda action: self.set_page_template(action.data()))
+        templates_menu.aboutToShow.connect(self.sync_template_menu)
+        self.actionTemplates.setMenu(templates_menu)
+
+        # Menus Bar: Options > Predict Pen Strokes
+        self.action_stroke_prediction = self.menuOptions.addAction("Predict Pen Strokes")
+        self.action_stroke_prediction.setCheckable(True)
+        self.action_stroke_prediction.setChecked(True)
+        self.action_stroke_prediction.toggled.connect(self.set_stroke_prediction)
+
+        # Menus Bar: Options > Play Back Notebook
+        self.action_playback = self.menuOptions.addAction("Play Back Notebook")
+        self.action_playback.triggered.connect(self.open_playback)
+        self.playback = None
+
+        # Menus Bar: Options > Minimap
+        self.minimap = MinimapWidget()
+        self.minimap_dock = QDockWidget("Minimap", self)
+        self.minimap_dock.setObjectName(u"minimap_dock")
+        self.minimap_dock.setWidget(self.minimap)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.minimap_dock)
+        self.menuOptions.addAction(self.minimap_dock.toggleViewAction())
+        self.tabWidget.currentChanged.connect(self.sync_minimap)
+
+        # Menus Bar: Options > Search, over the text boxes of every notebook saved or opened here
+        self.search = search.SearchService(search.index_path(), self)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search notebooks")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_notebooks)
+        self.search_results = QListWidget()
+        self.search_results.itemActivated.connect(self.open_search_hit)
+        search_panel = QWidget()
+        search_layout = QVBoxLayout(search_panel)
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.addWidget(self.search_box)
+        search_layout.addWidget(self.search_results)
+        self.search_dock = QDockWidget("Search", self)
+        self.search_dock.setObjectName(u"search_dock")
+        self.search_dock.setWidget(search_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.search_dock)
+        self.menuOptions.addAction(self.search_dock.toggleViewAction())
 
         ############################################################################################################
         # Ensure all buttons behave properly when clicked
@@ -424,7 +868,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # self.gv_Canvas.setScene(self.scene)
         # self.gv_Canvas.setRenderHint(QPainter.RenderHint.Antialiasing, True)
 
-        self.redo_list = []
+        # Tabs show a preview of their page, redrawn in the background when it changed since they were last left
+        self.thumbnails = thumbnails.ThumbnailService(thumbnails.cache_path(), self)
+        self.thumbnails.updated.connect(self.show_thumbnail)
+        self.tabWidget.setIconSize(TAB_ICON_SIZE)
+        self.tabWidget.currentChanged.connect(self.refresh_thumbnails)
+
+        # Load picks from every notebook saved or opened here, and those in the folders added to the library
+        self.library = library.LibraryService(library.library_path(), self)
 
         self.new_tab()
 
@@ -432,7 +883,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().set_active_tool("pen")
 
         ## closes the tab/notebook when clicking the close button
-        self.tabWidget.tabCloseRequested.connect(self.tabWidget.removeTab)
+        self.tabWidget.tabCloseRequested.connect(self.close_tab)
+
+        self.recover_notebooks()
 
     #Upload Image
     def upload_image(self):
@@ -461,8 +914,17 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     # def shapes(self):
     #     self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().shapes_menu()
 
+    def set_page_template(self, template):
+        self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().set_page_template(template)
+
+    #Checks the template of the notebook that is currently open
+    def sync_template_menu(self):
+        template = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().page_template.template
+        for action in self.template_actions.actions():
+            action.setChecked(action.data() == template)
+
     def clear_canvas(self):
-        self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().clear()
+        self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().clear_page()
 
     # def color_dialog(self):
     #     color_dialog = QColorDialog()
@@ -609,193 +1071,560 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         QDesktopServices.openUrl(QUrl.fromLocalFile(path))
 
     def save(self):
-        directory, _filter = QFileDialog.getSaveFileName(self, "Save as Pickle", '', "Pickle (*.pkl)")
+        directory, selected = QFileDialog.getSaveFileName(self, "Save Notebook", '',
+                                                          "BestNotes Notebook (*.bnb);;"
+                                                          "BestNotes Database, saves only what changed (*.bndb);;"
+                                                          "Pickle (*.pkl)")
 
         if directory == "":
             return
+        if not directory.endswith(('.bnb', '.bndb', '.pkl')):
+            directory += notebook_store.EXTENSION if notebook_store.EXTENSION in selected else notebook_format.EXTENSION
+
+        self.save_notebook(directory)
+
+    #Takes a snapshot of the page here and leaves serializing and writing it to the save thread
+    def save_notebook(self, path, scene=None):
+        if scene is None:
+            scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        journal = scene.history.journal
+        # Pictures still left in the file are read first, as the save may replace the file or delete them from it
+        scene.assets.read_from(path)
+        if path.endswith(notebook_store.EXTENSION) and scene.bound_to(path):
+            # Only the items changed since the store was last saved or opened are looked at, written and journaled
+            job = SaveJob(path, self.store_changes(scene), encode_store_changes)
+            job.incremental = True
+            job.checkpoint = journal.checkpoint() if journal is not None else None
+        else:
+            saved_items = []
+            snapshot = self.snapshot_notebook(saved_items, scene)
+            if path.endswith(notebook_store.EXTENSION):
+                ids = [getattr(item, 'item_id', None) for item in saved_items]
+                if notebook_store.ids_in_stack_order(ids):
+                    snapshot['ids'] = ids
+            job = SaveJob(path, snapshot)
+            job.incremental = False
+            job.checkpoint = None
+            # The file may be the one the journal was based on, so the journal starts over from the page as saved
+            if journal is not None:
+                journal.start_compaction(self.page_snapshot(scene, snapshot, saved_items))
+        # What a save to a store covers is taken off the page's changes, and handed back if it fails
+        job.scene = scene
+        job.changed_ids = None
+        if path.endswith(notebook_store.EXTENSION):
+            job.changed_ids, scene.changed_ids = scene.changed_ids, set()
+        job.signals.progress.connect(self.save_progress)
+        job.signals.finished.connect(partial(self.save_finished, job))
+        job.signals.failed.connect(partial(self.save_failed, job))
+        self.save_jobs.add(job)
+        self.save_pool.start(job)
+        return job
+
+    #The saved form of the items changed since the page was last saved to or opened from its store, None for
+    #those removed since, for encode_store_changes
+    def store_changes(self, scene):
+        items = []
+        for item_id in sorted(scene.changed_ids):
+            item = scene.items_by_id.get(item_id)
+            items.append((item_id, snapshot_item(item, scene.styles, scene.assets)
+                          if item is not None and item.scene() is scene else None))
+        return {
+            'template': scene.page_template.template,
+            'styles': scene.styles.serialize(),
+            'assets': scene.assets.serialize({data['asset'] for _item_id, data in items
+                                              if data is not None and data['type'] == 'Image'}),
+            'items': items,
+        }
 
-        with open(directory, 'wb') as file:
-            # noinspection PyTypeChecker
-            pickle.dump(self.serialize_items(), file, protocol=pickle.HIGHEST_PROTOCOL)
-
+    def save_progress(self, done, total):
+        self.statusbar.showMessage(f"Saving... {done * 100 // max(total, 1)}%")
+
+    def save_finished(self, job, path):
+        self.save_jobs.discard(job)
+        self.statusbar.showMessage(f"Saved {path}", 5000)
+        scene = job.scene
+        if job.incremental or 'ids' in job.snapshot:
+            # Unless the whole page changed meanwhile, what changed since the snapshot is what the next save writes
+            if scene.changed_ids is not None:
+                changed_ids = scene.changed_ids
+                scene.bind_store(path)
+                scene.changed_ids = changed_ids
+            if job.checkpoint is not None:
+                scene.history.journal.saved(job.checkpoint, {
+                    'kind': 'file', 'path': os.path.abspath(path), 'styles': job.snapshot['styles'],
+                    'assets': scene.assets.serialize()})
+        if job.incremental:
+            # Only the changes were saved, so the text boxes and counts are read from the store
+            self.search.index(path)
+            self.library.scan(files=[path])
+        else:
+            self.search.index(path, thumbnails.file_version(path), search.text_boxes(job.snapshot))
+            # Listed from what was saved, the library never loads a pickle itself
+            self.library.scan(files=[path], opened={path: job.snapshot})
+        job.scene = None
+        garbage_collector.release_job(job)
+
+    def save_failed(self, job, path, error):
+        self.save_jobs.discard(job)
+        # The changes it was to write are still to be saved
+        if path.endswith(notebook_store.EXTENSION):
+            if job.changed_ids is None or job.scene.changed_ids is None:
+                job.scene.changed_ids = None
+            else:
+                job.scene.changed_ids |= job.changed_ids
+        if job.checkpoint is not None:
+            job.scene.history.journal.forget(job.checkpoint)
+        job.scene = None
+        garbage_collector.release_job(job)
+        self.statusbar.showMessage(f"Couldn't save {path}: {error}")
+
+    #Opens notebooks in the binary format, older pickles, and JSON saved by the collaboration client
     def load(self):
-        self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().clear()
-        directory, _filter = QFileDialog.getOpenFileName()
-        with open(directory, 'rb') as file:
-            items_data = pickle.load(file)
-            self.deserialize_items(items_data)
+        directory = library.LibraryDialog.get_notebook(self, self.library, self.thumbnails)
+        if directory == "":
+            return
+        self.open_notebook(directory)
+
+    #Opens the notebook file at path in the current tab; a file that can't be read leaves the tab as it was
+    def open_notebook(self, path):
+        view = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+        # Damaged parts are left out and the rest opened
+        damaged = []
+        # Chunked notebooks and notebook stores are opened lazily; older ones are read whole
+        try:
+            try:
+                notebook = StoreNotebook(path) if notebook_store.is_store(path) else LazyNotebook(path)
+            except ValueError:
+                notebook = None
+                notebook_data = notebook_format.read_notebook(path, damaged)
+        except Exception as error:
+            self.statusbar.showMessage(f"Couldn't open {path}: {error}")
+            return False
+        view.scene().clear()
+        # The journal starts over from the file, with the pens and images the page had before loading it
+        base = {'kind': 'file', 'path': os.path.abspath(path), 'styles': view.scene().styles.serialize(),
+                'assets': view.scene().assets.serialize()}
+        view.scene().damage_found.connect(self.show_damage, Qt.ConnectionType.UniqueConnection)
+        if notebook is not None:
+            view.scene().attach_notebook(notebook)
+            self.load_visible(view)
+        else:
+            self.deserialize_notebook(notebook_data)
+        for section in damaged:
+            self.show_damage(section)
+        # Saving to a store from now on writes only what changes
+        if isinstance(notebook, StoreNotebook):
+            view.scene().bind_store(path)
+        else:
+            view.scene().store_path = None
+            view.scene().changed_ids = set()
+        # Only once the file has loaded, so a journal is never based on a file it can't be replayed onto
+        if view.scene().history.journal is not None:
+            view.scene().history.journal.rebase(base)
+            # Replaying reads the file's images from it again, so only those added from now on are journaled
+            view.scene().history.journal.assets_written = len(view.scene().assets)
+        # Opened again unchanged, the file has the same version, so its thumbnail is kept
+        view.scene().notebook_id = thumbnails.notebook_id(path)
+        view.scene().content_base = thumbnails.file_version(path)
+        view.scene().edits = 0
+        # Files saved elsewhere, or before there was an index, are indexed as they are opened
+        self.search.index(path)
+        # A notebook read whole is listed from what was read, the library never loads a pickle itself
+        self.library.scan(files=[path], opened={path: notebook_data} if notebook is None else None)
+        return True
+
+    #Lists the text boxes matching the search box, best first, as it is typed in
+    def search_notebooks(self, text):
+        self.search_results.clear()
+        for hit in self.search.search(text):
+            result = QListWidgetItem(str(hit))
+            result.setToolTip(hit.path)
+            result.setData(Qt.ItemDataRole.UserRole, hit)
+            self.search_results.addItem(result)
+
+    #Goes to the text box a search hit is, in the notebook's tab or in a new one if it isn't open
+    def open_search_hit(self, result):
+        hit = result.data(Qt.ItemDataRole.UserRole)
+        notebook_id = thumbnails.notebook_id(hit.path)
+        for index in range(self.tabWidget.count()):
+            if self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene().notebook_id == notebook_id:
+                self.tabWidget.setCurrentIndex(index)
+                break
+        else:
+            if not os.path.exists(hit.path):
+                # Moved or deleted since it was indexed, so it is taken out of the index
+                self.search.index(hit.path)
+                self.search_results.takeItem(self.search_results.row(result))
+                self.statusbar.showMessage(f"{hit.path} is gone, it was taken out of the search index")
+                return
+            self.new_tab()
+            self.tabWidget.setCurrentIndex(self.tabWidget.count() - 1)
+            if not self.open_notebook(hit.path):
+                self.close_tab(self.tabWidget.count() - 1)
+                return
+        view = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+        position = QPointF(hit.x, hit.y)
+        view.centerOn(position)
+        view.scene().clearSelection()
+        for item in view.scene().items(QRectF(position, QSizeF(1, 1))):
+            if isinstance(item, TextBox) and (item.pos() - position).manhattanLength() < 1:
+                item.setSelected(True)
+                break
+
+    def show_damage(self, section):
+        self.statusbar.showMessage(f"Part of the notebook is damaged and was left out: {section}")
+
+    #Loads the strokes of a lazily opened notebook that are on screen or nearly so
+    def load_visible(self, view):
+        rect = view.visible_scene_rect()
+        dx, dy = rect.width() * PREFETCH_MARGIN, rect.height() * PREFETCH_MARGIN
+        view.scene().load_region(rect.adjusted(-dx, -dy, dx, dy))
+
+    #Notebook-wide settings are stored next to the items
+    def serialize_notebook(self, saved_items=None, scene=None):
+        return finish_notebook(self.snapshot_notebook(saved_items, scene))
+
+    #serialize_notebook, leaving strokes' paths as they are for finish_notebook to turn into elements
+    def snapshot_notebook(self, saved_items=None, scene=None):
+        if scene is None:
+            scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        scene.load_all()
+        # Items first, since strokes whose pen was set directly add it to the style table
+        items = self.snapshot_items(saved_items, scene)
+        return {
+            'template': scene.page_template.template,
+            'styles': scene.styles.serialize(),
+            # Only the images still on the page, each once however many items show it
+            'assets': scene.assets.serialize({data['asset'] for data in items if data['type'] == 'Image'}),
+            'items': items,
+        }
 
-    def serialize_items(self):
-        items_data = []
-        for item in self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().items():
-            if isinstance(item, TextBox):
-                items_data.append({
-                    'type': 'TextBox',
-                    'text': item.toPlainText(),
-                    'font': self.serialize_font(item.font()),
-                    'color': self.serialize_color(item.defaultTextColor()),
-                    'rotation': item.rotation(),
-                    'transform': self.serialize_transform(item.transform()),
-                    'x': item.pos().x(),
-                    'y': item.pos().y(),
-                    'name': item.toolTip(),
-                })
+    #ids and z_values, if given, are those of a page snapshot (see page_snapshot)
+    def deserialize_notebook(self, notebook_data, ids=None, z_values=None):
+        notebook_data = normalize_notebook(notebook_data)
 
-            elif isinstance(item, QGraphicsPathItem):
-                path_data = {
-                    'type': 'QGraphicsPathItem',
-                    'pen': self.serialize_pen(item.pen()),
-                    'brush': self.serialize_brush(item.brush()),
-                    'rotation': item.rotation(),
-                    'transform': self.serialize_transform(item.transform()),
-                    'x': item.pos().x(),
-                    'y': item.pos().y(),
-                    'name': item.toolTip(),
-                    'elements': self.serialize_path(item.path()),
-                }
-                items_data.append(path_data)
+        scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        scene.set_page_template(notebook_data.get('template', 'blank'))
+        scene.assets.update(notebook_data.get('assets', {}))
+        self.deserialize_items(notebook_data['items'], StyleTable.deserialize(notebook_data.get('styles', [])),
+                               ids, z_values)
+
+    #saved_items, if given, collects the scene items in the same order as the returned data
+    def serialize_items(self, saved_items=None, scene=None):
+        return [finish_item(data) for data in self.snapshot_items(saved_items, scene)]
+
+    def snapshot_items(self, saved_items=None, scene=None):
+        items_data = []
+        if scene is None:
+            scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        for item in scene.items():
+            if isinstance(item, (TextBox, QGraphicsPathItem, ResizablePixmapItem)):
+                items_data.append(snapshot_item(item, scene.styles, scene.assets))
+                if saved_items is not None:
+                    saved_items.append(item)
 
         return items_data
 
+    #Drops erased, degenerate and off-page strokes; the analysis runs on a worker thread
+    def compact_notebook(self):
+        if self.compaction_job is not None:
+            return
+        scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        saved_items = []
+        self.compaction_job = CompactionJob(self.snapshot_notebook(saved_items, scene))
+        self.compaction_job.signals.finished.connect(
+            lambda compacted, report: self.compaction_finished(scene, saved_items, report))
+        self.action_compact.setEnabled(False)
+        self.statusbar.showMessage("Compacting notebook...")
+        QThreadPool.globalInstance().start(self.compaction_job)
+
+    #Exports every notebook tab as a page; the pages are rendered by worker processes from a snapshot of them
+    def export(self):
+        if self.export_job is not None:
+            return
+        path, selected = QFileDialog.getSaveFileName(self, "Export Notebook", '',
+                                                     "PDF (*.pdf);;PNG Images (*.png);;SVG Images (*.svg)")
+        if path == "":
+            return
+        format = os.path.splitext(path)[1][1:].lower()
+        if format not in EXPORT_FORMATS:
+            format = selected[selected.rindex('.') + 1:-1] if '.' in selected else 'pdf'
+            path += '.' + format
+        self.export_notebooks(path, format)
+
+    def export_notebooks(self, path, format, workers=None):
+        pages = []
+        for index in range(self.tabWidget.count()):
+            scene = self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene()
+            pages.append(self.snapshot_notebook(None, scene))
+        self.export_job = ExportJob(path, format, pages, workers)
+        self.export_job.signals.progress.connect(self.export_progressed)
+        self.export_job.signals.finished.connect(self.export_finished)
+        self.export_job.signals.cancelled.connect(self.export_cancelled)
+        self.export_job.signals.failed.connect(self.export_failed)
+        self.export_progress = QProgressDialog("Exporting notebook...", "Cancel", 0, len(pages), self)
+        self.export_progress.canceled.connect(self.export_job.cancel)
+        self.actionExport.setEnabled(False)
+        QThreadPool.globalInstance().start(self.export_job)
+        return self.export_job
+
+    def export_progressed(self, done, total):
+        self.export_progress.setValue(done)
+        self.statusbar.showMessage(f"Exporting... page {done} of {total}")
+
+    def export_finished(self, path):
+        self.export_ended(f"Exported {path}")
+
+    def export_cancelled(self, path):
+        self.export_ended(f"Export to {path} cancelled")
+
+    def export_failed(self, path, error):
+        self.export_ended(f"Couldn't export {path}: {error}")
+
+    def export_ended(self, message):
+        garbage_collector.release_job(self.export_job)
+        self.export_job = None
+        self.export_progress.canceled.disconnect()
+        self.export_progress.close()
+        self.export_progress = None
+        self.actionExport.setEnabled(True)
+        self.statusbar.showMessage(message, 5000)
+
+    def compaction_finished(self, scene, saved_items, report):
+        garbage_collector.release_job(self.compaction_job)
+        self.compaction_job = None
+        self.action_compact.setEnabled(True)
+
+        # Items are removed in place, so anything drawn while the worker ran is kept, and undo brings them back.
+        # A page cleared in the meantime is left alone
+        if scene.views():
+            scene.delete_items([saved_items[index] for index in report.dead])
+
+        self.statusbar.showMessage(str(report))
+
     def serialize_color(self, color: QColor):
-        return {
-            'red': color.red(),
-            'green': color.green(),
-            'blue': color.blue(),
-            'alpha': color.alpha(),
-        }
+        return codec.serialize_color(color)
 
     def serialize_pen(self, pen: QPen):
-        return {
-            'width': pen.width(),
-            'color': self.serialize_color(pen.color()),
-            'style': pen.style(),
-            'capstyle': pen.capStyle(),
-            'joinstyle': pen.joinStyle()
-        }
+        return style_table.serialize_pen(pen)
 
     def serialize_brush(self, brush: QBrush):
-        return {
-            'color': self.serialize_color(brush.color()),
-            'style': brush.style()
-        }
+        return codec.serialize_brush(brush)
 
     def serialize_font(self, font: QFont):
-        return {
-            'family': font.family(),
-            'pointsize': font.pixelSize(),
-            'letterspacing': font.letterSpacing(),
-            'bold': font.bold(),
-            'italic': font.italic(),
-            'underline': font.underline(),
-        }
+        return codec.serialize_font(font)
 
     def serialize_transform(self, transform: QTransform):
-        return {
-            'm11': transform.m11(),
-            'm12': transform.m12(),
-            'm13': transform.m13(),
-            'm21': transform.m21(),
-            'm22': transform.m22(),
-            'm23': transform.m23(),
-            'm31': transform.m31(),
-            'm32': transform.m32(),
-            'm33': transform.m33()
-        }
+        return codec.serialize_transform(transform)
 
     def serialize_path(self, path: QPainterPath):
-        elements = []
-        for i in range(path.elementCount()):
-            element = path.elementAt(i)
-            if element.isMoveTo():
-                elements.append({'type': 'moveTo', 'x': element.x, 'y': element.y})
-            elif element.isLineTo():
-                elements.append({'type': 'lineTo', 'x': element.x, 'y': element.y})
-            elif element.isCurveTo():
-                elements.append({'type': 'curveTo', 'x': element.x, 'y': element.y})
-        return elements
-
-    def deserialize_items(self, items_data):
-        for item_data in items_data:
-            if item_data['type'] == 'TextBox':
-                item = self.deserialize_text_item(item_data)
-            elif item_data['type'] == 'QGraphicsPathItem':
-                item = self.deserialize_path_item(item_data)
+        return codec.serialize_path(path)
 
-            # Add item
-            self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene().addItem(item)
+    def deserialize_items(self, items_data, styles=None, ids=None, z_values=None):
+        scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        # Saved items are topmost first, and each item added goes on top
+        for number in reversed(range(len(items_data))):
+            scene.add_saved_item(number, items_data[number], styles,
+                                 ids[number] if ids is not None else -1 - number,
+                                 z_values[number] if z_values is not None else -1 - number)
+            garbage_collector.collect_due()
 
     def deserialize_color(self, color):
-        return QColor(color['red'], color['green'], color['blue'], color['alpha'])
+        return codec.deserialize_color(color)
 
     def deserialize_pen(self, data):
-        pen = QPen()
-        pen.setWidth(data['width'])
-        pen.setColor(self.deserialize_color(data['color']))
-        pen.setStyle(data['style'])
-        pen.setCapStyle(data['capstyle'])
-        pen.setJoinStyle(data['joinstyle'])
-        return pen
+        return style_table.deserialize_pen(data)
 
     def deserialize_brush(self, data):
-        brush = QBrush()
-        brush.setColor(self.deserialize_color(data['color']))
-        brush.setStyle(data['style'])
-        return brush
+        return codec.deserialize_brush(data)
 
     def deserialize_font(self, data):
-        font = QFont()
-        font.setFamily(data['family'])
-        font.setPixelSize(data['pointsize'])
-        font.setLetterSpacing(QFont.AbsoluteSpacing, data['letterspacing'])
-        font.setBold(data['bold'])
-        font.setItalic(data['italic'])
-        font.setUnderline(data['underline'])
-        return font
+        return codec.deserialize_font(data)
 
     def deserialize_transform(self, data):
-        transform = QTransform(
-            data['m11'], data['m12'], data['m13'],
-            data['m21'], data['m22'], data['m23'],
-            data['m31'], data['m32'], data['m33']
-        )
-        return transform
+        return codec.transform_from_dict(data)
 
     def deserialize_text_item(self, data):
-        text_item = TextBox()
-        text_item.setFont(self.deserialize_font(data['font']))
-        text_item.setDefaultTextColor(self.deserialize_color(data['color']))
-        text_item.setRotation(data['rotation'])
-        text_item.setTransform(self.deserialize_transform(data['transform']))
-        text_item.setPos(data['x'], data['y'])
-        text_item.setToolTip(data['name'])
-        text_item.setPlainText(data['text'])
-        return text_item
-
-    def deserialize_path_item(self, data):
-        sub_path = QPainterPath()
-        for element in data['elements']:
-            if element['type'] == 'moveTo':
-                sub_path.moveTo(element['x'], element['y'])
-            elif element['type'] == 'lineTo':
-                sub_path.lineTo(element['x'], element['y'])
-            elif element['type'] == 'curveTo':
-                sub_path.cubicTo(element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'])
-
-        path_item = QGraphicsPathItem(sub_path)
-        path_item.setPen(self.deserialize_pen(data['pen']))
-        path_item.setBrush(self.deserialize_brush(data['brush']))
-        path_item.setRotation(data['rotation'])
-        path_item.setTransform(self.deserialize_transform(data['transform']))
-        path_item.setPos(data['x'], data['y'])
-        path_item.setToolTip(data['name'])
-
-        return path_item
+        return deserialize_item(data, None, None)
+
+    def deserialize_path_item(self, data, styles=None):
+        scene = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas').scene()
+        return deserialize_item(data, styles, scene.styles, scene.assets)
+
+    #The page as an autosave snapshot: its notebook data, and the ids and stacking its history refers to
+    def page_snapshot(self, scene, notebook_data, saved_items):
+        return {
+            'kind': 'snapshot',
+            'notebook': notebook_data,
+            'ids': [getattr(item, 'item_id', None) for item in saved_items],
+            'z_values': [item.zValue() for item in saved_items],
+            'next_item_id': scene.next_item_id,
+            'styles': notebook_data['styles'],
+            'assets': scene.assets.serialize(),
+        }
+
+    #Folds a notebook's autosave journal into a snapshot once it has grown big
+    def compact_journal(self, view):
+        scene = view.scene()
+        # A snapshot of a lazily opened notebook would decode all of it, so that waits until it is
+        if scene.lazy_notebook is not None or scene.history.journal is None:
+            return
+        saved_items = []
+        snapshot = self.snapshot_notebook(saved_items, scene)
+        scene.history.journal.start_compaction(self.page_snapshot(scene, snapshot, saved_items))
+
+    def attach_journal(self, view, journal):
+        view.scene().history.journal = journal
+        journal.compaction_due.connect(partial(self.compact_journal, view))
+
+    #Reopens the notebooks a crash left autosave journals of, each in a tab of its own. A journal that can't be
+    #replayed is set aside rather than stopping the window from opening, now and at every start after
+    def recover_notebooks(self):
+        recovered = 0
+        unrecovered = []
+        for path, lock in autosave.orphaned_journals(autosave.journal_directory()):
+            try:
+                base, records, length = autosave.read_journal(path)
+            except (OSError, ValueError, pickle.UnpicklingError, zlib.error) as error:
+                unrecovered.append(f"{autosave.quarantine(path, lock)} ({error})")
+                continue
+
+            self.new_tab()
+            index = self.tabWidget.count() - 1
+            self.tabWidget.setCurrentIndex(index)
+            view = self.tabWidget.currentWidget().findChild(QGraphicsView, 'gv_Canvas')
+            # The replayed edits are in the journal already
+            view.scene().history.journal.discard()
+            view.scene().history.journal = None
+            try:
+                self.replay_journal(view, base, records)
+            except Exception as error:
+                # E.g. the notebook file the journal was based on was moved, deleted or can't be read any more
+                self.tabWidget.removeTab(index)
+                unrecovered.append(f"{autosave.quarantine(path, lock)} ({error})")
+                continue
+
+            # The tab carries on with the old journal
+            journal = autosave.Journal(None, path, lock, length)
+            journal.base = base
+            journal.styles_written = len(view.scene().styles)
+            journal.assets_written = len(view.scene().assets)
+            self.attach_journal(view, journal)
+            recovered += 1
+
+        messages = []
+        if recovered:
+            messages.append(f"Recovered {recovered} notebook(s) after an unexpected exit")
+        if unrecovered:
+            messages.append(f"Couldn't recover {len(unrecovered)} notebook(s), their journals were kept as "
+                            + ", ".join(unrecovered))
+        if messages:
+            self.statusbar.showMessage(". ".join(messages))
+
+    #Rebuilds the page in view from an autosave journal's base and records, undo history included
+    def replay_journal(self, view, base, records):
+        history = view.scene().history
+        # Loading the base interns the pens it uses, which then keep the indices the records give them
+        view.scene().styles = autosave.journal_styles(base, records)
+        view.scene().assets = autosave.journal_assets(base, records)
+        if base['kind'] == 'file' and notebook_store.is_store(base['path']):
+            # Items of a store have the ids its rows give them, as when it was opened, not their place in it
+            notebook = StoreNotebook(base['path'])
+            view.scene().attach_notebook(notebook)
+            view.scene().load_all()
+            view.scene().bind_store(base['path'])
+        elif base['kind'] == 'file':
+            self.deserialize_notebook(notebook_format.read_notebook(base['path']))
+        elif base['kind'] == 'snapshot':
+            self.deserialize_notebook(base['notebook'], base['ids'], base['z_values'])
+            view.scene().next_item_id = base['next_item_id']
+        for kind, command in records:
+            if kind in (autosave.STYLES, autosave.ASSETS):
+                continue
+            if kind == autosave.UNDO:
+                history.undo()
+            elif kind == autosave.REDO:
+                history.redo()
+            elif command is None:
+                view.scene().clear_page()
+            else:
+                history.replay(command, merged=kind == autosave.MERGE)
+            garbage_collector.collect_due()
+
+    #Closing a notebook on purpose leaves nothing to recover
+    def close_tab(self, index):
+        self.discard_journal(index)
+        # Files keep their thumbnails for the next time they are opened
+        notebook_id = self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene().notebook_id
+        if notebook_id.startswith('untitled-'):
+            self.thumbnails.forget(notebook_id)
+        self.tabWidget.removeTab(index)
+
+    def discard_journal(self, index):
+        journal = self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene().history.journal
+        if journal is not None:
+            journal.discard()
+
+    def closeEvent(self, event):
+        # Saves already started still finish, an export is given up
+        self.save_pool.waitForDone()
+        if self.export_job is not None:
+            self.export_job.cancel()
+        self.thumbnails.close()
+        self.search.close()
+        self.library.close()
+        for index in range(self.tabWidget.count()):
+            self.discard_journal(index)
+        super().closeEvent(event)
+
+    def set_stroke_prediction(self, enabled):
+        # Applies to every open notebook, new tabs pick it up in new_tab
+        for index in range(self.tabWidget.count()):
+            self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene().predictor.enabled = enabled
+
+    #Replays a snapshot of the current notebook in its own window
+    def open_playback(self):
+        notebook_data = self.serialize_notebook()
+        styles = StyleTable.deserialize(notebook_data['styles'])
+        items = []
+        for item_data in notebook_data['items']:
+            if item_data['type'] == 'TextBox':
+                items.append(self.deserialize_text_item(item_data))
+            else:
+                items.append(self.deserialize_path_item(item_data, styles))
+
+        self.playback = PlaybackWindow(notebook_data, items)
+        self.playback.show()
+
+    #Requests new thumbnails of the pages that changed. A lazily opened notebook is drawn from its file while
+    #unedited, and keeps the thumbnail it has once edited, rather than being decoded whole for it
+    def refresh_thumbnails(self):
+        for index in range(self.tabWidget.count()):
+            scene = self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene()
+            # A tab just added has no scene yet
+            if scene is None:
+                continue
+            if scene.lazy_notebook is None:
+                self.thumbnails.request(scene.notebook_id, 0, scene.content_version,
+                                        partial(self.snapshot_notebook, None, scene))
+            elif scene.edits == 0:
+                self.thumbnails.request(scene.notebook_id, 0, scene.content_version,
+                                        partial(str, scene.lazy_notebook.path))
+            if self.tabWidget.tabIcon(index).isNull():
+                self.show_thumbnail(scene.notebook_id, 0)
+
+    def show_thumbnail(self, notebook_id, page):
+        for index in range(self.tabWidget.count()):
+            scene = self.tabWidget.widget(index).findChild(QGraphicsView, 'gv_Canvas').scene()
+            if scene is not None and scene.notebook_id == notebook_id:
+                image = self.thumbnails.thumbnail(notebook_id, page)
+                if image is not None:
+                    self.tabWidget.setTabIcon(index, QIcon(QPixmap.fromImage(image)))
+
+    def sync_minimap(self):
+        # The minimap follows whichever notebook tab is showing
+        notebook = self.tabWidget.currentWidget()
+        self.minimap.set_view(notebook.findChild(QGraphicsView, 'gv_Canvas') if notebook is not None else None)
 
     def new_tab(self):
         #adds a new tab that contains the widget canvas
@@ -805,11 +1634,17 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.scene = BoardScene()
         NewNotebook.get_canvas(NewNotebook).setScene(self.scene)
         NewNotebook.get_canvas(NewNotebook).setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        NewNotebook.get_canvas(NewNotebook).view_moved.connect(partial(self.load_visible, NewNotebook.get_canvas(NewNotebook)))
+        self.scene.predictor.enabled = self.action_stroke_prediction.isChecked()
+        self.attach_journal(NewNotebook.get_canvas(NewNotebook), autosave.Journal(autosave.journal_directory()))
 
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    # Saves and snapshots run on worker threads, which must never be the ones freeing Qt objects, so the
+    # whole process collects garbage on the GUI thread (see garbage_collector)
+    garbage_collector.install(app)
 
     window = MainWindow()
     window.show()
@@ -0,0 +1,249 @@
+import itertools
+import math
+
+from PySide6.QtCore import QObject, QTimer, Signal, Qt, QRectF, QPointF
+from PySide6.QtGui import QPainter, QPainterPath, QPen, QColor, QBrush, QTransform, QPixmap
+from PySide6.QtWidgets import QWidget, QSizePolicy
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.ink_tiles import TILE_SIZE, TileJob, snapshot_stroke, tile_pool, StrokeSnapshot, \
+    _TileSignals
+from WhiteboardApplication.stroke_item import StrokeItem
+
+MINIMAP_SCALE = 0.125  # Cache pixels per scene unit
+REFRESH_DELAY = 250  # ms to wait after the last change before re-rendering dirty chunks
+
+PAGE_COLOR = QColor("#FFFFFF")
+OUTSIDE_COLOR = QColor("#DCDCDC")
+PLACEHOLDER_COLOR = QColor(150, 150, 150, 120)
+VIEWPORT_COLOR = QColor(30, 120, 220)
+
+
+def placeholder_snapshot(item):
+    """Grey block standing in for an item the workers can't paint (text boxes, images)."""
+    path = QPainterPath()
+    path.addRect(item.sceneBoundingRect())
+    return StrokeSnapshot(path, QPen(Qt.PenStyle.NoPen), QBrush(PLACEHOLDER_COLOR), QTransform(), 1.0, None)
+
+
+class MinimapCache(QObject):
+    """Low-resolution image of a whole scene, kept as chunks that are re-rendered only where the scene changed.
+
+    Chunks are TILE_SIZE pixels at MINIMAP_SCALE and are rendered by the ink tile workers, so the
+    scene itself is never rendered for the minimap.
+    """
+
+    updated = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.scene = None
+        self.extent = QRectF()
+
+        self._chunks = {}  # (column, row) -> QImage
+        self._pending = {}  # (column, row) -> TileJob
+        self._jobs = {}  # generation -> TileJob started and not released yet, pending or cancelled
+        self._dirty = set()
+        self._generations = itertools.count(1)
+
+        self._signals = _TileSignals()
+        self._signals.finished.connect(self._chunk_finished)
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+    def set_scene(self, scene):
+        if self.scene is not None:
+            self.scene.changed.disconnect(self.invalidate)
+        for key in list(self._pending):
+            self._cancel(key)
+        self._chunks.clear()
+        self._dirty.clear()
+
+        self.scene = scene
+        self.extent = QRectF()
+        if scene is not None:
+            scene.changed.connect(self.invalidate)
+            # One full pass over the items; afterwards only the changed chunks are touched
+            self.extent = scene.sceneRect().united(scene.itemsBoundingRect())
+            self._mark_dirty(self.extent)
+            self._refresh_timer.start(0)
+        self.updated.emit()
+
+    def chunks(self):
+        """(scene rect, image) for every rendered chunk."""
+        return [(self.chunk_scene_rect(key), image) for key, image in self._chunks.items()]
+
+    @staticmethod
+    def chunk_scene_rect(key):
+        size = TILE_SIZE / MINIMAP_SCALE
+        return QRectF(key[0] * size, key[1] * size, size, size)
+
+    @staticmethod
+    def keys_for_rect(rect):
+        size = TILE_SIZE / MINIMAP_SCALE
+        left, top = math.floor(rect.left() / size), math.floor(rect.top() / size)
+        right, bottom = math.ceil(rect.right() / size), math.ceil(rect.bottom() / size)
+        return [(column, row) for row in range(top, max(bottom, top + 1))
+                for column in range(left, max(right, left + 1))]
+
+    def invalidate(self, rects):
+        grown = False
+        for rect in rects:
+            if rect.isEmpty():
+                continue
+            if not self.extent.contains(rect):
+                self.extent = self.extent.united(rect)
+                grown = True
+            self._mark_dirty(rect)
+        if grown:
+            self.updated.emit()
+        # Restarted on every change, so strokes are picked up once the pen lifts
+        self._refresh_timer.start(REFRESH_DELAY)
+
+    def _mark_dirty(self, rect):
+        self._dirty.update(self.keys_for_rect(rect.adjusted(-1, -1, 1, 1)))
+
+    def refresh(self):
+        """Queue a render for every dirty chunk; the old image stays up until its replacement lands."""
+        if self.scene is None:
+            return
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            if key in self._pending:
+                self._cancel(key)
+            self._start_job(key)
+
+    def _start_job(self, key):
+        rect = self.chunk_scene_rect(key)
+        snapshots = []
+        for item in self.scene.items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect,
+                                     Qt.SortOrder.AscendingOrder):
+            if not item.isVisible():
+                continue
+            if isinstance(item, StrokeItem):
+                snapshots.append(snapshot_stroke(item))
+            elif item.topLevelItem() is item:
+                snapshots.append(placeholder_snapshot(item))
+
+        if not snapshots:
+            if self._chunks.pop(key, None) is not None:
+                self.updated.emit()
+            return
+
+        transform = QTransform.fromScale(MINIMAP_SCALE, MINIMAP_SCALE) * QTransform.fromTranslate(
+            -key[0] * TILE_SIZE, -key[1] * TILE_SIZE)
+        job = TileJob(key, next(self._generations), snapshots, transform, TILE_SIZE, 1.0, self._signals)
+        self._pending[key] = job
+        self._jobs[job.generation] = job
+        # Behind the canvas tiles, which are what the user is looking at
+        tile_pool().start(job, -1)
+
+    def _cancel(self, key):
+        job = self._pending.pop(key)
+        job.cancelled = True
+        # One that has started reports back and is released then
+        if tile_pool().tryTake(job):
+            del self._jobs[job.generation]
+            garbage_collector.release_job(job, keep_signals=True)
+
+    def _chunk_finished(self, key, generation, image):
+        finished = self._jobs.pop(generation, None)
+        if finished is not None:
+            garbage_collector.release_job(finished, keep_signals=True)
+        job = self._pending.get(key)
+        if image.isNull() or job is None or job.generation != generation:
+            return
+        del self._pending[key]
+        self._chunks[key] = image
+        self.updated.emit()
+
+
+class MinimapWidget(QWidget):
+    """Overview of the current notebook with its visible area; click to jump, drag to pan."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(120, 150)
+        self.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Expanding)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+
+        # Each canvas keeps its own cache, so switching tabs doesn't re-render anything
+        self.view = None
+        # Chunks scaled down to the widget, rebuilt only when the cache or the widget size changes,
+        # so moving the view repaints with a single blit
+        self._composed = None
+
+    def set_view(self, view):
+        if self.view is not None:
+            self.view.view_moved.disconnect(self.update)
+            self.view.minimap_cache.updated.disconnect(self._cache_updated)
+        self.view = view
+        if view is not None:
+            view.view_moved.connect(self.update)
+            view.minimap_cache.updated.connect(self._cache_updated)
+        self._cache_updated()
+
+    def _cache_updated(self):
+        self._composed = None
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._composed = None
+
+    def scene_transform(self):
+        """Scene to widget transform that fits the whole notebook into the widget."""
+        extent = self.view.minimap_cache.extent if self.view is not None else QRectF()
+        if extent.isEmpty():
+            return QTransform()
+        scale = min(self.width() / extent.width(), self.height() / extent.height())
+        dx = (self.width() - extent.width() * scale) / 2 - extent.left() * scale
+        dy = (self.height() - extent.height() * scale) / 2 - extent.top() * scale
+        return QTransform(scale, 0, 0, scale, dx, dy)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.view is None or self.view.scene() is None:
+            painter.fillRect(self.rect(), OUTSIDE_COLOR)
+            return
+
+        if self._composed is None:
+            self._composed = self._compose()
+        painter.drawPixmap(0, 0, self._composed)
+
+        transform = self.scene_transform()
+        painter.setPen(QPen(VIEWPORT_COLOR, 2))
+        painter.setBrush(QColor(VIEWPORT_COLOR.red(), VIEWPORT_COLOR.green(), VIEWPORT_COLOR.blue(), 30))
+        painter.drawRect(transform.mapRect(self.view.visible_scene_rect()))
+
+    def _compose(self):
+        dpr = self.devicePixelRatioF()
+        composed = QPixmap(round(self.width() * dpr), round(self.height() * dpr))
+        composed.setDevicePixelRatio(dpr)
+        composed.fill(OUTSIDE_COLOR)
+
+        transform = self.scene_transform()
+        painter = QPainter(composed)
+        painter.fillRect(transform.mapRect(self.view.scene().sceneRect()), PAGE_COLOR)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+        for rect, image in self.view.minimap_cache.chunks():
+            painter.drawImage(transform.mapRect(rect), image)
+        painter.end()
+        return composed
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._jump(event.position())
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.MouseButton.LeftButton:
+            self._jump(event.position())
+
+    def _jump(self, position):
+        if self.view is None:
+            return
+        inverted, invertible = self.scene_transform().inverted()
+        if invertible:
+            self.view.center_on(inverted.map(QPointF(position)))
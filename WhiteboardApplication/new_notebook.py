@@ -3,6 +3,8 @@ from PySide6.QtGui import QCursor
 from PySide6.QtWidgets import QAbstractScrollArea, QSizePolicy, QGraphicsView, QHBoxLayout, QWidget, QScrollArea, \
     QGridLayout
 
+from WhiteboardApplication.canvas_view import CanvasView
+
 
 class NewNotebook:
     def add_new_notebook(self):
@@ -39,7 +41,7 @@ class NewNotebook:
 
         self.scrollAreaWidgetContents_3.setLayout(self.horizontalLayout_2)
 
-        self.gv_Canvas = QGraphicsView()
+        self.gv_Canvas = CanvasView()
         self.gv_Canvas.setObjectName(u"gv_Canvas")
         sizePolicy1 = QSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
         sizePolicy1.setHorizontalStretch(0)
@@ -55,6 +57,12 @@ class NewNotebook:
 
         self.horizontalLayout_2.addWidget(self.gv_Canvas)
 
+        # The page is scrolled by the surrounding scroll area, so its scrollbars count as panning
+        self.scrollArea_2.verticalScrollBar().valueChanged.connect(self.gv_Canvas.begin_interaction)
+        self.scrollArea_2.horizontalScrollBar().valueChanged.connect(self.gv_Canvas.begin_interaction)
+        self.scrollArea_2.verticalScrollBar().valueChanged.connect(self.gv_Canvas.view_moved)
+        self.scrollArea_2.horizontalScrollBar().valueChanged.connect(self.gv_Canvas.view_moved)
+
         self.notebook.setLayout(self.gridLayout)
 
         return self.notebook
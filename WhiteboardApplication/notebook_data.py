@@ -0,0 +1,321 @@
+import sys
+from array import array
+
+import numpy
+
+from PySide6.QtGui import QPainterPath, QTransform, QBrush, QColor, QFont, QPixmap
+from PySide6.QtCore import QRectF, Qt, QBuffer, QByteArray, QIODevice
+from PySide6.QtWidgets import QGraphicsPathItem
+
+from WhiteboardApplication import geometry
+from WhiteboardApplication.style_table import deserialize_pen
+from WhiteboardApplication.stroke_item import StrokeItem
+from WhiteboardApplication.text_box import TextBox
+from WhiteboardApplication.resize_handle_image import ResizablePixmapItem
+
+# Scene rect every BoardScene starts with; the canvas widget showing it is CANVAS_SIZE pixels
+SCENE_RECT = QRectF(0, 0, 600, 500)
+CANVAS_SIZE = (850, 1100)
+
+
+# Kinds of saved path elements, as stored in PackedElements.kinds
+ELEMENT_TYPES = ('moveTo', 'lineTo', 'curveTo')
+MOVE_TO, LINE_TO, CURVE_TO = range(3)
+
+
+class PackedElements:
+    """A stroke's path elements as parallel arrays: one kind byte and an x and y per element.
+
+    Reads like the list of {'type', 'x', 'y'} dicts older notebooks hold, so code indexing,
+    slicing or iterating saved elements works with either, at a fraction of the memory.
+    """
+    __slots__ = ('kinds', 'xs', 'ys')
+
+    def __init__(self, kinds=b'', xs=None, ys=None):
+        self.kinds = bytes(kinds)
+        self.xs = xs if xs is not None else array('d')
+        self.ys = ys if ys is not None else array('d')
+
+    @classmethod
+    def from_dicts(cls, elements):
+        if isinstance(elements, cls):
+            return elements
+        kinds = bytes(ELEMENT_TYPES.index(element['type']) for element in elements)
+        return cls(kinds, array('d', [element['x'] for element in elements]),
+                   array('d', [element['y'] for element in elements]))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PackedElements(self.kinds[index], self.xs[index], self.ys[index])
+        return {'type': ELEMENT_TYPES[self.kinds[index]], 'x': self.xs[index], 'y': self.ys[index]}
+
+    def __iter__(self):
+        for kind, x, y in zip(self.kinds, self.xs, self.ys):
+            yield {'type': ELEMENT_TYPES[kind], 'x': x, 'y': y}
+
+    def __eq__(self, other):
+        if not isinstance(other, PackedElements):
+            return NotImplemented
+        return self.kinds == other.kinds and list(self.xs) == list(other.xs) and list(self.ys) == list(other.ys)
+
+    def __getstate__(self):
+        return self.kinds, self.xs, self.ys
+
+    def __setstate__(self, state):
+        self.kinds, self.xs, self.ys = state
+
+
+def path_from_elements(elements):
+    """Rebuild a stroke's QPainterPath from its saved elements."""
+    if not isinstance(elements, PackedElements):
+        elements = PackedElements.from_dicts(elements)
+    kinds = numpy.frombuffer(elements.kinds, dtype=numpy.uint8)
+    points = numpy.column_stack((numpy.asarray(elements.xs), numpy.asarray(elements.ys))).astype(numpy.float64, copy=False)
+    # What moveTo and lineTo would drop, then each curveTo as the cubicTo(p, p, p) it was drawn
+    # with: a curveTo element and two curveToData at its point
+    kinds, points = geometry.drop_repeats(kinds, points)
+    curves = kinds == CURVE_TO
+    if curves.any():
+        counts = numpy.where(curves, 3, 1)
+        expanded = numpy.full(counts.sum(), geometry.CURVE_TO_DATA, dtype=numpy.uint8)
+        expanded[numpy.cumsum(counts) - counts] = kinds
+        kinds, points = expanded, numpy.repeat(points, counts, axis=0)
+    return geometry.path_from_arrays(kinds, points)
+
+
+def serialize_path(path: QPainterPath):
+    kinds, points = geometry.path_to_arrays(path)
+    # Qt's element types run moveTo, lineTo, curveTo, as in ELEMENT_TYPES, then curveToData,
+    # the control points, which aren't saved
+    saved = kinds <= CURVE_TO
+    return PackedElements(kinds[saved].tobytes(), array('d', points[saved, 0].tobytes()),
+                          array('d', points[saved, 1].tobytes()))
+
+
+def serialize_transform(transform: QTransform):
+    return {
+        'm11': transform.m11(), 'm12': transform.m12(), 'm13': transform.m13(),
+        'm21': transform.m21(), 'm22': transform.m22(), 'm23': transform.m23(),
+        'm31': transform.m31(), 'm32': transform.m32(), 'm33': transform.m33(),
+    }
+
+
+def transform_from_dict(data):
+    return QTransform(data['m11'], data['m12'], data['m13'],
+                      data['m21'], data['m22'], data['m23'],
+                      data['m31'], data['m32'], data['m33'])
+
+
+def item_scene_transform(item_data):
+    """Item to scene transform of a saved item, composed the way QGraphicsItem does it."""
+    transform = transform_from_dict(item_data['transform'])
+    transform *= QTransform().rotate(item_data['rotation'])
+    transform *= QTransform.fromTranslate(item_data['x'], item_data['y'])
+    return transform
+
+
+def item_pen(notebook_data, item_data):
+    """Pen of a saved stroke, from the notebook's style table or, in older files, the stroke itself."""
+    if 'style' in item_data:
+        return deserialize_pen(notebook_data['styles'][item_data['style']])
+    return deserialize_pen(item_data['pen'])
+
+
+def serialize_color(color: QColor):
+    return {'red': color.red(), 'green': color.green(), 'blue': color.blue(), 'alpha': color.alpha()}
+
+
+def deserialize_color(data):
+    return QColor(data['red'], data['green'], data['blue'], data['alpha'])
+
+
+def serialize_brush(brush: QBrush):
+    return {'color': serialize_color(brush.color()), 'style': Qt.BrushStyle(brush.style()).value}
+
+
+def deserialize_brush(data):
+    # Older notebooks pickled the Qt enum itself, which the enum constructor accepts too
+    brush = QBrush(deserialize_color(data['color']))
+    brush.setStyle(Qt.BrushStyle(data['style']))
+    return brush
+
+
+def serialize_font(font: QFont):
+    return {
+        'family': font.family(),
+        'pointsize': font.pixelSize(),
+        'letterspacing': font.letterSpacing(),
+        'bold': font.bold(),
+        'italic': font.italic(),
+        'underline': font.underline(),
+    }
+
+
+def deserialize_font(data):
+    font = QFont()
+    font.setFamily(data['family'])
+    font.setPixelSize(data['pointsize'])
+    font.setLetterSpacing(QFont.AbsoluteSpacing, data['letterspacing'])
+    font.setBold(data['bold'])
+    font.setItalic(data['italic'])
+    font.setUnderline(data['underline'])
+    return font
+
+
+def serialize_pixmap(pixmap: QPixmap):
+    """PNG bytes of an image, so it can be pickled."""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    pixmap.save(buffer, "PNG")
+    return bytes(data)
+
+
+def deserialize_pixmap(data):
+    pixmap = QPixmap()
+    pixmap.loadFromData(data, "PNG")
+    return pixmap
+
+
+def serialize_times(start_time, timestamps=None):
+    """Saved form of an item's timing: start in ms since the epoch, per-point deltas as little-endian uint16 bytes."""
+    times = {'start': start_time}
+    if timestamps is not None:
+        deltas = array('H', timestamps)
+        if sys.byteorder == 'big':
+            deltas.byteswap()
+        times['deltas'] = deltas.tobytes()
+    return times
+
+
+def deserialize_times(data):
+    """(start time, array of per-point deltas or None) from serialize_times output."""
+    deltas = None
+    if 'deltas' in data:
+        deltas = array('H')
+        deltas.frombytes(data['deltas'])
+        if sys.byteorder == 'big':
+            deltas.byteswap()
+    return data['start'], deltas
+
+
+def normalize_notebook(notebook_data):
+    # Older notebooks were saved as a bare list of items
+    if isinstance(notebook_data, list):
+        notebook_data = {'items': notebook_data}
+    return notebook_data
+
+
+def serialize_item(item, styles, assets=None):
+    """Saved form of one top-level scene item, or None for items that aren't saved.
+
+    Strokes refer to their pen by index into styles, the scene's StyleTable, and images to their
+    picture by key into assets, its AssetStore. Without a store an image carries its PNG bytes.
+    """
+    data = snapshot_item(item, styles, assets)
+    return finish_item(data) if data is not None else None
+
+
+def snapshot_item(item, styles, assets=None):
+    """serialize_item without its costly part, for saving on another thread.
+
+    Strokes keep their QPainterPath in place of their elements, and items their QBrush and
+    QTransform: copies Qt shares with the item until either changes. finish_item turns them into
+    their saved form later, on whatever thread.
+    """
+    if isinstance(item, TextBox):
+        data = {
+            'type': 'TextBox',
+            'text': item.toPlainText(),
+            'font': serialize_font(item.font()),
+            'color': serialize_color(item.defaultTextColor()),
+        }
+        if item.start_time is not None:
+            data['times'] = serialize_times(item.start_time)
+    elif isinstance(item, QGraphicsPathItem):
+        data = {
+            'type': 'QGraphicsPathItem',
+            'style': styles.index_of(item),
+            'brush': QBrush(item.brush()),
+            'elements': QPainterPath(item.path()),
+        }
+        # One timestamp per path element, for playback
+        if isinstance(item, StrokeItem) and item.start_time is not None:
+            data['times'] = serialize_times(item.start_time, item.timestamps)
+    elif isinstance(item, ResizablePixmapItem):
+        size = item.image_size()
+        data = {'type': 'Image', 'width': size.width(), 'height': size.height()}
+        if assets is not None:
+            data['asset'] = assets.key_of(item)
+        else:
+            data['image'] = serialize_pixmap(item.pixmap())
+    else:
+        return None
+
+    data.update({
+        'rotation': item.rotation(),
+        'transform': QTransform(item.transform()),
+        'x': item.pos().x(),
+        'y': item.pos().y(),
+        'name': item.toolTip(),
+    })
+    return data
+
+
+def finish_item(data):
+    """Saved form of an item from its snapshot_item data, which is left as it was."""
+    if not isinstance(data['transform'], QTransform):
+        return data
+    data = dict(data, transform=serialize_transform(data['transform']))
+    if isinstance(data.get('brush'), QBrush):
+        data['brush'] = serialize_brush(data['brush'])
+    if isinstance(data.get('elements'), QPainterPath):
+        data['elements'] = serialize_path(data['elements'])
+        # Timing that no longer matches the path, e.g. after it was edited, is dropped
+        if 'times' in data and len(data['times'].get('deltas', b'')) != 2 * len(data['elements']):
+            del data['times']
+    return data
+
+
+def deserialize_item(data, styles, scene_styles, assets=None):
+    """Build a scene item from serialize_item output.
+
+    styles is the StyleTable the data's style indices refer to; the stroke's pen is interned into
+    scene_styles, the table of the scene it will be added to. Both are the same table when the data
+    came from that scene. assets is the scene's AssetStore, which must hold the images the data
+    refers to; images carrying their own bytes are added to it.
+    """
+    if data['type'] == 'TextBox':
+        item = TextBox()
+        item.setFont(deserialize_font(data['font']))
+        item.setDefaultTextColor(deserialize_color(data['color']))
+        item.setPlainText(data['text'])
+        if 'times' in data:
+            item.start_time = deserialize_times(data['times'])[0]
+    elif data['type'] == 'QGraphicsPathItem':
+        item = StrokeItem(path_from_elements(data['elements']))
+        # Notebooks saved before the style table carry a full pen on every stroke
+        pen = styles.pen(data['style']) if 'style' in data else deserialize_pen(data['pen'])
+        scene_styles.apply(item, pen)
+        item.setBrush(deserialize_brush(data['brush']))
+        if 'times' in data:
+            item.set_times(*deserialize_times(data['times']))
+    elif data['type'] == 'Image':
+        # Images saved without a store carry their PNG bytes, older ones no size either
+        key = data['asset'] if 'asset' in data else assets.add(data['image']) if assets is not None else None
+        if key is not None and 'width' in data:
+            item = ResizablePixmapItem.from_asset(assets, key, data['width'], data['height'])
+        else:
+            item = ResizablePixmapItem(assets.pixmap(key) if key is not None else deserialize_pixmap(data['image']))
+            item.asset = key
+    else:
+        raise ValueError(f"Unknown item type {data['type']!r}")
+
+    item.setRotation(data['rotation'])
+    item.setTransform(transform_from_dict(data['transform']))
+    item.setPos(data['x'], data['y'])
+    item.setToolTip(data['name'])
+    return item
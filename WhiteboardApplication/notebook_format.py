@@ -0,0 +1,857 @@
+"""Compact binary notebook files (.bnb), and conversion from the older pickle and JSON files.
+
+Layout, every integer little-endian:
+    header    b'BNNB', uint16 version, uint16 number of sections
+    section   4-byte tag, uint8 codec, uint32 stored length, uint32 raw length, uint32 CRC-32 of the
+              stored payload, payload
+Sections:
+    META  JSON: notebook settings (the page template)
+    STYL  JSON: the style table, as StyleTable.serialize writes it
+    ORDR  one uint8 kind per item, in saved order (topmost first)
+    TEXT  JSON: the text boxes, as serialize_item writes them
+    IMAG  JSON index of the images: where each one is and the key of its picture
+    ASST  JSON index of the pictures, [key, size] each, then their PNG bytes; one per distinct picture
+    CIDX  the chunk index: per chunk its scene bounds, file offset and number of strokes
+    CHNK  one chunk of strokes close together on the page: their item numbers, then pack_strokes
+Readers skip sections they don't know, so later versions can add their own. The CHNK sections
+always come last and the index says where each one is, so a reader can stop at the first chunk
+and decode only the ones it needs (see lazy_notebook). Version 1 files hold every stroke in a
+single STRK section instead of chunks, and version 2 files have no ASST section: each image in
+IMAG is followed by its own PNG bytes. Sections have no checksum before version 4.
+
+Every section, each chunk of strokes included, is checked on its own as it is read, so a damaged
+byte costs the part of the page it falls in rather than the whole notebook. Given a list to fill,
+loads_notebook and read_notebook leave damaged sections out and describe them there as
+DamagedSection; otherwise they raise NotebookFormatError. verify_notebook checks a file's
+checksums without decoding anything, at the speed the file can be read.
+read_summary tells what a notebook holds, and on what paper, from two small sections
+alone (see library).
+
+Convert an older notebook with:
+    python -m WhiteboardApplication.notebook_format notebook.pkl [-o notebook.bnb] [--lzma]
+"""
+import argparse
+import json
+import lzma
+import math
+import os
+import pickle
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QPen
+
+from WhiteboardApplication import geometry
+from WhiteboardApplication.asset_store import asset_key
+from WhiteboardApplication.notebook_data import PackedElements, LINE_TO, MOVE_TO, normalize_notebook, \
+    item_scene_transform
+from WhiteboardApplication.style_table import serialize_pen, deserialize_pen, pen_key
+
+MAGIC = b'BNNB'
+VERSION = 4
+EXTENSION = '.bnb'
+
+# Section codecs
+STORED, ZLIB, LZMA = range(3)
+COMPRESSORS = {'zlib': ZLIB, 'lzma': LZMA}
+
+# Item kinds in the ORDR section
+STROKE, TEXT, IMAGE = range(3)
+KINDS = {'QGraphicsPathItem': STROKE, 'TextBox': TEXT, 'Image': IMAGE}
+# Sections whose damage loses every item of a kind
+_KIND_SECTIONS = {STROKE: (b'STRK', b'CIDX'), TEXT: (b'TEXT',), IMAGE: (b'IMAG', b'ASST')}
+
+# Per-stroke timing in the STRK section
+NO_TIMES, START_TIME, POINT_TIMES = range(3)
+
+CHUNK_SIZE = 64.0  # Scene units on a side of the grid cells strokes are chunked by
+MAX_CHUNK_STROKES = 512  # A crowded cell is split into chunks of at most this many strokes
+
+ELLIPSE_SEGMENTS = 64  # Sides of the polygon ellipses from the JSON format are drawn as
+
+_HEADER = struct.Struct('<4sHH')
+_SECTION = struct.Struct('<4sBIII')
+_SECTION_V3 = struct.Struct('<4sBII')  # Sections of files before version 4, without a checksum
+_CHUNK = struct.Struct('<4dQI')  # left, top, right, bottom, offset of the CHNK section, strokes
+_IDENTITY = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0)
+_TRANSFORM_KEYS = ('m11', 'm12', 'm13', 'm21', 'm22', 'm23', 'm31', 'm32', 'm33')
+
+
+# What is lost with each section, as a DamagedSection tells it
+SECTION_CONTENTS = {b'META': "page settings", b'STYL': "pens", b'ORDR': "item order", b'TEXT': "text boxes",
+                    b'IMAG': "images", b'ASST': "pictures", b'CIDX': "stroke index", b'STRK': "strokes",
+                    b'CHNK': "strokes", b'ITEM': "items"}
+
+
+class NotebookFormatError(ValueError):
+    pass
+
+
+class DamagedSection:
+    """A section of a notebook file that failed its checksum or couldn't be decoded."""
+
+    def __init__(self, tag, offset, reason, bounds=None, items=None):
+        self.tag = tag
+        self.offset = offset  # in the file, or None for a row of a notebook store
+        self.reason = reason
+        self.bounds = bounds  # (left, top, right, bottom) in the scene, for a chunk of strokes
+        self.items = items  # number of items lost with it, if known
+
+    def __str__(self):
+        contents = SECTION_CONTENTS.get(self.tag, f"section {self.tag!r}")
+        if self.items is not None:
+            contents = f"{self.items} {contents}"
+        where = f" around ({self.bounds[0]:.0f}, {self.bounds[1]:.0f})-({self.bounds[2]:.0f}, {self.bounds[3]:.0f})" \
+            if self.bounds is not None else ""
+        at = f", at byte {self.offset}" if self.offset is not None else ""
+        return f"{contents}{where}{at}: {self.reason}"
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _shuffle(data, width):
+    # Byte planes of the floats: exponents and high mantissa bytes repeat along a stroke, so they compress far better
+    return b''.join(data[i::width] for i in range(width))
+
+
+def _unshuffle(data, width):
+    out = bytearray(len(data))
+    plane = len(data) // width
+    for i in range(width):
+        out[i::width] = data[i * plane:(i + 1) * plane]
+    return bytes(out)
+
+
+class _Writer:
+    def __init__(self):
+        self.parts = []
+
+    def column(self, data):
+        self.parts.append(struct.pack('<I', len(data)))
+        self.parts.append(data)
+
+    def getvalue(self):
+        return b''.join(self.parts)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def column(self):
+        length, = struct.unpack_from('<I', self.data, self.offset)
+        start = self.offset + 4
+        self.offset = start + length
+        if self.offset > len(self.data):
+            raise NotebookFormatError("Truncated stroke section")
+        return bytes(self.data[start:self.offset])
+
+
+def pack_strokes(strokes):
+    """STRK payload: each per-stroke field as one column, then every stroke's points, kinds and timing."""
+    styles, colors, brush_styles = array('I'), array('I'), array('B')
+    xs, ys, rotations = array('d'), array('d'), array('d')
+    transformed, transforms = array('B'), array('d')
+    counts, kinds, point_xs, point_ys = array('I'), bytearray(), array('f'), array('f')
+    timing, starts, deltas = array('B'), array('d'), bytearray()
+    names = []
+
+    for data in strokes:
+        styles.append(data['style'])
+        color = data['brush']['color']
+        colors.append(color['alpha'] << 24 | color['red'] << 16 | color['green'] << 8 | color['blue'])
+        brush_styles.append(data['brush']['style'])
+        xs.append(data['x'])
+        ys.append(data['y'])
+        rotations.append(data['rotation'])
+        matrix = tuple(data['transform'][key] for key in _TRANSFORM_KEYS)
+        transformed.append(matrix != _IDENTITY)
+        if matrix != _IDENTITY:
+            transforms.extend(matrix)
+        names.append(data['name'])
+
+        elements = PackedElements.from_dicts(data['elements'])
+        counts.append(len(elements))
+        kinds += elements.kinds
+        point_xs.extend(elements.xs if elements.xs.typecode == 'f' else array('f', elements.xs))
+        point_ys.extend(elements.ys if elements.ys.typecode == 'f' else array('f', elements.ys))
+
+        times = data.get('times')
+        if times is None:
+            timing.append(NO_TIMES)
+        else:
+            starts.append(times['start'])
+            if 'deltas' in times:
+                timing.append(POINT_TIMES)
+                deltas += times['deltas']
+            else:
+                timing.append(START_TIME)
+
+    writer = _Writer()
+    writer.column(struct.pack('<I', len(strokes)))
+    writer.column(_little_endian(styles))
+    writer.column(_little_endian(colors))
+    writer.column(brush_styles.tobytes())
+    writer.column(_little_endian(xs))
+    writer.column(_little_endian(ys))
+    writer.column(_little_endian(rotations))
+    writer.column(transformed.tobytes())
+    writer.column(_little_endian(transforms))
+    # Names are nearly always empty, so a single empty list stands in for all of them
+    writer.column(json.dumps(names if any(names) else []).encode('utf-8'))
+    writer.column(_little_endian(counts))
+    writer.column(bytes(kinds))
+    writer.column(_shuffle(_little_endian(point_xs), 4))
+    writer.column(_shuffle(_little_endian(point_ys), 4))
+    writer.column(timing.tobytes())
+    writer.column(_little_endian(starts))
+    writer.column(bytes(deltas))
+    return writer.getvalue()
+
+
+def unpack_strokes(payload):
+    reader = _Reader(payload)
+    count, = struct.unpack('<I', reader.column())
+    styles = _from_little_endian('I', reader.column())
+    colors = _from_little_endian('I', reader.column())
+    brush_styles = reader.column()
+    xs = _from_little_endian('d', reader.column())
+    ys = _from_little_endian('d', reader.column())
+    rotations = _from_little_endian('d', reader.column())
+    transformed = reader.column()
+    transforms = _from_little_endian('d', reader.column())
+    names = json.loads(reader.column()) or [''] * count
+    counts = _from_little_endian('I', reader.column())
+    kinds = reader.column()
+    point_xs = _from_little_endian('f', _unshuffle(reader.column(), 4))
+    point_ys = _from_little_endian('f', _unshuffle(reader.column(), 4))
+    timing = reader.column()
+    starts = _from_little_endian('d', reader.column())
+    deltas = reader.column()
+
+    strokes = []
+    point, matrix, start, delta = 0, 0, 0, 0
+    for i in range(count):
+        color = colors[i]
+        if transformed[i]:
+            values = transforms[matrix:matrix + 9]
+            matrix += 9
+        else:
+            values = _IDENTITY
+        end = point + counts[i]
+        data = {
+            'type': 'QGraphicsPathItem',
+            'style': styles[i],
+            'brush': {'color': {'red': color >> 16 & 0xFF, 'green': color >> 8 & 0xFF, 'blue': color & 0xFF,
+                                'alpha': color >> 24}, 'style': brush_styles[i]},
+            'rotation': rotations[i],
+            'transform': dict(zip(_TRANSFORM_KEYS, values)),
+            'x': xs[i],
+            'y': ys[i],
+            'name': names[i],
+            'elements': PackedElements(kinds[point:end], point_xs[point:end], point_ys[point:end]),
+        }
+        if timing[i] != NO_TIMES:
+            data['times'] = {'start': starts[start]}
+            start += 1
+            if timing[i] == POINT_TIMES:
+                data['times']['deltas'] = deltas[delta:delta + 2 * counts[i]]
+                delta += 2 * counts[i]
+        strokes.append(data)
+        point = end
+    if point != len(kinds) or len(point_xs) != len(kinds):
+        raise NotebookFormatError("Stroke points don't match their counts")
+    return strokes
+
+
+def pack_images(images):
+    header = json.dumps(images).encode('utf-8')
+    return struct.pack('<I', len(header)) + header
+
+
+def unpack_images(payload):
+    """Image items of an IMAG payload; those of version 2 files carry their PNG bytes, the rest refer to ASST."""
+    length, = struct.unpack_from('<I', payload)
+    index = json.loads(payload[4:4 + length])
+    offset = 4 + length
+    images = []
+    for data in index:
+        if 'size' in data:
+            size = data.pop('size')
+            data['image'] = bytes(payload[offset:offset + size])
+            offset += size
+        images.append(data)
+    return images
+
+
+def pack_assets(assets):
+    header = json.dumps([[key, len(data)] for key, data in assets.items()]).encode('utf-8')
+    return struct.pack('<I', len(header)) + header + b''.join(assets.values())
+
+
+def unpack_assets(payload):
+    """{key: PNG bytes} of an ASST payload."""
+    return {key: bytes(payload[offset:offset + size])
+            for key, (offset, size) in asset_offsets(payload, 0, len(payload)).items()}
+
+
+def asset_offsets(data, start, length):
+    """{key: (offset, size)} of the PNG bytes of each picture of the ASST payload at start in data, reading
+    only its index."""
+    index_length, = struct.unpack_from('<I', data, start)
+    offset = start + 4 + index_length
+    offsets = {}
+    for key, size in json.loads(data[start + 4:offset]):
+        offsets[key] = (offset, size)
+        offset += size
+    if offset != start + length:
+        raise NotebookFormatError("Image section is damaged")
+    return offsets
+
+
+def normalize_images(notebook_data, items):
+    """(assets, items) with every image referring to a picture in assets by key, and only pictures in use kept.
+
+    Images saved before the asset store carry their PNG bytes; a picture found in more than one is kept once.
+    """
+    saved = notebook_data.get('assets', {})
+    assets = {}
+    normalized = []
+    for data in items:
+        if data['type'] == 'Image':
+            if 'asset' in data:
+                assets[data['asset']] = saved[data['asset']]
+            else:
+                image = data['image']
+                data = {key: value for key, value in data.items() if key != 'image'}
+                data['asset'] = asset_key(image)
+                assets[data['asset']] = image
+        normalized.append(data)
+    return assets, normalized
+
+
+def normalize_items(notebook_data):
+    """(style table, items) with every stroke referring to the table, whatever age the notebook is.
+
+    Notebooks saved before the style table carry a full pen on each stroke; those are interned
+    into a new table. Enums pickled as Qt objects become plain ints.
+    """
+    notebook_data = normalize_notebook(notebook_data)
+    styles = [serialize_pen(deserialize_pen(pen)) for pen in notebook_data.get('styles', [])]
+    indices = {}
+    for index, pen in enumerate(styles):
+        indices.setdefault(pen_key(deserialize_pen(pen)), index)
+
+    items = []
+    for data in notebook_data['items']:
+        if data['type'] == 'QGraphicsPathItem':
+            data = dict(data, brush=dict(data['brush'], style=int(getattr(data['brush']['style'], 'value',
+                                                                           data['brush']['style']))))
+            if 'style' not in data:
+                pen = deserialize_pen(data.pop('pen'))
+                key = pen_key(pen)
+                if key not in indices:
+                    indices[key] = len(styles)
+                    styles.append(serialize_pen(pen))
+                data['style'] = indices[key]
+        items.append(data)
+    return styles, items
+
+
+def stroke_bounds(data, styles):
+    """(left, top, right, bottom) a saved stroke covers in the scene, pen width included."""
+    elements = data['elements']
+    if not len(elements):
+        return data['x'], data['y'], data['x'], data['y']
+    if isinstance(elements, PackedElements):
+        xs, ys = elements.xs, elements.ys
+    else:
+        xs, ys = [element['x'] for element in elements], [element['y'] for element in elements]
+    rect = QRectF(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+    if data['rotation'] or tuple(data['transform'][key] for key in _TRANSFORM_KEYS) != _IDENTITY:
+        rect = item_scene_transform(data).mapRect(rect)
+    else:
+        rect.translate(data['x'], data['y'])
+    margin = styles[data['style']]['width'] / 2 + 1 if data['style'] < len(styles) else 1
+    return rect.left() - margin, rect.top() - margin, rect.right() + margin, rect.bottom() + margin
+
+
+def layout_chunks(strokes, styles):
+    """[(bounds, item numbers, strokes)] of (item number, stroke) pairs, grouped by the grid cell their middle is in."""
+    cells = {}
+    for number, data in strokes:
+        bounds = stroke_bounds(data, styles)
+        cell = (math.floor((bounds[1] + bounds[3]) / 2 / CHUNK_SIZE), math.floor((bounds[0] + bounds[2]) / 2 / CHUNK_SIZE))
+        cells.setdefault(cell, []).append((number, data, bounds))
+
+    chunks = []
+    # Row by row, so chunks near each other on the page are near each other in the file
+    for cell in sorted(cells):
+        members = cells[cell]
+        for start in range(0, len(members), MAX_CHUNK_STROKES):
+            part = members[start:start + MAX_CHUNK_STROKES]
+            bounds = (min(member[2][0] for member in part), min(member[2][1] for member in part),
+                      max(member[2][2] for member in part), max(member[2][3] for member in part))
+            chunks.append((bounds, array('I', [member[0] for member in part]), [member[1] for member in part]))
+    return chunks
+
+
+def pack_chunk(numbers, strokes):
+    return struct.pack('<I', len(numbers)) + _little_endian(numbers) + pack_strokes(strokes)
+
+
+def unpack_chunk(payload):
+    """(item numbers, strokes) of a CHNK payload."""
+    count, = struct.unpack_from('<I', payload)
+    numbers = _from_little_endian('I', payload[4:4 + 4 * count])
+    strokes = unpack_strokes(payload[4 + 4 * count:])
+    if len(numbers) != count or len(strokes) != count:
+        raise NotebookFormatError("Chunk is damaged")
+    return numbers, strokes
+
+
+def _compress(codec, raw):
+    if codec == ZLIB:
+        return zlib.compress(raw, 6)
+    if codec == LZMA:
+        return lzma.compress(raw)
+    return raw
+
+
+def dumps_notebook(notebook_data, compression='zlib'):
+    """The notebook as .bnb bytes; compression is 'zlib' (fast) or 'lzma' (smaller)."""
+    notebook_data = normalize_notebook(notebook_data)
+    codec = COMPRESSORS[compression]
+    styles, items = normalize_items(notebook_data)
+    assets, items = normalize_images(notebook_data, items)
+    order = bytes(KINDS[data['type']] for data in items)
+
+    sections = [
+        (b'META', codec, json.dumps({'template': notebook_data.get('template', 'blank')}).encode('utf-8')),
+        (b'STYL', codec, json.dumps(styles).encode('utf-8')),
+        (b'ORDR', codec, order),
+        (b'TEXT', codec, json.dumps([data for data in items if data['type'] == 'TextBox']).encode('utf-8')),
+    ]
+    images = [data for data in items if data['type'] == 'Image']
+    if images:
+        sections.append((b'IMAG', codec, pack_images(images)))
+        # PNG is compressed already
+        sections.append((b'ASST', STORED, pack_assets(assets)))
+
+    chunks = layout_chunks([(number, data) for number, data in enumerate(items)
+                            if data['type'] == 'QGraphicsPathItem'], styles)
+    stored_chunks = [(bounds, len(numbers), pack_chunk(numbers, strokes)) for bounds, numbers, strokes in chunks]
+    stored_chunks = [(bounds, count, _compress(codec, raw), len(raw)) for bounds, count, raw in stored_chunks]
+
+    parts = [_HEADER.pack(MAGIC, VERSION, len(sections) + 1 + len(chunks))]
+    offset = _HEADER.size
+    for tag, section_codec, raw in sections:
+        stored = _compress(section_codec, raw)
+        parts.append(_SECTION.pack(tag, section_codec, len(stored), len(raw), zlib.crc32(stored)))
+        parts.append(stored)
+        offset += _SECTION.size + len(stored)
+
+    # The index is stored uncompressed, so opening a notebook reads it straight from the file
+    offset += _SECTION.size + _CHUNK.size * len(chunks)
+    index = []
+    for bounds, count, stored, raw_length in stored_chunks:
+        index.append(_CHUNK.pack(*bounds, offset, count))
+        offset += _SECTION.size + len(stored)
+    index = b''.join(index)
+    parts.append(_SECTION.pack(b'CIDX', STORED, len(index), len(index), zlib.crc32(index)))
+    parts.append(index)
+    for bounds, count, stored, raw_length in stored_chunks:
+        parts.append(_SECTION.pack(b'CHNK', codec, len(stored), raw_length, zlib.crc32(stored)))
+        parts.append(stored)
+    return b''.join(parts)
+
+
+def _section_layout(data):
+    """Struct of the section headers in a .bnb file, which depends on its version."""
+    if len(data) < _HEADER.size:
+        raise NotebookFormatError("Not a BestNotes notebook")
+    magic, version, _count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise NotebookFormatError("Not a BestNotes notebook")
+    if version > VERSION:
+        raise NotebookFormatError(f"Notebook format version {version} is newer than this BestNotes")
+    return _SECTION if version >= 4 else _SECTION_V3
+
+
+def _section_at(data, offset, layout):
+    """(tag, codec, raw length, stored payload, offset past the section) of the section at offset.
+
+    The payload's checksum is checked here, if the file has them.
+    """
+    if offset + layout.size > len(data):
+        raise NotebookFormatError("Truncated notebook")
+    tag, codec, stored_length, raw_length, *checksum = layout.unpack_from(data, offset)
+    offset += layout.size
+    stored = data[offset:offset + stored_length]
+    if len(stored) != stored_length:
+        raise NotebookFormatError("Truncated notebook")
+    if checksum and zlib.crc32(stored) != checksum[0]:
+        raise NotebookFormatError(f"Section {tag!r} is damaged")
+    return tag, codec, raw_length, stored, offset + stored_length
+
+
+def _span_at(data, offset, layout):
+    """(tag, payload offset, payload length, offset past the section) of the stored section at offset.
+
+    The checksum is computed over data in place, so a mapped file's payload is never copied.
+    """
+    if offset + layout.size > len(data):
+        raise NotebookFormatError("Truncated notebook")
+    tag, codec, stored_length, raw_length, *checksum = layout.unpack_from(data, offset)
+    start = offset + layout.size
+    if start + stored_length > len(data):
+        raise NotebookFormatError("Truncated notebook")
+    if codec != STORED or raw_length != stored_length:
+        raise NotebookFormatError(f"Section {tag!r} is damaged")
+    if checksum:
+        with memoryview(data) as view:
+            crc = zlib.crc32(view[start:start + stored_length])
+        if crc != checksum[0]:
+            raise NotebookFormatError(f"Section {tag!r} is damaged")
+    return tag, start, stored_length, start + stored_length
+
+
+def _decode(tag, codec, raw_length, stored):
+    try:
+        if codec == ZLIB:
+            raw = zlib.decompress(stored)
+        elif codec == LZMA:
+            raw = lzma.decompress(stored)
+        elif codec == STORED:
+            raw = bytes(stored)
+        else:
+            raise NotebookFormatError(f"Unknown compression in section {tag!r}")
+    except (zlib.error, lzma.LZMAError):
+        raise NotebookFormatError(f"Section {tag!r} is damaged") from None
+    if len(raw) != raw_length:
+        raise NotebookFormatError(f"Section {tag!r} is damaged")
+    return raw
+
+
+def _next_section(data, offset, layout):
+    """Offset past the section at offset, going by its stored length alone, or None if that is past the end."""
+    if offset + layout.size > len(data):
+        return None
+    end = offset + layout.size + layout.unpack_from(data, offset)[2]
+    return end if end <= len(data) else None
+
+
+def read_sections(data, damaged=None, spans=()):
+    """{tag: raw payload} of a .bnb file, up to its chunks; data may be bytes or an mmap.
+
+    If damaged is a list, damaged sections are left out and added to it instead of raising. Sections
+    tagged in spans, which must be stored uncompressed, are checked but not copied: their entry is the
+    (offset, length) of the payload in data instead.
+    """
+    layout = _section_layout(data)
+    _magic, _version, count = _HEADER.unpack_from(data)
+    sections = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        if data[offset:offset + 4] == b'CHNK':
+            break
+        try:
+            if bytes(data[offset:offset + 4]) in spans:
+                tag, start, length, end = _span_at(data, offset, layout)
+                sections[tag] = (start, length)
+            else:
+                tag, codec, raw_length, stored, end = _section_at(data, offset, layout)
+                sections[tag] = _decode(tag, codec, raw_length, stored)
+        except NotebookFormatError as error:
+            if damaged is None:
+                raise
+            damaged.append(DamagedSection(bytes(data[offset:offset + 4]), offset, str(error)))
+            end = _next_section(data, offset, layout)
+            # Nothing after a section running past the end can be found
+            if end is None:
+                break
+        offset = end
+    return sections
+
+
+def read_summary(data):
+    """(page settings, one kind per item in saved order) of a .bnb file, decoding only its META and ORDR sections.
+
+    Other sections are stepped over by their lengths, so of a mapped file only the pages with
+    section headers are read.
+    """
+    layout = _section_layout(data)
+    _magic, _version, count = _HEADER.unpack_from(data)
+    sections = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        tag = bytes(data[offset:offset + 4])
+        if tag == b'CHNK' or len(sections) == 2:
+            break
+        if tag in (b'META', b'ORDR'):
+            tag, codec, raw_length, stored, offset = _section_at(data, offset, layout)
+            sections[tag] = _decode(tag, codec, raw_length, stored)
+        else:
+            offset = _next_section(data, offset, layout)
+            if offset is None:
+                raise NotebookFormatError("Truncated notebook")
+    return json.loads(sections.get(b'META', b'{}')), sections.get(b'ORDR', b'')
+
+
+def read_chunk_index(sections):
+    """[(bounds, file offset, strokes)] of the chunks a notebook's CIDX section lists."""
+    index = sections.get(b'CIDX', b'')
+    if len(index) % _CHUNK.size:
+        raise NotebookFormatError("Chunk index is damaged")
+    chunks = []
+    for record in _CHUNK.iter_unpack(index):
+        chunks.append((record[:4], record[4], record[5]))
+    return chunks
+
+
+def read_chunk(data, offset):
+    """(item numbers, strokes) of the CHNK section at offset."""
+    tag, codec, raw_length, stored, _end = _section_at(data, offset, _section_layout(data))
+    if tag != b'CHNK':
+        raise NotebookFormatError("Chunk index doesn't point at a chunk")
+    return unpack_chunk(_decode(tag, codec, raw_length, stored))
+
+
+def verify_notebook(data):
+    """[DamagedSection] of a .bnb file, empty if it is whole; data may be bytes or an mmap.
+
+    Only checksums are compared, nothing is decoded, except in files from before version 4, which
+    have none and are decompressed instead.
+    """
+    layout = _section_layout(data)
+    _magic, _version, count = _HEADER.unpack_from(data)
+    damaged = []
+    chunks = {}  # file offset -> (bounds, strokes), from the chunk index
+    offset = _HEADER.size
+    for _ in range(count):
+        try:
+            tag, codec, raw_length, stored, end = _section_at(data, offset, layout)
+            if layout is _SECTION_V3 or tag == b'CIDX':
+                raw = _decode(tag, codec, raw_length, stored)
+                if tag == b'CIDX':
+                    chunks = {chunk_offset: (bounds, strokes)
+                              for bounds, chunk_offset, strokes in read_chunk_index({tag: raw})}
+        except NotebookFormatError as error:
+            bounds, strokes = chunks.get(offset, (None, None))
+            damaged.append(DamagedSection(bytes(data[offset:offset + 4]), offset, str(error), bounds, strokes))
+            end = _next_section(data, offset, layout)
+            if end is None:
+                break
+        offset = end
+    if offset < len(data) and not damaged:
+        damaged.append(DamagedSection(b'', offset, "Data after the last section"))
+    return damaged
+
+
+def loads_notebook(data, damaged=None):
+    """Notebook data, in the form MainWindow.deserialize_notebook takes, from .bnb bytes.
+
+    If damaged is a list, items in damaged sections are left out and the sections added to it instead
+    of raising. Without their order, items come strokes first, then text boxes, then images.
+    """
+    recovering = damaged is not None
+    first = len(damaged) if recovering else 0
+    sections = read_sections(data, damaged)
+    lost = {section.tag for section in damaged[first:]} if recovering else set()
+    meta = json.loads(sections.get(b'META', b'{}'))
+    order = sections.get(b'ORDR', b'')
+    by_kind = {
+        STROKE: iter(unpack_strokes(sections[b'STRK']) if b'STRK' in sections else []),
+        TEXT: iter(json.loads(sections.get(b'TEXT', b'[]'))),
+        IMAGE: iter(unpack_images(sections[b'IMAG']) if b'IMAG' in sections else []),
+    }
+    strokes = None
+    if b'CIDX' in sections:
+        # Chunked strokes know their own place in the order
+        strokes = {}
+        for bounds, offset, count in read_chunk_index(sections):
+            try:
+                numbers, chunk = read_chunk(data, offset)
+            except NotebookFormatError as error:
+                if not recovering:
+                    raise
+                damaged.append(DamagedSection(b'CHNK', offset, str(error), bounds, count))
+                lost.add(b'CHNK')
+                continue
+            strokes.update(zip(numbers, chunk))
+        by_kind[STROKE] = (strokes[number] for number in sorted(strokes))
+
+    if b'ORDR' in lost:
+        items = [data for kind in (STROKE, TEXT, IMAGE) if not lost.intersection(_KIND_SECTIONS[kind])
+                 for data in by_kind[kind]]
+    else:
+        items = []
+        try:
+            for number, kind in enumerate(order):
+                if kind == STROKE and strokes is not None:
+                    if number in strokes:
+                        items.append(strokes[number])
+                    elif b'CHNK' not in lost:
+                        raise KeyError(number)
+                elif not lost.intersection(_KIND_SECTIONS.get(kind, ())):
+                    items.append(next(by_kind[kind]))
+        except (StopIteration, KeyError):
+            raise NotebookFormatError("Item order doesn't match the sections") from None
+
+    styles = json.loads(sections.get(b'STYL', b'[]'))
+    if b'STYL' in lost:
+        # The strokes are kept, drawn with a plain pen
+        used = max((data['style'] for data in items if data['type'] == 'QGraphicsPathItem'), default=-1)
+        styles = [serialize_pen(QPen()) for _ in range(used + 1)]
+    return {
+        'template': meta.get('template', 'blank'),
+        'styles': styles,
+        'assets': unpack_assets(sections[b'ASST']) if b'ASST' in sections else {},
+        'items': items,
+    }
+
+
+def _json_stroke(style, points):
+    points = geometry.as_points(points)
+    elements = PackedElements(bytes([MOVE_TO]) + bytes([LINE_TO]) * (len(points) - 1),
+                              array('d', points[:, 0].tobytes()), array('d', points[:, 1].tobytes()))
+    return {
+        'type': 'QGraphicsPathItem', 'style': style,
+        'brush': {'color': {'red': 0, 'green': 0, 'blue': 0, 'alpha': 255}, 'style': 0},
+        'rotation': 0.0, 'transform': dict(zip(_TRANSFORM_KEYS, _IDENTITY)), 'x': 0.0, 'y': 0.0, 'name': '',
+        'elements': elements,
+    }
+
+
+def notebook_from_json(data):
+    """Notebook data from a whiteboard saved as JSON by the collaboration client or server.
+
+    Those files list items bottom first and only know pens by colour and width. Rectangles and
+    ellipses become closed strokes, since notebooks have no shape items.
+    """
+    from PySide6.QtGui import QPen, QColor
+    from PySide6.QtCore import Qt
+
+    styles = []
+    indices = {}
+
+    def style_of(color, width, cap):
+        pen = QPen(QColor(color), width)
+        pen.setCapStyle(cap)
+        key = pen_key(pen)
+        if key not in indices:
+            indices[key] = len(styles)
+            styles.append(serialize_pen(pen))
+        return indices[key]
+
+    items = []
+    # The server saves 'lines', the client typed 'items'
+    for shape in data.get('items', [dict(line, type='path') for line in data.get('lines', [])]):
+        if shape['type'] == 'path':
+            if shape['points']:
+                style = style_of(shape['color'], shape['width'], Qt.PenCapStyle.RoundCap)
+                items.append(_json_stroke(style, shape['points']))
+            continue
+        x, y, width, height = shape['rect']
+        style = style_of(shape['color'], shape['width'], Qt.PenCapStyle.SquareCap)
+        if shape['type'] == 'rectangle':
+            points = [(x, y), (x + width, y), (x + width, y + height), (x, y + height), (x, y)]
+        elif shape['type'] == 'ellipse':
+            cx, cy, rx, ry = x + width / 2, y + height / 2, width / 2, height / 2
+            points = [(cx + rx * math.cos(2 * math.pi * i / ELLIPSE_SEGMENTS),
+                       cy + ry * math.sin(2 * math.pi * i / ELLIPSE_SEGMENTS)) for i in range(ELLIPSE_SEGMENTS + 1)]
+        else:
+            continue
+        items.append(_json_stroke(style, points))
+
+    items.reverse()
+    return {'template': 'blank', 'styles': styles, 'items': items}
+
+
+def read_notebook(path, damaged=None):
+    """Notebook data from a .bnb, .bndb, pickle or JSON notebook file, told apart by their contents.
+
+    Damaged parts of a .bnb file are left out and added to damaged, if it is a list (see loads_notebook).
+    Pickles can run code while loading, so only open pickled notebooks you made yourself.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data.startswith(b'SQLite format 3\x00'):
+        # The store builds on this module, so it is only imported once one is opened
+        from WhiteboardApplication.notebook_store import read_store
+        return read_store(path, damaged)
+    if data.startswith(MAGIC):
+        return loads_notebook(data, damaged)
+    if data.lstrip()[:1] == b'{':
+        return notebook_from_json(json.loads(data))
+    return normalize_notebook(pickle.loads(data))
+
+
+def encode_notebook(path, notebook_data, compression='zlib'):
+    """Bytes of a notebook file: a pickle for .pkl paths and the binary format otherwise."""
+    if path.endswith('.pkl'):
+        return pickle.dumps(notebook_data, protocol=pickle.HIGHEST_PROTOCOL)
+    return dumps_notebook(notebook_data, compression)
+
+
+def write_atomically(path, data):
+    """Replace the file at path with data, never leaving half of it behind.
+
+    The data goes to a temporary file beside the target first, is synced, and then renamed over it.
+    """
+    # Named for the writer, so two saves to one path at once don't share a temporary file
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write_notebook(path, notebook_data, compression='zlib'):
+    """Save a notebook, as a pickle for .pkl paths and in the binary format otherwise."""
+    write_atomically(path, encode_notebook(path, notebook_data, compression))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m WhiteboardApplication.notebook_format",
+                                     description="Convert a pickle or JSON notebook to the compact binary format.")
+    parser.add_argument('notebook', help="notebook saved by BestNotes (.pkl) or by the collaboration client (.json)")
+    parser.add_argument('-o', '--output', help=f"where to write the converted notebook (default: next to the input, "
+                                               f"with the {EXTENSION} extension)")
+    parser.add_argument('--lzma', action='store_true', help="compress with lzma: smaller, slower to save")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.notebook)[0] + EXTENSION
+    notebook_data = read_notebook(args.notebook)
+    write_notebook(output, notebook_data, 'lzma' if args.lzma else 'zlib')
+    before, after = os.path.getsize(args.notebook), os.path.getsize(output)
+    print(f"{args.notebook}: {before} bytes -> {output}: {after} bytes ({before / max(after, 1):.1f}x smaller)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
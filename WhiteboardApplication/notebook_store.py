@@ -0,0 +1,452 @@
+"""Notebooks kept in a SQLite database (.bndb), saved by changing only the rows that changed.
+
+A .bnb file is written whole at every save. A store instead holds each item in a row of its own:
+    settings     the page template and the style table, as JSON
+    assets       the pictures, one PNG per key, as in the asset store
+    items        one row per item: kind, z, its place in the stacking order (higher is on top), and
+                 its data, strokes packed like a single-stroke STRK section (see
+                 notebook_format.pack_strokes), text boxes and images as the JSON serialize_item writes
+    item_bounds  an R*Tree of the strokes' scene bounds, pen width included
+Rows are keyed by a digest of their data, so save_store inserts the items that are new, deletes
+the ones gone and moves the ones whose place in the stack changed, all in one transaction; the
+rest of the file is left alone. It still digests every item to find out which rows changed.
+
+A page that knows which of its items changed since it was saved to or opened from a store saves
+with update_store instead, which touches only their rows and never looks at the rest. For that
+an item's row is found by its id: z is the item's id plus the store's offset setting, an item
+opened from the store gets its id back from z, and an item drawn since takes the z its id gives,
+which is above every other as ids are handed out in the order items are added.
+
+Opening a store reads its settings, text boxes and images. Strokes are fetched as the view comes
+near them, each region with one R*Tree query (see StoreNotebook), like the chunks of a .bnb file
+are, and pictures once an image showing them is first painted (see StoreAssets).
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+from array import array
+from collections import Counter
+from urllib.parse import quote
+
+from WhiteboardApplication.notebook_format import STROKE, TEXT, IMAGE, KINDS, NotebookFormatError, DamagedSection, \
+    normalize_items, normalize_images, pack_strokes, unpack_strokes, stroke_bounds, _TRANSFORM_KEYS
+from WhiteboardApplication.notebook_data import PackedElements, normalize_notebook
+
+EXTENSION = '.bndb'
+SQLITE_MAGIC = b'SQLite format 3\x00'
+STORE_VERSION = 1
+LOAD_BATCH = 256  # Strokes fetched by one query as the view comes near them
+
+# Style, brush color and style, position, rotation and transform of a stroke, as item_digest takes them
+_STROKE_FIELDS = struct.Struct('<I4BI12d')
+_KIND_NAMES = {kind: name for name, kind in KINDS.items()}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS assets (
+    key TEXT PRIMARY KEY,
+    png BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    key BLOB NOT NULL UNIQUE,
+    z INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_by_kind ON items (kind);
+CREATE INDEX IF NOT EXISTS items_by_z ON items (z);
+CREATE VIRTUAL TABLE IF NOT EXISTS item_bounds USING rtree(id, left, right, top, bottom);
+"""
+
+
+def is_store(path):
+    """Whether the file at path is a notebook store, going by its first bytes."""
+    with open(path, 'rb') as file:
+        return file.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def encode_item(data):
+    """(kind, blob) of an item in its saved form, strokes referring to the style table."""
+    kind = KINDS[data['type']]
+    if kind == STROKE:
+        return kind, pack_strokes([data])
+    return kind, json.dumps(data).encode('utf-8')
+
+
+def item_digest(data):
+    """Digest of an item's saved form, taken without encoding it.
+
+    Points are digested as the float32 they are stored as, so a stroke read back from a store and
+    saved again keeps its digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if data['type'] != 'QGraphicsPathItem':
+        digest.update(json.dumps(data, sort_keys=True).encode('utf-8'))
+        return digest.digest()
+    elements = PackedElements.from_dicts(data['elements'])
+    digest.update(elements.kinds)
+    for values in (elements.xs, elements.ys):
+        digest.update((values if values.typecode == 'f' else array('f', values)).tobytes())
+    # The other fields pack_strokes keeps
+    color, transform = data['brush']['color'], data['transform']
+    digest.update(_STROKE_FIELDS.pack(data['style'], color['red'], color['green'], color['blue'], color['alpha'],
+                                      data['brush']['style'], data['x'], data['y'], data['rotation'],
+                                      *[transform[key] for key in _TRANSFORM_KEYS]))
+    digest.update(data['name'].encode('utf-8'))
+    times = data.get('times')
+    if times is not None:
+        digest.update(struct.pack('<d', times['start']))
+        digest.update(bytes(times.get('deltas', b'')))
+    return digest.digest()
+
+
+def decode_item(kind, blob):
+    if kind == STROKE:
+        strokes = unpack_strokes(blob)
+        if len(strokes) != 1:
+            raise NotebookFormatError("Stroke row is damaged")
+        return strokes[0]
+    data = json.loads(blob)
+    if data.get('type') != _KIND_NAMES.get(kind):
+        raise NotebookFormatError("Item row is damaged")
+    return data
+
+
+def ids_in_stack_order(ids):
+    """Whether ids, of items topmost first, rise from the bottom of the stack up, so they can place the rows."""
+    if not ids or None in ids:
+        return False
+    return all(lower < upper for upper, lower in zip(ids, ids[1:]))
+
+
+def save_store(path, notebook_data, progress=None, ids=None):
+    """Brings the store at path, made if there is none, up to date with notebook data in one transaction.
+
+    ids, if given, are those of the items in the same order, and must pass ids_in_stack_order; the rows
+    are then placed by them, so the page can save with update_store from then on. Returns (rows inserted,
+    rows deleted, rows moved in the stacking order).
+    """
+    notebook_data = normalize_notebook(notebook_data)
+    styles, items = normalize_items(notebook_data)
+    assets, items = normalize_images(notebook_data, items)
+    # An item's id is its z less the offset; without ids the items are numbered from the top down, -1 first
+    offset = 0 if ids is not None else len(items)
+
+    # Bottom first, so drawing on top adds rows without moving the ones under it
+    rows = {}
+    seen = Counter()
+    for z, data in enumerate(reversed(items)):
+        digest = item_digest(data)
+        # Identical items are told apart by how many came before them
+        key = digest + seen[digest].to_bytes(4, 'little')
+        seen[digest] += 1
+        rows[key] = (ids[len(items) - 1 - z] if ids is not None else z, data)
+        if progress is not None and z % 1000 == 0:
+            progress(z, len(items))
+
+    connection = _connect(path)
+    try:
+        with connection:
+            existing = {key: (row_id, z) for row_id, key, z in connection.execute("SELECT id, key, z FROM items")}
+            gone = [row_id for key, (row_id, _z) in existing.items() if key not in rows]
+            connection.executemany("DELETE FROM items WHERE id = ?", [(row_id,) for row_id in gone])
+            connection.executemany("DELETE FROM item_bounds WHERE id = ?", [(row_id,) for row_id in gone])
+            moved = [(z, existing[key][0]) for key, (z, _data) in rows.items()
+                     if key in existing and existing[key][1] != z]
+            connection.executemany("UPDATE items SET z = ? WHERE id = ?", moved)
+            added = 0
+            # Only the new items are encoded
+            for key, (z, data) in rows.items():
+                if key in existing:
+                    continue
+                _insert(connection, key, z, data, styles)
+                added += 1
+            _save_assets(connection, assets)
+            _save_settings(connection, notebook_data, styles, offset)
+    finally:
+        connection.close()
+    if progress is not None:
+        progress(len(items), len(items))
+    return added, len(gone), len(moved)
+
+
+def update_store(path, changes, progress=None):
+    """Writes the items that changed since the page was saved to or opened from the store at path, in one
+    transaction, leaving every other row alone.
+
+    changes is notebook data whose items are (item id, saved form) of the items changed, with None
+    for those removed, and whose assets hold at least the pictures of the images among them.
+    Returns (rows written, rows deleted).
+    """
+    styles, items = normalize_items(dict(changes, items=[data for _item_id, data in changes['items']
+                                                         if data is not None]))
+    assets, items = normalize_images(changes, items)
+    items = iter(items)
+    written = deleted = 0
+    connection = _connect(path)
+    try:
+        with connection:
+            offset = int(_settings(connection).get('offset', connection.execute(
+                "SELECT COUNT(*) FROM items").fetchone()[0]))
+            for done, (item_id, data) in enumerate(changes['items']):
+                z = item_id + offset
+                for row_id, in connection.execute("SELECT id FROM items WHERE z = ?", (z,)).fetchall():
+                    connection.execute("DELETE FROM items WHERE id = ?", (row_id,))
+                    connection.execute("DELETE FROM item_bounds WHERE id = ?", (row_id,))
+                    deleted += data is None
+                if data is not None:
+                    data = next(items)
+                    # Kept apart from the keys save_store gives by their length
+                    _insert(connection, item_digest(data) + struct.pack('<q', z), z, data, styles)
+                    written += 1
+                if progress is not None and done % 1000 == 0:
+                    progress(done, len(changes['items']))
+            # Pictures new to the store are added and those no image shows any more deleted; images are few
+            shown = {json.loads(blob)['asset'] for blob, in
+                     connection.execute(f"SELECT data FROM items WHERE kind = {IMAGE}")}
+            stored = {key for key, in connection.execute("SELECT key FROM assets")}
+            connection.executemany("DELETE FROM assets WHERE key = ?", [(key,) for key in stored - shown])
+            connection.executemany("INSERT INTO assets VALUES (?, ?)",
+                                   [(key, png) for key, png in assets.items() if key not in stored and key in shown])
+            _save_settings(connection, changes, styles, offset)
+    finally:
+        connection.close()
+    if progress is not None:
+        progress(len(changes['items']), len(changes['items']))
+    return written, deleted
+
+
+def _insert(connection, key, z, data, styles):
+    kind, blob = encode_item(data)
+    row_id = connection.execute("INSERT INTO items (key, z, kind, data) VALUES (?, ?, ?, ?)",
+                                (key, z, kind, blob)).lastrowid
+    if kind == STROKE:
+        left, top, right, bottom = stroke_bounds(data, styles)
+        connection.execute("INSERT INTO item_bounds VALUES (?, ?, ?, ?, ?)", (row_id, left, right, top, bottom))
+
+
+def _save_assets(connection, assets):
+    stored = {key for key, in connection.execute("SELECT key FROM assets")}
+    connection.executemany("DELETE FROM assets WHERE key = ?", [(key,) for key in stored - assets.keys()])
+    connection.executemany("INSERT INTO assets VALUES (?, ?)",
+                           [(key, png) for key, png in assets.items() if key not in stored])
+
+
+def _save_settings(connection, notebook_data, styles, offset):
+    connection.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)", [
+        ('version', str(STORE_VERSION)),
+        ('template', notebook_data.get('template', 'blank')),
+        ('styles', json.dumps(styles)),
+        ('offset', str(offset)),
+    ])
+
+
+def _settings(connection):
+    settings = dict(connection.execute("SELECT key, value FROM settings"))
+    if int(settings.get('version', STORE_VERSION)) > STORE_VERSION:
+        raise NotebookFormatError(f"Notebook store version {settings['version']} is newer than this BestNotes")
+    return settings
+
+
+def _open(path):
+    if not is_store(path):
+        raise NotebookFormatError("Not a BestNotes notebook store")
+    # Opened read-only, so a file that isn't a store is never made into one
+    return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def store_summary(path):
+    """(template, strokes, text boxes, images) of the store at path, counted by the database."""
+    connection = _open(path)
+    try:
+        settings = _settings(connection)
+        counts = dict(connection.execute("SELECT kind, COUNT(*) FROM items GROUP BY kind"))
+    except sqlite3.DatabaseError as error:
+        raise NotebookFormatError(f"Notebook store is damaged: {error}") from None
+    finally:
+        connection.close()
+    return settings.get('template', 'blank'), counts.get(STROKE, 0), counts.get(TEXT, 0), counts.get(IMAGE, 0)
+
+
+def read_text_boxes(path):
+    """Saved form of the text boxes in the store at path, topmost first; no other row is read."""
+    connection = _open(path)
+    try:
+        _settings(connection)
+        return [decode_item(TEXT, blob) for blob, in
+                connection.execute(f"SELECT data FROM items WHERE kind = {TEXT} ORDER BY z DESC")]
+    except sqlite3.DatabaseError as error:
+        raise NotebookFormatError(f"Notebook store is damaged: {error}") from None
+    finally:
+        connection.close()
+
+
+def read_store(path, damaged=None):
+    """Notebook data, in the form MainWindow.deserialize_notebook takes, from the store at path.
+
+    If damaged is a list, items that can't be decoded are left out and added to it instead of raising.
+    """
+    connection = _open(path)
+    try:
+        settings = _settings(connection)
+        assets = dict(connection.execute("SELECT key, png FROM assets"))
+        items = []
+        for row_id, kind, blob in connection.execute("SELECT id, kind, data FROM items ORDER BY z DESC"):
+            try:
+                items.append(decode_item(kind, blob))
+            except (NotebookFormatError, ValueError, KeyError, struct.error) as error:
+                if damaged is None:
+                    raise NotebookFormatError(f"Item {row_id} is damaged") from error
+                damaged.append(DamagedSection(b'ITEM', None, f"row {row_id}: {error}", items=1))
+    except sqlite3.DatabaseError as error:
+        raise NotebookFormatError(f"Notebook store is damaged: {error}") from None
+    finally:
+        connection.close()
+    return {'template': settings.get('template', 'blank'), 'styles': json.loads(settings.get('styles', '[]')),
+            'assets': assets, 'items': items}
+
+
+class StoreAssets:
+    """The pictures of a store, each fetched from it the first time it is asked for.
+
+    Like lazy_notebook.FileAssets it keeps a connection of its own until they all have been.
+    """
+
+    def __init__(self, path, keys):
+        self.path = os.path.abspath(path)
+        self.unread = set(keys)
+        self.connection = _open(path) if keys else None
+
+    def keys(self):
+        return list(self.unread)
+
+    def read(self, key):
+        try:
+            row = self.connection.execute("SELECT png FROM assets WHERE key = ?", (key,)).fetchone()
+        except sqlite3.DatabaseError as error:
+            raise NotebookFormatError(f"Notebook store is damaged: {error}") from None
+        if row is None:
+            raise NotebookFormatError(f"Picture {key} is missing from the store")
+        self.unread.discard(key)
+        if not self.unread:
+            self.connection.close()
+            self.connection = None
+        return row[0]
+
+
+class StoreNotebook:
+    """A notebook store opened like a LazyNotebook: strokes are fetched from it as the view comes near them.
+
+    Its chunks are batches of strokes found by one R*Tree query, with every stroke not fetched yet
+    standing in a single chunk, None, as long as there are any.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self.connection = _open(path)
+            settings = _settings(self.connection)
+            self.count, strokes, self.last_row, top = self.connection.execute(
+                f"SELECT COUNT(*), COUNT(*) FILTER (WHERE kind = {STROKE}), MAX(id), MAX(z) FROM items").fetchone()
+            # Stores written before there was an offset number their items from the top down
+            self.offset = int(settings.get('offset', self.count))
+            # Rows written after opening, by update_store, are items the page has already
+            self.last_row = self.last_row or 0
+            self.next_item_id = (top - self.offset + 1) if top is not None else 0
+            self.assets = StoreAssets(path, [key for key, in self.connection.execute("SELECT key FROM assets")])
+            rows = self.connection.execute(f"SELECT z, kind, data FROM items WHERE kind != {STROKE}")
+            # Text boxes and images are few and small, so they are read straight away
+            self.eager_items = [(self.number(z), decode_item(kind, blob)) for z, kind, blob in rows]
+        except sqlite3.DatabaseError as error:
+            self.close()
+            raise NotebookFormatError(f"Notebook store is damaged: {error}") from None
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+        self.template = settings.get('template', 'blank')
+        self.styles = json.loads(settings.get('styles', '[]'))
+        self.damaged = []  # DamagedSection of each item found damaged so far
+        self.remaining = strokes
+        self.fetched = set()  # ids of the strokes fetched so far
+        self.centers = {}  # chunk -> middle of its strokes
+
+    def number(self, z):
+        """Place in the saved order, topmost first, of the item at z in the stack, counted so that the item's
+        id is -1 - number; items drawn after the store was last saved whole have negative numbers."""
+        return self.offset - 1 - z
+
+    @property
+    def closed(self):
+        return self.connection is None
+
+    @property
+    def unloaded(self):
+        return [None] if self.remaining else []
+
+    def chunks_in(self, rect):
+        """Batches of the strokes not fetched yet whose bounds meet the scene rect, nearest its middle first."""
+        if not self.remaining:
+            return []
+        x, y = rect.center().x(), rect.center().y()
+        found = [(row_id, (left + right) / 2, (top + bottom) / 2) for row_id, left, right, top, bottom in
+                 self.connection.execute("SELECT id, left, right, top, bottom FROM item_bounds "
+                                         "WHERE left <= ? AND right >= ? AND top <= ? AND bottom >= ? AND id <= ?",
+                                         (rect.right(), rect.left(), rect.bottom(), rect.top(), self.last_row))
+                 if row_id not in self.fetched]
+        found.sort(key=lambda stroke: math.dist(stroke[1:], (x, y)))
+        chunks = []
+        for start in range(0, len(found), LOAD_BATCH):
+            batch = found[start:start + LOAD_BATCH]
+            chunk = tuple(stroke[0] for stroke in batch)
+            self.centers[chunk] = (sum(stroke[1] for stroke in batch) / len(batch),
+                                   sum(stroke[2] for stroke in batch) / len(batch))
+            chunks.append(chunk)
+        return chunks
+
+    def chunk_center(self, chunk):
+        return self.centers.get(chunk, (0.0, 0.0))
+
+    def load_chunk(self, chunk):
+        """[(item number, stroke data)] of the strokes of a chunk not fetched yet; chunk None fetches all of them."""
+        if not self.remaining:
+            return []
+        self.centers.pop(chunk, None)
+        if chunk is None:
+            rows = self.connection.execute(f"SELECT id, z, data FROM items WHERE kind = {STROKE} AND id <= ?",
+                                           (self.last_row,))
+        else:
+            chunk = [row_id for row_id in chunk if row_id not in self.fetched]
+            rows = self.connection.execute(f"SELECT id, z, data FROM items WHERE id IN "
+                                           f"({', '.join('?' * len(chunk))})", chunk) if chunk else []
+        strokes = []
+        for row_id, z, blob in rows:
+            if row_id in self.fetched:
+                continue
+            self.fetched.add(row_id)
+            self.remaining -= 1
+            try:
+                strokes.append((self.number(z), decode_item(STROKE, blob)))
+            except (NotebookFormatError, ValueError, struct.error) as error:
+                self.damaged.append(DamagedSection(b'ITEM', None, f"row {row_id}: {error}", items=1))
+        if chunk is None:
+            self.remaining = 0
+        return strokes
+
+    def close(self):
+        if getattr(self, 'connection', None) is not None:
+            self.connection.close()
+            self.connection = None
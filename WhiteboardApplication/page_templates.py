@@ -0,0 +1,101 @@
+from PySide6.QtGui import QPixmap, QPainter, QPen, QColor
+from PySide6.QtCore import Qt, QPointF, QPoint
+
+# Template ids stored in notebook files, mapped to the names shown in the Templates menu
+TEMPLATES = {
+    'blank': "Blank",
+    'ruled': "Ruled",
+    'grid': "Grid",
+    'dotted': "Dotted",
+}
+
+LINE_SPACING = 25  # Scene units between ruled lines, grid lines and dots
+TILE_PERIODS = 8  # Each tile holds this many repeats so drawTiledPixmap makes few calls
+MAX_CACHED_TILES = 8
+
+RULED_COLOR = QColor(120, 160, 210, 140)
+GRID_COLOR = QColor(160, 160, 160, 110)
+DOT_COLOR = QColor(110, 110, 110, 170)
+
+
+class PageTemplate:
+    """Draws a notebook's paper template from one pre-rendered repeating tile per zoom level."""
+
+    def __init__(self, template='blank'):
+        self.template = template if template in TEMPLATES else 'blank'
+
+        # (template, device scale) -> transparent QPixmap holding TILE_PERIODS x TILE_PERIODS repeats
+        self._tiles = {}
+
+    def set_template(self, template):
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown page template: {template}")
+        self.template = template
+
+    def draw(self, painter, rect):
+        """Tile the template over the exposed scene rect, in device pixels."""
+        if self.template == 'blank':
+            return
+
+        transform = painter.worldTransform()
+        # Templates are drawn axis aligned, so the horizontal scale is the zoom level
+        scale = abs(transform.m11()) or 1.0
+        dpr = painter.device().devicePixelRatioF() if painter.device() else 1.0
+        tile = self.tile(scale, dpr)
+        tile_size = tile.width() / dpr
+
+        device_rect = transform.mapRect(rect).toAlignedRect()
+        origin = transform.map(QPointF(0, 0))
+        offset = QPoint(int((device_rect.left() - origin.x()) % tile_size),
+                        int((device_rect.top() - origin.y()) % tile_size))
+
+        painter.save()
+        painter.resetTransform()
+        painter.drawTiledPixmap(device_rect, tile, offset)
+        painter.restore()
+
+    def tile(self, scale, dpr=1.0):
+        key = (self.template, round(scale, 4), dpr)
+        tile = self._tiles.get(key)
+        if tile is None:
+            if len(self._tiles) >= MAX_CACHED_TILES:
+                # Drop the oldest zoom level; dicts keep insertion order
+                del self._tiles[next(iter(self._tiles))]
+            tile = self._render_tile(scale, dpr)
+            self._tiles[key] = tile
+        return tile
+
+    def _render_tile(self, scale, dpr):
+        size = max(1, round(LINE_SPACING * TILE_PERIODS * scale))
+        # Spacing is stretched slightly so the repeats land on whole pixels
+        spacing = size / TILE_PERIODS
+
+        tile = QPixmap(round(size * dpr), round(size * dpr))
+        tile.setDevicePixelRatio(dpr)
+        tile.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(tile)
+        if self.template == 'ruled':
+            painter.setPen(QPen(RULED_COLOR, 1))
+            for i in range(TILE_PERIODS):
+                y = i * spacing + spacing - 1
+                painter.drawLine(QPointF(0, y), QPointF(size, y))
+        elif self.template == 'grid':
+            painter.setPen(QPen(GRID_COLOR, 1))
+            for i in range(TILE_PERIODS):
+                line = i * spacing
+                painter.drawLine(QPointF(0, line), QPointF(size, line))
+                painter.drawLine(QPointF(line, 0), QPointF(line, size))
+        elif self.template == 'dotted':
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(DOT_COLOR)
+            radius = max(0.75, 1.25 * scale)
+            # Dots sit in the middle of each cell so none are cut by the tile edge
+            for i in range(TILE_PERIODS):
+                for j in range(TILE_PERIODS):
+                    painter.drawEllipse(QPointF((i + 0.5) * spacing, (j + 0.5) * spacing), radius, radius)
+        painter.end()
+
+        return tile
+
@@ -0,0 +1,191 @@
+import time
+from array import array
+from bisect import bisect_right
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QWidget, QGraphicsScene, QGraphicsView, QSlider, QPushButton, QComboBox, QLabel, \
+    QVBoxLayout, QHBoxLayout
+
+from WhiteboardApplication.notebook_data import SCENE_RECT, path_from_elements, deserialize_times
+
+MAX_GAP = 2000  # ms; longer pauses between strokes are shortened to this during playback
+KEYFRAMES = 64  # Snapshots of the document state spread over the timeline
+MIN_KEYFRAME_OPS = 1024  # Ops between keyframes in short notebooks, where replaying is cheap anyway
+PLAYBACK_INTERVAL = 16  # ms between playback frames
+SPEEDS = [1, 2, 4, 8, 16]
+
+
+class PlaybackTimeline:
+    """A notebook as a timeline of ops, with keyframes so any moment can be rebuilt without replaying from the start.
+
+    Each drawable item is an entry, and the document state is how many points of each entry are shown
+    (text boxes have one). An op sets the count of one entry at a given time. A keyframe holds the
+    counts before every KEYFRAMES-th part of the ops, so seeking copies the nearest earlier keyframe
+    and applies at most one interval of ops.
+
+    Time is playback time in ms: the notebook's real time with long pauses shortened to max_gap.
+    Items saved without timestamps are shown from the start.
+    """
+
+    def __init__(self, notebook_data, max_gap=MAX_GAP):
+        self.entries = []  # index into notebook_data['items'] for each entry
+        self.sizes = array('I')  # points of each entry when fully drawn
+
+        initial = array('I')
+        events = []  # (real time, entry, count)
+        for index, item_data in enumerate(notebook_data['items']):
+            entry = len(self.entries)
+            size = len(item_data['elements']) if item_data['type'] == 'QGraphicsPathItem' else 1
+            self.entries.append(index)
+            self.sizes.append(size)
+
+            times = item_data.get('times')
+            if times is None:
+                initial.append(size)
+                continue
+            initial.append(0)
+            start, deltas = deserialize_times(times)
+            if deltas is None or len(deltas) != size:
+                events.append((start, entry, size))
+                continue
+            t = start
+            for count, delta in enumerate(deltas, 1):
+                t += delta
+                events.append((t, entry, count))
+        events.sort()
+
+        self.op_times = array('d')
+        self.op_entries = array('I')
+        self.op_counts = array('I')
+        previous = None
+        playback_time = 0.0
+        for real_time, entry, count in events:
+            if previous is not None:
+                playback_time += min(real_time - previous, max_gap)
+            previous = real_time
+            self.op_times.append(playback_time)
+            self.op_entries.append(entry)
+            self.op_counts.append(count)
+        self.duration = playback_time
+
+        self.interval = max(MIN_KEYFRAME_OPS, -(-len(events) // KEYFRAMES))
+        self.keyframes = []
+        state = array('I', initial)
+        for op in range(len(events)):
+            if op % self.interval == 0:
+                self.keyframes.append(array('I', state))
+            state[self.op_entries[op]] = self.op_counts[op]
+        if not self.keyframes:
+            self.keyframes.append(state)
+
+    def state_at(self, t):
+        """Points shown of every entry at playback time t."""
+        end = bisect_right(self.op_times, t)
+        keyframe = min(end // self.interval, len(self.keyframes) - 1)
+        state = array('I', self.keyframes[keyframe])
+        for op in range(keyframe * self.interval, end):
+            state[self.op_entries[op]] = self.op_counts[op]
+        return state
+
+
+class PlaybackWindow(QWidget):
+    """Replays a notebook as it was written, with a scrubber to seek anywhere."""
+
+    def __init__(self, notebook_data, items, parent=None):
+        """items holds the scene item built for each of notebook_data['items'], or None to leave one out."""
+        super().__init__(parent)
+        self.setWindowTitle("Notebook Playback")
+        self.resize(900, 1000)
+
+        self.notebook_data = notebook_data
+        self.timeline = PlaybackTimeline(notebook_data)
+        self.items = [items[index] for index in self.timeline.entries]
+        self._full_paths = [item.path() if hasattr(item, 'path') else None for item in self.items]
+        self._shown = array('I', [0] * len(self.items))
+
+        self.scene = QGraphicsScene(self)
+        self.scene.setSceneRect(SCENE_RECT)
+        # Saved items are topmost first
+        for z, item in enumerate(reversed(self.items)):
+            if item is not None:
+                item.setZValue(z)
+                item.setVisible(False)
+                self.scene.addItem(item)
+
+        self.view = QGraphicsView(self.scene)
+        self.view.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+
+        self.play_button = QPushButton("Play")
+        self.play_button.clicked.connect(self.toggle_playing)
+        self.speed = QComboBox()
+        for speed in SPEEDS:
+            self.speed.addItem(f"{speed}x", speed)
+        self.scrubber = QSlider(Qt.Orientation.Horizontal)
+        self.scrubber.setRange(0, int(self.timeline.duration))
+        self.scrubber.valueChanged.connect(self.seek)
+        self.time_label = QLabel()
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.play_button)
+        controls.addWidget(self.speed)
+        controls.addWidget(self.scrubber, 1)
+        controls.addWidget(self.time_label)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.view, 1)
+        layout.addLayout(controls)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(PLAYBACK_INTERVAL)
+        self._timer.timeout.connect(self._advance)
+        self._last_tick = None
+
+        self.seek(0)
+
+    def seek(self, t):
+        """Show the notebook as it was at playback time t, in ms."""
+        state = self.timeline.state_at(t)
+        for entry, count in enumerate(state):
+            if count == self._shown[entry]:
+                continue
+            self._show(entry, count)
+        self.position = t
+        self.time_label.setText(f"{int(t // 60000)}:{int(t // 1000) % 60:02d}")
+
+    def _show(self, entry, count):
+        self._shown[entry] = count
+        item = self.items[entry]
+        if item is None:
+            return
+        item.setVisible(count > 0)
+        if count == 0 or self._full_paths[entry] is None:
+            return
+        if count == self.timeline.sizes[entry]:
+            item.setPath(self._full_paths[entry])
+        else:
+            elements = self.notebook_data['items'][self.timeline.entries[entry]]['elements']
+            item.setPath(path_from_elements(elements[:count]))
+
+    def toggle_playing(self):
+        if self._timer.isActive():
+            self._timer.stop()
+            self.play_button.setText("Play")
+            return
+        if self.position >= self.timeline.duration:
+            self.scrubber.setValue(0)
+        self._last_tick = time.perf_counter()
+        self._timer.start()
+        self.play_button.setText("Pause")
+
+    def _advance(self):
+        now = time.perf_counter()
+        elapsed = (now - self._last_tick) * 1000 * self.speed.currentData()
+        self._last_tick = now
+        position = min(self.position + elapsed, self.timeline.duration)
+        # The scrubber only holds whole ms, so playback keeps its own fractional position
+        self.scrubber.blockSignals(True)
+        self.scrubber.setValue(int(position))
+        self.scrubber.blockSignals(False)
+        self.seek(position)
+        if position >= self.timeline.duration:
+            self.toggle_playing()
@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import QGraphicsPixmapItem, QGraphicsRectItem, QGraphicsSceneMouseEvent
-from PySide6.QtGui import QPixmap, QCursor
-from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QPixmap, QCursor, QPainterPath
+from PySide6.QtCore import Qt, QRectF, QPointF, QSizeF
 
 
 class ResizablePixmapItem(QGraphicsPixmapItem):
@@ -15,6 +15,11 @@ class ResizablePixmapItem(QGraphicsPixmapItem):
         # Save the original pixmap to maintain quality during resizing
         self.original_pixmap = pixmap
 
+        # Key of the image in its notebook's AssetStore, and while it isn't decoded yet the store and the size it is shown at
+        self.asset = None
+        self.assets = None
+        self.pending_size = None
+
         # Initialize resize handles
         self.handles = []
         self.handle_size = 10
@@ -22,6 +27,52 @@ class ResizablePixmapItem(QGraphicsPixmapItem):
         self.create_handles()
         self.setHandlesVisible(False)  # Hide handles by default
 
+    @classmethod
+    def from_asset(cls, assets, key, width, height):
+        """An item showing an image of the store at width x height, decoded only once it is first painted."""
+        item = cls(QPixmap())
+        item.asset = key
+        item.assets = assets
+        item.pending_size = QSizeF(width, height)
+        item.update_handles()
+        return item
+
+    def decode(self):
+        """Decode the image of an item made by from_asset, if it isn't already."""
+        if self.pending_size is None:
+            return
+        size, self.pending_size = self.pending_size.toSize(), None
+        self.original_pixmap = self.assets.pixmap(self.asset)
+        pixmap = self.original_pixmap
+        if pixmap.size() != size:
+            # Scaled the way resize scales it
+            pixmap = pixmap.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio)
+        self.setPixmap(pixmap)
+
+    def image_size(self):
+        """Size the image is shown at, decoded or not."""
+        if self.pending_size is not None:
+            return QSizeF(self.pending_size)
+        return self.pixmap().deviceIndependentSize()
+
+    def boundingRect(self):
+        if self.pending_size is None:
+            return super().boundingRect()
+        # What QGraphicsPixmapItem gives a selectable item once its pixmap is set
+        return QRectF(self.offset(), self.pending_size).adjusted(-0.5, -0.5, 0.5, 0.5)
+
+    def shape(self):
+        if self.pending_size is None:
+            return super().shape()
+        path = QPainterPath()
+        path.addRect(QRectF(self.offset(), self.pending_size))
+        return path
+
+    def paint(self, painter, option, widget=None):
+        # First time on screen
+        self.decode()
+        super().paint(painter, option, widget)
+
     def create_handles(self):
         """Create resize handles at the corners of the pixmap."""
         for i in range(4):  # Four handles (top-left, top-right, bottom-left, bottom-right)
@@ -84,6 +135,7 @@ class ResizablePixmapItem(QGraphicsPixmapItem):
 
     def resize(self, mouse_pos, handle_index):
         """Resize the pixmap based on the selected handle, allowing smaller and larger scales."""
+        self.decode()
         rect = self.boundingRect()
 
         # Map mouse position to item coordinates
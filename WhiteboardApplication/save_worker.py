@@ -0,0 +1,102 @@
+"""Saving off the GUI thread.
+
+A save takes a snapshot of the page on the GUI thread, which is cheap: items keep their
+QPainterPath, QBrush and QTransform, which Qt shares copy-on-write with the item, instead of being
+turned into their saved form (see notebook_data.snapshot_item). A SaveJob does the costly part on a worker thread: the saved
+form of every item, encoding and compression, and writing the file through a temporary file that
+is renamed over the target once it is complete.
+"""
+import json
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from WhiteboardApplication import geometry, notebook_store
+from WhiteboardApplication.notebook_data import finish_item
+from WhiteboardApplication.notebook_format import encode_notebook, write_atomically
+
+PROGRESS_INTERVAL = 500  # Items finished between two progress signals
+
+
+def finish_notebook(notebook_data, progress=None):
+    """Notebook data with every item in its saved form, from a snapshot; progress(done, total) is told as it goes."""
+    items = notebook_data['items']
+    finished = []
+    for done, data in enumerate(items):
+        if progress is not None and done % PROGRESS_INTERVAL == 0:
+            progress(done, len(items))
+        finished.append(finish_item(data))
+    if progress is not None:
+        progress(len(items), len(items))
+    return dict(notebook_data, items=finished)
+
+
+def encode_notebook_snapshot(path, snapshot, progress, compression='zlib'):
+    """SaveJob encoder for a notebook snapshot, as MainWindow.snapshot_notebook takes it.
+
+    A notebook store (.bndb) is updated in place instead, and None returned; its rows are placed
+    by the snapshot's item ids, if it has them (see notebook_store.save_store).
+    """
+    notebook_data = finish_notebook(snapshot, progress)
+    if path.endswith(notebook_store.EXTENSION):
+        notebook_data.pop('ids', None)
+        notebook_store.save_store(path, notebook_data, ids=snapshot.get('ids'))
+        return None
+    return encode_notebook(path, notebook_data, compression)
+
+
+def encode_store_changes(path, snapshot, progress):
+    """SaveJob encoder for the items of a page changed since it was saved to or opened from the store at path,
+    as MainWindow.store_changes takes them. Only those are finished and written, however big the page."""
+    items = [(item_id, finish_item(data) if data is not None else None) for item_id, data in snapshot['items']]
+    notebook_store.update_store(path, dict(snapshot, items=items), progress)
+    return None
+
+
+def encode_whiteboard_snapshot(path, snapshot, progress):
+    """SaveJob encoder for the collaboration client's JSON whiteboard files.
+
+    The snapshot is the file's JSON with each path item holding its QPainterPath in place of its points.
+    """
+    items = []
+    for done, item in enumerate(snapshot['items']):
+        if done % PROGRESS_INTERVAL == 0:
+            progress(done, len(snapshot['items']))
+        if item['type'] == 'path':
+            item = dict(item, points=geometry.point_list(geometry.path_points(item['path'])))
+            del item['path']
+        items.append(item)
+    progress(len(items), len(items))
+    return json.dumps(dict(snapshot, items=items)).encode('utf-8')
+
+
+class _SaveSignals(QObject):
+    progress = Signal(int, int)  # items done, items in all
+    finished = Signal(str)  # path
+    failed = Signal(str, str)  # path, what went wrong
+
+
+class SaveJob(QRunnable):
+    """Encodes a snapshot with encode(path, snapshot, progress) and writes it to path, on a pool thread.
+
+    An encoder that saved the notebook itself returns None.
+    """
+
+    def __init__(self, path, snapshot, encode=encode_notebook_snapshot):
+        super().__init__()
+        # Kept alive by whoever started it until finished or failed is delivered
+        self.setAutoDelete(False)
+        self.path = path
+        self.snapshot = snapshot
+        self.encode = encode
+        self.signals = _SaveSignals()
+
+    def run(self):
+        try:
+            data = self.encode(self.path, self.snapshot, self.signals.progress.emit)
+            if data is not None:
+                write_atomically(self.path, data)
+        except Exception as error:
+            # Nothing on this thread can show the error, and the file was left as it was
+            self.signals.failed.emit(self.path, str(error))
+            return
+        self.signals.finished.emit(self.path)
@@ -0,0 +1,282 @@
+"""Full-text search over the text boxes of every notebook saved or opened on this machine.
+
+Text boxes are kept in a SQLite database with an FTS5 index on their text, each with the path of
+its notebook, its page and its place on the page, so a search is answered from the index, ranked
+by bm25, without opening any notebook. A notebook's boxes are replaced whenever it is saved or
+opened at a version the index hasn't seen, on a background thread; searches read the database
+alongside it, in WAL mode, from the GUI thread.
+
+Index a folder of notebooks, or search the index, from a terminal with:
+    python -m WhiteboardApplication.search --index notebooks/
+    python -m WhiteboardApplication.search "lecture notes"
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+import sqlite3
+import sys
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QStandardPaths, QThreadPool, Signal
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.notebook_format import MAGIC, read_notebook, read_sections
+from WhiteboardApplication.notebook_data import normalize_notebook
+from WhiteboardApplication.notebook_store import is_store, read_text_boxes
+from WhiteboardApplication.thumbnails import file_version
+
+SEARCH_LIMIT = 50  # Hits a search returns at most
+SNIPPET_WORDS = 10  # Words of the text box shown around a hit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notebooks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    id INTEGER PRIMARY KEY,
+    notebook INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boxes_by_notebook ON boxes (notebook);
+CREATE VIRTUAL TABLE IF NOT EXISTS box_text USING fts5(
+    text, content='boxes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS box_added AFTER INSERT ON boxes BEGIN
+    INSERT INTO box_text (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS box_removed AFTER DELETE ON boxes BEGIN
+    INSERT INTO box_text (box_text, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+_SEARCH = f"""
+SELECT notebooks.path, boxes.page, boxes.x, boxes.y, snippet(box_text, 0, '[', ']', '...', {SNIPPET_WORDS})
+FROM box_text
+JOIN boxes ON boxes.id = box_text.rowid
+JOIN notebooks ON notebooks.id = boxes.notebook
+WHERE box_text MATCH ?
+ORDER BY rank
+LIMIT ?
+"""
+
+
+def index_path():
+    """Where the search index is kept."""
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return os.path.join(location or os.path.expanduser('~'), 'search.sqlite')
+
+
+def fts_query(text):
+    """FTS5 query matching boxes with every word typed, the last ones possibly half typed; None if there are none."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def text_boxes(notebook_data, page=0):
+    """[(page, x, y, text)] of the text boxes in notebook data or a page snapshot."""
+    return [(page, data['x'], data['y'], data['text']) for data in normalize_notebook(notebook_data)['items']
+            if data['type'] == 'TextBox' and data['text'].strip()]
+
+
+def file_text_boxes(path):
+    """text_boxes of a notebook file; of a .bnb file only the sections before the strokes are read, and of a
+    notebook store only the rows of its text boxes."""
+    if is_store(path):
+        return text_boxes({'items': read_text_boxes(path)})
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return text_boxes(read_notebook(path))
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            sections = read_sections(data)
+    return text_boxes({'items': json.loads(sections.get(b'TEXT', b'[]'))})
+
+
+class SearchHit:
+    """A text box that matched, and where to find it."""
+
+    def __init__(self, path, page, x, y, snippet):
+        self.path = path
+        self.page = page
+        self.x = x
+        self.y = y
+        self.snippet = snippet  # the matching words of its text, in [brackets]
+
+    def __str__(self):
+        return f"{os.path.basename(self.path)}: {self.snippet}"
+
+
+class SearchIndex:
+    """The SQLite database of text boxes, used from one thread at a time."""
+
+    def __init__(self, path, check_same_thread=True):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        # Searches read while the index is being written
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+        self.connection.commit()
+
+    def version(self, path):
+        """Version of the notebook at path the index holds, or None if it holds none."""
+        row = self.connection.execute("SELECT version FROM notebooks WHERE path = ?",
+                                      (os.path.abspath(path),)).fetchone()
+        return row[0] if row is not None else None
+
+    def update(self, path, version, boxes):
+        """Replaces the text boxes of the notebook at path with boxes, [(page, x, y, text)], in one transaction."""
+        path = os.path.abspath(path)
+        with self.connection:
+            row = self.connection.execute("SELECT id FROM notebooks WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                notebook = self.connection.execute("INSERT INTO notebooks (path, version) VALUES (?, ?)",
+                                                   (path, version)).lastrowid
+            else:
+                notebook = row[0]
+                self.connection.execute("UPDATE notebooks SET version = ? WHERE id = ?", (version, notebook))
+                self.connection.execute("DELETE FROM boxes WHERE notebook = ?", (notebook,))
+            self.connection.executemany("INSERT INTO boxes (notebook, page, x, y, text) VALUES (?, ?, ?, ?, ?)",
+                                        [(notebook, page, x, y, text) for page, x, y, text in boxes])
+
+    def forget(self, path):
+        path = os.path.abspath(path)
+        with self.connection:
+            self.connection.execute("DELETE FROM boxes WHERE notebook IN (SELECT id FROM notebooks WHERE path = ?)",
+                                    (path,))
+            self.connection.execute("DELETE FROM notebooks WHERE path = ?", (path,))
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """[SearchHit] of the boxes matching text, best first."""
+        query = fts_query(text)
+        if query is None:
+            return []
+        return [SearchHit(*row) for row in self.connection.execute(_SEARCH, (query, limit))]
+
+    def close(self):
+        self.connection.close()
+
+
+class _IndexSignals(QObject):
+    finished = Signal(str, bool)  # path, whether its boxes changed in the index
+
+
+class IndexJob(QRunnable):
+    """Brings the index up to date with a notebook on a pool thread.
+
+    Given no boxes, the notebook file is read for them, and only if the index holds another version of it.
+    A notebook file that is gone is taken out of the index.
+    """
+
+    def __init__(self, index, path, version=None, boxes=None):
+        super().__init__()
+        # Kept alive by whoever started it until finished is delivered
+        self.setAutoDelete(False)
+        self.index = index
+        self.path = path
+        self.version = version
+        self.boxes = boxes
+        self.signals = _IndexSignals()
+
+    def run(self):
+        changed = False
+        try:
+            if self.boxes is None and not os.path.exists(self.path):
+                # Moved or deleted since it was indexed
+                changed = self.index.version(self.path) is not None
+                self.index.forget(self.path)
+                self.signals.finished.emit(self.path, changed)
+                return
+            version = self.version or file_version(self.path)
+            if self.boxes is not None or self.index.version(self.path) != version:
+                boxes = self.boxes if self.boxes is not None else file_text_boxes(self.path)
+                self.index.update(self.path, version, boxes)
+                changed = True
+        except (OSError, ValueError, sqlite3.Error) as error:
+            # A notebook that can't be read is left out of the index; the window carries on
+            print(f"Couldn't index {self.path}: {error}")
+        self.signals.finished.emit(self.path, changed)
+
+
+class SearchService(QObject):
+    """Updates the index on a background thread and answers searches on the GUI thread."""
+    # The boxes of the notebook at a path changed in the index
+    indexed = Signal(str)
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        path = path or index_path()
+        # Only jobs use the writer, and the pool's one thread runs them one after another
+        self.writer = SearchIndex(path, check_same_thread=False)
+        self.reader = SearchIndex(path)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.running = set()  # jobs not finished yet, kept alive while the pool runs them
+
+    def index(self, path, version=None, boxes=None):
+        """Has the notebook at path indexed: with boxes, [(page, x, y, text)], if given, or else from its file.
+
+        A notebook file that is gone is taken out of the index instead.
+        """
+        if self.writer is None:
+            return
+        job = IndexJob(self.writer, path, version, boxes)
+        job.signals.finished.connect(partial(self.job_finished, job))
+        self.running.add(job)
+        self.pool.start(job)
+
+    def job_finished(self, job, path, changed):
+        self.running.discard(job)
+        garbage_collector.release_job(job)
+        if changed:
+            self.indexed.emit(path)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        return self.reader.search(text, limit) if self.reader is not None else []
+
+    def close(self):
+        self.pool.waitForDone()
+        if self.writer is not None:
+            self.writer.close()
+            self.reader.close()
+            self.writer = self.reader = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m WhiteboardApplication.search",
+                                     description="Search the text boxes of every indexed notebook, "
+                                                 "or add notebooks to the index.")
+    parser.add_argument('query', nargs='?', help="words to search for")
+    parser.add_argument('--index', nargs='+', metavar='PATH',
+                        help="notebook files, or folders to search for them, to add to the index first")
+    parser.add_argument('--database', help="the index to use (default: the one BestNotes keeps)")
+    args = parser.parse_args(argv)
+
+    # batch brings in the compaction code, which only the indexing needs
+    from WhiteboardApplication.batch import find_notebooks
+
+    index = SearchIndex(args.database or index_path())
+    for path, _root in find_notebooks(args.index or []):
+        version = file_version(path)
+        if index.version(path) == version:
+            continue
+        try:
+            index.update(path, version, file_text_boxes(path))
+        except (OSError, ValueError) as error:
+            print(f"Couldn't index {path}: {error}")
+    if args.query:
+        for hit in index.search(args.query):
+            print(f"{hit.path}, page {hit.page + 1} at ({hit.x:.0f}, {hit.y:.0f}): {hit.snippet}")
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+from array import array
+
+from PySide6.QtWidgets import QGraphicsPathItem, QStyle
+from PySide6.QtGui import QPainterPathStroker, QPainterPath, QPen
+from PySide6.QtCore import Qt
+
+MAX_TIME_DELTA = 0xFFFF  # Largest gap between two points a timestamp can hold, in ms
+
+
+def stroke_outline(path, pen, brush):
+    """Filled outline covering everything a path item would paint with this pen and brush."""
+    if path.isEmpty():
+        return QPainterPath()
+    if pen.widthF() <= 0 or pen.style() == Qt.PenStyle.NoPen:
+        return QPainterPath(path)
+
+    outline = QPainterPathStroker(pen).createStroke(path)
+    # Filled paths (unused by the pen tools, but allowed by the item) keep their interior
+    if brush.style() != Qt.BrushStyle.NoBrush:
+        outline = outline.united(path)
+    return outline
+
+
+def fills_outline(pen):
+    """Whether a stroke can be painted by filling its outline instead of stroking the path.
+
+    Dashed and cosmetic pens depend on the painter transform, so Qt has to stroke those.
+    """
+    return pen.style() == Qt.PenStyle.SolidLine and not pen.isCosmetic()
+
+
+class StrokeItem(QGraphicsPathItem):
+    """Pen/highlighter stroke that caches its stroked outline and bounding rect."""
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+
+        # Stroked outline of the path and its tight bounds, rebuilt lazily after
+        # setPath/setPen so painting and hit-testing never re-run the stroker
+        self._outline = None
+        self._bounds = None
+        # Index of the pen in the notebook's StyleTable, None if the pen was set directly
+        self.style = None
+
+        # When each point was drawn: start_time is ms since the epoch for the first point and
+        # timestamps holds ms since the previous point, one per path element
+        self.start_time = None
+        self.timestamps = None
+        self._elapsed = 0
+
+        if path is not None:
+            self.setPath(path)
+
+    # Qt asks for the old bounds while the geometry change is being prepared,
+    # so the caches are only dropped after the base class has stored the new value
+    def setPath(self, path):
+        super().setPath(path)
+        self._invalidate_geometry()
+
+    def setPen(self, pen):
+        super().setPen(pen)
+        self._invalidate_geometry()
+        self.style = None
+
+    # A filled stroke keeps its interior in the outline; Qt's own setBrush only repaints
+    def setBrush(self, brush):
+        self.prepareGeometryChange()
+        super().setBrush(brush)
+        self._invalidate_geometry()
+
+    def record_time(self, now):
+        """Timestamp the point just added to the path; now is ms since the epoch."""
+        if self.start_time is None:
+            self.start_time = now
+            self.timestamps = array('H', [0])
+            self._elapsed = 0
+            return
+        # Measured from the start so rounding never drifts, clamped for long pauses mid-stroke
+        delta = min(max(0, round(now - self.start_time) - self._elapsed), MAX_TIME_DELTA)
+        self.timestamps.append(delta)
+        self._elapsed += delta
+
+    def set_times(self, start_time, timestamps):
+        self.start_time = start_time
+        self.timestamps = timestamps
+        self._elapsed = sum(timestamps)
+
+    def _invalidate_geometry(self):
+        self._outline = None
+        self._bounds = None
+
+    def outline(self):
+        """Return the filled outline of the stroke, building it once per geometry change."""
+        if self._outline is None:
+            self._outline = stroke_outline(self.path(), self.pen(), self.brush())
+        return self._outline
+
+    def cached_outline(self):
+        """The outline if it has already been built, otherwise None."""
+        return self._outline
+
+    def boundingRect(self):
+        if self._bounds is None:
+            self._bounds = self.outline().boundingRect()
+        return self._bounds
+
+    def shape(self):
+        return self.outline()
+
+    def contains(self, point):
+        # Cheap rectangle rejection before the exact point-in-outline test
+        return self.boundingRect().contains(point) and self.outline().contains(point)
+
+    def paint(self, painter, option, widget=None):
+        # On a CanvasView, parts of the stroke may already be drawn from the view's ink tiles
+        clip = None
+        layer = getattr(widget.parent(), 'ink_layer', None) if widget is not None else None
+        if layer is not None:
+            clip = layer.baked_clip(self, widget)
+            if clip is False:
+                return
+        if clip is not None:
+            painter.save()
+            world = painter.worldTransform()
+            painter.resetTransform()
+            painter.setClipRegion(clip, Qt.ClipOperation.IntersectClip)
+            painter.setWorldTransform(world)
+
+        pen = self.pen()
+        if fills_outline(pen):
+            painter.fillPath(self.outline(), pen.brush())
+            if option.state & QStyle.StateFlag.State_Selected:
+                self._paint_selection(painter)
+        else:
+            super().paint(painter, option, widget)
+
+        if clip is not None:
+            painter.restore()
+
+    def _paint_selection(self, painter):
+        """Dashed selection box around the cached bounds, like Qt draws for path items."""
+        painter.save()
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.setPen(QPen(Qt.GlobalColor.white, 0, Qt.PenStyle.SolidLine))
+        painter.drawRect(self.boundingRect())
+        painter.setPen(QPen(Qt.GlobalColor.black, 0, Qt.PenStyle.DashLine))
+        painter.drawRect(self.boundingRect())
+        painter.restore()
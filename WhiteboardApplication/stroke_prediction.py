@@ -0,0 +1,170 @@
+import math
+from collections import deque
+
+from PySide6.QtGui import QPainterPath, QPen
+from PySide6.QtCore import QPointF, QRectF, Qt
+
+PREDICTION_HORIZON = 16.0  # ms of pen motion drawn ahead of the last real sample, about one frame
+PREDICTION_STEPS = 4  # Points along the predicted tip, so curving strokes bend instead of shooting straight
+MAX_PREDICTION = 40.0  # Scene units the tip may run ahead, whatever the speed
+MIN_SAMPLE_INTERVAL = 0.5  # ms; samples closer together than this are merged, their velocity is mostly noise
+ACCELERATION_DAMPING = 0.5  # Share of the measured acceleration trusted when extrapolating
+ERROR_TOLERANCE = 2.0  # Scene units a prediction may miss by and still count as hiding latency
+
+
+class PredictionStats:
+    """Compares each predicted tip with where the pen really was at that time, once it gets there."""
+
+    def __init__(self, tolerance=ERROR_TOLERANCE):
+        self.tolerance = tolerance
+        self._pending = deque()  # (target time, predicted point, unit direction, horizon)
+        self._last = None  # last real sample, (time, point)
+
+        self.predictions = 0
+        self.total_error = 0.0
+        self.max_error = 0.0
+        self.total_overshoot = 0.0
+        self.hidden_ms = 0.0
+
+    def add_prediction(self, t, point, direction, horizon):
+        self._pending.append((t + horizon, point, direction, horizon))
+
+    def add_sample(self, t, point):
+        while self._pending and self._pending[0][0] <= t:
+            target, predicted, direction, horizon = self._pending.popleft()
+            actual = self._position_at(target, t, point)
+            offset = predicted - actual
+            error = math.hypot(offset.x(), offset.y())
+            # How far the tip ran past the real pen along the direction it was heading
+            overshoot = max(0.0, offset.x() * direction.x() + offset.y() * direction.y())
+
+            self.predictions += 1
+            self.total_error += error
+            self.max_error = max(self.max_error, error)
+            self.total_overshoot += overshoot
+            if error <= self.tolerance:
+                self.hidden_ms += horizon
+        self._last = (t, point)
+
+    def end_stroke(self):
+        # The pen lifted before these targets were reached, so there is nothing to compare with
+        self._pending.clear()
+        self._last = None
+
+    def _position_at(self, target, t, point):
+        if self._last is None or t <= self._last[0]:
+            return point
+        last_t, last_point = self._last
+        f = (target - last_t) / (t - last_t)
+        return last_point + (point - last_point) * f
+
+    def report(self):
+        """Averages over every checked prediction: perceived latency hidden, miss distance and overshoot."""
+        count = self.predictions or 1
+        return {
+            'predictions': self.predictions,
+            'latency_hidden_ms': self.hidden_ms / count,
+            'mean_error': self.total_error / count,
+            'max_error': self.max_error,
+            'mean_overshoot': self.total_overshoot / count,
+        }
+
+
+class StrokePredictor:
+    """Extrapolates the next few milliseconds of pen motion from recent velocity and acceleration.
+
+    Given a PredictionStats, as the benchmark does, each prediction is also checked against the pen.
+    """
+
+    def __init__(self, horizon=PREDICTION_HORIZON, enabled=True, stats=None):
+        self.horizon = horizon
+        self.enabled = enabled
+        self.stats = stats
+        self._samples = deque(maxlen=3)  # (time in ms, QPointF)
+
+    def begin_stroke(self, point, t):
+        self._samples.clear()
+        self._samples.append((t, QPointF(point)))
+        if self.stats is not None:
+            self.stats.end_stroke()
+            self.stats.add_sample(t, QPointF(point))
+
+    def add_sample(self, point, t):
+        point = QPointF(point)
+        if self.stats is not None:
+            self.stats.add_sample(t, point)
+        if self._samples and t - self._samples[-1][0] < MIN_SAMPLE_INTERVAL:
+            self._samples[-1] = (self._samples[-1][0], point)
+        else:
+            self._samples.append((t, point))
+
+    def end_stroke(self):
+        self._samples.clear()
+        if self.stats is not None:
+            self.stats.end_stroke()
+
+    def predict(self):
+        """Predicted points ahead of the last sample, nearest first; empty when there is nothing to predict."""
+        if not self.enabled or self.horizon <= 0 or len(self._samples) < 2:
+            return []
+
+        (t1, p1), (t2, p2) = self._samples[-2], self._samples[-1]
+        velocity = (p2 - p1) / (t2 - t1)
+        acceleration = QPointF()
+        if len(self._samples) == 3:
+            t0, p0 = self._samples[0]
+            previous_velocity = (p1 - p0) / (t1 - t0)
+            acceleration = (velocity - previous_velocity) / ((t2 - t0) / 2) * ACCELERATION_DAMPING
+
+        speed = math.hypot(velocity.x(), velocity.y())
+        if speed == 0:
+            return []
+
+        points = []
+        for step in range(1, PREDICTION_STEPS + 1):
+            h = self.horizon * step / PREDICTION_STEPS
+            offset = velocity * h + acceleration * (0.5 * h * h)
+            # Never let the tip run ahead further than the pen could plausibly travel
+            length = math.hypot(offset.x(), offset.y())
+            limit = min(MAX_PREDICTION, 2 * speed * h)
+            if length > limit:
+                offset *= limit / length
+            points.append(p2 + offset)
+
+        if self.stats is not None:
+            self.stats.add_prediction(t2, points[-1], velocity / speed, self.horizon)
+        return points
+
+
+class PredictionOverlay:
+    """Temporary tip drawn ahead of the stroke in progress; replaced as real samples arrive.
+
+    It is painted by the scene's drawForeground rather than added as an item, so it is never saved,
+    journaled, erased or baked into the ink tiles with the page.
+    """
+
+    def __init__(self, pen):
+        self.pen = QPen(pen)
+        self.path = QPainterPath()
+
+    def show_prediction(self, start, points):
+        """Replace the tip and return the scene rect to repaint, covering both the old and new tip."""
+        old = self.bounding_rect()
+        self.path = QPainterPath()
+        if points:
+            self.path.moveTo(start)
+            for point in points:
+                self.path.lineTo(point)
+        return old.united(self.bounding_rect())
+
+    def bounding_rect(self):
+        if self.path.isEmpty():
+            return QRectF()
+        # Half the pen on either side of the path, and a pixel for antialiasing
+        margin = self.pen.widthF() / 2 + 1
+        return self.path.boundingRect().adjusted(-margin, -margin, margin, margin)
+
+    def paint(self, painter):
+        painter.setPen(self.pen)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawPath(self.path)
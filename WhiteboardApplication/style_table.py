@@ -0,0 +1,87 @@
+from PySide6.QtGui import QPen, QColor
+from PySide6.QtCore import Qt
+
+
+def serialize_pen(pen: QPen):
+    # Enums are stored as plain ints so the same dict works in pickles and JSON payloads
+    color = pen.color()
+    return {
+        'width': pen.widthF(),
+        'color': {'red': color.red(), 'green': color.green(), 'blue': color.blue(), 'alpha': color.alpha()},
+        'style': Qt.PenStyle(pen.style()).value,
+        'capstyle': Qt.PenCapStyle(pen.capStyle()).value,
+        'joinstyle': Qt.PenJoinStyle(pen.joinStyle()).value,
+    }
+
+
+def deserialize_pen(data):
+    # Older notebooks pickled the Qt enums themselves, which the enum constructors accept too
+    color = data['color']
+    pen = QPen()
+    pen.setWidthF(data['width'])
+    pen.setColor(QColor(color['red'], color['green'], color['blue'], color['alpha']))
+    pen.setStyle(Qt.PenStyle(data['style']))
+    pen.setCapStyle(Qt.PenCapStyle(data['capstyle']))
+    pen.setJoinStyle(Qt.PenJoinStyle(data['joinstyle']))
+    return pen
+
+
+def pen_key(pen: QPen):
+    """Everything about a pen that a saved stroke depends on, as a hashable tuple."""
+    return (pen.color().rgba(), pen.widthF(), Qt.PenStyle(pen.style()).value,
+            Qt.PenCapStyle(pen.capStyle()).value, Qt.PenJoinStyle(pen.joinStyle()).value, pen.isCosmetic())
+
+
+class StyleTable:
+    """Interned pens of a notebook: each distinct pen is kept once and strokes refer to it by index.
+
+    Strokes given a pen from the table all share one implicitly shared QPen, and files and
+    network payloads write the table once instead of a full pen per stroke.
+    """
+
+    def __init__(self):
+        self.pens = []
+        self._indices = {}  # pen_key -> index into pens
+
+    def __len__(self):
+        return len(self.pens)
+
+    def intern(self, pen: QPen):
+        """Index of the pen in the table, adding it if no equal pen is there yet."""
+        key = pen_key(pen)
+        index = self._indices.get(key)
+        if index is None:
+            index = len(self.pens)
+            self.pens.append(QPen(pen))
+            self._indices[key] = index
+        return index
+
+    def pen(self, index):
+        return self.pens[index]
+
+    def apply(self, item, pen: QPen):
+        """Give a stroke the table's copy of the pen and remember its index on the item."""
+        index = self.intern(pen)
+        item.setPen(self.pens[index])
+        item.style = index
+        return index
+
+    def index_of(self, item):
+        """Index of a stroke's pen, using the index it carries if its pen came from this table."""
+        index = getattr(item, 'style', None)
+        if index is not None and index < len(self.pens):
+            return index
+        return self.intern(item.pen())
+
+    def serialize(self):
+        return [serialize_pen(pen) for pen in self.pens]
+
+    @classmethod
+    def deserialize(cls, data):
+        table = cls()
+        for pen_data in data:
+            pen = deserialize_pen(pen_data)
+            # Interning keeps the indices as saved, unless the file holds duplicates
+            table.pens.append(pen)
+            table._indices.setdefault(pen_key(pen), len(table.pens) - 1)
+        return table
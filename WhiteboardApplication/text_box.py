@@ -22,6 +22,9 @@ class TextBox(QGraphicsTextItem):
         # Allow text editing within the box
         self.setTextInteractionFlags(Qt.TextEditorInteraction)
 
+        # ms since the epoch when the box was added, so playback can show it at the right moment
+        self.start_time = None
+
         # Create background rectangle
         self.background = QGraphicsRectItem(self)
         self.background.setBrush(QColor(255, 255, 255, 127))
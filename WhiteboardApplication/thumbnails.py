@@ -0,0 +1,227 @@
+"""Small previews of notebook pages, kept in an on-disk cache and redrawn in the background.
+
+A thumbnail is drawn from a page's saved form, straight onto a QImage, which is safe on a
+worker thread: no scene is built. Thumbnails are kept as PNG blobs in a SQLite database, one row
+per notebook id and page holding the content version it was drawn from, so only pages whose
+version moved on are drawn again. Reading one back is a primary key lookup and a small PNG
+decode, well under a millisecond.
+
+A notebook file's id comes from its path and its version from its modification time and size, so
+a file opened again unchanged keeps its thumbnail; each edit made since gives a new version.
+"""
+import hashlib
+import os
+import sqlite3
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QStandardPaths, QThreadPool, QRectF, QBuffer, QByteArray, QIODevice, \
+    Qt, Signal
+from PySide6.QtGui import QImage, QPainter, QTransform, QColor
+
+from WhiteboardApplication import garbage_collector
+from WhiteboardApplication.notebook_data import SCENE_RECT, item_scene_transform, item_pen, path_from_elements, \
+    deserialize_brush, deserialize_font, deserialize_color
+from WhiteboardApplication.notebook_format import read_notebook
+from WhiteboardApplication.save_worker import finish_notebook
+
+THUMBNAIL_WIDTH = 192  # px; the height follows the page's shape
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    notebook TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    png BLOB NOT NULL,
+    PRIMARY KEY (notebook, page)
+) WITHOUT ROWID
+"""
+
+
+def cache_path():
+    """Where the thumbnail database is kept."""
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return os.path.join(location or os.path.expanduser('~'), 'thumbnails.sqlite')
+
+
+def notebook_id(path):
+    """Cache id of a notebook file, the same each time it is opened."""
+    return hashlib.sha256(os.path.normcase(os.path.abspath(path)).encode('utf-8')).hexdigest()
+
+
+def file_version(path):
+    """Content version of a notebook file as it is on disk."""
+    status = os.stat(path)
+    return f"{status.st_mtime_ns}-{status.st_size}"
+
+
+def render_thumbnail(notebook_data, width=THUMBNAIL_WIDTH):
+    """A QImage preview of a page from its saved form; the paper template is left out."""
+    scale = width / SCENE_RECT.width()
+    image = QImage(width, round(SCENE_RECT.height() * scale), QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(QColor(Qt.GlobalColor.white))
+    page = QTransform.fromScale(scale, scale).translate(-SCENE_RECT.left(), -SCENE_RECT.top())
+    assets = notebook_data.get('assets', {})
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+    # Saved items are topmost first
+    for data in reversed(notebook_data['items']):
+        painter.setTransform(item_scene_transform(data) * page)
+        if data['type'] == 'QGraphicsPathItem':
+            painter.setPen(item_pen(notebook_data, data))
+            painter.setBrush(deserialize_brush(data['brush']))
+            painter.drawPath(path_from_elements(data['elements']))
+        elif data['type'] == 'TextBox':
+            painter.setFont(deserialize_font(data['font']))
+            painter.setPen(deserialize_color(data['color']))
+            painter.drawText(QRectF(0, 0, SCENE_RECT.width(), SCENE_RECT.height()),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, data['text'])
+        elif data['type'] == 'Image':
+            picture = QImage.fromData(assets[data['asset']] if 'asset' in data else data['image'])
+            painter.drawImage(QRectF(0, 0, data.get('width', picture.width()), data.get('height', picture.height())),
+                              picture)
+    painter.end()
+    return image
+
+
+def encode_png(image):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(data)
+
+
+class ThumbnailStore:
+    """The SQLite database of thumbnails, used from one thread."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(_SCHEMA)
+        self.connection.commit()
+
+    def version(self, notebook, page):
+        """Content version of the cached thumbnail, or None if there is none."""
+        row = self.connection.execute("SELECT version FROM thumbnails WHERE notebook = ? AND page = ?",
+                                      (notebook, page)).fetchone()
+        return row[0] if row is not None else None
+
+    def png(self, notebook, page):
+        row = self.connection.execute("SELECT png FROM thumbnails WHERE notebook = ? AND page = ?",
+                                      (notebook, page)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, notebook, page, version, png):
+        self.connection.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)", (notebook, page, version, png))
+        self.connection.commit()
+
+    def forget(self, notebook):
+        self.connection.execute("DELETE FROM thumbnails WHERE notebook = ?", (notebook,))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class _ThumbnailSignals(QObject):
+    finished = Signal(str, int, str, bytes)  # notebook id, page, version, PNG bytes
+    failed = Signal(str, int, str, str)  # notebook id, page, version, what went wrong
+
+
+class ThumbnailJob(QRunnable):
+    """Draws a thumbnail on a pool thread from a page snapshot (see MainWindow.snapshot_notebook), or from
+    the notebook file at a path for a notebook still being opened lazily."""
+
+    def __init__(self, notebook, page, version, snapshot):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.notebook = notebook
+        self.page = page
+        self.version = version
+        self.snapshot = snapshot
+        self.signals = _ThumbnailSignals()
+
+    def run(self):
+        try:
+            if isinstance(self.snapshot, str):
+                notebook_data = read_notebook(self.snapshot)
+            else:
+                notebook_data = finish_notebook(self.snapshot)
+            png = encode_png(render_thumbnail(notebook_data))
+        except Exception as error:
+            # E.g. the file was damaged or removed since; the service still has to hear the job is over
+            self.signals.failed.emit(self.notebook, self.page, self.version, str(error))
+            return
+        self.signals.finished.emit(self.notebook, self.page, self.version, png)
+
+
+class ThumbnailService(QObject):
+    """Thumbnails of pages by notebook id and page number, drawn again only when their content version changes."""
+    # A new thumbnail of the page is in the cache
+    updated = Signal(str, int)
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.store = ThumbnailStore(path or cache_path())
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.jobs = {}  # (notebook, page) -> job drawing its latest version
+        self.running = set()  # every job not finished yet, kept alive while the pool runs it
+        self.failed = {}  # (notebook, page) -> version that couldn't be drawn, not tried again
+
+    def thumbnail(self, notebook, page=0):
+        """The cached QImage of the page, of whatever version, or None."""
+        png = self.store.png(notebook, page) if self.store is not None else None
+        return QImage.fromData(png, "PNG") if png is not None else None
+
+    def request(self, notebook, page, version, snapshot):
+        """Has the page drawn again unless its thumbnail is of version already, or drawing that version failed;
+        snapshot() gives the page's snapshot or its notebook file's path.
+
+        Returns whether a new thumbnail is on its way.
+        """
+        if self.store is None:
+            return False
+        job = self.jobs.get((notebook, page))
+        if (job.version if job is not None else self.store.version(notebook, page)) == version:
+            return False
+        if self.failed.get((notebook, page)) == version:
+            return False
+        job = ThumbnailJob(notebook, page, version, snapshot())
+        job.signals.finished.connect(partial(self.job_finished, job))
+        job.signals.failed.connect(partial(self.job_failed, job))
+        self.jobs[(notebook, page)] = job
+        self.running.add(job)
+        self.pool.start(job)
+        return True
+
+    def job_finished(self, job, notebook, page, version, png):
+        self.running.discard(job)
+        garbage_collector.release_job(job)
+        # A job for a newer version replaced this one, or the service was closed
+        if self.jobs.get((notebook, page)) is not job or self.store is None:
+            return
+        del self.jobs[(notebook, page)]
+        self.store.put(notebook, page, version, png)
+        self.failed.pop((notebook, page), None)
+        self.updated.emit(notebook, page)
+
+    def job_failed(self, job, notebook, page, version, error):
+        self.running.discard(job)
+        garbage_collector.release_job(job)
+        # The page keeps the thumbnail it has, and a later version is drawn as usual
+        if self.jobs.get((notebook, page)) is job:
+            del self.jobs[(notebook, page)]
+            self.failed[(notebook, page)] = version
+
+    def forget(self, notebook):
+        if self.store is not None:
+            self.store.forget(notebook)
+
+    def close(self):
+        self.pool.waitForDone()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
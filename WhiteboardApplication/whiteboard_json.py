@@ -0,0 +1,169 @@
+"""Opening the collaboration client's and server's JSON whiteboard files a piece at a time.
+
+These files hold the whole board in one JSON object, which json.load turns into a list per point
+before the first item can be drawn. WhiteboardReader instead reads the file in blocks and decodes
+one item of its 'items' (or the server's older 'lines') array at a time, packing each point list
+into a NumPy array as soon as it is decoded, so only the item at hand is ever held as Python
+objects. WhiteboardLoader feeds those items to the scene in time-boxed slices on the GUI thread,
+reporting progress as it goes.
+"""
+import codecs
+import json
+import os
+import re
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from WhiteboardApplication import geometry
+
+BLOCK_SIZE = 1024 * 1024  # Bytes read from the file at a time
+ITEM_ARRAYS = ('items', 'lines')  # Top-level arrays streamed item by item; 'lines' is the server's format
+LOAD_SLICE = 0.010  # Seconds of each GUI tick spent adding items to the scene
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+class WhiteboardReader:
+    """Decodes a whiteboard JSON file's items one at a time from an open binary file.
+
+    items() yields each item's dict in file order, with 'points' as an (N, 2) array of x, y and
+    the server's lines given the 'path' type. The board's other top-level values (scene_rect,
+    color, size) are gathered into properties as they are read, which for saved boards is after
+    the items.
+    """
+
+    def __init__(self, file, block_size=BLOCK_SIZE):
+        self.file = file
+        self.block_size = block_size
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.offset = 0  # into buffer, of the first character not yet decoded
+        self.position = 0  # bytes read from the file so far
+        self.properties = {}
+
+    def items(self):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key in ITEM_ARRAYS:
+                yield from self._items(key)
+            else:
+                self.properties[key] = self._value()
+            if self._expect(',}') == '}':
+                return
+
+    def _items(self, key):
+        self._expect('[')
+        if self._peek() == ']':
+            self.offset += 1
+            return
+        while True:
+            item = self._value()
+            if key == 'lines':
+                item['type'] = 'path'
+            if 'points' in item:
+                item['points'] = geometry.as_points(item['points'])
+            yield item
+            if self._expect(',]') == ']':
+                return
+
+    #Reads size more bytes onto the buffer, dropping what's been decoded; False at the end of the file
+    def _fill(self, size):
+        block = self.file.read(size)
+        self.position += len(block)
+        self.buffer = self.buffer[self.offset:] + self.text.decode(block, final=not block)
+        self.offset = 0
+        return bool(block)
+
+    #The next character that isn't whitespace, without consuming it; '' at the end of the file
+    def _peek(self):
+        while True:
+            self.offset = _WHITESPACE.match(self.buffer, self.offset).end()
+            if self.offset < len(self.buffer):
+                return self.buffer[self.offset]
+            if not self._fill(self.block_size):
+                return ''
+
+    def _expect(self, characters):
+        character = self._peek()
+        if not character or character not in characters:
+            expected = ' or '.join(repr(c) for c in characters)
+            raise ValueError(f"Expected {expected} near byte {self.position}, found {character or 'the end'!r}")
+        self.offset += 1
+        return character
+
+    def _value(self):
+        self._peek()
+        size = self.block_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.offset)
+            except json.JSONDecodeError:
+                # Most likely cut off by the end of the buffer; the read grows so a big item is
+                # decoded again only a few times
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # A number running into the end of the buffer may carry on in the next block
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self._fill(size):
+                continue
+            self.offset = end
+            return value
+
+
+class WhiteboardLoader(QObject):
+    """Adds the items of a whiteboard JSON file to a scene a slice at a time, between GUI events.
+
+    build(number, item_data) makes the QGraphicsItem for an item, or None to skip it; number
+    counts the items from 0 in file order.
+    """
+    progress = Signal(int, int)  # bytes read, bytes in the file
+    finished = Signal(dict)  # the board's properties
+    failed = Signal(str)
+
+    def __init__(self, scene, path, build, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self.build = build
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.reader = WhiteboardReader(self.file)
+        self.items = self.reader.items()
+        self.count = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.step)
+
+    def start(self):
+        self.timer.start(0)
+
+    def step(self):
+        deadline = time.perf_counter() + LOAD_SLICE
+        try:
+            while time.perf_counter() < deadline:
+                item_data = next(self.items, None)
+                if item_data is None:
+                    self.cancel()
+                    self.progress.emit(self.size, self.size)
+                    self.finished.emit(self.reader.properties)
+                    return
+                item = self.build(self.count, item_data)
+                self.count += 1
+                if item is not None:
+                    self.scene.addItem(item)
+        except Exception as error:
+            # The items read before the error stay on the board
+            self.cancel()
+            self.failed.emit(str(error))
+            return
+        self.progress.emit(self.reader.position, self.size)
+
+    #Stops loading, e.g. because another file is being opened into the scene
+    def cancel(self):
+        self.timer.stop()
+        self.file.close()